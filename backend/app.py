@@ -34,13 +34,23 @@ def create_app():
     from student_applications.routes import student_bp
     app.register_blueprint(student_bp, url_prefix='/api/student-applications')
 
+    # Create the shared GenAI client and open its connection before the first request
+    from student_applications.genai_client import warm_genai_client
+    warm_genai_client()
+
     # Health check endpoint
     @app.route('/api/health', methods=['GET'])
     def health_check():
+        from student_applications.model_router import model_health_stats
+        from student_applications.ocr import ocr_stats
         return jsonify({
             'status': 'healthy',
             'service': 'Comes Student Application API',
-            'version': '1.0.0'
+            'version': '1.0.0',
+            # Circuit state and recent error rate/latency of each GenAI model in this worker
+            'models': model_health_stats(),
+            # OCR queue depth and per-image latency in this worker
+            'ocr': ocr_stats()
         })
 
     # Root endpoint
@@ -52,7 +62,9 @@ def create_app():
                 'health': '/api/health',
                 'student_applications': '/api/student-applications/',
                 'upload': '/api/student-applications/upload',
-                'analyze': '/api/student-applications/analyze'
+                'analyze': '/api/student-applications/analyze',
+                'jobs': '/api/student-applications/jobs/<job_id>',
+                'job_events': '/api/student-applications/jobs/<job_id>/events'
             }
         })
 
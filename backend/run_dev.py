@@ -33,11 +33,15 @@ if __name__ == '__main__':
     print("  GET  /                              - API documentation")
     print("  GET  /api/student-applications/     - List applications")
     print("  POST /api/student-applications/upload - Upload files")
-    print("  POST /api/student-applications/analyze/<id> - Analyze documents")
+    print("  POST /api/student-applications/analyze/<id> - Queue document analysis")
+    print("  POST /api/student-applications/analyze/<id>/stream - Analyze and stream progress (SSE)")
+    print("  GET  /api/student-applications/jobs/<id> - Get analysis/verification job status")
+    print("  GET  /api/student-applications/jobs/<id>/events - Stream job progress (SSE)")
     print("  GET  /api/student-applications/<id> - Get application details")
     print("  GET  /api/student-applications/template - Get template")
     print("  POST /api/student-applications/transcript/upload - Upload transcript")
-    print("  POST /api/student-applications/transcript/verify/<id> - Verify transcript")
+    print("  POST /api/student-applications/transcript/verify/<id> - Queue transcript verification")
+    print("  POST /api/student-applications/transcript/verify/<id>/stream - Verify and stream progress (SSE)")
     print("  GET  /api/student-applications/transcript/<id> - Get transcript verification")
     print("  GET  /api/student-applications/transcript - List transcript verifications")
 
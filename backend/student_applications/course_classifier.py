@@ -0,0 +1,228 @@
+"""
+Local course type classification for verified transcripts
+
+Course types (core/major/elective/...) follow from keywords in the course
+names far more often than from anything the model knows, so they are
+assigned locally instead of being written out by the model for every
+course. Chinese and English names are scanned in one pass with an
+Aho-Corasick automaton over the keyword table; matches are weighted per
+type, adjusted by credit heuristics (theses and internships carry many
+credits, orientation courses none) and turned into a type with a
+confidence score.
+"""
+
+import os
+import json
+import unicodedata
+from collections import deque
+from typing import Dict, Any, List, Optional, Tuple, Iterable
+
+# English and Chinese descriptions of each course type
+COURSE_TYPE_NAMES = {
+    'core': ('Core Course', '核心课程'),
+    'major': ('Major Course', '专业课程'),
+    'elective': ('Elective Course', '选修课程'),
+    'general': ('General Education', '通识课程'),
+    'required': ('Required Course', '必修课程'),
+    'optional': ('Optional Course', '可选课程'),
+    'practical': ('Practical Course', '实践课程'),
+    'thesis': ('Thesis', '论文课程'),
+    'internship': ('Internship', '实习课程'),
+    'language': ('Language Course', '语言课程'),
+}
+
+# (course type, weight, keywords); specific subjects outweigh category words
+DEFAULT_KEYWORDS = [
+    ('thesis', 4.0, ['毕业论文', '毕业设计', '学位论文', 'thesis', 'dissertation', 'capstone',
+                     'graduation project', 'graduation design']),
+    ('internship', 4.0, ['实习', '见习', 'internship', 'placement']),
+    ('practical', 3.0, ['实验', '实践', '实训', '课程设计', '军训', '社会调查', '工程训练', '金工',
+                        'lab', 'laboratory', 'experiment', 'practice', 'practical', 'workshop',
+                        'military training', 'course project']),
+    # Only named languages: '语言'/'language' alone also names programming and formal languages
+    ('language', 3.0, ['英语', '日语', '德语', '法语', '俄语', '西班牙语', '韩语', '外语',
+                       '听说', '雅思', '托福', 'english', 'japanese', 'german', 'french', 'russian',
+                       'spanish', 'korean', 'toefl', 'ielts']),
+    ('major', 3.5, ['程序设计', '编程', '编译', '形式语言', '自动机', '汇编语言', '数据库语言',
+                    'programming', 'compiler', 'formal language', 'automata', 'assembly language']),
+    ('general', 3.0, ['思想道德', '马克思', '毛泽东', '习近平', '中国近现代史', '形势与政策', '体育',
+                      '军事理论', '心理健康', '职业生涯', '就业指导', '创新创业', '安全教育',
+                      '入学教育', '通识', '大学生', 'ideolog', 'marxis', 'mao zedong', 'politic',
+                      'physical education', 'military theory', 'mental health', 'career',
+                      'entrepreneurship', 'general education', 'moral', 'situation and policy']),
+    ('required', 2.0, ['高等数学', '线性代数', '概率论', '数理统计', '大学物理', '大学化学',
+                       '计算机基础', 'calculus', 'advanced mathematics', 'linear algebra',
+                       'probability', 'college physics', 'university physics']),
+    ('core', 2.0, ['核心', 'core']),
+    ('major', 2.0, ['专业', 'major', 'professional']),
+    ('elective', 2.5, ['选修', '任选', '限选', '选讲', 'elective', 'special topics', 'selected topics']),
+    ('optional', 2.0, ['可选', 'optional']),
+    ('required', 1.5, ['必修', 'required', 'compulsory']),
+]
+
+# Type given to courses no keyword matched (most unlabelled courses are subject courses)
+FALLBACK_TYPE = 'major'
+FALLBACK_CONFIDENCE = 0.2
+
+
+class KeywordAutomaton:
+    """Aho-Corasick automaton finding every keyword occurrence in one pass over the text"""
+
+    def __init__(self, keywords: Iterable[Tuple[str, Any]]):
+        self.goto: List[Dict[str, int]] = [{}]
+        self.fail: List[int] = [0]
+        self.output: List[List[Tuple[int, Any]]] = [[]]
+
+        for keyword, value in keywords:
+            state = 0
+            for char in keyword:
+                if char not in self.goto[state]:
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.output.append([])
+                    self.goto[state][char] = len(self.goto) - 1
+                state = self.goto[state][char]
+            self.output[state].append((len(keyword), value))
+
+        # Breadth-first failure links; each state also reports the matches of its fallbacks
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, child in self.goto[state].items():
+                queue.append(child)
+                fallback = self.fail[state]
+                while fallback and char not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                self.fail[child] = self.goto[fallback].get(char, 0)
+                self.output[child] = self.output[child] + self.output[self.fail[child]]
+
+    def search(self, text: str) -> Iterable[Tuple[int, int, Any]]:
+        """Yield (start, end, value) for every keyword occurrence"""
+        state = 0
+        for index, char in enumerate(text):
+            while state and char not in self.goto[state]:
+                state = self.fail[state]
+            state = self.goto[state].get(char, 0)
+            for length, value in self.output[state]:
+                yield index + 1 - length, index + 1, value
+
+
+def _load_keywords() -> List[Tuple[str, float, List[str]]]:
+    """Default keywords plus those in the COURSE_KEYWORDS_FILE JSON file ({type: [keyword, ...]})"""
+    keywords = list(DEFAULT_KEYWORDS)
+    path = os.environ.get('COURSE_KEYWORDS_FILE')
+    if path:
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                custom = json.load(f)
+            for type_name, words in custom.items():
+                if type_name in COURSE_TYPE_NAMES:
+                    keywords.append((type_name, 4.0, list(words)))
+        except (OSError, ValueError) as e:
+            print(f"Could not load course keywords from {path}: {e}")
+    return keywords
+
+
+def _normalize(text: str) -> str:
+    # NFKC folds full-width letters and brackets common in Chinese transcripts
+    return unicodedata.normalize('NFKC', text).lower()
+
+
+def course_type_entry(type_name: Optional[str], confidence: Optional[float] = None) -> Dict[str, Any]:
+    """A course_type object for a schema course type"""
+    en, zh = COURSE_TYPE_NAMES.get(type_name, (None, None))
+    entry = {'type': type_name if type_name in COURSE_TYPE_NAMES else None, 'en': en, 'zh': zh}
+    if confidence is not None:
+        entry['confidence'] = confidence
+    return entry
+
+
+class CourseTypeClassifier:
+    """Keyword and credit based course type classifier"""
+
+    def __init__(self, keywords: Optional[List[Tuple[str, float, List[str]]]] = None):
+        entries = []
+        for type_name, weight, words in keywords if keywords is not None else _load_keywords():
+            for word in words:
+                word = _normalize(word)
+                entries.append((word, (type_name, weight, word.isascii())))
+        self.automaton = KeywordAutomaton(entries)
+
+    def scores(self, name: str, credits: Optional[float] = None) -> Dict[str, float]:
+        """Weight of each course type matched in a course name"""
+        text = _normalize(name)
+        scores: Dict[str, float] = {}
+        for start, end, (type_name, weight, ascii_word) in self.automaton.search(text):
+            # English keywords must start a word ('lab' in 'laboratory', not in 'syllabus')
+            if ascii_word and start > 0 and text[start - 1].isalnum():
+                continue
+            scores[type_name] = scores.get(type_name, 0.0) + weight
+
+        if credits is not None:
+            if credits >= 4:
+                for type_name in ('thesis', 'internship'):
+                    if type_name in scores:
+                        scores[type_name] *= 1.5
+            elif credits <= 1:
+                for type_name in ('general', 'practical', 'language'):
+                    if type_name in scores:
+                        scores[type_name] *= 1.2
+                if credits == 0 and not scores:
+                    scores['general'] = 1.0
+        return scores
+
+    def classify(self, name_zh: Optional[str], name_en: Optional[str],
+                 credits: Optional[float] = None) -> Dict[str, Any]:
+        """course_type object ({'type', 'en', 'zh', 'confidence'}) for one course"""
+        name = ' | '.join(part for part in (name_zh, name_en) if part)
+        scores = self.scores(name, credits)
+        if not scores:
+            return course_type_entry(FALLBACK_TYPE, FALLBACK_CONFIDENCE)
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+        best, top = ranked[0]
+        runner_up = ranked[1][1] if len(ranked) > 1 else 0.0
+        return course_type_entry(best, round(top / (top + runner_up + 1.0), 2))
+
+    def classify_result(self, result: Dict[str, Any]) -> int:
+        """Fill course_type of every course in a verification result in place
+
+        Courses whose course_type already carries a confidence (a type printed
+        on the transcript) keep it. Returns the number of courses classified.
+        """
+        classified = 0
+        for semester in result.get('semesters') or []:
+            for course in semester.get('courses') or []:
+                if not isinstance(course, dict):
+                    continue
+                existing = course.get('course_type')
+                if isinstance(existing, dict) and existing.get('confidence') is not None:
+                    continue
+                credits = course.get('credits')
+                course['course_type'] = self.classify(
+                    course.get('name_zh'), course.get('name_en'),
+                    credits if isinstance(credits, (int, float)) and not isinstance(credits, bool) else None
+                )
+                classified += 1
+        return classified
+
+
+_classifier = None
+
+
+def get_course_classifier() -> CourseTypeClassifier:
+    """Get the process-wide classifier (the automaton is built once)"""
+    global _classifier
+    if _classifier is None:
+        _classifier = CourseTypeClassifier()
+    return _classifier
+
+
+def set_course_classifier(classifier: Optional[CourseTypeClassifier]) -> None:
+    """Replace the process-wide classifier (None rebuilds it from the configured keywords)"""
+    global _classifier
+    _classifier = classifier
+
+
+def course_classifier_enabled() -> bool:
+    """Whether course types are classified locally instead of by the model (COURSE_CLASSIFIER, default true)"""
+    return os.environ.get('COURSE_CLASSIFIER', 'true').lower() in ('1', 'true', 'yes')
@@ -0,0 +1,259 @@
+"""
+Content-addressed cache for extracted document text
+
+Entries are keyed by the SHA-256 of the file bytes plus the extractor
+version, so re-uploads of the same document skip PDF parsing and OCR.
+Lookups go through a per-process LRU tier first and then an on-disk tier
+that every worker process on the host shares.
+"""
+
+import os
+import hashlib
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, Optional
+
+DEFAULT_CACHE_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'instance', 'extraction_cache'
+)
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+class ExtractionCache:
+    """Two-tier (memory LRU + shared disk) cache of extracted text"""
+
+    def __init__(self, directory: Optional[str] = DEFAULT_CACHE_DIR,
+                 max_memory_items: int = 256,
+                 max_memory_bytes: int = 64 * 1024 * 1024,
+                 max_disk_bytes: int = 512 * 1024 * 1024):
+        """
+        Args:
+            directory: Directory of the disk tier, or None for memory only
+            max_memory_items: Maximum number of entries kept in memory
+            max_memory_bytes: Maximum total size of entries kept in memory
+            max_disk_bytes: Disk tier size that triggers eviction of the oldest entries
+        """
+        self.directory = directory
+        self.max_memory_items = max_memory_items
+        self.max_memory_bytes = max_memory_bytes
+        self.max_disk_bytes = max_disk_bytes
+
+        self._memory: 'OrderedDict[str, str]' = OrderedDict()
+        self._memory_bytes = 0
+        self._lock = threading.Lock()
+        self._stats = {'memory_hits': 0, 'disk_hits': 0, 'misses': 0, 'stores': 0, 'evictions': 0}
+
+        self._disk_bytes = 0
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+            self._disk_bytes = self._disk_usage()
+
+    @staticmethod
+    def make_key(filepath: str, version: str, variant: str = '') -> str:
+        """Hash the file bytes together with the extractor version
+
+        Args:
+            filepath: File to hash
+            version: Extractor version; bump it to invalidate old entries
+            variant: Extra inputs that change the extraction result (e.g. routing hints)
+        """
+        digest = hashlib.sha256()
+        with open(filepath, 'rb') as file:
+            for chunk in iter(lambda: file.read(HASH_CHUNK_SIZE), b''):
+                digest.update(chunk)
+        digest.update(b'\0' + version.encode('utf-8') + b'\0' + variant.encode('utf-8'))
+        return digest.hexdigest()
+
+    def _path_for(self, key: str) -> str:
+        """Disk path of an entry, sharded by key prefix"""
+        return os.path.join(self.directory, key[:2], f"{key}.txt")
+
+    def get(self, key: str) -> Optional[str]:
+        """Look up extracted text, promoting disk hits into memory"""
+        with self._lock:
+            text = self._memory.get(key)
+            if text is not None:
+                self._memory.move_to_end(key)
+                self._stats['memory_hits'] += 1
+                return text
+
+        if self.directory:
+            path = self._path_for(key)
+            try:
+                with open(path, 'r', encoding='utf-8') as file:
+                    text = file.read()
+                # Touch the entry so disk eviction treats it as recently used
+                os.utime(path)
+            except (FileNotFoundError, UnicodeDecodeError):
+                text = None
+            except OSError as e:
+                print(f"Extraction cache read failed: {e}")
+                text = None
+
+            if text is not None:
+                with self._lock:
+                    self._stats['disk_hits'] += 1
+                self._remember(key, text)
+                return text
+
+        with self._lock:
+            self._stats['misses'] += 1
+        return None
+
+    def set(self, key: str, text: str) -> None:
+        """Store extracted text in both tiers"""
+        self._remember(key, text)
+        with self._lock:
+            self._stats['stores'] += 1
+
+        if not self.directory:
+            return
+
+        path = self._path_for(key)
+        tmp_path = None
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # An entry rewritten in place only changes the disk usage by the size difference
+            try:
+                replaced = os.path.getsize(path)
+            except FileNotFoundError:
+                replaced = 0
+            # Write to a temp file and rename so other workers never read partial entries
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+            with os.fdopen(fd, 'w', encoding='utf-8') as file:
+                file.write(text)
+            os.replace(tmp_path, path)
+        except (OSError, UnicodeError) as e:
+            print(f"Extraction cache write failed: {e}")
+            if tmp_path is not None:
+                try:
+                    os.unlink(tmp_path)
+                except OSError:
+                    pass
+            return
+
+        with self._lock:
+            self._disk_bytes += len(text.encode('utf-8')) - replaced
+            over_limit = self._disk_bytes > self.max_disk_bytes
+        if over_limit:
+            self._evict_disk()
+
+    def _remember(self, key: str, text: str) -> None:
+        """Insert into the memory tier, evicting least recently used entries"""
+        size = len(text.encode('utf-8'))
+        if size > self.max_memory_bytes:
+            return
+
+        with self._lock:
+            previous = self._memory.pop(key, None)
+            if previous is not None:
+                self._memory_bytes -= len(previous.encode('utf-8'))
+
+            self._memory[key] = text
+            self._memory_bytes += size
+
+            while len(self._memory) > self.max_memory_items or self._memory_bytes > self.max_memory_bytes:
+                _, evicted = self._memory.popitem(last=False)
+                self._memory_bytes -= len(evicted.encode('utf-8'))
+                self._stats['evictions'] += 1
+
+    def _disk_entries(self):
+        """List (mtime, size, path) of every entry in the disk tier"""
+        entries = []
+        for root, _, filenames in os.walk(self.directory):
+            for filename in filenames:
+                if not filename.endswith('.txt'):
+                    continue
+                path = os.path.join(root, filename)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+        return entries
+
+    def _disk_usage(self) -> int:
+        """Total size of the disk tier"""
+        return sum(size for _, size, _ in self._disk_entries())
+
+    def _evict_disk(self) -> None:
+        """Delete the least recently used disk entries until usage is under 90% of the limit"""
+        entries = sorted(self._disk_entries())
+        usage = sum(size for _, size, _ in entries)
+        target = int(self.max_disk_bytes * 0.9)
+
+        for _, size, path in entries:
+            if usage <= target:
+                break
+            try:
+                os.remove(path)
+                usage -= size
+                with self._lock:
+                    self._stats['evictions'] += 1
+            except FileNotFoundError:
+                # Another worker evicted it first
+                usage -= size
+            except OSError as e:
+                print(f"Extraction cache eviction failed: {e}")
+
+        with self._lock:
+            self._disk_bytes = usage
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters and tier sizes"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['memory_items'] = len(self._memory)
+            stats['memory_bytes'] = self._memory_bytes
+            stats['disk_bytes'] = self._disk_bytes
+        lookups = stats['memory_hits'] + stats['disk_hits'] + stats['misses']
+        stats['hit_rate'] = (stats['memory_hits'] + stats['disk_hits']) / lookups if lookups else 0.0
+        return stats
+
+    def clear(self) -> None:
+        """Drop every entry from both tiers"""
+        with self._lock:
+            self._memory.clear()
+            self._memory_bytes = 0
+        if self.directory:
+            for _, _, path in self._disk_entries():
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+            with self._lock:
+                self._disk_bytes = 0
+
+
+_extraction_cache = None
+_extraction_cache_lock = threading.Lock()
+
+
+def get_extraction_cache() -> Optional[ExtractionCache]:
+    """Get the process-wide extraction cache, or None when disabled
+
+    Configured with EXTRACTION_CACHE_ENABLED, EXTRACTION_CACHE_DIR,
+    EXTRACTION_CACHE_MEMORY_ITEMS and EXTRACTION_CACHE_MAX_MB.
+    """
+    global _extraction_cache
+    if os.environ.get('EXTRACTION_CACHE_ENABLED', 'true').lower() not in ('1', 'true', 'yes'):
+        return None
+
+    if _extraction_cache is None:
+        with _extraction_cache_lock:
+            if _extraction_cache is None:
+                _extraction_cache = ExtractionCache(
+                    directory=os.environ.get('EXTRACTION_CACHE_DIR', DEFAULT_CACHE_DIR),
+                    max_memory_items=int(os.environ.get('EXTRACTION_CACHE_MEMORY_ITEMS', 256)),
+                    max_disk_bytes=int(os.environ.get('EXTRACTION_CACHE_MAX_MB', 512)) * 1024 * 1024
+                )
+    return _extraction_cache
+
+
+def set_extraction_cache(cache: Optional[ExtractionCache]) -> None:
+    """Replace the process-wide extraction cache (None resets to the configured default)"""
+    global _extraction_cache
+    with _extraction_cache_lock:
+        _extraction_cache = cache
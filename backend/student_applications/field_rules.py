@@ -0,0 +1,253 @@
+"""
+Rule-based extraction of applicant fields
+
+Fields with a fixed written form (email addresses, mainland phone
+numbers, passport numbers, IELTS Test Report Form numbers and band
+scores, GPAs written as "3.6 / 4.0") and clearly labelled form fields
+are read with regular expressions before the model is called. A field is
+only filled when every match across the documents agrees on one value,
+so the model is asked only for what is still unresolved, or not at all.
+"""
+
+import os
+import re
+from typing import Dict, Any, List, Optional, Set
+
+from .schemas import APPLICATION_RESPONSE_SCHEMA
+
+# Paths that must be known before the GenAI call can be skipped
+DEFAULT_REQUIRED_FIELDS = [
+    'applicant_info.name',
+    'applicant_info.gender',
+    'applicant_info.birth_date',
+    'applicant_info.passport_number',
+    'applicant_info.phone',
+    'applicant_info.email',
+    'education_background.university',
+    'education_background.major',
+    'education_background.gpa.score',
+    'education_background.gpa.scale',
+    'language_test.test_type',
+    'language_test.total_score',
+    'language_test.sections.listening',
+    'language_test.sections.reading',
+    'language_test.sections.writing',
+    'language_test.sections.speaking',
+]
+
+# Sections only a resume can provide; required whenever one was uploaded
+RESUME_FIELDS = ['work_experience', 'recommenders']
+
+MONTHS = {
+    'JAN': 1, 'FEB': 2, 'MAR': 3, 'APR': 4, 'MAY': 5, 'JUN': 6,
+    'JUL': 7, 'AUG': 8, 'SEP': 9, 'OCT': 10, 'NOV': 11, 'DEC': 12
+}
+
+_SEP = r'[^\S\n]*[:：]?[^\S\n]*'
+_DATE = (
+    r'(\d{4}[-/.年]\s*\d{1,2}[-/.月]\s*\d{1,2}日?'
+    r'|\d{1,2}[-/\s]*(?:JAN|FEB|MAR|APR|MAY|JUN|JUL|AUG|SEP|OCT|NOV|DEC)[A-Z]*[-/\s]*\d{4})'
+)
+_BAND = r'(\d(?:\.[05])?)(?![\d.])'
+
+EMAIL = re.compile(r'(?<![\w.+-])[A-Za-z0-9._%+-]+@[A-Za-z0-9-]+(?:\.[A-Za-z0-9-]+)*\.[A-Za-z]{2,}')
+PHONE = re.compile(r'(?<!\d)(?:\+?86[-\s]?)?(1[3-9]\d[-\s]?\d{4}[-\s]?\d{4})(?!\d)')
+PASSPORT = re.compile(r'(?<![A-Z0-9])([EG]\d{8}|E[A-HJ-NP-Z]\d{7})(?![A-Z0-9])')
+PASSPORT_LABELLED = re.compile(r'(?:护照号码?|Passport\s*(?:No\.?|Number))' + _SEP + r'([A-Z]{1,2}\d{7,8})(?![A-Z0-9])', re.I)
+IELTS = re.compile(r'\bIELTS\b|International English Language Testing System|雅思')
+TRF_NUMBER = re.compile(
+    r'(?:Test\s*Report\s*Form\s*(?:No\.?|Number)|TRF\s*(?:No\.?|Number))' + _SEP + r'([A-Z0-9]{10,20})\b', re.I
+)
+BAND_SCORES = {
+    'listening': re.compile(r'(?:Listening|听力)' + _SEP + _BAND, re.I),
+    'reading': re.compile(r'(?:Reading|阅读)' + _SEP + _BAND, re.I),
+    'writing': re.compile(r'(?:Writing|写作)' + _SEP + _BAND, re.I),
+    'speaking': re.compile(r'(?:Speaking|口语)' + _SEP + _BAND, re.I),
+}
+OVERALL_BAND = re.compile(r'(?:Overall\s*Band\s*Score|Overall|总分)' + _SEP + _BAND, re.I)
+TEST_DATE = re.compile(r'(?:Date\s*of\s*Test|Test\s*Date|考试日期)' + _SEP + _DATE, re.I)
+GPA = re.compile(
+    r'(?:GPA|平均学分绩点|绩点)' + _SEP + r'(\d{1,3}(?:\.\d{1,2})?)\s*/\s*(4(?:\.0+)?|5(?:\.0+)?|100)(?![\d.])', re.I
+)
+GPA_BARE = re.compile(r'(?<![\d.])([0-4]\.\d{1,2})\s*/\s*(4\.0+)(?![\d.])')
+NAME = re.compile(r'姓\s*名' + _SEP + r'([一-龥·]{2,10})(?![一-龥])')
+GENDER = re.compile(r'(?:性\s*别' + _SEP + r'([男女])|\b(?:Sex|Gender)' + _SEP + r'(Male|Female|M|F)\b)', re.I)
+BIRTH_DATE = re.compile(r'(?:出生日期|出生年月日|Date\s*of\s*Birth)' + _SEP + _DATE, re.I)
+UNIVERSITY = re.compile(r'(?:毕业院校|就读院校|所在院校|学\s*校)' + _SEP + r'([一-龥（）()]{2,30}(?:大学|学院))')
+MAJOR = re.compile(r'专\s*业' + _SEP + r'([一-龥（）()与和]{2,30})(?![一-龥])')
+
+# Labels that follow a value without a separator in text extracted from tables
+NEXT_LABEL = re.compile(r'(?:性别|学号|出生|专业|民族|身份|学制|学历|学位|年级|班级|层次|院系)')
+
+
+def _cut_at_label(value: str) -> str:
+    return NEXT_LABEL.split(value)[0]
+
+
+def normalize_date(text: str) -> Optional[str]:
+    """Turn '2023-03-12', '2023年3月12日' or '12/MAR/2023' into YYYY-MM-DD"""
+    text = text.strip().upper()
+    match = re.match(r'(\d{4})[-/.年]\s*(\d{1,2})[-/.月]\s*(\d{1,2})', text)
+    if match:
+        year, month, day = (int(part) for part in match.groups())
+    else:
+        match = re.match(r'(\d{1,2})[-/\s]*([A-Z]{3})[A-Z]*[-/\s]*(\d{4})', text)
+        if not match or match.group(2) not in MONTHS:
+            return None
+        day, month, year = int(match.group(1)), MONTHS[match.group(2)], int(match.group(3))
+    if not (1 <= month <= 12 and 1 <= day <= 31):
+        return None
+    return f"{year:04d}-{month:02d}-{day:02d}"
+
+
+def _format_number(value: float) -> str:
+    return f"{value:.1f}"
+
+
+def overall_band(sections: Dict[str, float]) -> float:
+    """IELTS overall band: mean of the four sections rounded to the nearest half band, halves up"""
+    mean = sum(sections.values()) / 4.0
+    return int(mean * 2 + 0.5) / 2.0
+
+
+def _collect(found: Dict[str, Set[str]], path: str, value: Optional[str]) -> None:
+    if value:
+        found.setdefault(path, set()).add(value)
+
+
+def _language_fields(text: str, found: Dict[str, Set[str]]) -> None:
+    """IELTS fields, taken only from documents that are IELTS reports"""
+    if not IELTS.search(text):
+        return
+
+    # A mention of IELTS alone does not make a score report
+    trf_numbers = [match.group(1).upper() for match in TRF_NUMBER.finditer(text)]
+    for number in trf_numbers:
+        _collect(found, 'language_test.reference_number', number)
+    if trf_numbers:
+        _collect(found, 'language_test.test_type', 'IELTS')
+        for match in TEST_DATE.finditer(text):
+            _collect(found, 'language_test.test_date', normalize_date(match.group(1)))
+
+    # Band scores count only when they are consistent with each other
+    sections = {}
+    for name, pattern in BAND_SCORES.items():
+        values = {float(match.group(1)) for match in pattern.finditer(text)}
+        values = {value for value in values if value <= 9}
+        if len(values) == 1:
+            sections[name] = values.pop()
+    if len(sections) != 4:
+        return
+    overall_values = {float(match.group(1)) for match in OVERALL_BAND.finditer(text)}
+    expected = overall_band(sections)
+    if overall_values and overall_values != {expected}:
+        return
+    for name, value in sections.items():
+        _collect(found, f'language_test.sections.{name}', _format_number(value))
+    _collect(found, 'language_test.total_score', _format_number(expected))
+    _collect(found, 'language_test.test_type', 'IELTS')
+
+
+def _gpa_fields(text: str, found: Dict[str, Set[str]]) -> None:
+    matches = [match.groups() for match in GPA.finditer(text)] or [match.groups() for match in GPA_BARE.finditer(text)]
+    for score, scale in matches:
+        if float(score) <= float(scale):
+            scale = scale if scale == '100' else f"{float(scale):.1f}"
+            _collect(found, 'education_background.gpa', f"{score}|{scale}")
+
+
+def extract_rule_fields(document_texts: Dict[str, str]) -> Dict[str, str]:
+    """Read the fields whose value is unambiguous in the extracted document texts
+
+    Returns:
+        Dotted field path -> value for every field found with exactly one
+        distinct value across all documents
+    """
+    found: Dict[str, Set[str]] = {}
+    emails: Set[str] = set()
+    phones: Set[str] = set()
+
+    for text in document_texts.values():
+        if not text:
+            continue
+        emails.update(match.group(0).lower() for match in EMAIL.finditer(text))
+        phones.update(re.sub(r'[-\s]', '', match.group(1)) for match in PHONE.finditer(text))
+        for match in PASSPORT_LABELLED.finditer(text):
+            _collect(found, 'applicant_info.passport_number', match.group(1).upper())
+        if 'applicant_info.passport_number' not in found:
+            for match in PASSPORT.finditer(text):
+                _collect(found, 'applicant_info.passport_number', match.group(1))
+        for match in NAME.finditer(text):
+            name = _cut_at_label(match.group(1))
+            _collect(found, 'applicant_info.name', name if len(name) >= 2 else None)
+        for match in GENDER.finditer(text):
+            value = match.group(1) or ('男' if match.group(2).upper().startswith('M') else '女')
+            _collect(found, 'applicant_info.gender', value)
+        for match in BIRTH_DATE.finditer(text):
+            _collect(found, 'applicant_info.birth_date', normalize_date(match.group(1)))
+        for match in UNIVERSITY.finditer(text):
+            university = match.group(1)
+            # '北京大学信息科学技术学院' names the university's school; keep the university
+            if '大学' in university:
+                university = university[:university.index('大学') + 2]
+            _collect(found, 'education_background.university', university)
+        for match in MAJOR.finditer(text):
+            major = _cut_at_label(match.group(1))
+            _collect(found, 'education_background.major', major if len(major) >= 2 else None)
+        _gpa_fields(text, found)
+        _language_fields(text, found)
+
+    # A single address/number across all documents is the applicant's own;
+    # several usually mean recommenders or employers are listed too
+    if len(emails) == 1:
+        found['applicant_info.email'] = emails
+    if len(phones) == 1:
+        found['applicant_info.phone'] = phones
+
+    fields = {path: values.pop() for path, values in found.items() if len(values) == 1}
+    gpa = fields.pop('education_background.gpa', None)
+    if gpa:
+        fields['education_background.gpa.score'], fields['education_background.gpa.scale'] = gpa.split('|')
+    return fields
+
+
+def required_fields(document_texts: Dict[str, str]) -> List[str]:
+    """Fields that must be resolved before the GenAI call can be skipped
+
+    RULE_REQUIRED_FIELDS (comma-separated dotted paths) replaces the default
+    list. Work experience and recommenders are required when a resume was uploaded.
+    """
+    configured = os.environ.get('RULE_REQUIRED_FIELDS')
+    if configured:
+        return [path.strip() for path in configured.split(',') if path.strip()]
+    fields = list(DEFAULT_REQUIRED_FIELDS)
+    if (document_texts.get('resume') or '').strip():
+        fields.extend(RESUME_FIELDS)
+    return fields
+
+
+def rule_extraction_enabled() -> bool:
+    """Whether the rule-based fast path runs before the GenAI call (RULE_EXTRACTION, default true)"""
+    return os.environ.get('RULE_EXTRACTION', 'true').lower() in ('1', 'true', 'yes')
+
+
+def empty_result(schema: Dict[str, Any] = APPLICATION_RESPONSE_SCHEMA) -> Any:
+    """Result skeleton of a schema: objects with null fields and empty lists"""
+    if schema['type'] == 'OBJECT':
+        return {key: empty_result(child) for key, child in schema['properties'].items()}
+    if schema['type'] == 'ARRAY':
+        return []
+    return None
+
+
+def apply_rule_fields(result: Dict[str, Any], fields: Dict[str, str]) -> Dict[str, Any]:
+    """Write rule-extracted values into a result, overriding what the model returned"""
+    for path, value in fields.items():
+        keys = path.split('.')
+        target = result
+        for key in keys[:-1]:
+            if not isinstance(target.get(key), dict):
+                target[key] = {}
+            target = target[key]
+        target[keys[-1]] = value
+    return result
@@ -0,0 +1,138 @@
+"""
+Process-wide Google GenAI client
+
+Both services share one client per worker process, so they also share
+its pool of keep-alive HTTPS connections. The client is created and
+warmed when the app starts, which keeps connection setup out of the
+first user request.
+"""
+
+import os
+import threading
+from typing import Optional
+
+# Try to import Google GenAI with different possible import paths
+try:
+    import google.genai as genai
+    GENAI_AVAILABLE = True
+except ImportError:
+    try:
+        import genai
+        GENAI_AVAILABLE = True
+    except ImportError:
+        GENAI_AVAILABLE = False
+
+try:
+    import httpx
+    HTTPX_AVAILABLE = True
+except ImportError:
+    HTTPX_AVAILABLE = False
+
+
+def _http_options():
+    """HTTP options with the configured connection pool, or None if unsupported
+
+    Pool size comes from GENAI_POOL_SIZE, idle connection lifetime from
+    GENAI_KEEPALIVE_SECONDS and the request timeout from GENAI_TIMEOUT (seconds).
+    """
+    types = getattr(genai, 'types', None)
+    if not HTTPX_AVAILABLE or types is None or not hasattr(types, 'HttpOptions'):
+        return None
+
+    pool_size = int(os.environ.get('GENAI_POOL_SIZE', 10))
+    limits = httpx.Limits(
+        max_connections=pool_size,
+        max_keepalive_connections=pool_size,
+        keepalive_expiry=float(os.environ.get('GENAI_KEEPALIVE_SECONDS', 60))
+    )
+    try:
+        return types.HttpOptions(
+            client_args={'limits': limits},
+            # HttpOptions takes milliseconds
+            timeout=int(float(os.environ.get('GENAI_TIMEOUT', 120)) * 1000)
+        )
+    except Exception as e:
+        # Older google-genai releases have no client_args
+        print(f"GenAI connection pool options not supported: {e}")
+        return None
+
+
+def create_genai_client():
+    """Create a GenAI client with a pooled HTTP connection
+
+    Raises:
+        ImportError: If google-genai is not installed
+        ValueError: If GOOGLE_GENAI_API_KEY is not set
+    """
+    if not GENAI_AVAILABLE:
+        raise ImportError("google-genai library is not installed. Please install it with: pip install google-genai")
+
+    api_key = os.environ.get('GOOGLE_GENAI_API_KEY')
+    if not api_key:
+        raise ValueError("GOOGLE_GENAI_API_KEY environment variable is required")
+
+    http_options = _http_options()
+    if http_options is None:
+        return genai.Client(api_key=api_key)
+    return genai.Client(api_key=api_key, http_options=http_options)
+
+
+_client = None
+_client_pid = None
+_client_lock = threading.Lock()
+
+
+def get_genai_client():
+    """Get the GenAI client of the current process, creating it on first use
+
+    A process forked after the client was created gets its own client, so
+    workers never share sockets.
+
+    Raises:
+        ImportError: If google-genai is not installed
+        ValueError: If GOOGLE_GENAI_API_KEY is not set
+    """
+    global _client, _client_pid
+    if _client is None or _client_pid != os.getpid():
+        with _client_lock:
+            if _client is None or _client_pid != os.getpid():
+                _client = create_genai_client()
+                _client_pid = os.getpid()
+    return _client
+
+
+def set_genai_client(client) -> None:
+    """Replace the process-wide client (None recreates it on next use)"""
+    global _client, _client_pid
+    with _client_lock:
+        _client = client
+        _client_pid = os.getpid() if client is not None else None
+
+
+def warm_genai_client(background: bool = True) -> Optional[threading.Thread]:
+    """Create the client and open a connection before the first user request
+
+    The warm-up request fetches the metadata of GENAI_WARMUP_MODEL, which
+    costs no tokens. Disabled with GENAI_WARMUP=false.
+
+    Returns:
+        The warm-up thread when running in the background
+    """
+    if os.environ.get('GENAI_WARMUP', 'true').lower() not in ('1', 'true', 'yes'):
+        return None
+
+    def warm():
+        try:
+            client = get_genai_client()
+            client.models.get(model=os.environ.get('GENAI_WARMUP_MODEL', 'gemini-2.5-pro'))
+            print("GenAI client warmed up")
+        except Exception as e:
+            print(f"GenAI client warm-up skipped: {e}")
+
+    if not background:
+        warm()
+        return None
+
+    thread = threading.Thread(target=warm, name='genai-warmup', daemon=True)
+    thread.start()
+    return thread
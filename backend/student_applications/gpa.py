@@ -0,0 +1,402 @@
+"""
+Credit, GPA and grade-scale computation for verified transcripts
+
+The model's academic_summary numbers are free text and often wrong, so
+they are recomputed from semesters[].courses[]: credit totals, course
+counts and credit-weighted GPAs per semester and overall. Grades written
+on 100-point, letter or Chinese five-level (优秀/良好/中等/及格) scales
+are converted with configurable tables to the transcript's GPA scale
+(4.0, 4.3, 5.0 or 100), and every model number that disagrees with the
+computed one is flagged.
+
+All courses of a batch of transcripts are flattened into arrays and
+aggregated at once with NumPy when it is installed, so batch
+re-verification handles thousands of transcripts per second; a pure
+Python path gives the same results without NumPy.
+"""
+
+import os
+import re
+import json
+import math
+from bisect import bisect_right
+from functools import lru_cache
+from typing import Dict, Any, List, Optional, Tuple
+
+from .utils import to_number, tidy_number
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+# Percent thresholds (lowest score of each band) and letter grades per scale
+DEFAULT_SCALES = {
+    '4.0': {
+        'percent': [[90, 4.0], [85, 3.7], [82, 3.3], [78, 3.0], [75, 2.7],
+                    [72, 2.3], [68, 2.0], [64, 1.5], [60, 1.0], [0, 0.0]],
+        'letters': {'A+': 4.0, 'A': 4.0, 'A-': 3.7, 'B+': 3.3, 'B': 3.0, 'B-': 2.7,
+                    'C+': 2.3, 'C': 2.0, 'C-': 1.7, 'D+': 1.3, 'D': 1.0, 'D-': 0.7, 'F': 0.0}
+    },
+    '4.3': {
+        'percent': [[95, 4.3], [90, 4.0], [85, 3.7], [82, 3.3], [78, 3.0], [75, 2.7],
+                    [72, 2.3], [68, 2.0], [64, 1.5], [60, 1.0], [0, 0.0]],
+        'letters': {'A+': 4.3, 'A': 4.0, 'A-': 3.7, 'B+': 3.3, 'B': 3.0, 'B-': 2.7,
+                    'C+': 2.3, 'C': 2.0, 'C-': 1.7, 'D+': 1.3, 'D': 1.0, 'D-': 0.7, 'F': 0.0}
+    },
+    '5.0': {
+        'percent': [[95, 5.0], [90, 4.5], [85, 4.0], [80, 3.5], [75, 3.0],
+                    [70, 2.5], [65, 2.0], [60, 1.5], [0, 0.0]],
+        'letters': {'A+': 5.0, 'A': 4.5, 'A-': 4.0, 'B+': 3.5, 'B': 3.0, 'B-': 2.5,
+                    'C+': 2.0, 'C': 1.5, 'C-': 1.5, 'D+': 1.0, 'D': 1.0, 'D-': 0.5, 'F': 0.0}
+    },
+    '100': {
+        # On the 100-point scale the GPA is the credit-weighted average score
+        'percent': None,
+        'letters': {'A+': 97, 'A': 93, 'A-': 90, 'B+': 87, 'B': 83, 'B-': 80,
+                    'C+': 77, 'C': 73, 'C-': 70, 'D+': 67, 'D': 63, 'D-': 60, 'F': 50}
+    },
+}
+
+# Five-level and pass/fail grades as 100-point equivalents (None: not part of the GPA)
+DEFAULT_LEVELS = {
+    '优秀': 95, '优': 95, 'excellent': 95,
+    '良好': 85, '良': 85, 'good': 85,
+    '中等': 75, '中': 75, 'medium': 75, 'average': 75,
+    '及格': 65, 'fair': 65,
+    '不及格': 50, '不合格': 50, 'fail': 50, 'failed': 50,
+    '通过': None, '合格': None, 'pass': None, 'passed': None, 'p': None,
+}
+
+
+# Letter grades in a fixed order so each scale can hold its points as an array
+LETTERS = ['A+', 'A', 'A-', 'B+', 'B', 'B-', 'C+', 'C', 'C-', 'D+', 'D', 'D-', 'F']
+LETTER_CODES = {letter: code for code, letter in enumerate(LETTERS)}
+
+LETTER = re.compile(r'^([A-DF])\s*([+\-]?)$', re.I)
+
+
+def _load_tables() -> Tuple[Dict[str, Any], Dict[str, Optional[float]]]:
+    """Default scales and levels, extended or overridden by the GPA_SCALES_FILE JSON file
+
+    The file may hold 'scales' (same shape as DEFAULT_SCALES) and 'levels'
+    (grade word -> 100-point equivalent, or null for pass/fail grades).
+    """
+    scales = {name: dict(table) for name, table in DEFAULT_SCALES.items()}
+    levels = dict(DEFAULT_LEVELS)
+    path = os.environ.get('GPA_SCALES_FILE')
+    if path:
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                custom = json.load(f)
+            for name, table in (custom.get('scales') or {}).items():
+                scales[name] = {**scales.get(name, {}), **table}
+            levels.update({key.lower(): value for key, value in (custom.get('levels') or {}).items()})
+        except (OSError, ValueError) as e:
+            print(f"Could not load GPA scales from {path}: {e}")
+    return scales, levels
+
+
+def _number(value: Any) -> float:
+    """A numeric field as a float, NaN when missing or unreadable"""
+    number = to_number(value)
+    return math.nan if number is None else number
+
+
+def _round(value: float) -> Optional[float]:
+    return None if math.isnan(value) else round(float(value), 2)
+
+
+class GradeScale:
+    """One GPA scale: points for percent bands and for letter grades"""
+
+    def __init__(self, name: str, percent: Optional[List[List[float]]], letters: Dict[str, float]):
+        self.name = name
+        letters = {key.upper(): float(value) for key, value in letters.items()}
+        self.letter_points = [letters.get(letter, math.nan) for letter in LETTERS]
+        self.maximum = _number(name)
+        if math.isnan(self.maximum):
+            self.maximum = max(value for value in self.letter_points if not math.isnan(value))
+        if percent:
+            bands = sorted((float(low), float(points)) for low, points in percent)
+            self.thresholds = [low for low, _ in bands]
+            self.points = [points for _, points in bands]
+        else:
+            self.thresholds = self.points = None
+
+    def from_percent(self, percent: float) -> float:
+        if self.thresholds is None or math.isnan(percent):
+            return percent
+        return self.points[max(bisect_right(self.thresholds, percent) - 1, 0)]
+
+    def course_points(self, percent: float, letter: int) -> float:
+        return self.letter_points[letter] if letter >= 0 else self.from_percent(percent)
+
+    def course_points_array(self, percents, letters):
+        """Vectorised course_points over NumPy arrays (NaN where a course has no grade)"""
+        if self.thresholds is None:
+            from_percent = percents
+        else:
+            index = np.searchsorted(np.asarray(self.thresholds), np.nan_to_num(percents), side='right') - 1
+            from_percent = np.where(np.isnan(percents), np.nan, np.asarray(self.points)[np.clip(index, 0, None)])
+        letter_points = np.asarray(self.letter_points)[np.clip(letters, 0, None)]
+        return np.where(letters >= 0, letter_points, from_percent)
+
+
+class GPAEngine:
+    """Recomputes credits and GPAs of verification results"""
+
+    def __init__(self, default_scale: Optional[str] = None, tolerance: Optional[float] = None):
+        """
+        Args:
+            default_scale: Scale used when a transcript states none (GPA_DEFAULT_SCALE, default '4.0')
+            tolerance: Largest GPA difference that is not a mismatch (GPA_MISMATCH_TOLERANCE, default 0.05)
+        """
+        tables, self.levels = _load_tables()
+        self.scales = {name: GradeScale(name, table.get('percent'), table.get('letters') or {})
+                       for name, table in tables.items()}
+        self.default_scale = default_scale or os.environ.get('GPA_DEFAULT_SCALE', '4.0')
+        self.tolerance = tolerance if tolerance is not None else float(os.environ.get('GPA_MISMATCH_TOLERANCE', 0.05))
+        self._parse = lru_cache(maxsize=4096)(self._parse_grade)
+
+    def scale_for(self, value: Any) -> GradeScale:
+        """The configured scale whose maximum matches a stated scale such as 4, '4.3' or '100分'"""
+        number = _number(value)
+        for scale in self.scales.values():
+            if abs(scale.maximum - number) < 1e-6:
+                return scale
+        return self.scales.get(self.default_scale) or self.scales['4.0']
+
+    def _parse_grade(self, grade: str) -> Tuple[float, int]:
+        """(100-point equivalent, letter code) of a grade as written
+
+        Letter grades give a code (percent NaN); scores and five-level grades
+        give a percent (code -1); pass/fail and unreadable grades give neither.
+        """
+        text = grade.strip()
+        letter = LETTER.match(text)
+        if letter:
+            return math.nan, LETTER_CODES[(letter.group(1) + letter.group(2)).upper()]
+        key = text.lower()
+        if key in self.levels:
+            percent = self.levels[key]
+            return (math.nan if percent is None else float(percent)), -1
+        number = _number(text)
+        # Numbers up to 5 are grade points rather than scores
+        return (number if 5 < number <= 100 else math.nan), -1
+
+    def parse_grade(self, grade: Any) -> Tuple[float, int]:
+        if grade is None or isinstance(grade, bool):
+            return math.nan, -1
+        return self._parse(str(grade))
+
+    def convert(self, grade: Any, scale: Any) -> Optional[float]:
+        """Grade points of a single grade on a scale (e.g. convert('良好', '4.0') -> 3.7)"""
+        percent, letter = self.parse_grade(grade)
+        return _round(self.scale_for(scale).course_points(percent, letter))
+
+    def recompute(self, result: Dict[str, Any]) -> Dict[str, Any]:
+        """Recompute one verification result in place (see recompute_batch)"""
+        return self.recompute_batch([result])[0]
+
+    def recompute_batch(self, results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Recompute credits, course counts and GPAs of many verification results in place
+
+        Semester total_credits and academic_summary totals are replaced by the
+        computed values (credit totals only where at least one course credit
+        could be read); semester_gpa and student_info.overall_gpa are only
+        filled in where the transcript gives none, since universities use
+        their own conversion tables. The transcript's own scale (student_info.gpa_scale) prefers grade points
+        printed on the transcript and converts the grade only where none is
+        given. Each academic_summary gains 'gpa_check': the scale used, the
+        computed overall and semester GPAs, the overall GPA on every configured
+        scale and the model numbers that disagreed with the computed ones.
+        """
+        owners, semester_ids, credits, percents, letters, reported = [], [], [], [], [], []
+        semester_starts, semester_count = [], 0
+        own_scales = []
+        for r_index, result in enumerate(results):
+            scale = self.scale_for((result.get('student_info') or {}).get('gpa_scale'))
+            own_scales.append(scale)
+            semester_starts.append(semester_count)
+            for semester in result.get('semesters') or []:
+                for course in semester.get('courses') or []:
+                    percent, letter = self.parse_grade(course.get('grade'))
+                    points = _number(course.get('grade_points'))
+                    owners.append(r_index)
+                    semester_ids.append(semester_count)
+                    credits.append(_number(course.get('credits')))
+                    percents.append(percent)
+                    letters.append(letter)
+                    printed = scale.maximum <= 5 and 0 <= points <= scale.maximum
+                    reported.append(points if printed else math.nan)
+                semester_count += 1
+
+        aggregate = _aggregate_numpy if NUMPY_AVAILABLE else _aggregate_python
+        totals = aggregate(self.scales, own_scales, owners, semester_ids, credits,
+                           percents, letters, reported, semester_count, len(results))
+
+        for r_index, result in enumerate(results):
+            self._apply(result, r_index, semester_starts[r_index], totals, own_scales[r_index])
+        return results
+
+    def _apply(self, result: Dict[str, Any], r_index: int, first_semester: int,
+               totals: Dict[str, Any], scale: GradeScale) -> None:
+        mismatches = []
+
+        def check(field: str, model_value: Any, computed: Any, tolerance: float) -> None:
+            reported = _number(model_value)
+            if computed is not None and not math.isnan(reported) and abs(reported - computed) > tolerance:
+                mismatches.append({'field': field, 'model': model_value, 'computed': computed})
+
+        semester_gpas = []
+        for index, semester in enumerate(result.get('semesters') or []):
+            semester_id = first_semester + index
+            gpa = _round(totals['semester_gpa'][semester_id])
+            # Without a single readable course credit the model's total is all there is
+            if totals['semester_credited'][semester_id]:
+                credits = tidy_number(float(totals['semester_credits'][semester_id]))
+                check(f'semesters[{index}].total_credits', semester.get('total_credits'), credits, 0.01)
+                semester['total_credits'] = credits
+            check(f'semesters[{index}].semester_gpa', semester.get('semester_gpa'), gpa, self.tolerance)
+            # Universities convert grades with their own tables, so a printed GPA is kept
+            if gpa is not None and math.isnan(_number(semester.get('semester_gpa'))):
+                semester['semester_gpa'] = gpa
+            semester_gpas.append(gpa)
+
+        student_info = result.get('student_info') or {}
+        summary = result.get('academic_summary') or {}
+        result['academic_summary'] = summary
+
+        total_courses = int(totals['courses'][r_index])
+        overall = _round(totals['own_gpa'][r_index])
+        if totals['credited'][r_index]:
+            total_credits = tidy_number(float(totals['credits'][r_index]))
+            check('academic_summary.total_credits', summary.get('total_credits'), total_credits, 0.01)
+            summary['total_credits'] = total_credits
+        check('academic_summary.total_courses', summary.get('total_courses'), total_courses, 0)
+        check('student_info.overall_gpa', student_info.get('overall_gpa'), overall, self.tolerance)
+
+        summary['total_courses'] = total_courses
+        if overall is not None and math.isnan(_number(student_info.get('overall_gpa'))):
+            # student_info is only added when there is a GPA to put in it
+            result['student_info'] = student_info
+            student_info['overall_gpa'] = overall
+            if student_info.get('gpa_scale') in (None, ''):
+                student_info['gpa_scale'] = scale.maximum
+        summary['gpa_check'] = {
+            'scale': scale.name,
+            'overall_gpa': overall,
+            'semester_gpas': semester_gpas,
+            'equivalents': {name: _round(values[r_index]) for name, values in totals['gpa'].items()},
+            'mismatches': mismatches
+        }
+
+
+def _aggregate_numpy(scales, own_scales, owners, semester_ids, credits, percents, letters,
+                     reported, semester_count, result_count):
+    """Credit sums and credit-weighted GPAs with one pass of array operations per scale"""
+    owners = np.asarray(owners, dtype=np.int64)
+    semester_ids = np.asarray(semester_ids, dtype=np.int64)
+    credits = np.asarray(credits, dtype=float)
+    credited = (~np.isnan(credits)).astype(float)
+    credits = np.nan_to_num(credits)
+    percents = np.asarray(percents, dtype=float)
+    letters = np.asarray(letters, dtype=np.int64)
+    reported = np.asarray(reported, dtype=float)
+
+    def weighted(points, groups, size):
+        weights = np.where(np.isnan(points), 0.0, credits)
+        numerator = np.bincount(groups, weights=np.nan_to_num(points) * weights, minlength=size)
+        denominator = np.bincount(groups, weights=weights, minlength=size)
+        return np.divide(numerator, denominator, out=np.full(size, np.nan), where=denominator > 0)
+
+    converted = {name: scale.course_points_array(percents, letters) for name, scale in scales.items()}
+
+    # Each course on its transcript's own scale, preferring printed grade points
+    own_index = np.asarray([list(scales).index(scale.name) for scale in own_scales], dtype=np.int64)
+    stacked = np.stack(list(converted.values())) if converted else np.empty((0, len(owners)))
+    own_points = stacked[own_index[owners], np.arange(len(owners))] if len(owners) else np.empty(0)
+    own_points = np.where(np.isnan(reported), own_points, reported)
+
+    return {
+        'semester_credits': np.bincount(semester_ids, weights=credits, minlength=semester_count),
+        'semester_credited': np.bincount(semester_ids, weights=credited, minlength=semester_count) > 0,
+        'semester_gpa': weighted(own_points, semester_ids, semester_count),
+        'credits': np.bincount(owners, weights=credits, minlength=result_count),
+        'credited': np.bincount(owners, weights=credited, minlength=result_count) > 0,
+        'courses': np.bincount(owners, minlength=result_count),
+        'own_gpa': weighted(own_points, owners, result_count),
+        'gpa': {name: weighted(points, owners, result_count) for name, points in converted.items()}
+    }
+
+
+def _aggregate_python(scales, own_scales, owners, semester_ids, credits, percents, letters,
+                      reported, semester_count, result_count):
+    """Same results as _aggregate_numpy without NumPy"""
+    semester_credits = [0.0] * semester_count
+    result_credits = [0.0] * result_count
+    semester_credited = [False] * semester_count
+    result_credited = [False] * result_count
+    courses = [0] * result_count
+    semester_sums = [[0.0, 0.0] for _ in range(semester_count)]
+    own_sums = [[0.0, 0.0] for _ in range(result_count)]
+    scale_sums = {name: [[0.0, 0.0] for _ in range(result_count)] for name in scales}
+
+    def add(sums, points, weight):
+        if not math.isnan(points):
+            sums[0] += points * weight
+            sums[1] += weight
+
+    for row, owner in enumerate(owners):
+        weight = 0.0 if math.isnan(credits[row]) else credits[row]
+        semester_id = semester_ids[row]
+        if not math.isnan(credits[row]):
+            semester_credited[semester_id] = result_credited[owner] = True
+        semester_credits[semester_id] += weight
+        result_credits[owner] += weight
+        courses[owner] += 1
+        for name, scale in scales.items():
+            add(scale_sums[name][owner], scale.course_points(percents[row], letters[row]), weight)
+        own = reported[row]
+        if math.isnan(own):
+            own = own_scales[owner].course_points(percents[row], letters[row])
+        add(semester_sums[semester_id], own, weight)
+        add(own_sums[owner], own, weight)
+
+    def mean(sums):
+        return sums[0] / sums[1] if sums[1] > 0 else math.nan
+
+    return {
+        'semester_credits': semester_credits,
+        'semester_credited': semester_credited,
+        'semester_gpa': [mean(sums) for sums in semester_sums],
+        'credits': result_credits,
+        'credited': result_credited,
+        'courses': courses,
+        'own_gpa': [mean(sums) for sums in own_sums],
+        'gpa': {name: [mean(sums) for sums in values] for name, values in scale_sums.items()}
+    }
+
+
+_engine = None
+
+
+def get_gpa_engine() -> GPAEngine:
+    """Get the process-wide engine (tables are loaded once)"""
+    global _engine
+    if _engine is None:
+        _engine = GPAEngine()
+    return _engine
+
+
+def set_gpa_engine(engine: Optional[GPAEngine]) -> None:
+    """Replace the process-wide engine (None reloads the configured tables on next use)"""
+    global _engine
+    _engine = engine
+
+
+def gpa_recompute_enabled() -> bool:
+    """Whether verification results get recomputed credits and GPAs (GPA_RECOMPUTE, default true)"""
+    return os.environ.get('GPA_RECOMPUTE', 'true').lower() in ('1', 'true', 'yes')
@@ -0,0 +1,123 @@
+"""
+Background job queue for document analysis and transcript verification
+
+Jobs run on a bounded thread pool inside the worker process that accepted
+the request. Job records are persisted through the storage backend, so
+their status can be polled from any worker.
+"""
+
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, Future, wait as wait_futures
+from typing import Dict, Any, Callable, Optional
+
+from .models import AnalysisJob
+from .progress import get_progress_broker
+
+
+class QueueFullError(Exception):
+    """Raised when the job queue has no room for another job"""
+
+
+class JobQueue:
+    """Bounded pool of background workers for long-running jobs"""
+
+    def __init__(self, max_workers: int = 2, max_pending: int = 20):
+        """
+        Args:
+            max_workers: Number of jobs that run concurrently
+            max_pending: Number of jobs that may wait for a free worker
+        """
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='comes-job')
+        self._futures: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+
+    def active_count(self) -> int:
+        """Number of jobs that are queued or running in this process"""
+        with self._lock:
+            self._futures = {k: f for k, f in self._futures.items() if not f.done()}
+            return len(self._futures)
+
+    def submit(self, kind: str, target_id: str, func: Callable[..., Any], *args) -> AnalysisJob:
+        """Queue a job and return its record immediately
+
+        Args:
+            kind: Job kind ('analyze' or 'verify')
+            target_id: ID of the record the job works on
+            func: Callable invoked as func(job, *args) on a worker thread
+
+        Raises:
+            QueueFullError: If all workers are busy and the backlog is full
+        """
+        if self.active_count() >= self.max_workers + self.max_pending:
+            raise QueueFullError(f"Job queue is full ({self.max_pending} jobs waiting)")
+
+        job = AnalysisJob(kind=kind, target_id=target_id).save()
+        get_progress_broker().publish(job.id, 'queued', kind=kind, target_id=target_id)
+        future = self._executor.submit(self._run, job, func, *args)
+        with self._lock:
+            self._futures[job.id] = future
+        return job
+
+    def _run(self, job: AnalysisJob, func: Callable[..., Any], *args) -> AnalysisJob:
+        """Run a job and record its final status"""
+        job.status = 'running'
+        job.save()
+        get_progress_broker().publish(job.id, 'running')
+
+        try:
+            func(job, *args)
+            job.status = 'completed'
+        except Exception as e:
+            print(f"Job {job.id} ({job.kind}) failed: {e}")
+            job.status = 'failed'
+            job.error_message = str(e)
+
+        job.save()
+        get_progress_broker().publish(job.id, job.status, error=job.error_message)
+        return job
+
+    def wait(self, job_id: str, timeout: Optional[float] = None) -> Optional[AnalysisJob]:
+        """Block until a job submitted by this process finishes
+
+        Returns:
+            The finished job, or the stored job record if it is still running
+            after the timeout or belongs to another process
+        """
+        with self._lock:
+            future = self._futures.get(job_id)
+
+        if future is not None:
+            done, _ = wait_futures([future], timeout=timeout)
+            if done:
+                return future.result()
+
+        return AnalysisJob.get_by_id(job_id)
+
+    def shutdown(self, wait: bool = True) -> None:
+        """Stop accepting jobs and optionally wait for running ones"""
+        self._executor.shutdown(wait=wait)
+
+
+_job_queue = None
+_job_queue_pid = None
+_job_queue_lock = threading.Lock()
+
+
+def get_job_queue() -> JobQueue:
+    """Get the job queue of the current process, creating it on first use
+
+    Pool size and backlog come from JOB_WORKERS and JOB_QUEUE_SIZE.
+    """
+    global _job_queue, _job_queue_pid
+    if _job_queue is None or _job_queue_pid != os.getpid():
+        with _job_queue_lock:
+            if _job_queue is None or _job_queue_pid != os.getpid():
+                _job_queue = JobQueue(
+                    max_workers=int(os.environ.get('JOB_WORKERS', 2)),
+                    max_pending=int(os.environ.get('JOB_QUEUE_SIZE', 20))
+                )
+                _job_queue_pid = os.getpid()
+    return _job_queue
@@ -0,0 +1,138 @@
+"""
+JSON extraction from model responses
+
+Models wrap their JSON in prose or markdown fences and, when they hit the
+output token limit, stop in the middle of it. The scanner here walks the
+response once, finds the outermost JSON object whatever the fencing, and
+when the text ends before the object closes it cuts back to the last
+complete value and closes every open string, array and object.
+"""
+
+import re
+import json
+from typing import Dict, Any, Tuple
+
+JSON_FENCE = '```json'
+
+# A \uXXXX escape that was cut off before all four hex digits arrived
+PARTIAL_UNICODE_ESCAPE = re.compile(r'(?<!\\)((?:\\\\)*)\\u[0-9a-fA-F]{0,3}$')
+
+
+def _find_object_start(text: str) -> int:
+    """Index of the opening brace of the response's JSON object, or -1"""
+    fence = text.find(JSON_FENCE)
+    if fence != -1:
+        start = text.find('{', fence + len(JSON_FENCE))
+        if start != -1:
+            return start
+    return text.find('{')
+
+
+def scan_json_object(text: str) -> Tuple[str, bool]:
+    """Find the outermost JSON object in text in a single pass
+
+    Returns:
+        (json_text, truncated). When the text ends before the object is
+        closed, json_text is cut back to the last complete value and every
+        open container is closed, and truncated is True.
+
+    Raises:
+        json.JSONDecodeError: If the text contains no JSON object
+    """
+    start = _find_object_start(text)
+    if start == -1:
+        raise json.JSONDecodeError("No JSON object found", text, 0)
+
+    stack = []  # Open containers, '{' or '['
+    expect_key = False  # Inside an object, the next string is a key
+    in_string = False
+    escaped = False
+    in_scalar = False  # Inside a number, true, false or null
+
+    # Longest prefix that ends on a complete value, and the closers it needs
+    safe_end = start
+    safe_closers = ''
+
+    def closers():
+        return ''.join('}' if c == '{' else ']' for c in reversed(stack))
+
+    def mark(end):
+        nonlocal safe_end, safe_closers
+        safe_end = end
+        safe_closers = closers()
+
+    for i in range(start, len(text)):
+        char = text[i]
+
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == '\\':
+                escaped = True
+            elif char == '"':
+                in_string = False
+                if stack[-1] == '{' and expect_key:
+                    expect_key = False
+                else:
+                    mark(i + 1)
+            continue
+
+        if in_scalar:
+            if char in ',}] \t\r\n':
+                in_scalar = False
+                mark(i)
+            else:
+                continue
+
+        if char == '"':
+            in_string = True
+        elif char in '{[':
+            stack.append(char)
+            expect_key = char == '{'
+            mark(i + 1)
+        elif char in '}]':
+            stack.pop()
+            if not stack:
+                return text[start:i + 1], False
+            expect_key = False
+            mark(i + 1)
+        elif char == ',':
+            expect_key = stack[-1] == '{'
+        elif char == ':':
+            expect_key = False
+        elif not char.isspace():
+            in_scalar = True
+
+    if in_string and not (stack[-1] == '{' and expect_key):
+        # Keep the partial string value, minus any escape sequence cut in half
+        partial = text[start:len(text) - 1] if escaped else text[start:]
+        partial = PARTIAL_UNICODE_ESCAPE.sub(r'\1', partial)
+        return partial + '"' + closers(), True
+
+    return text[start:safe_end] + safe_closers, True
+
+
+def extract_json(text: str) -> Tuple[Dict[str, Any], bool]:
+    """Parse the JSON object in a model response, repairing a truncated tail
+
+    Returns:
+        (parsed_object, truncated)
+
+    Raises:
+        json.JSONDecodeError: If no JSON object can be recovered
+    """
+    json_text, truncated = scan_json_object(text)
+    # Models sometimes put raw newlines inside strings; accept them
+    result = json.loads(json_text, strict=False)
+    if not isinstance(result, dict):
+        raise json.JSONDecodeError("Response JSON is not an object", json_text, 0)
+    return result, truncated
+
+
+def strip_leading_fence(text: str) -> str:
+    """Drop a markdown fence line that a continuation response starts with"""
+    stripped = text.lstrip()
+    if stripped.startswith('```'):
+        newline = stripped.find('\n')
+        return stripped[newline + 1:] if newline != -1 else ''
+    return text
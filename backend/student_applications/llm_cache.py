@@ -0,0 +1,170 @@
+"""
+Persistent cache of Google GenAI responses
+
+Responses are keyed by a hash of the prompt, the prepared document
+content, the model name and the generation config, so re-analyzing an
+unchanged application returns the earlier answer without a model call.
+Entries live in a SQLite database shared by every worker process.
+"""
+
+import os
+import json
+import time
+import hashlib
+import sqlite3
+import threading
+from typing import Dict, Any, Optional
+
+DEFAULT_CACHE_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'instance', 'llm_cache.db'
+)
+
+
+class LLMResponseCache:
+    """SQLite-backed response cache with TTL and size-bounded LRU eviction"""
+
+    def __init__(self, path: str = DEFAULT_CACHE_PATH, ttl_seconds: float = 7 * 24 * 3600,
+                 max_entries: int = 1000, timeout: float = 30.0):
+        """
+        Args:
+            path: SQLite database path
+            ttl_seconds: Age after which an entry is ignored and removed
+            max_entries: Number of entries kept; least recently used ones are evicted
+            timeout: Seconds to wait for a database lock
+        """
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.timeout = timeout
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'stores': 0}
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._connect().execute(
+            """
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                model TEXT NOT NULL,
+                response TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+            """
+        )
+        self._connect().execute(
+            'CREATE INDEX IF NOT EXISTS responses_accessed_at ON responses (accessed_at)'
+        )
+
+    def _connect(self) -> sqlite3.Connection:
+        """Get the connection for the current thread, reopening after a fork"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None and getattr(self._local, 'pid', None) == os.getpid():
+            return conn
+
+        conn = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        self._local.conn = conn
+        self._local.pid = os.getpid()
+        return conn
+
+    @staticmethod
+    def make_key(prompt: str, content: Any, model: str, config: Optional[Dict[str, Any]] = None) -> str:
+        """Hash everything that determines the model's answer"""
+        payload = json.dumps(
+            [prompt, content, model, config or {}],
+            sort_keys=True, ensure_ascii=False, default=str
+        )
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        """Get a cached response that has not expired"""
+        now = time.time()
+        conn = self._connect()
+        row = conn.execute(
+            'SELECT response, created_at FROM responses WHERE key = ?', (key,)
+        ).fetchone()
+
+        if row is None or now - row[1] > self.ttl_seconds:
+            if row is not None:
+                conn.execute('DELETE FROM responses WHERE key = ?', (key,))
+            with self._lock:
+                self._stats['misses'] += 1
+            return None
+
+        conn.execute('UPDATE responses SET accessed_at = ? WHERE key = ?', (now, key))
+        with self._lock:
+            self._stats['hits'] += 1
+        return row[0]
+
+    def set(self, key: str, model: str, response: str) -> None:
+        """Store a response and evict expired and least recently used entries"""
+        now = time.time()
+        conn = self._connect()
+        conn.execute(
+            """
+            INSERT INTO responses (key, model, response, created_at, accessed_at)
+            VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT (key) DO UPDATE SET
+                model = excluded.model,
+                response = excluded.response,
+                created_at = excluded.created_at,
+                accessed_at = excluded.accessed_at
+            """,
+            (key, model, response, now, now)
+        )
+        conn.execute('DELETE FROM responses WHERE created_at < ?', (now - self.ttl_seconds,))
+        conn.execute(
+            """
+            DELETE FROM responses WHERE key IN (
+                SELECT key FROM responses ORDER BY accessed_at DESC LIMIT -1 OFFSET ?
+            )
+            """,
+            (self.max_entries,)
+        )
+        with self._lock:
+            self._stats['stores'] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters and the current number of entries"""
+        with self._lock:
+            stats = dict(self._stats)
+        stats['entries'] = self._connect().execute('SELECT COUNT(*) FROM responses').fetchone()[0]
+        return stats
+
+    def clear(self) -> None:
+        """Remove every cached response"""
+        self._connect().execute('DELETE FROM responses')
+
+
+_llm_cache = None
+_llm_cache_lock = threading.Lock()
+
+
+def get_llm_cache() -> Optional[LLMResponseCache]:
+    """Get the process-wide response cache, or None when disabled
+
+    Configured with LLM_CACHE_ENABLED, LLM_CACHE_PATH, LLM_CACHE_TTL
+    (seconds) and LLM_CACHE_MAX_ENTRIES.
+    """
+    global _llm_cache
+    if os.environ.get('LLM_CACHE_ENABLED', 'true').lower() not in ('1', 'true', 'yes'):
+        return None
+
+    if _llm_cache is None:
+        with _llm_cache_lock:
+            if _llm_cache is None:
+                _llm_cache = LLMResponseCache(
+                    path=os.environ.get('LLM_CACHE_PATH', DEFAULT_CACHE_PATH),
+                    ttl_seconds=float(os.environ.get('LLM_CACHE_TTL', 7 * 24 * 3600)),
+                    max_entries=int(os.environ.get('LLM_CACHE_MAX_ENTRIES', 1000))
+                )
+    return _llm_cache
+
+
+def set_llm_cache(cache: Optional[LLMResponseCache]) -> None:
+    """Replace the process-wide response cache (None resets to the configured default)"""
+    global _llm_cache
+    with _llm_cache_lock:
+        _llm_cache = cache
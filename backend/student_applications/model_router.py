@@ -0,0 +1,431 @@
+"""
+Health-aware routing across the GenAI model fallback chain
+
+Each model has a circuit breaker and rolling latency/error statistics
+kept per worker process. A router orders its chain by recent health so
+a model that keeps failing is skipped for a cool-down period instead of
+costing every request its full failure latency, and reports which model
+actually answered.
+
+With hedging enabled, a request whose model has not answered within a
+high percentile of its recent latency is also sent to the next model;
+the first valid answer wins and the other request is cancelled. A
+per-request budget caps how many such extra calls a request may cause.
+"""
+
+import os
+import time
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Dict, Any, List, Callable, Optional, Tuple
+
+from .rate_limit import RateLimitExceeded
+
+# Error rates are compared in tiers so noise does not reorder the chain
+ERROR_RATE_TIER = 0.25
+
+
+class RequestCancelled(Exception):
+    """Raised inside a hedged call whose other request already produced the answer"""
+
+
+class ModelHealth:
+    """Circuit breaker and rolling statistics for one model"""
+
+    def __init__(self, model: str, failure_threshold: int = 3, cooldown_seconds: float = 60.0,
+                 window: int = 50):
+        """
+        Args:
+            model: Model name
+            failure_threshold: Consecutive failures that open the circuit
+            cooldown_seconds: How long an open circuit rejects calls before a trial call
+            window: Number of recent calls the statistics cover
+        """
+        self.model = model
+        self.failure_threshold = failure_threshold
+        self.cooldown_seconds = cooldown_seconds
+        self._calls = deque(maxlen=window)  # (success, latency_seconds)
+        self._consecutive_failures = 0
+        self._opened_at: Optional[float] = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        """'closed', 'open' or 'half_open'"""
+        with self._lock:
+            return self._state()
+
+    def _state(self) -> str:
+        if self._opened_at is None:
+            return 'closed'
+        if time.monotonic() - self._opened_at >= self.cooldown_seconds:
+            return 'half_open'
+        return 'open'
+
+    def allow(self) -> bool:
+        """Whether a call may go to this model now; a half-open circuit admits one trial call"""
+        with self._lock:
+            state = self._state()
+            if state == 'closed':
+                return True
+            if state == 'half_open' and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            return False
+
+    def retry_in(self) -> float:
+        """Seconds until an open circuit admits a trial call"""
+        with self._lock:
+            if self._opened_at is None:
+                return 0.0
+            return max(0.0, self.cooldown_seconds - (time.monotonic() - self._opened_at))
+
+    def release(self) -> None:
+        """Give back a trial slot that was claimed but not used"""
+        with self._lock:
+            self._trial_in_flight = False
+
+    def record_success(self, latency: float) -> None:
+        with self._lock:
+            self._calls.append((True, latency))
+            self._consecutive_failures = 0
+            self._opened_at = None
+            self._trial_in_flight = False
+
+    def record_failure(self, latency: float) -> None:
+        with self._lock:
+            self._calls.append((False, latency))
+            self._consecutive_failures += 1
+            was_trial = self._trial_in_flight
+            self._trial_in_flight = False
+            if was_trial or self._consecutive_failures >= self.failure_threshold:
+                if self._opened_at is None or was_trial:
+                    print(f"Circuit opened for model {self.model} after {self._consecutive_failures} failures")
+                self._opened_at = time.monotonic()
+
+    def error_rate(self) -> float:
+        with self._lock:
+            if not self._calls:
+                return 0.0
+            return sum(1 for success, _ in self._calls if not success) / len(self._calls)
+
+    def median_latency(self) -> Optional[float]:
+        """Median latency of recent successful calls, or None without data"""
+        with self._lock:
+            latencies = sorted(latency for success, latency in self._calls if success)
+        if not latencies:
+            return None
+        return latencies[len(latencies) // 2]
+
+    def latency_percentile(self, percentile: float, min_samples: int = 5) -> Optional[float]:
+        """Latency below which the given percent of recent successful calls finished
+
+        Returns None until at least min_samples successful calls were seen.
+        """
+        with self._lock:
+            latencies = sorted(latency for success, latency in self._calls if success)
+        if len(latencies) < min_samples:
+            return None
+        index = min(len(latencies) - 1, int(len(latencies) * percentile / 100.0))
+        return latencies[index]
+
+    def stats(self) -> Dict[str, Any]:
+        median = self.median_latency()
+        with self._lock:
+            calls = len(self._calls)
+            state = self._state()
+        return {
+            'state': state,
+            'calls': calls,
+            'error_rate': round(self.error_rate(), 3),
+            'median_latency': round(median, 3) if median is not None else None
+        }
+
+
+_health: Dict[str, ModelHealth] = {}
+_health_lock = threading.Lock()
+
+
+def get_model_health(model: str) -> ModelHealth:
+    """Get the shared health record of a model in this process
+
+    Breakers are tuned with MODEL_FAILURE_THRESHOLD, MODEL_COOLDOWN_SECONDS
+    and MODEL_STATS_WINDOW.
+    """
+    with _health_lock:
+        health = _health.get(model)
+        if health is None:
+            health = ModelHealth(
+                model,
+                failure_threshold=int(os.environ.get('MODEL_FAILURE_THRESHOLD', 3)),
+                cooldown_seconds=float(os.environ.get('MODEL_COOLDOWN_SECONDS', 60)),
+                window=int(os.environ.get('MODEL_STATS_WINDOW', 50))
+            )
+            _health[model] = health
+        return health
+
+
+def reset_model_health() -> None:
+    """Forget every model's breaker state and statistics"""
+    with _health_lock:
+        _health.clear()
+
+
+def model_health_stats() -> Dict[str, Dict[str, Any]]:
+    """Statistics of every model used in this process"""
+    with _health_lock:
+        records = list(_health.values())
+    return {health.model: health.stats() for health in records}
+
+
+class ModelRouter:
+    """Orders a model fallback chain by recent health and runs calls through it"""
+
+    def __init__(self, models: List[str], latency_tolerance: float = 2.0):
+        """
+        Args:
+            models: Models in order of preference
+            latency_tolerance: A model slower than this multiple of the fastest
+                healthy model's median latency is tried after it
+        """
+        if not models:
+            raise ValueError("ModelRouter needs at least one model")
+        self.models = list(models)
+        self.latency_tolerance = latency_tolerance
+
+    def ranked(self) -> List[str]:
+        """Models ordered by error-rate tier, then latency, then preference"""
+        health = {model: get_model_health(model) for model in self.models}
+        medians = {model: health[model].median_latency() for model in self.models}
+        known = [median for median in medians.values() if median is not None]
+        fastest = min(known) if known else None
+
+        def rank(model: str) -> Tuple[int, int, int]:
+            error_tier = int(health[model].error_rate() / ERROR_RATE_TIER)
+            slow = int(fastest is not None and medians[model] is not None
+                       and medians[model] > fastest * self.latency_tolerance)
+            return error_tier, slow, self.models.index(model)
+
+        return sorted(self.models, key=rank)
+
+    def run(self, call: Callable[[str], Any],
+            on_attempt: Optional[Callable[[str], None]] = None) -> Tuple[Any, str]:
+        """Call models in ranked order until one succeeds
+
+        Models with an open circuit are skipped; if every circuit is open,
+        the one closest to its trial call is tried anyway.
+
+        Args:
+            call: Function taking the model name and returning its result
+            on_attempt: Optional callback invoked with each model before it is called
+
+        Returns:
+            (result, model that produced it)
+
+        Raises:
+            Exception: The last model's error if every attempted model failed
+        """
+        ranked = self.ranked()
+        last_error: Optional[Exception] = None
+        attempted = False
+
+        for model in ranked:
+            # Asked only right before calling, so a half-open trial slot is never left claimed
+            if not get_model_health(model).allow():
+                print(f"Skipping model {model}: circuit open")
+                continue
+            attempted = True
+            try:
+                return self._attempt(model, call, on_attempt), model
+            except RateLimitExceeded:
+                raise
+            except Exception as e:
+                last_error = e
+
+        if not attempted:
+            model = min(ranked, key=lambda name: get_model_health(name).retry_in())
+            print(f"All model circuits open, trying {model}")
+            return self._attempt(model, call, on_attempt), model
+
+        raise last_error
+
+    def _attempt(self, model: str, call: Callable[[str], Any],
+                 on_attempt: Optional[Callable[[str], None]]) -> Any:
+        """Call one model and record the outcome on its health record"""
+        health = get_model_health(model)
+        if on_attempt is not None:
+            on_attempt(model)
+        started = time.monotonic()
+        try:
+            result = call(model)
+        except (RateLimitExceeded, RequestCancelled):
+            # Our own quota or a lost hedge race, not the model's health
+            health.release()
+            raise
+        except Exception as e:
+            health.record_failure(time.monotonic() - started)
+            print(f"Model {model} failed: {e}")
+            raise
+        health.record_success(time.monotonic() - started)
+        return result
+
+    def run_hedged(self, call: Callable[[str, threading.Event], Any],
+                   budget: Optional['HedgeBudget'] = None,
+                   is_valid: Optional[Callable[[Any], bool]] = None,
+                   on_attempt: Optional[Callable[[str], None]] = None,
+                   on_hedge: Optional[Callable[[str, str, float], None]] = None) -> Tuple[Any, str]:
+        """Like run(), but also send the request to the next model if the current one is slow
+
+        Once a call has been in flight longer than hedge_delay() of its model
+        and the budget allows it, the next model is called as well. The first
+        result that passes is_valid wins and the other call's cancel event is
+        set. A failed or invalid result waits for the other call; when no call
+        is left in flight the chain continues as in run().
+
+        Args:
+            call: Function taking the model name and a cancel event and returning its result
+            budget: Extra calls this request may still spend; None allows one hedge
+            is_valid: Optional check of a result; invalid results only win if nothing better arrives
+            on_attempt: Optional callback invoked with each model before it is called
+            on_hedge: Optional callback(slow_model, hedge_model, waited_seconds)
+
+        Returns:
+            (result, model that produced it)
+        """
+        ranked = self.ranked()
+        pending = list(ranked)
+        in_flight: Dict[Any, Tuple[str, threading.Event]] = {}
+        executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='comes-hedge')
+        last_error: Optional[Exception] = None
+        fallback: Optional[Tuple[Any, str]] = None
+        hedged = False
+        launched_at = 0.0
+
+        def launch_next() -> Optional[str]:
+            while pending:
+                model = pending.pop(0)
+                if not get_model_health(model).allow():
+                    print(f"Skipping model {model}: circuit open")
+                    continue
+                cancel_event = threading.Event()
+                future = executor.submit(self._attempt, model, lambda name: call(name, cancel_event), on_attempt)
+                in_flight[future] = (model, cancel_event)
+                return model
+            return None
+
+        try:
+            if launch_next() is None:
+                # Every circuit is open: run() picks the model closest to its trial call
+                return self.run(lambda name: call(name, threading.Event()), on_attempt)
+            launched_at = time.monotonic()
+
+            while in_flight:
+                timeout = None
+                if not hedged and len(in_flight) == 1 and pending:
+                    slow_model = next(iter(in_flight.values()))[0]
+                    timeout = max(0.0, launched_at + hedge_delay(slow_model) - time.monotonic())
+
+                done, _ = wait(list(in_flight), timeout=timeout, return_when=FIRST_COMPLETED)
+                if not done:
+                    # Only one hedge per call, and only while the request's budget lasts
+                    hedged = True
+                    if budget is not None and not budget.spend():
+                        continue
+                    waited = time.monotonic() - launched_at
+                    hedge_model = launch_next()
+                    if hedge_model is not None:
+                        print(f"Model {slow_model} slower than {waited:.1f}s, hedging with {hedge_model}")
+                        if on_hedge is not None:
+                            on_hedge(slow_model, hedge_model, waited)
+                    continue
+
+                for future in done:
+                    model, _ = in_flight.pop(future)
+                    try:
+                        result = future.result()
+                    except RequestCancelled:
+                        continue
+                    except RateLimitExceeded:
+                        if not in_flight:
+                            raise
+                        continue
+                    except Exception as e:
+                        last_error = e
+                        continue
+
+                    if is_valid is None or is_valid(result):
+                        for _, cancel_event in in_flight.values():
+                            cancel_event.set()
+                        return result, model
+                    if fallback is None:
+                        fallback = (result, model)
+
+                if not in_flight:
+                    if fallback is not None:
+                        return fallback
+                    # Everything in flight failed: continue down the chain
+                    if launch_next() is not None:
+                        launched_at = time.monotonic()
+        finally:
+            executor.shutdown(wait=False)
+
+        if last_error is None:
+            raise RuntimeError("No model in the chain could be called")
+        raise last_error
+
+
+class HedgeBudget:
+    """Number of hedged calls one request may still make"""
+
+    def __init__(self, max_hedges: int):
+        self.remaining = max_hedges
+        self._lock = threading.Lock()
+
+    def spend(self) -> bool:
+        """Take one hedge from the budget; False when it is used up"""
+        with self._lock:
+            if self.remaining <= 0:
+                return False
+            self.remaining -= 1
+            return True
+
+
+def hedging_enabled() -> bool:
+    """Whether slow GenAI calls are hedged with the next model (GENAI_HEDGING, default false)"""
+    return os.environ.get('GENAI_HEDGING', 'false').lower() in ('1', 'true', 'yes')
+
+
+def new_hedge_budget() -> Optional[HedgeBudget]:
+    """Hedge budget for one user request, or None when hedging is off
+
+    A request (including all chunks of a chunked transcript) makes at most
+    GENAI_HEDGE_MAX_PER_REQUEST extra calls (default 1).
+    """
+    if not hedging_enabled():
+        return None
+    return HedgeBudget(int(os.environ.get('GENAI_HEDGE_MAX_PER_REQUEST', 1)))
+
+
+def hedge_delay(model: str) -> float:
+    """Seconds to wait for a model before hedging
+
+    The GENAI_HEDGE_PERCENTILE (default 95) of the model's recent latency,
+    at least GENAI_HEDGE_MIN_DELAY seconds (default 5); GENAI_HEDGE_DEFAULT_DELAY
+    (default 60) until enough calls have been seen.
+    """
+    latency = get_model_health(model).latency_percentile(float(os.environ.get('GENAI_HEDGE_PERCENTILE', 95)))
+    if latency is None:
+        return float(os.environ.get('GENAI_HEDGE_DEFAULT_DELAY', 60))
+    return max(float(os.environ.get('GENAI_HEDGE_MIN_DELAY', 5)), latency)
+
+
+def configured_models(env_name: str) -> List[str]:
+    """Model chain from a comma-separated environment variable
+
+    Falls back to GENAI_MODELS, then to gemini-3-pro-preview followed by
+    gemini-2.5-pro.
+    """
+    value = os.environ.get(env_name) or os.environ.get('GENAI_MODELS') or 'gemini-3-pro-preview,gemini-2.5-pro'
+    return [model.strip() for model in value.split(',') if model.strip()]
@@ -7,16 +7,18 @@ import json
 from datetime import datetime
 from typing import Dict, Any, Optional
 
+from .storage import get_storage
+
 class StudentApplication:
     """Represents a student application with uploaded files and analysis results"""
 
-    # In-memory storage for demo (would be replaced with database in production)
-    _applications = {}
+    # Collection name in the configured storage backend (see storage.py)
+    _collection = 'applications'
 
     def __init__(self, files: Dict[str, Any], status: str = 'pending'):
         self.id = str(uuid.uuid4())
         self.files = files  # Dict with file_key: {filename, filepath, content_type}
-        self.status = status  # 'pending', 'uploaded', 'analyzing', 'analyzed', 'completed', 'failed'
+        self.status = status  # 'pending', 'uploaded', 'queued', 'extracting', 'analyzing', 'analyzed', 'completed', 'failed'
         self.analysis_result = None
         self.structured_summary = None
         self.error_message = None
@@ -24,9 +26,9 @@ class StudentApplication:
         self.updated_at = datetime.now()
 
     def save(self):
-        """Save the application to in-memory storage"""
+        """Save the application to the configured storage backend"""
         self.updated_at = datetime.now()
-        self.__class__._applications[self.id] = self
+        get_storage().save(self._collection, self.id, self.to_dict())
         return self
 
     def to_dict(self) -> Dict[str, Any]:
@@ -42,33 +44,46 @@ class StudentApplication:
             'updated_at': self.updated_at.isoformat()
         }
 
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'StudentApplication':
+        """Rebuild an application from its stored dictionary"""
+        application = cls(files=data.get('files', {}), status=data.get('status', 'pending'))
+        application.id = data['id']
+        application.analysis_result = data.get('analysis_result')
+        application.structured_summary = data.get('structured_summary')
+        application.error_message = data.get('error_message')
+        application.created_at = datetime.fromisoformat(data['created_at'])
+        application.updated_at = datetime.fromisoformat(data['updated_at'])
+        return application
+
     @classmethod
     def get_by_id(cls, application_id: str) -> Optional['StudentApplication']:
         """Get application by ID"""
-        return cls._applications.get(application_id)
+        data = get_storage().get(cls._collection, application_id)
+        return cls.from_dict(data) if data else None
 
     @classmethod
     def get_all(cls):
         """Get all applications"""
-        return list(cls._applications.values())
+        return [cls.from_dict(data) for data in get_storage().get_all(cls._collection)]
 
     @classmethod
     def delete_all(cls):
         """Clear all applications (for testing)"""
-        cls._applications = {}
+        get_storage().delete_all(cls._collection)
 
 
 class TranscriptVerification:
     """Represents a transcript verification with uploaded files and analysis results"""
 
-    # In-memory storage for demo (would be replaced with database in production)
-    _verifications = {}
+    # Collection name in the configured storage backend (see storage.py)
+    _collection = 'verifications'
 
     def __init__(self, files: Dict[str, Any], upload_type: str = 'single', status: str = 'pending'):
         self.id = str(uuid.uuid4())
         self.files = files  # Dict with file_key: {filename, filepath, content_type}
         self.upload_type = upload_type  # 'single' or 'separate'
-        self.status = status  # 'pending', 'uploaded', 'processing', 'completed', 'failed'
+        self.status = status  # 'pending', 'uploaded', 'queued', 'extracting', 'processing', 'completed', 'failed'
         self.verification_result = None
         self.structured_result = None
         self.error_message = None
@@ -76,9 +91,9 @@ class TranscriptVerification:
         self.updated_at = datetime.now()
 
     def save(self):
-        """Save the verification to in-memory storage"""
+        """Save the verification to the configured storage backend"""
         self.updated_at = datetime.now()
-        self.__class__._verifications[self.id] = self
+        get_storage().save(self._collection, self.id, self.to_dict())
         return self
 
     def to_dict(self) -> Dict[str, Any]:
@@ -95,17 +110,87 @@ class TranscriptVerification:
             'updated_at': self.updated_at.isoformat()
         }
 
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'TranscriptVerification':
+        """Rebuild a verification from its stored dictionary"""
+        verification = cls(
+            files=data.get('files', {}),
+            upload_type=data.get('upload_type', 'single'),
+            status=data.get('status', 'pending')
+        )
+        verification.id = data['id']
+        verification.verification_result = data.get('verification_result')
+        verification.structured_result = data.get('structured_result')
+        verification.error_message = data.get('error_message')
+        verification.created_at = datetime.fromisoformat(data['created_at'])
+        verification.updated_at = datetime.fromisoformat(data['updated_at'])
+        return verification
+
     @classmethod
     def get_by_id(cls, verification_id: str) -> Optional['TranscriptVerification']:
         """Get verification by ID"""
-        return cls._verifications.get(verification_id)
+        data = get_storage().get(cls._collection, verification_id)
+        return cls.from_dict(data) if data else None
 
     @classmethod
     def get_all(cls):
         """Get all verifications"""
-        return list(cls._verifications.values())
+        return [cls.from_dict(data) for data in get_storage().get_all(cls._collection)]
 
     @classmethod
     def delete_all(cls):
         """Clear all verifications (for testing)"""
-        cls._verifications = {}
\ No newline at end of file
+        get_storage().delete_all(cls._collection)
+
+
+class AnalysisJob:
+    """Represents a queued background job that analyzes or verifies a record"""
+
+    # Collection name in the configured storage backend (see storage.py)
+    _collection = 'jobs'
+
+    def __init__(self, kind: str, target_id: str, status: str = 'queued'):
+        self.id = str(uuid.uuid4())
+        self.kind = kind  # 'analyze' or 'verify'
+        self.target_id = target_id  # StudentApplication or TranscriptVerification ID
+        self.status = status  # 'queued', 'running', 'completed', 'failed'
+        self.stage = None  # Last stage reported by the service
+        self.error_message = None
+        self.created_at = datetime.now()
+        self.updated_at = datetime.now()
+
+    def save(self):
+        """Save the job to the configured storage backend"""
+        self.updated_at = datetime.now()
+        get_storage().save(self._collection, self.id, self.to_dict())
+        return self
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Convert job to dictionary for JSON response"""
+        return {
+            'id': self.id,
+            'kind': self.kind,
+            'target_id': self.target_id,
+            'status': self.status,
+            'stage': self.stage,
+            'error_message': self.error_message,
+            'created_at': self.created_at.isoformat(),
+            'updated_at': self.updated_at.isoformat()
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'AnalysisJob':
+        """Rebuild a job from its stored dictionary"""
+        job = cls(kind=data['kind'], target_id=data['target_id'], status=data.get('status', 'queued'))
+        job.id = data['id']
+        job.stage = data.get('stage')
+        job.error_message = data.get('error_message')
+        job.created_at = datetime.fromisoformat(data['created_at'])
+        job.updated_at = datetime.fromisoformat(data['updated_at'])
+        return job
+
+    @classmethod
+    def get_by_id(cls, job_id: str) -> Optional['AnalysisJob']:
+        """Get job by ID"""
+        data = get_storage().get(cls._collection, job_id)
+        return cls.from_dict(data) if data else None
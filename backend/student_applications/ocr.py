@@ -0,0 +1,583 @@
+"""
+OCR of images and scanned PDF pages
+
+Pages of a scanned PDF have no text layer, so both text extractors return
+next to nothing for them. Such pages are recognised cheaply from their
+resources (a page that declares no font cannot contain text) before any
+text extraction is tried, rasterized with pdfium at OCR_DPI and read with
+tesseract. The pages of a document are OCR'd concurrently on a process
+pool and collected in page order, so a multi-page scan takes about as
+long as its slowest page. Each web worker has one OCR pool; documents
+extracted on the extraction pool OCR their pages in the extraction worker
+itself, so process pools are never nested.
+
+Every process keeps one tesseract engine per language set loaded for its
+lifetime (through tesserocr when installed, so language data is not
+reloaded per image), and the OCR pool is long-lived, so batches of images
+from several uploads reuse warm engines. Queue depth and per-image latency
+are tracked for the health endpoint; extraction workers report their OCR
+work back with each result, so the web worker's statistics include it. The language set of each page is
+narrowed from the upload's file key or a script probe (see ocr_lang).
+"""
+
+import os
+import time
+import threading
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from collections import deque
+from functools import lru_cache
+from typing import Optional, Dict, List, Any, Tuple
+
+try:
+    import pypdfium2 as pdfium
+    PDFIUM_AVAILABLE = True
+except ImportError:
+    PDFIUM_AVAILABLE = False
+
+try:
+    import pytesseract
+    TESSERACT_AVAILABLE = True
+except ImportError:
+    TESSERACT_AVAILABLE = False
+    pytesseract = None
+
+try:
+    import tesserocr
+    TESSEROCR_AVAILABLE = True
+except ImportError:
+    TESSEROCR_AVAILABLE = False
+
+try:
+    from PIL import Image
+    from .ocr_preprocess import preprocess_image, ocr_preprocess_enabled, preprocess_signature
+    PILLOW_AVAILABLE = True
+except ImportError:
+    PILLOW_AVAILABLE = False
+    Image = None
+
+from .task_pool import TaskPool
+from .ocr_lang import ocr_lang_detect_enabled, get_mixed_script_share, narrow_lang, lang_for_probe_text, probe_image
+
+# Nested form XObjects are followed at most this deep when looking for fonts
+MAX_FORM_DEPTH = 3
+
+
+def ocr_enabled() -> bool:
+    """Whether scanned PDF pages are OCR'd (OCR_ENABLED, default true)"""
+    return os.environ.get('OCR_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+
+
+def get_ocr_dpi() -> int:
+    """Rasterization resolution of scanned pages (OCR_DPI, default 300)"""
+    return int(os.environ.get('OCR_DPI', 300))
+
+
+def get_ocr_lang() -> str:
+    """Tesseract languages (OCR_LANG, default eng+chi_sim)"""
+    return os.environ.get('OCR_LANG', 'eng+chi_sim')
+
+
+def get_ocr_workers() -> int:
+    """Size of the page OCR process pool (OCR_WORKERS, default min(4, CPU count); 1 = in-process)"""
+    default = min(4, os.cpu_count() or 1)
+    return max(1, int(os.environ.get('OCR_WORKERS', default)))
+
+
+def get_ocr_timeout() -> float:
+    """Seconds one page may take once its OCR started (OCR_TIMEOUT, default 60)"""
+    return float(os.environ.get('OCR_TIMEOUT', 60))
+
+
+@lru_cache(maxsize=1)
+def tesseract_version() -> Optional[str]:
+    """Installed tesseract version, or None if tesseract cannot be used (checked once per process)"""
+    if TESSEROCR_AVAILABLE:
+        return tesserocr.tesseract_version().split()[1]
+    if not TESSERACT_AVAILABLE:
+        return None
+    try:
+        return str(pytesseract.get_tesseract_version())
+    except Exception as e:
+        print(f"tesseract not available: {e}")
+        return None
+
+
+def ocr_available() -> bool:
+    """Whether images can be OCR'd in this environment"""
+    return PILLOW_AVAILABLE and tesseract_version() is not None
+
+
+def pdf_ocr_available() -> bool:
+    """Whether scanned PDF pages can be rasterized and OCR'd in this environment"""
+    return PDFIUM_AVAILABLE and ocr_available()
+
+
+def page_lang_detection_enabled() -> bool:
+    """Whether pages without a language hint are probed for their scripts
+
+    Only with tesserocr: through the tesseract binary the probe would be a
+    second process per page, which costs about as much as it saves.
+    """
+    return ocr_lang_detect_enabled() and TESSEROCR_AVAILABLE
+
+
+def _lang_signature(lang: Optional[str]) -> str:
+    combined = get_ocr_lang()
+    chosen = narrow_lang(lang, combined)
+    if chosen == combined and page_lang_detection_enabled():
+        chosen += f"|detect:{get_mixed_script_share()}"
+    return chosen
+
+
+def ocr_signature(lang: Optional[str] = None) -> str:
+    """Settings that change the OCR of scanned PDF pages, for extraction cache keys ('off' when pages are not OCR'd)
+
+    lang is the language set requested for the document, None when it is detected per page.
+    """
+    if not (ocr_enabled() and pdf_ocr_available()):
+        return 'off'
+    return f"{get_ocr_dpi()}|{_lang_signature(lang)}"
+
+
+def image_ocr_signature(lang: Optional[str] = None) -> str:
+    """Settings that change the OCR of uploaded images, for extraction cache keys
+
+    Images are OCR'd whether or not pdfium is installed or OCR_ENABLED is
+    set, so unlike ocr_signature this does not depend on either.
+    """
+    return f"{_lang_signature(lang)}|{preprocess_signature() if PILLOW_AVAILABLE else 'raw'}"
+
+
+def _has_fonts(resources: Any, depth: int = 0) -> bool:
+    if resources is None:
+        return False
+    resources = resources.get_object()
+    fonts = resources.get('/Font')
+    if fonts is not None and len(fonts.get_object()) > 0:
+        return True
+    if depth >= MAX_FORM_DEPTH:
+        return False
+    xobjects = resources.get('/XObject')
+    for reference in (xobjects.get_object().values() if xobjects is not None else []):
+        xobject = reference.get_object()
+        if xobject.get('/Subtype') == '/Form' and _has_fonts(xobject.get('/Resources'), depth + 1):
+            return True
+    return False
+
+
+def page_has_text_layer(page: Any) -> bool:
+    """Whether a PyPDF2 page declares any font, directly or in a form XObject
+
+    Only reads the page's resource dictionaries, not its content stream.
+    Pages whose resources cannot be read count as having text.
+    """
+    try:
+        return _has_fonts(page.get('/Resources'))
+    except Exception:
+        return True
+
+
+def render_pdf_page(filepath: str, index: int, dpi: int):
+    """Grayscale PIL image of one PDF page"""
+    pdf = pdfium.PdfDocument(filepath)
+    try:
+        page = pdf[index]
+        try:
+            return page.render(scale=dpi / 72, grayscale=True).to_pil()
+        finally:
+            page.close()
+    finally:
+        pdf.close()
+
+
+def load_image(item: Tuple, dpi: int):
+    """PIL image of an OCR item: ('image', filepath) or ('pdf', filepath, page index)"""
+    if item[0] == 'pdf':
+        return render_pdf_page(item[1], item[2], dpi)
+    # Photos are shrunk, straightened and binarized before tesseract sees them
+    if ocr_preprocess_enabled():
+        return preprocess_image(item[1])
+    # A copy keeps the pixels once the file is closed
+    with Image.open(item[1]) as image:
+        return image.copy()
+
+
+class TesseractEngine:
+    """A tesseract engine for one language set, loaded once and reused for every image
+
+    Uses the tesserocr C-API binding when installed, which keeps the
+    language data in memory; otherwise each image runs the tesseract binary
+    through pytesseract. Calls into a tesserocr engine are serialised because
+    it is not thread-safe; pytesseract runs a separate process per call and
+    needs no lock.
+    """
+
+    def __init__(self, lang: str):
+        self.lang = lang
+        self._lock = threading.Lock()
+        self._api = None
+        if TESSEROCR_AVAILABLE:
+            try:
+                self._api = tesserocr.PyTessBaseAPI(lang=lang)
+            except Exception as e:
+                print(f"tesserocr could not load {lang}, using the tesseract binary: {e}")
+
+    @property
+    def name(self) -> str:
+        return 'tesserocr' if self._api is not None else 'pytesseract'
+
+    def recognize(self, image) -> str:
+        if self._api is None:
+            return pytesseract.image_to_string(image, lang=self.lang).strip()
+        with self._lock:
+            try:
+                self._api.SetImage(image)
+                dpi = image.info.get('dpi') if hasattr(image, 'info') else None
+                if dpi:
+                    self._api.SetSourceResolution(int(dpi[0]))
+                return self._api.GetUTF8Text().strip()
+            finally:
+                self._api.Clear()
+
+
+_engines: Dict[str, TesseractEngine] = {}
+_engines_lock = threading.Lock()
+
+
+def get_engine(lang: str) -> TesseractEngine:
+    """The engine of this process for a language set, created on first use"""
+    with _engines_lock:
+        if lang not in _engines:
+            _engines[lang] = TesseractEngine(lang)
+        return _engines[lang]
+
+
+def detect_lang(image, combined: str) -> str:
+    """Smallest language set for a page, from a quick OCR of a reduced copy with the combined set"""
+    engine = get_engine(combined)
+    if engine.name != 'tesserocr':
+        return combined
+    try:
+        text = engine.recognize(probe_image(image))
+    except Exception as e:
+        print(f"OCR script probe failed, using {combined}: {e}")
+        return combined
+    return lang_for_probe_text(text, combined)
+
+
+def recognize_item(item: Tuple, dpi: int, lang: str, detect: bool = False) -> Tuple[str, float]:
+    """OCR one image or PDF page with this process's engine (runs in a pool worker)
+
+    With detect, lang is the combined set the page's language set is narrowed from.
+
+    Returns:
+        (text, seconds taken)
+    """
+    start = time.perf_counter()
+    image = load_image(item, dpi)
+    if detect:
+        lang = detect_lang(image, lang)
+    text = get_engine(lang).recognize(image)
+    return text, time.perf_counter() - start
+
+
+class OCRStats:
+    """Queue depth and recent per-image latency of this process's OCR requests
+
+    Extraction pool workers OCR scanned pages in their own process; they
+    send what they recorded back with each result (since()), and the web
+    worker adds it to its statistics (merge()).
+    """
+
+    def __init__(self, window: int = 200):
+        self._lock = threading.Lock()
+        self._latencies = deque(maxlen=window)
+        self._queued = 0
+        self._completed = 0
+        self._failed = 0
+
+    def submitted(self, count: int = 1) -> None:
+        with self._lock:
+            self._queued += count
+
+    def finished(self, seconds: Optional[float]) -> None:
+        """Record one image leaving the queue (seconds None: failed or cancelled)"""
+        with self._lock:
+            self._queued -= 1
+            if seconds is None:
+                self._failed += 1
+            else:
+                self._completed += 1
+                self._latencies.append(seconds)
+
+    def mark(self) -> Tuple[int, int]:
+        """Position to report new work from (see since())"""
+        with self._lock:
+            return self._completed, self._failed
+
+    def since(self, mark: Tuple[int, int]) -> Dict[str, Any]:
+        """Images finished since mark: {'pid', 'latencies', 'failed'}"""
+        with self._lock:
+            completed = self._completed - mark[0]
+            latencies = list(self._latencies)[-completed:] if completed > 0 else []
+            return {'pid': os.getpid(), 'latencies': latencies, 'failed': self._failed - mark[1]}
+
+    def merge(self, report: Optional[Dict[str, Any]]) -> None:
+        """Add images another process reported with since()"""
+        if not report or report.get('pid') == os.getpid():
+            return
+        with self._lock:
+            self._completed += len(report['latencies'])
+            self._failed += report['failed']
+            self._latencies.extend(report['latencies'])
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            latencies = sorted(self._latencies)
+            stats = {'queue_depth': self._queued, 'completed': self._completed, 'failed': self._failed}
+
+        def percentile(p: float) -> Optional[float]:
+            if not latencies:
+                return None
+            return round(latencies[min(len(latencies) - 1, int(len(latencies) * p / 100.0))], 3)
+
+        stats['latency'] = {
+            'mean': round(sum(latencies) / len(latencies), 3) if latencies else None,
+            'p50': percentile(50),
+            'p95': percentile(95)
+        }
+        return stats
+
+
+_stats = OCRStats(int(os.environ.get('OCR_STATS_WINDOW', 200)))
+
+
+def ocr_stats_mark() -> Tuple[int, int]:
+    """Mark this process's OCR statistics, to report the work done after it (see ocr_stats_since)"""
+    return _stats.mark()
+
+
+def ocr_stats_since(mark: Tuple[int, int]) -> Dict[str, Any]:
+    """OCR work this process finished since mark, for merge_ocr_stats in another process"""
+    return _stats.since(mark)
+
+
+def merge_ocr_stats(report: Optional[Dict[str, Any]]) -> None:
+    """Count OCR work reported by an extraction worker in this process's statistics"""
+    _stats.merge(report)
+
+
+def ocr_stats() -> Dict[str, Any]:
+    """OCR engine, pool and latency statistics of this web worker, including its extraction workers"""
+    stats = _stats.snapshot()
+    stats.update({
+        'available': ocr_available(),
+        'engine': 'tesserocr' if TESSEROCR_AVAILABLE else 'pytesseract',
+        'tesseract_version': tesseract_version(),
+        'workers': get_ocr_workers()
+    })
+    return stats
+
+
+_ocr_pool = None
+_ocr_pool_pid = None
+_ocr_pool_lock = threading.Lock()
+
+# Set in extraction pool workers, which OCR in-process instead of starting pools of their own
+_in_process_only = False
+
+
+def use_in_process_ocr() -> None:
+    """OCR every batch of this process in-process (called in extraction pool workers)"""
+    global _in_process_only
+    _in_process_only = True
+
+
+def _get_ocr_pool(max_workers: int) -> TaskPool:
+    """Get the OCR pool of the current process, creating it on first use
+
+    The pool lives as long as the process, so its workers keep their
+    engines loaded across requests.
+    """
+    global _ocr_pool, _ocr_pool_pid
+    with _ocr_pool_lock:
+        if _ocr_pool is None or _ocr_pool_pid != os.getpid():
+            _ocr_pool = TaskPool(max_workers)
+            _ocr_pool_pid = os.getpid()
+        return _ocr_pool
+
+
+def _reset_ocr_pool(pool: Optional[TaskPool] = None) -> None:
+    """Drop a broken or hung OCR pool so the next batch starts a fresh one
+
+    With pool given, the current pool is only dropped if it is still that one.
+    """
+    global _ocr_pool
+    with _ocr_pool_lock:
+        if _ocr_pool is not None and (pool is None or pool is _ocr_pool):
+            _ocr_pool.shutdown()
+            _ocr_pool = None
+
+
+def _record_result(future) -> None:
+    try:
+        _stats.finished(None if future.cancelled() or future.exception() else future.result()[1])
+    except Exception:
+        _stats.finished(None)
+
+
+class OCRBatch:
+    """OCR of several images or PDF pages, submitted at once and collected in order
+
+    With more than one worker every item is submitted to the pool on
+    creation, so the caller can do other work while they are recognised;
+    text() then waits for an item's result. With one worker, or inside an
+    extraction worker, items are OCR'd in this process when asked for.
+    """
+
+    def __init__(self, items: Dict[Any, Tuple], dpi: Optional[int] = None,
+                 lang: Optional[str] = None, workers: Optional[int] = None,
+                 timeout: Optional[float] = None, langs: Optional[Dict[Any, Optional[str]]] = None):
+        """
+        Args:
+            items: key -> ('image', filepath) or ('pdf', filepath, page index)
+            dpi: Rasterization resolution of PDF pages (defaults to OCR_DPI)
+            lang: Tesseract languages (defaults to OCR_LANG, narrowed per item by a script probe)
+            langs: key -> languages of items whose set differs from lang (e.g. uploads of different file keys)
+            workers: Pool size (defaults to OCR_WORKERS)
+            timeout: Seconds each item may take once a worker starts it (defaults to OCR_TIMEOUT)
+        """
+        self.items = dict(items)
+        self.dpi = dpi or get_ocr_dpi()
+        combined = get_ocr_lang()
+        self.lang = narrow_lang(lang, combined)
+        # Only an undecided language set is narrowed per item
+        self.detect = self.lang == combined and page_lang_detection_enabled()
+        self.langs = {key: (self.lang, self.detect) for key in self.items}
+        for key, item_lang in (langs or {}).items():
+            narrowed = narrow_lang(item_lang, combined)
+            self.langs[key] = (narrowed, narrowed == combined and page_lang_detection_enabled())
+        self.workers = workers or get_ocr_workers()
+        self.timeout = timeout if timeout is not None else get_ocr_timeout()
+        self.futures: Dict[Any, Any] = {}
+        self.pool: Optional[TaskPool] = None
+
+        if self.workers > 1 and len(self.items) > 1 and not _in_process_only:
+            try:
+                self.pool = _get_ocr_pool(self.workers)
+                for key, item in self.items.items():
+                    future = self.pool.submit(recognize_item, item, self.dpi, *self.langs[key])
+                    _stats.submitted()
+                    future.add_done_callback(_record_result)
+                    self.futures[key] = future
+            except (BrokenProcessPool, RuntimeError, OSError) as e:
+                print(f"OCR pool unavailable, recognising sequentially: {e}")
+                _reset_ocr_pool(self.pool)
+                self.close()
+                self.futures = {}
+
+    def __contains__(self, key: Any) -> bool:
+        return key in self.items
+
+    def _describe(self, key: Any) -> str:
+        item = self.items[key]
+        name = os.path.basename(item[1])
+        return f"page {item[2] + 1} of {name}" if item[0] == 'pdf' else name
+
+    def _recognize_here(self, key: Any) -> str:
+        _stats.submitted()
+        seconds = None
+        try:
+            text, seconds = recognize_item(self.items[key], self.dpi, *self.langs[key])
+            return text
+        finally:
+            _stats.finished(seconds)
+
+    def text(self, key: Any) -> str:
+        """Recognised text of one item ("" if OCR failed or timed out)"""
+        future = self.futures.get(key)
+        try:
+            if future is None:
+                return self._recognize_here(key)
+            # The pool is shared by every request of this worker, so the timeout runs from the item's start
+            return self.pool.result(future, self.timeout)[0]
+        except FutureTimeoutError:
+            # A running item cannot be cancelled, so its worker is killed
+            print(f"OCR of {self._describe(key)} timed out after {self.timeout}s, restarting the OCR pool")
+            self.pool.kill(future)
+            _reset_ocr_pool(self.pool)
+        except BrokenProcessPool as e:
+            # The pool crashed, or another item's hung worker was killed: read this item here
+            _reset_ocr_pool(self.pool)
+            try:
+                return self._recognize_here(key)
+            except Exception:
+                print(f"OCR of {self._describe(key)} failed: {e}")
+        except Exception as e:
+            print(f"OCR of {self._describe(key)} failed: {e}")
+        return ""
+
+    def texts(self) -> List[str]:
+        """Texts of all items in the order they were given"""
+        return [self.text(key) for key in self.items]
+
+    def close(self) -> None:
+        """Cancel items that were never collected"""
+        for future in self.futures.values():
+            future.cancel()
+
+
+def crop_region(image, box: Tuple[float, float, float, float]):
+    """Part of an image given as (left, top, right, bottom) fractions of its size"""
+    width, height = image.size
+    left, top, right, bottom = box
+    return image.crop((round(left * width), round(top * height), round(right * width), round(bottom * height)))
+
+
+def recognize_regions(image, boxes: Dict[str, Tuple[float, float, float, float]],
+                      lang: Optional[str] = None) -> Dict[str, str]:
+    """OCR named regions of one page in this process, name -> text
+
+    Crops are a fraction of a page, so they are read with this process's
+    engine instead of being shipped to the pool.
+    """
+    engine = get_engine(lang or get_ocr_lang())
+    texts = {}
+    for name, box in boxes.items():
+        _stats.submitted()
+        seconds = None
+        start = time.perf_counter()
+        try:
+            texts[name] = engine.recognize(crop_region(image, box))
+            seconds = time.perf_counter() - start
+        except Exception as e:
+            print(f"OCR of region {name} failed: {e}")
+            texts[name] = ""
+        finally:
+            _stats.finished(seconds)
+    return texts
+
+
+class PageOCR(OCRBatch):
+    """OCR of a PDF's scanned pages, keyed by page index"""
+
+    def __init__(self, filepath: str, indexes: List[int], **options):
+        super().__init__({index: ('pdf', filepath, index) for index in indexes}, **options)
+
+
+def recognize_images(filepaths: List[str], lang: Optional[str] = None,
+                     langs: Optional[List[Optional[str]]] = None) -> List[str]:
+    """OCR a batch of image files concurrently, texts in the order given
+
+    lang fixes the language set of every image and langs (one per file) that
+    of each image; by default it is detected per image.
+    """
+    batch = OCRBatch(
+        {index: ('image', filepath) for index, filepath in enumerate(filepaths)}, lang=lang,
+        langs=dict(enumerate(langs)) if langs is not None else None
+    )
+    try:
+        return batch.texts()
+    finally:
+        batch.close()
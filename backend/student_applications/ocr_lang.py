@@ -0,0 +1,96 @@
+"""
+OCR language selection per document and page
+
+Recognising with eng+chi_sim runs both language models over every line,
+which is several times slower than one model and reads pure English text
+less accurately. The language set of a page is narrowed in two ways:
+
+- by the upload's file key, when it fixes the language (an IELTS report
+  or an English transcript is English, a Chinese transcript is Chinese);
+- otherwise by a script probe: a quick OCR of a reduced copy of the page
+  with the full set, counting English words and Chinese characters. A page
+  in one script is read with that script's language alone.
+
+A page with a real share of both scripts is mixed and keeps the full
+OCR_LANG set, as do pages the probe could not read. A narrowed set is only
+used when all its languages are part of OCR_LANG, so the configured set
+stays the upper bound.
+"""
+
+import os
+import re
+from typing import Dict, Optional
+
+# Upload file keys whose documents are in one known language
+FILE_KEY_LANGS = {
+    'ielts_score': 'eng',
+    'transcript_en': 'eng',
+    'transcript_zh': 'chi_sim',
+}
+
+# Scripts counted in the probe text and the language set that reads each
+SCRIPT_LANGS = {
+    'Latin': 'eng',
+    'Han': 'chi_sim',
+}
+
+# An English word and a Chinese character each count as one unit of their script
+LATIN_WORD = re.compile(r'[A-Za-z]{2,}')
+HAN_CHAR = re.compile(r'[\u3400-\u4dbf\u4e00-\u9fff]')
+
+# Probes that read fewer units than this (blank or unreadable pages) keep the full set
+PROBE_MIN_UNITS = 10
+
+# Pages are probed at about this many pixels on the long side (roughly 140 DPI for A4)
+PROBE_LONG_SIDE = 1600
+
+
+def ocr_lang_detect_enabled() -> bool:
+    """Whether OCR languages are narrowed per document and page (OCR_LANG_DETECT, default true)"""
+    return os.environ.get('OCR_LANG_DETECT', 'true').lower() in ('1', 'true', 'yes')
+
+
+def get_mixed_script_share() -> float:
+    """Share of the minority script that makes a page mixed (OCR_MIXED_SCRIPT_SHARE, default 0.05)"""
+    return float(os.environ.get('OCR_MIXED_SCRIPT_SHARE', 0.05))
+
+
+def narrow_lang(lang: Optional[str], combined: str) -> str:
+    """lang if all its languages are in the combined set, otherwise the combined set"""
+    if not lang:
+        return combined
+    available = set(combined.split('+'))
+    return lang if set(lang.split('+')) <= available else combined
+
+
+def lang_for_file_key(file_key: Optional[str]) -> Optional[str]:
+    """Language set implied by an upload's file key, None when it must be detected"""
+    if not ocr_lang_detect_enabled():
+        return None
+    return FILE_KEY_LANGS.get(file_key)
+
+
+def script_counts(text: str) -> Dict[str, int]:
+    """English words and Chinese characters in a probe's text"""
+    return {'Latin': len(LATIN_WORD.findall(text)), 'Han': len(HAN_CHAR.findall(text))}
+
+
+def lang_for_probe_text(text: str, combined: str) -> str:
+    """Language set for a page whose probe with the combined set read text"""
+    counts = script_counts(text)
+    total = sum(counts.values())
+    if total < PROBE_MIN_UNITS:
+        return combined
+    script, count = max(counts.items(), key=lambda item: item[1])
+    # Bilingual pages need both models, even when one script dominates
+    if total - count >= get_mixed_script_share() * total:
+        return combined
+    return narrow_lang(SCRIPT_LANGS[script], combined)
+
+
+def probe_image(image):
+    """Reduced copy of a page for the script probe"""
+    scale = PROBE_LONG_SIDE / max(image.size)
+    if scale >= 1:
+        return image
+    return image.resize((max(1, round(image.size[0] * scale)), max(1, round(image.size[1] * scale))))
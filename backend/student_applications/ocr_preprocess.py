@@ -0,0 +1,89 @@
+"""
+Image preprocessing before OCR
+
+Phone photos of score reports and certificates arrive as 12-megapixel
+colour JPEGs, several times more pixels than tesseract needs. Before OCR
+each image is decoded straight to grayscale at a reduced scale (JPEG draft
+mode), turned upright from its EXIF orientation, resized to the pixel
+size of a page scanned at OCR_TARGET_DPI and binarized against its local
+background, which also removes the uneven lighting of photos.
+"""
+
+import os
+from typing import Tuple
+
+from PIL import Image, ImageChops, ImageFilter, ImageOps
+
+# Long side of an A4 page in inches; photos are scaled as if they showed a whole page
+PAGE_LONG_SIDE_INCHES = 11.69
+
+# Never enlarge an image more than this (upscaling adds no detail)
+MAX_UPSCALE = 2.0
+
+
+def ocr_preprocess_enabled() -> bool:
+    """Whether images are preprocessed before OCR (OCR_PREPROCESS, default false until benchmarked)"""
+    return os.environ.get('OCR_PREPROCESS', 'false').lower() in ('1', 'true', 'yes')
+
+
+def get_target_dpi() -> int:
+    """Resolution images are normalised to (OCR_TARGET_DPI, default 200)"""
+    return int(os.environ.get('OCR_TARGET_DPI', 200))
+
+
+def get_binarize_offset() -> int:
+    """How much darker than its surroundings a pixel must be to count as ink (OCR_BINARIZE_OFFSET, default 10)"""
+    return int(os.environ.get('OCR_BINARIZE_OFFSET', 10))
+
+
+def preprocess_signature() -> str:
+    """Settings that change preprocessed images, for extraction cache keys"""
+    if not ocr_preprocess_enabled():
+        return 'raw'
+    return f"{get_target_dpi()}|{get_binarize_offset()}"
+
+
+def target_size(size: Tuple[int, int], dpi: int) -> Tuple[int, int]:
+    """Pixel size of an image normalised to a page scanned at dpi"""
+    width, height = size
+    scale = min(MAX_UPSCALE, dpi * PAGE_LONG_SIDE_INCHES / max(width, height))
+    return max(1, round(width * scale)), max(1, round(height * scale))
+
+
+def binarize(image: Image.Image, offset: int) -> Image.Image:
+    """Adaptive threshold: ink is whatever is darker than its local mean by more than offset
+
+    The local mean is a box blur over about 1/80 of the long side, so
+    shadows and gradients across a photo do not swallow the text.
+    """
+    radius = max(4, max(image.size) // 80)
+    background = image.filter(ImageFilter.BoxBlur(radius))
+    darkness = ImageChops.subtract(background, image)
+    return darkness.point([0 if value > offset else 255 for value in range(256)])
+
+
+def preprocess_image(filepath: str, dpi: int = None, offset: int = None) -> Image.Image:
+    """Grayscale, upright, resolution-normalised and binarized image for OCR"""
+    dpi = dpi or get_target_dpi()
+    offset = offset if offset is not None else get_binarize_offset()
+
+    with Image.open(filepath) as original:
+        orientation = original.getexif().get(0x0112, 1)
+        # Orientations 5-8 swap width and height, so the target is computed upright
+        upright = original.size[::-1] if orientation in (5, 6, 7, 8) else original.size
+        width, height = target_size(upright, dpi)
+
+        if original.format == 'JPEG':
+            # Decodes to grayscale at the smallest 1/2, 1/4 or 1/8 scale still at least this large
+            requested = (height, width) if orientation in (5, 6, 7, 8) else (width, height)
+            original.draft('L', requested)
+
+        # Both return new images, so the file can be closed afterwards
+        image = ImageOps.exif_transpose(original).convert('L')
+
+    if image.size != (width, height):
+        image = image.resize((width, height), Image.LANCZOS if width < image.size[0] else Image.BICUBIC)
+
+    image = binarize(image, offset)
+    image.info['dpi'] = (dpi, dpi)
+    return image
@@ -0,0 +1,290 @@
+"""
+Region-of-interest OCR templates for fixed-layout documents
+
+IELTS Test Report Forms and Chinese degree certificates are printed on
+fixed layouts, so the few fields the application needs always sit in the
+same parts of the page. Instead of OCR'ing the whole page with every
+language and asking the model to find the values, a photo or scan of such
+a document is matched against a registry of templates: the template's
+anchor region (e.g. the TRF header) is OCR'd first to confirm the document
+type, then only the template's other regions are OCR'd, in the document's
+language, and parsed into structured fields. A document read this way is
+left out of the model's input unless one of the template's optional fields
+(e.g. the TRF test date) was not read, in which case the region text is
+sent instead of the whole page; if the anchor does not match or a required
+field is missing, the document goes through full-page OCR as before.
+
+Regions are (left, top, right, bottom) fractions of the page, so they hold
+for any resolution of a page photographed or scanned edge to edge.
+OCR_TEMPLATES_FILE (JSON, {template: {region: [left, top, right, bottom]}})
+adjusts regions for other print runs.
+"""
+
+import os
+import re
+import json
+from typing import Dict, Any, List, Optional, Tuple, Callable, Pattern
+
+try:
+    import PyPDF2
+    PYPDF2_AVAILABLE = True
+except ImportError:
+    PYPDF2_AVAILABLE = False
+
+from .field_rules import extract_rule_fields, normalize_date
+from .ocr import (
+    ocr_available, pdf_ocr_available, get_ocr_dpi, get_ocr_lang, load_image, render_pdf_page,
+    page_has_text_layer, recognize_regions
+)
+from .ocr_lang import narrow_lang
+from .utils import IMAGE_EXTENSIONS, get_file_extension
+
+Box = Tuple[float, float, float, float]
+
+# IELTS Academic/General Training TRF (A4 portrait)
+IELTS_TRF_REGIONS = {
+    'header': (0.0, 0.0, 1.0, 0.12),
+    'test_details': (0.0, 0.08, 1.0, 0.22),
+    'results': (0.0, 0.52, 1.0, 0.68),
+    'trf_number': (0.45, 0.86, 1.0, 1.0),
+}
+
+# Chinese bachelor/master/doctor degree certificate (photo on the left, text on the right)
+CN_DEGREE_REGIONS = {
+    'title': (0.15, 0.0, 0.85, 0.3),
+    'body': (0.25, 0.25, 1.0, 0.75),
+}
+
+CN_DIGITS = {'〇': 0, '○': 0, '零': 0, '一': 1, '二': 2, '三': 3, '四': 4,
+             '五': 5, '六': 6, '七': 7, '八': 8, '九': 9}
+
+_CN_NUMBER = r'[〇○零一二三四五六七八九十\d]'
+DEGREE_HOLDER = re.compile(
+    r'(?<![一-龥·])([一-龥·]{2,4})[，,]\s*(?:性别)?([男女])[，,]\s*'
+    r'(' + _CN_NUMBER + r'{4}\s*年\s*' + _CN_NUMBER + r'{1,3}\s*月\s*' + _CN_NUMBER + r'{1,3}\s*日)\s*生'
+)
+DEGREE_STUDY = re.compile(r'在([一-龥（）()]{2,30}?(?:大学|学院))([一-龥（）()、与和]{2,40}?)专业')
+DEGREE_AWARDED = re.compile(r'授予([一-龥]{0,10}?(?:学士|硕士|博士))学位')
+
+
+def _cn_number(text: str) -> int:
+    """'2023', '二〇二三', '十二' or '二十三' as an integer"""
+    if text.isdigit():
+        return int(text)
+    if '十' in text:
+        tens, _, units = text.partition('十')
+        return CN_DIGITS.get(tens, 1) * 10 + (CN_DIGITS.get(units, 0) if units else 0)
+    return int(''.join(str(CN_DIGITS.get(char, char)) for char in text))
+
+
+def chinese_date(text: str) -> Optional[str]:
+    """'二〇〇〇年一月十二日' or '2000年1月12日' as YYYY-MM-DD"""
+    match = re.match(r'(\S{4})\s*年\s*(\S{1,3}?)\s*月\s*(\S{1,3}?)\s*日', text)
+    if not match:
+        return None
+    try:
+        year, month, day = (_cn_number(part) for part in match.groups())
+    except ValueError:
+        return None
+    return normalize_date(f"{year}年{month}月{day}日")
+
+
+def parse_ielts_trf(texts: Dict[str, str]) -> Dict[str, str]:
+    """language_test fields from the regions of a TRF, with the checks of the extraction rules"""
+    fields = extract_rule_fields({'ielts_score': '\n'.join(texts.values())})
+    return {path: value for path, value in fields.items() if path.startswith('language_test.')}
+
+
+def parse_cn_degree(texts: Dict[str, str]) -> Dict[str, str]:
+    """Holder, university, major and degree from the body of a degree certificate"""
+    # Chinese OCR output separates characters with spaces; line breaks are kept as boundaries
+    body = re.sub(r'[^\S\n]+', '', texts.get('body', ''))
+    flat = body.replace('\n', '')
+    fields = {}
+
+    match = DEGREE_HOLDER.search(body) or DEGREE_HOLDER.search(flat)
+    if match:
+        fields['applicant_info.name'] = match.group(1)
+        fields['applicant_info.gender'] = match.group(2)
+        birth_date = chinese_date(match.group(3))
+        if birth_date:
+            fields['applicant_info.birth_date'] = birth_date
+
+    match = DEGREE_STUDY.search(flat)
+    if match:
+        fields['education_background.university'] = match.group(1)
+        # '北京大学信息科学技术学院计算机科学与技术专业' names the school first
+        fields['education_background.major'] = match.group(2).split('学院')[-1]
+
+    match = DEGREE_AWARDED.search(flat)
+    if match:
+        fields['education_background.expected_degree'] = match.group(1)
+    return fields
+
+
+class DocumentTemplate:
+    """Named page regions of one fixed-layout document type and how to read them"""
+
+    def __init__(self, name: str, file_keys: List[str], anchor_region: str, anchor: Pattern,
+                 regions: Dict[str, Box], lang: str, required: List[str],
+                 parse: Callable[[Dict[str, str]], Dict[str, str]], optional: Optional[List[str]] = None):
+        """
+        Args:
+            name: Template name, reported in the analysis metadata
+            file_keys: Upload file keys whose documents may have this layout
+            anchor_region: Region OCR'd first; the document matches when anchor is found in it
+            anchor: Pattern identifying the document type
+            regions: Region name -> (left, top, right, bottom) fractions of the page
+            lang: Tesseract languages of the regions
+            required: Field paths that must be read for the template result to be used
+            parse: Region texts -> dotted field path -> value
+            optional: Other field paths the template reads; the document stays in the model input when one is missing
+        """
+        self.name = name
+        self.file_keys = list(file_keys)
+        self.anchor_region = anchor_region
+        self.anchor = anchor
+        self.regions = dict(regions)
+        self.lang = lang
+        self.required = list(required)
+        self.parse = parse
+        self.optional = list(optional or [])
+
+    def field_regions(self) -> Dict[str, Box]:
+        """Regions OCR'd once the anchor matched"""
+        return {name: box for name, box in self.regions.items() if name != self.anchor_region}
+
+
+def default_templates() -> List[DocumentTemplate]:
+    """Built-in templates, with region overrides from OCR_TEMPLATES_FILE"""
+    templates = [
+        DocumentTemplate(
+            'ielts_trf', ['ielts_score'], 'header',
+            re.compile(r'IELTS|Test\s*Report\s*Form', re.I), IELTS_TRF_REGIONS, 'eng',
+            ['language_test.test_type', 'language_test.total_score', 'language_test.sections.listening',
+             'language_test.sections.reading', 'language_test.sections.writing',
+             'language_test.sections.speaking'],
+            parse_ielts_trf,
+            optional=['language_test.test_date', 'language_test.reference_number']
+        ),
+        DocumentTemplate(
+            'cn_degree', ['degree_certificate'], 'title',
+            re.compile(r'学\s*位\s*证\s*书'), CN_DEGREE_REGIONS, 'chi_sim',
+            ['applicant_info.name', 'education_background.university', 'education_background.major'],
+            parse_cn_degree,
+            optional=['applicant_info.gender', 'applicant_info.birth_date',
+                      'education_background.expected_degree']
+        ),
+    ]
+
+    path = os.environ.get('OCR_TEMPLATES_FILE')
+    if path:
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                overrides = json.load(f)
+            for template in templates:
+                for region, box in overrides.get(template.name, {}).items():
+                    template.regions[region] = tuple(float(value) for value in box)
+        except (OSError, ValueError, TypeError) as e:
+            print(f"Could not load OCR templates from {path}: {e}")
+    return templates
+
+
+class TemplateRegistry:
+    """Document templates by name, looked up by upload file key"""
+
+    def __init__(self, templates: Optional[List[DocumentTemplate]] = None):
+        self.templates: Dict[str, DocumentTemplate] = {}
+        for template in templates if templates is not None else default_templates():
+            self.register(template)
+
+    def register(self, template: DocumentTemplate) -> None:
+        """Add a template, replacing one of the same name"""
+        self.templates[template.name] = template
+
+    def for_file_key(self, file_key: Optional[str]) -> List[DocumentTemplate]:
+        """Templates an upload with this file key may match"""
+        return [template for template in self.templates.values() if file_key in template.file_keys]
+
+
+_registry = None
+
+
+def get_template_registry() -> TemplateRegistry:
+    """Get the process-wide template registry"""
+    global _registry
+    if _registry is None:
+        _registry = TemplateRegistry()
+    return _registry
+
+
+def set_template_registry(registry: Optional[TemplateRegistry]) -> None:
+    """Replace the process-wide registry (None rebuilds it from the configured templates)"""
+    global _registry
+    _registry = registry
+
+
+def ocr_templates_enabled() -> bool:
+    """Whether fixed-layout documents are read from template regions (OCR_TEMPLATES, default false)
+
+    Off by default until the regions have been checked against real TRFs and certificates.
+    """
+    return os.environ.get('OCR_TEMPLATES', 'false').lower() in ('1', 'true', 'yes')
+
+
+def load_page(filepath: str):
+    """Image of a one-page photo or scan to apply templates to, None for other documents"""
+    extension = get_file_extension(filepath)
+    if extension in IMAGE_EXTENSIONS:
+        return load_image(('image', filepath), get_ocr_dpi())
+    if extension != 'pdf' or not (PYPDF2_AVAILABLE and pdf_ocr_available()):
+        return None
+    with open(filepath, 'rb') as f:
+        pages = PyPDF2.PdfReader(f).pages
+        # Electronic TRFs carry a text layer, which the extraction rules read directly
+        if len(pages) != 1 or page_has_text_layer(pages[0]):
+            return None
+    return render_pdf_page(filepath, 0, get_ocr_dpi())
+
+
+def read_template_fields(filepath: str, file_key: Optional[str],
+                         registry: Optional[TemplateRegistry] = None) -> Optional[Dict[str, Any]]:
+    """Read a fixed-layout document from its template regions
+
+    Returns:
+        {'template': name, 'fields': {path: value}, 'text': region texts, 'complete': whether the
+        optional fields were read too}, or None when no template applies and the document needs full extraction
+    """
+    templates = (registry or get_template_registry()).for_file_key(file_key)
+    if not templates or not ocr_available():
+        return None
+    try:
+        image = load_page(filepath)
+    except Exception as e:
+        print(f"Could not load {os.path.basename(filepath)} for template OCR: {e}")
+        return None
+    if image is None:
+        return None
+
+    combined = get_ocr_lang()
+    for template in templates:
+        lang = narrow_lang(template.lang, combined)
+        anchor_box = template.regions[template.anchor_region]
+        texts = recognize_regions(image, {template.anchor_region: anchor_box}, lang)
+        if not template.anchor.search(texts[template.anchor_region]):
+            continue
+
+        texts.update(recognize_regions(image, template.field_regions(), lang))
+        fields = template.parse(texts)
+        missing = [path for path in template.required if path not in fields]
+        if missing:
+            print(f"{template.name} template could not read {', '.join(missing)} "
+                  f"from {os.path.basename(filepath)}, reading the whole page")
+            return None
+        text = '\n'.join(texts[name] for name in template.regions if texts.get(name))
+        unread = [path for path in template.optional if path not in fields]
+        if unread:
+            print(f"{template.name} template could not read {', '.join(unread)} "
+                  f"from {os.path.basename(filepath)}, keeping its region text for the model")
+        return {'template': template.name, 'fields': fields, 'text': text, 'complete': not unread}
+    return None
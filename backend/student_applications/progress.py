@@ -0,0 +1,111 @@
+"""
+In-process progress events for analysis and verification jobs
+
+Job runners publish stage events here and the Server-Sent Events endpoints
+subscribe to them. Each job keeps a short history so a client that
+connects after the job started still receives every earlier event.
+"""
+
+import json
+import time
+import queue
+import threading
+from collections import deque
+from typing import Dict, Any, Iterator, Optional
+
+# Stages after which a job publishes nothing more
+TERMINAL_STAGES = {'completed', 'failed'}
+
+
+class ProgressBroker:
+    """Publish/subscribe hub for job progress events within one worker process"""
+
+    def __init__(self, history_limit: int = 1000, retain_seconds: float = 300.0):
+        """
+        Args:
+            history_limit: Events kept per job for late subscribers
+            retain_seconds: How long a finished job's history is kept
+        """
+        self.history_limit = history_limit
+        self.retain_seconds = retain_seconds
+        self._history: Dict[str, deque] = {}
+        self._subscribers: Dict[str, list] = {}
+        self._finished_at: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def publish(self, job_id: str, stage: str, **details) -> Dict[str, Any]:
+        """Record an event and deliver it to current subscribers"""
+        event = {'job_id': job_id, 'stage': stage, 'timestamp': time.time(), **details}
+
+        with self._lock:
+            self._purge_finished()
+            self._history.setdefault(job_id, deque(maxlen=self.history_limit)).append(event)
+            subscribers = list(self._subscribers.get(job_id, []))
+            if stage in TERMINAL_STAGES:
+                self._finished_at[job_id] = time.monotonic()
+
+        for subscriber in subscribers:
+            subscriber.put(event)
+        return event
+
+    def has_job(self, job_id: str) -> bool:
+        """Whether this process has events for a job"""
+        with self._lock:
+            return job_id in self._history
+
+    def subscribe(self, job_id: str, heartbeat: float = 15.0) -> Iterator[Optional[Dict[str, Any]]]:
+        """Yield past and future events of a job until it finishes
+
+        Yields None every `heartbeat` seconds without events, so callers can
+        keep idle connections alive.
+        """
+        subscriber: 'queue.Queue[Dict[str, Any]]' = queue.Queue()
+        with self._lock:
+            history = list(self._history.get(job_id, []))
+            self._subscribers.setdefault(job_id, []).append(subscriber)
+
+        try:
+            for event in history:
+                yield event
+                if event['stage'] in TERMINAL_STAGES:
+                    return
+
+            while True:
+                try:
+                    event = subscriber.get(timeout=heartbeat)
+                except queue.Empty:
+                    yield None
+                    continue
+                yield event
+                if event['stage'] in TERMINAL_STAGES:
+                    return
+        finally:
+            with self._lock:
+                subscribers = self._subscribers.get(job_id, [])
+                if subscriber in subscribers:
+                    subscribers.remove(subscriber)
+                if not subscribers:
+                    self._subscribers.pop(job_id, None)
+
+    def _purge_finished(self) -> None:
+        """Drop histories of jobs that finished long enough ago (lock must be held)"""
+        cutoff = time.monotonic() - self.retain_seconds
+        for job_id, finished_at in list(self._finished_at.items()):
+            if finished_at < cutoff and job_id not in self._subscribers:
+                self._history.pop(job_id, None)
+                self._finished_at.pop(job_id, None)
+
+
+def format_sse(event: Optional[Dict[str, Any]]) -> str:
+    """Format an event as a Server-Sent Events message (None becomes a keep-alive comment)"""
+    if event is None:
+        return ": keep-alive\n\n"
+    return f"event: {event['stage']}\ndata: {json.dumps(event, ensure_ascii=False)}\n\n"
+
+
+_broker = ProgressBroker()
+
+
+def get_progress_broker() -> ProgressBroker:
+    """Get the progress broker of the current process"""
+    return _broker
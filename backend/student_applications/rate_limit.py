@@ -0,0 +1,217 @@
+"""
+Cross-process rate limiting for Google GenAI calls
+
+Every worker process draws from the same two token buckets, one for
+requests per minute and one for input tokens per minute, kept in a
+SQLite database so the gunicorn workers on a host share one quota. A
+caller that cannot be served right away reserves its share and sleeps
+until it is due, so requests are admitted roughly in arrival order;
+one that would have to wait too long is rejected with a retry delay.
+"""
+
+import os
+import math
+import time
+import sqlite3
+import threading
+from typing import Dict, Any, Optional
+
+DEFAULT_LIMITER_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'instance', 'rate_limit.db'
+)
+
+# Rough input tokens per character for mixed Chinese/English documents
+TOKENS_PER_CHAR = 0.5
+
+
+class RateLimitExceeded(Exception):
+    """Raised when a GenAI call would have to wait longer than allowed"""
+
+    def __init__(self, retry_after: float, message: Optional[str] = None):
+        self.retry_after = retry_after
+        super().__init__(message or f"Google GenAI rate limit reached, retry in {math.ceil(retry_after)}s")
+
+
+def estimate_tokens(contents: list) -> int:
+    """Estimate the input tokens of a request from its text length"""
+    chars = sum(len(part) if isinstance(part, str) else len(str(part)) for part in contents)
+    return int(chars * TOKENS_PER_CHAR) + 1
+
+
+class TokenBucketLimiter:
+    """Requests-per-minute and tokens-per-minute buckets shared through SQLite"""
+
+    def __init__(self, path: str = DEFAULT_LIMITER_PATH, requests_per_minute: int = 60,
+                 tokens_per_minute: int = 1000000, timeout: float = 30.0):
+        """
+        Args:
+            path: SQLite database path shared by all worker processes
+            requests_per_minute: Request quota; also the largest burst
+            tokens_per_minute: Input token quota; also the largest burst
+            timeout: Seconds to wait for a database lock
+        """
+        self.path = path
+        self.capacities = {'requests': float(requests_per_minute), 'tokens': float(tokens_per_minute)}
+        self.timeout = timeout
+        self._local = threading.local()
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._connect().execute(
+            """
+            CREATE TABLE IF NOT EXISTS buckets (
+                name TEXT PRIMARY KEY,
+                level REAL NOT NULL,
+                updated_at REAL NOT NULL
+            )
+            """
+        )
+
+    def _connect(self) -> sqlite3.Connection:
+        """Get the connection for the current thread, reopening after a fork"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None and getattr(self._local, 'pid', None) == os.getpid():
+            return conn
+
+        conn = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        self._local.conn = conn
+        self._local.pid = os.getpid()
+        return conn
+
+    def _levels(self, conn: sqlite3.Connection, now: float) -> Dict[str, float]:
+        """Current bucket levels after refilling for the time since the last update"""
+        levels = {}
+        for name, capacity in self.capacities.items():
+            row = conn.execute('SELECT level, updated_at FROM buckets WHERE name = ?', (name,)).fetchone()
+            if row is None:
+                levels[name] = capacity
+            else:
+                levels[name] = min(capacity, row[0] + max(0.0, now - row[1]) * capacity / 60.0)
+        return levels
+
+    def _wait_for(self, levels: Dict[str, float], amounts: Dict[str, float]) -> float:
+        """Seconds until every bucket holds the requested amount"""
+        wait = 0.0
+        for name, amount in amounts.items():
+            capacity = self.capacities[name]
+            # A request larger than the whole bucket waits for a full bucket
+            deficit = min(amount, capacity) - levels[name]
+            if deficit > 0:
+                wait = max(wait, deficit * 60.0 / capacity)
+        return wait
+
+    def reserve(self, tokens: int, max_wait: Optional[float] = None) -> float:
+        """Take one request and the given tokens from the buckets
+
+        Returns:
+            Seconds the caller must wait before sending the request
+
+        Raises:
+            RateLimitExceeded: If the wait would exceed max_wait; nothing is taken
+        """
+        amounts = {'requests': 1.0, 'tokens': float(tokens)}
+        conn = self._connect()
+        now = time.time()
+
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            levels = self._levels(conn, now)
+            wait = self._wait_for(levels, amounts)
+            if max_wait is not None and wait > max_wait:
+                raise RateLimitExceeded(wait)
+
+            # Levels may go negative: later callers queue behind this reservation
+            for name, amount in amounts.items():
+                conn.execute(
+                    """
+                    INSERT INTO buckets (name, level, updated_at) VALUES (?, ?, ?)
+                    ON CONFLICT (name) DO UPDATE SET level = excluded.level, updated_at = excluded.updated_at
+                    """,
+                    (name, levels[name] - amount, now)
+                )
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        return wait
+
+    def acquire(self, tokens: int, max_wait: Optional[float] = None) -> float:
+        """Reserve capacity and sleep until the request may be sent
+
+        Returns:
+            Seconds waited
+        """
+        wait = self.reserve(tokens, max_wait)
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    def reconcile(self, estimated_tokens: int, actual_tokens: int) -> None:
+        """Correct the token bucket once the real token count of a request is known"""
+        difference = float(estimated_tokens - actual_tokens)
+        if difference == 0:
+            return
+        self._connect().execute(
+            'UPDATE buckets SET level = MIN(?, level + ?) WHERE name = ?',
+            (self.capacities['tokens'], difference, 'tokens')
+        )
+
+    def projected_wait(self, tokens: int = 0) -> float:
+        """Seconds a new request would wait right now, without reserving anything"""
+        levels = self._levels(self._connect(), time.time())
+        return self._wait_for(levels, {'requests': 1.0, 'tokens': float(tokens)})
+
+    def stats(self) -> Dict[str, Any]:
+        """Current bucket levels and capacities"""
+        levels = self._levels(self._connect(), time.time())
+        return {
+            name: {'level': round(levels[name], 2), 'capacity': capacity}
+            for name, capacity in self.capacities.items()
+        }
+
+    def reset(self) -> None:
+        """Refill both buckets"""
+        self._connect().execute('DELETE FROM buckets')
+
+
+_limiter = None
+_limiter_lock = threading.Lock()
+
+
+def get_rate_limiter() -> Optional[TokenBucketLimiter]:
+    """Get the process-wide limiter, or None when disabled
+
+    Configured with GENAI_RATE_LIMIT_ENABLED, GENAI_RATE_LIMIT_PATH,
+    GENAI_RPM and GENAI_TPM.
+    """
+    global _limiter
+    if os.environ.get('GENAI_RATE_LIMIT_ENABLED', 'true').lower() not in ('1', 'true', 'yes'):
+        return None
+
+    if _limiter is None:
+        with _limiter_lock:
+            if _limiter is None:
+                _limiter = TokenBucketLimiter(
+                    path=os.environ.get('GENAI_RATE_LIMIT_PATH', DEFAULT_LIMITER_PATH),
+                    requests_per_minute=int(os.environ.get('GENAI_RPM', 60)),
+                    tokens_per_minute=int(os.environ.get('GENAI_TPM', 1000000))
+                )
+    return _limiter
+
+
+def set_rate_limiter(limiter: Optional[TokenBucketLimiter]) -> None:
+    """Replace the process-wide limiter (None resets to the configured default)"""
+    global _limiter
+    with _limiter_lock:
+        _limiter = limiter
+
+
+def get_max_wait() -> float:
+    """Longest a background GenAI call may wait for quota (GENAI_MAX_WAIT seconds)"""
+    return float(os.environ.get('GENAI_MAX_WAIT', 60))
+
+
+def get_admission_max_wait() -> float:
+    """Longest projected wait at which new jobs are still accepted (GENAI_ADMISSION_MAX_WAIT seconds)"""
+    return float(os.environ.get('GENAI_ADMISSION_MAX_WAIT', 30))
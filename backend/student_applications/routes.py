@@ -3,11 +3,16 @@ API routes for student application information processing
 """
 
 import os
-from typing import Any, Dict, Optional
-from flask import Blueprint, request, jsonify, current_app
+import math
+import time
+from typing import Any, Callable, Dict, Optional
+from flask import Blueprint, Response, request, jsonify, current_app, stream_with_context
 from werkzeug.utils import secure_filename
 from .services import StudentApplicationService, TranscriptVerificationService
-from .models import StudentApplication, TranscriptVerification
+from .models import StudentApplication, TranscriptVerification, AnalysisJob
+from .jobs import get_job_queue, QueueFullError
+from .progress import get_progress_broker, format_sse, TERMINAL_STAGES
+from .rate_limit import get_rate_limiter, get_admission_max_wait
 
 
 def api_response(
@@ -80,24 +85,53 @@ def api_error(
     )
 
 student_bp = Blueprint('student_applications', __name__)
+
+GENAI_NOT_INITIALIZED = "Google GenAI service not initialized. Please set GOOGLE_GENAI_API_KEY environment variable."
+
+
+class MockService:
+    """Stand-in for StudentApplicationService while no GenAI client can be created"""
+
+    def analyze_documents(self, files, progress_callback=None, use_cache=True, stream_tokens=False):
+        return {"error": GENAI_NOT_INITIALIZED}
+
+    def generate_structured_summary(self, analysis_result):
+        return GENAI_NOT_INITIALIZED
+
+
+class MockTranscriptService:
+    """Stand-in for TranscriptVerificationService while no GenAI client can be created"""
+
+    def verify_transcript(self, files, upload_type, progress_callback=None, use_cache=True,
+                          stream_tokens=False):
+        return {
+            "error": GENAI_NOT_INITIALIZED,
+            "metadata": {"status": "failed"}
+        }
+
+    def generate_structured_transcript(self, verification_result):
+        return GENAI_NOT_INITIALIZED
+
+
 service = None
 
 def get_service():
-    """Lazy initialization of service to handle missing API key"""
+    """Lazy initialization of service to handle missing API key
+
+    Both services take their client from the shared factory in
+    genai_client.py; while it cannot create one, a MockService is returned
+    and creation is retried on the next call.
+    """
     global service
-    if service is None:
+    if service is None or isinstance(service, MockService):
         try:
             service = StudentApplicationService()
         except (ValueError, ImportError) as e:
             # Log error but allow application to start
-            print(f"Warning: Failed to initialize StudentApplicationService: {e}")
-            print("File upload will work, but analysis will require GOOGLE_GENAI_API_KEY")
-            # Create a mock service that returns errors when analysis is attempted
-            class MockService:
-                def analyze_documents(self, files):
-                    return {"error": "Google GenAI service not initialized. Please set GOOGLE_GENAI_API_KEY environment variable."}
-                def generate_structured_summary(self, analysis_result):
-                    return "Google GenAI service not initialized. Please set GOOGLE_GENAI_API_KEY environment variable."
+            if service is None:
+                print(f"Warning: Failed to initialize StudentApplicationService: {e}")
+                print("File upload will work, but analysis will require GOOGLE_GENAI_API_KEY")
+            # Use a mock service that returns errors when analysis is attempted
             service = MockService()
     return service
 
@@ -106,25 +140,238 @@ transcript_service = None
 def get_transcript_service():
     """Lazy initialization of transcript verification service to handle missing API key"""
     global transcript_service
-    if transcript_service is None:
+    if transcript_service is None or isinstance(transcript_service, MockTranscriptService):
         try:
             transcript_service = TranscriptVerificationService()
         except (ValueError, ImportError) as e:
             # Log error but allow application to start
-            print(f"Warning: Failed to initialize TranscriptVerificationService: {e}")
-            print("File upload will work, but verification will require GOOGLE_GENAI_API_KEY")
-            # Create a mock service that returns errors when verification is attempted
-            class MockTranscriptService:
-                def verify_transcript(self, files, upload_type):
-                    return {
-                        "error": "Google GenAI service not initialized. Please set GOOGLE_GENAI_API_KEY environment variable.",
-                        "metadata": {"status": "failed"}
-                    }
-                def generate_structured_transcript(self, verification_result):
-                    return "Google GenAI service not initialized. Please set GOOGLE_GENAI_API_KEY environment variable."
+            if transcript_service is None:
+                print(f"Warning: Failed to initialize TranscriptVerificationService: {e}")
+                print("File upload will work, but verification will require GOOGLE_GENAI_API_KEY")
+            # Use a mock service that returns errors when verification is attempted
             transcript_service = MockTranscriptService()
     return transcript_service
 
+# Model status to record when the service reports a stage
+APPLICATION_STAGE_STATUS = {
+    'extraction_started': 'extracting',
+    'llm_started': 'analyzing',
+    'json_parsed': 'analyzed',
+}
+
+VERIFICATION_STAGE_STATUS = {
+    'extraction_started': 'extracting',
+    'llm_started': 'processing',
+}
+
+# Stages that are streamed to subscribers but too frequent to persist on the job
+TRANSIENT_STAGES = {'llm_token'}
+
+
+def _stage_recorder(job: AnalysisJob, record, stage_status: Dict[str, str]):
+    """Build a progress callback that publishes each stage and stores it on the job and record"""
+    def on_stage(stage, **details):
+        get_progress_broker().publish(job.id, stage, **details)
+        if stage in TRANSIENT_STAGES:
+            return
+        job.stage = stage
+        job.save()
+        status = stage_status.get(stage)
+        if status and record.status != status:
+            record.status = status
+            record.save()
+    return on_stage
+
+
+def run_analysis_job(job: AnalysisJob, application: StudentApplication, use_cache: bool = True,
+                     stream_tokens: bool = False):
+    """Analyze an application on a background worker"""
+    try:
+        analysis_result = get_service().analyze_documents(
+            application.files,
+            progress_callback=_stage_recorder(job, application, APPLICATION_STAGE_STATUS),
+            use_cache=use_cache,
+            stream_tokens=stream_tokens
+        )
+
+        # Update application with analysis results
+        application.analysis_result = analysis_result
+        application.status = 'analyzed'
+        application.save()
+
+        # Generate structured summary
+        application.structured_summary = get_service().generate_structured_summary(analysis_result)
+        application.status = 'completed'
+        application.save()
+        get_progress_broker().publish(
+            job.id, 'summary_rendered', application_id=application.id, summary=application.structured_summary
+        )
+    except Exception as e:
+        application.status = 'failed'
+        application.error_message = str(e)
+        application.save()
+        raise
+
+
+def run_verification_job(job: AnalysisJob, verification: TranscriptVerification, use_cache: bool = True,
+                         stream_tokens: bool = False):
+    """Verify a transcript on a background worker"""
+    try:
+        verification_result = get_transcript_service().verify_transcript(
+            verification.files,
+            verification.upload_type,
+            progress_callback=_stage_recorder(job, verification, VERIFICATION_STAGE_STATUS),
+            use_cache=use_cache,
+            stream_tokens=stream_tokens
+        )
+
+        # Update verification with results
+        verification.verification_result = verification_result
+        verification.status = 'processing'
+        verification.save()
+
+        # Generate structured transcript summary
+        verification.structured_result = get_transcript_service().generate_structured_transcript(verification_result)
+        verification.status = 'completed'
+        verification.save()
+        get_progress_broker().publish(
+            job.id, 'summary_rendered', verification_id=verification.id, summary=verification.structured_result
+        )
+    except Exception as e:
+        verification.status = 'failed'
+        verification.error_message = str(e)
+        verification.save()
+        raise
+
+
+def _query_flag(name: str) -> bool:
+    """Read a boolean query string flag"""
+    return request.args.get(name, '').lower() in ('1', 'true', 'yes')
+
+
+def wants_sync_response() -> bool:
+    """Check whether the client asked to wait for the job instead of polling"""
+    return _query_flag('wait')
+
+
+def wants_cached_response() -> bool:
+    """Check whether a cached model response may be used (?no_cache=true bypasses it)"""
+    return not _query_flag('no_cache')
+
+
+def _with_retry_after(result, seconds: float):
+    """Add a Retry-After header (whole seconds) to an api_error result"""
+    response, status = result
+    response.headers['Retry-After'] = str(max(1, math.ceil(seconds)))
+    return response, status
+
+
+def submit_job(kind: str, record, runner: Callable, *args) -> AnalysisJob:
+    """Mark a record as queued and submit a background job for it
+
+    The status is saved before the job is submitted, so it cannot overwrite
+    a stage the worker has already recorded; a rejected job restores it.
+
+    Raises:
+        QueueFullError: If the job queue is full
+    """
+    previous = record.status
+    record.status = 'queued'
+    record.save()
+    try:
+        return get_job_queue().submit(kind, record.id, runner, record, *args)
+    except QueueFullError:
+        record.status = previous
+        record.save()
+        raise
+
+
+def queue_full_error(e: QueueFullError):
+    """Error response for a rejected job"""
+    return _with_retry_after(
+        api_error(
+            message=str(e),
+            status=503,
+            code='QUEUE_FULL'
+        ),
+        float(os.environ.get('JOB_RETRY_AFTER', 10))
+    )
+
+
+def rate_limit_rejection():
+    """503 response if the shared GenAI quota is booked too far ahead to accept a new job, else None"""
+    limiter = get_rate_limiter()
+    if limiter is None:
+        return None
+
+    wait = limiter.projected_wait()
+    if wait <= get_admission_max_wait():
+        return None
+
+    return _with_retry_after(
+        api_error(
+            message=f'Google GenAI rate limit reached, retry in {math.ceil(wait)}s',
+            status=503,
+            code='RATE_LIMITED'
+        ),
+        wait
+    )
+
+
+def _stored_job_events(job_id: str, poll_interval: float = 1.0, heartbeat: float = 15.0):
+    """Yield stage changes of a job run by another worker process by polling storage"""
+    last_seen = None
+    last_sent = time.monotonic()
+    while True:
+        job = AnalysisJob.get_by_id(job_id)
+        if job is None:
+            return
+
+        current = (job.status, job.stage)
+        if current != last_seen:
+            last_seen = current
+            last_sent = time.monotonic()
+            stage = job.status if job.status in TERMINAL_STAGES else (job.stage or job.status)
+            yield {
+                'job_id': job.id,
+                'stage': stage,
+                'timestamp': time.time(),
+                'status': job.status,
+                'error': job.error_message
+            }
+            if job.status in TERMINAL_STAGES:
+                return
+        elif time.monotonic() - last_sent >= heartbeat:
+            last_sent = time.monotonic()
+            yield None
+
+        time.sleep(poll_interval)
+
+
+def job_event_stream(job_id: str) -> Response:
+    """Server-Sent Events response with the progress of a job"""
+    broker = get_progress_broker()
+    heartbeat = float(os.environ.get('SSE_HEARTBEAT_SECONDS', 15))
+    if broker.has_job(job_id):
+        events = broker.subscribe(job_id, heartbeat=heartbeat)
+    else:
+        events = _stored_job_events(job_id, heartbeat=heartbeat)
+
+    def generate():
+        for event in events:
+            yield format_sse(event)
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={
+            'Cache-Control': 'no-cache',
+            # Stop nginx-style proxies from buffering the stream
+            'X-Accel-Buffering': 'no'
+        }
+    )
+
+
 def allowed_file(filename):
     """Check if file extension is allowed"""
     return '.' in filename and \
@@ -220,7 +467,12 @@ def upload_files():
 
 @student_bp.route('/analyze/<application_id>', methods=['POST'])
 def analyze_application(application_id):
-    """Analyze uploaded documents using Google GenAI"""
+    """Queue analysis of uploaded documents using Google GenAI
+
+    Returns 202 with a job ID right away; pass ?wait=true to block until
+    the analysis finishes and get the summary in the response, and
+    ?no_cache=true to ignore a cached model response.
+    """
     try:
         application = StudentApplication.get_by_id(application_id)
         if not application:
@@ -230,38 +482,111 @@ def analyze_application(application_id):
                 code='NOT_FOUND'
             )
 
-        # Analyze the documents
-        analysis_result = get_service().analyze_documents(application.files)
+        rejection = rate_limit_rejection()
+        if rejection:
+            return rejection
 
-        # Update application with analysis results
-        application.analysis_result = analysis_result
-        application.status = 'analyzed'
-        application.save()
-
-        # Generate structured summary
-        structured_summary = get_service().generate_structured_summary(analysis_result)
-        application.structured_summary = structured_summary
-        application.status = 'completed'
-        application.save()
+        try:
+            job = submit_job('analyze', application, run_analysis_job, wants_cached_response())
+        except QueueFullError as e:
+            return queue_full_error(e)
+
+        if wants_sync_response():
+            job = get_job_queue().wait(job.id)
+            if job.status == 'failed':
+                return jsonify({'error': job.error_message}), 500
+
+            return api_response(
+                data={
+                    'application_id': application.id,
+                    'job_id': job.id,
+                    'status': application.status,
+                    'analysis_summary': application.structured_summary
+                },
+                message='Analysis completed successfully'
+            )
 
         return api_response(
             data={
                 'application_id': application.id,
+                'job_id': job.id,
                 'status': application.status,
-                'analysis_summary': structured_summary
+                'next_step': {
+                    'job': f'/api/student-applications/jobs/{job.id}',
+                    'events': f'/api/student-applications/jobs/{job.id}/events',
+                    'status': f'/api/student-applications/{application.id}'
+                }
             },
-            message='Analysis completed successfully'
+            message='Analysis queued',
+            status_code=202
         )
 
     except Exception as e:
-        # Update application status to failed
-        if 'application' in locals():
-            application.status = 'failed'
-            application.error_message = str(e)
-            application.save()
+        return jsonify({'error': str(e)}), 500
+
+@student_bp.route('/analyze/<application_id>/stream', methods=['POST'])
+def stream_application_analysis(application_id):
+    """Queue analysis and stream its progress as Server-Sent Events
+
+    Emits one event per stage (file_extracted, llm_started, llm_token,
+    json_parsed, summary_rendered, ...) and ends with 'completed' or 'failed'.
+    """
+    try:
+        application = StudentApplication.get_by_id(application_id)
+        if not application:
+            return api_error(
+                message='Application not found',
+                status=404,
+                code='NOT_FOUND'
+            )
+
+        rejection = rate_limit_rejection()
+        if rejection:
+            return rejection
+
+        try:
+            job = submit_job('analyze', application, run_analysis_job, wants_cached_response(), True)
+        except QueueFullError as e:
+            return queue_full_error(e)
 
+        return job_event_stream(job.id)
+
+    except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@student_bp.route('/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """Get the status of a queued analysis or verification job"""
+    try:
+        job = AnalysisJob.get_by_id(job_id)
+        if not job:
+            return api_error(
+                message='Job not found',
+                status=404,
+                code='NOT_FOUND'
+            )
+
+        return api_response(data=job.to_dict())
+
+    except Exception as e:
+        return api_error(
+            message=str(e),
+            status=500,
+            code='INTERNAL_SERVER_ERROR'
+        )
+
+@student_bp.route('/jobs/<job_id>/events', methods=['GET'])
+def get_job_events(job_id):
+    """Stream the progress of a queued job as Server-Sent Events"""
+    if not get_progress_broker().has_job(job_id) and not AnalysisJob.get_by_id(job_id):
+        return api_error(
+            message='Job not found',
+            status=404,
+            code='NOT_FOUND'
+        )
+
+    return job_event_stream(job_id)
+
 @student_bp.route('/<application_id>', methods=['GET'])
 def get_application(application_id):
     """Get application details and analysis results"""
@@ -458,7 +783,12 @@ def upload_transcript():
 
 @student_bp.route('/transcript/verify/<verification_id>', methods=['POST'])
 def verify_transcript(verification_id):
-    """Verify uploaded transcript using Google GenAI"""
+    """Queue verification of an uploaded transcript using Google GenAI
+
+    Returns 202 with a job ID right away; pass ?wait=true to block until
+    the verification finishes and get the results in the response, and
+    ?no_cache=true to ignore a cached model response.
+    """
     try:
         verification = TranscriptVerification.get_by_id(verification_id)
         if not verification:
@@ -468,40 +798,74 @@ def verify_transcript(verification_id):
                 code='NOT_FOUND'
             )
 
-        # Verify the transcript
-        verification_result = get_transcript_service().verify_transcript(
-            verification.files,
-            verification.upload_type
-        )
-
-        # Update verification with results
-        verification.verification_result = verification_result
-        verification.status = 'processing'
-        verification.save()
+        rejection = rate_limit_rejection()
+        if rejection:
+            return rejection
 
-        # Generate structured transcript summary
-        structured_result = get_transcript_service().generate_structured_transcript(verification_result)
-        verification.structured_result = structured_result
-        verification.status = 'completed'
-        verification.save()
+        try:
+            job = submit_job('verify', verification, run_verification_job, wants_cached_response())
+        except QueueFullError as e:
+            return queue_full_error(e)
+
+        if wants_sync_response():
+            job = get_job_queue().wait(job.id)
+            if job.status == 'failed':
+                return jsonify({'error': job.error_message}), 500
+
+            return api_response(
+                data={
+                    'verification_id': verification.id,
+                    'job_id': job.id,
+                    'status': verification.status,
+                    'verification_result': verification.verification_result,
+                    'structured_result': verification.structured_result
+                },
+                message='Transcript verification completed successfully'
+            )
 
         return api_response(
             data={
                 'verification_id': verification.id,
+                'job_id': job.id,
                 'status': verification.status,
-                'verification_result': verification_result,
-                'structured_result': structured_result
+                'next_step': {
+                    'job': f'/api/student-applications/jobs/{job.id}',
+                    'events': f'/api/student-applications/jobs/{job.id}/events',
+                    'status': f'/api/student-applications/transcript/{verification.id}'
+                }
             },
-            message='Transcript verification completed successfully'
+            message='Transcript verification queued',
+            status_code=202
         )
 
     except Exception as e:
-        # Update verification status to failed
-        if 'verification' in locals():
-            verification.status = 'failed'
-            verification.error_message = str(e)
-            verification.save()
+        return jsonify({'error': str(e)}), 500
+
 
+@student_bp.route('/transcript/verify/<verification_id>/stream', methods=['POST'])
+def stream_transcript_verification(verification_id):
+    """Queue transcript verification and stream its progress as Server-Sent Events"""
+    try:
+        verification = TranscriptVerification.get_by_id(verification_id)
+        if not verification:
+            return api_error(
+                message='Transcript verification not found',
+                status=404,
+                code='NOT_FOUND'
+            )
+
+        rejection = rate_limit_rejection()
+        if rejection:
+            return rejection
+
+        try:
+            job = submit_job('verify', verification, run_verification_job, wants_cached_response(), True)
+        except QueueFullError as e:
+            return queue_full_error(e)
+
+        return job_event_stream(job.id)
+
+    except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 
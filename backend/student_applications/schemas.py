@@ -0,0 +1,238 @@
+"""
+Response schemas for Gemini structured output
+
+These mirror the JSON skeletons embedded in the analysis and transcript
+prompts. When structured output is enabled they are sent as the
+response schema, so the prompts only carry instructions and the model
+is constrained to return JSON of this shape.
+"""
+
+import os
+from typing import Dict, Any, Optional
+
+
+def _field(schema_type: str, description: Optional[str] = None, **extra) -> Dict[str, Any]:
+    """Nullable scalar field"""
+    schema = {'type': schema_type, 'nullable': True, **extra}
+    if description:
+        schema['description'] = description
+    return schema
+
+
+def _string(description: Optional[str] = None, **extra) -> Dict[str, Any]:
+    return _field('STRING', description, **extra)
+
+
+def _number(description: Optional[str] = None) -> Dict[str, Any]:
+    return _field('NUMBER', description)
+
+
+def _object(properties: Dict[str, Dict[str, Any]], nullable: bool = True) -> Dict[str, Any]:
+    """Object whose keys are produced in the order given"""
+    return {
+        'type': 'OBJECT',
+        'nullable': nullable,
+        'properties': properties,
+        'property_ordering': list(properties)
+    }
+
+
+def _array(items: Dict[str, Any]) -> Dict[str, Any]:
+    return {'type': 'ARRAY', 'items': items}
+
+
+def _period() -> Dict[str, Any]:
+    return _object({
+        'start_date': _string('起始年月'),
+        'end_date': _string('结束年月')
+    })
+
+
+APPLICATION_RESPONSE_SCHEMA = _object({
+    'applicant_info': _object({
+        'name': _string('申请人姓名'),
+        'gender': _string(),
+        'birth_date': _string('YYYY-MM-DD'),
+        'passport_number': _string(),
+        'passport_issue_date': _string(),
+        'passport_expiry_date': _string(),
+        'phone': _string(),
+        'email': _string('申请邮箱'),
+        'password': _string('密码（如有）'),
+        'domestic_address': _string('国内家庭住址'),
+        'postal_code': _string()
+    }),
+    'education_background': _object({
+        'university': _string('所在院校'),
+        'major': _string('就读专业'),
+        'study_period': _period(),
+        'expected_degree': _string('预计学位'),
+        'gpa': _object({
+            'score': _string('绩点分数'),
+            'scale': _string('总分（如4.0或100）')
+        })
+    }),
+    'language_test': _object({
+        'test_type': _string('如：雅思/托福'),
+        'test_date': _string(),
+        'reference_number': _string(),
+        'total_score': _string(),
+        'sections': _object({
+            'listening': _string(),
+            'reading': _string(),
+            'writing': _string(),
+            'speaking': _string()
+        })
+    }),
+    'work_experience': _array(_object({
+        'company_name': _string(),
+        'company_address': _string(),
+        'position': _string('岗位名称'),
+        'work_period': _period(),
+        'job_description': _string('工作内容描述')
+    }, nullable=False)),
+    'recommenders': _array(_object({
+        'name': _string(),
+        'title': _string('职称'),
+        'relationship': _string('与申请人关系'),
+        'organization': _string('所在单位'),
+        'organization_address': _string(),
+        'postal_code': _string(),
+        'email': _string(),
+        'phone': _string()
+    }, nullable=False))
+}, nullable=False)
+
+COURSE_TYPES = [
+    'core', 'elective', 'major', 'general', 'required',
+    'optional', 'practical', 'thesis', 'internship', 'language'
+]
+
+SEMESTER_TYPES = ['fall', 'spring', 'summer', 'winter', 'custom']
+
+COURSE_SCHEMA = _object({
+    'course_id': _string('课程标识'),
+    'code': _string('课程代码（如：CS101）'),
+    'name_zh': _string('课程中文名'),
+    'name_en': _string('课程英文名'),
+    'course_type': _object({
+        'type': _string(format='enum', enum=COURSE_TYPES),
+        'en': _string('课程类型英文描述'),
+        'zh': _string('课程类型中文描述')
+    }),
+    'credits': _number('学分'),
+    'grade': _string('成绩（如：A, 90, 优秀）'),
+    'grade_points': _number('绩点分数（如：4.0, 3.5）'),
+    'description': _string()
+}, nullable=False)
+
+SEMESTER_SCHEMA = _object({
+    'semester_id': _string('学期标识'),
+    'name_zh': _string('学期中文名（如：第一学期、2023秋季）'),
+    'name_en': _string('学期英文名（如：Fall 2023）'),
+    'type': _string(format='enum', enum=SEMESTER_TYPES),
+    'academic_year': _string('如：2023-2024'),
+    'start_date': _string('YYYY-MM-DD'),
+    'end_date': _string('YYYY-MM-DD'),
+    'courses': _array(COURSE_SCHEMA),
+    'total_credits': _number('该学期总学分'),
+    'semester_gpa': _number('该学期绩点')
+}, nullable=False)
+
+STUDENT_INFO_SCHEMA = _object({
+    'name_zh': _string('学生中文姓名'),
+    'name_en': _string('学生英文姓名'),
+    'student_id': _string('学号'),
+    'university': _string('所在院校'),
+    'major': _string('专业'),
+    'degree_level': _string('如：本科、硕士、博士'),
+    'graduation_date': _string('YYYY-MM'),
+    'overall_gpa': _number('总平均绩点'),
+    'gpa_scale': _number('绩点总分（如4.0或100）')
+})
+
+TRANSCRIPT_RESPONSE_SCHEMA = _object({
+    'student_info': STUDENT_INFO_SCHEMA,
+    'semesters': _array(SEMESTER_SCHEMA),
+    'academic_summary': _object({
+        'total_credits': _number('总学分'),
+        'total_courses': _field('INTEGER', '总课程数'),
+        'academic_standing': _string('学业状态（如：良好、优秀）'),
+        'verification_notes': _string('认证备注')
+    })
+}, nullable=False)
+
+
+# What the model adds to course rows read from PDF tables (see transcript_tables.py)
+TABLE_ANNOTATION_SCHEMA = _object({
+    'student_info': STUDENT_INFO_SCHEMA,
+    'semesters': _array(_object({
+        'id': _string('学期编号（如：s1）'),
+        'name_zh': _string('学期中文名'),
+        'name_en': _string('学期英文名'),
+        'type': _string(format='enum', enum=SEMESTER_TYPES),
+        'academic_year': _string('如：2023-2024'),
+        'start_date': _string('YYYY-MM-DD'),
+        'end_date': _string('YYYY-MM-DD')
+    }, nullable=False)),
+    'courses': _array(_object({
+        'id': _string('课程编号（如：s1c2）'),
+        'course_type': _string(format='enum', enum=COURSE_TYPES),
+        'name_zh': _string('缺中文名时补充的课程中文名'),
+        'name_en': _string('缺英文名时补充的课程英文名')
+    }, nullable=False)),
+    'academic_summary': _object({
+        'academic_standing': _string('学业状态（如：良好、优秀）'),
+        'verification_notes': _string('认证备注')
+    })
+}, nullable=False)
+
+
+def structured_output_enabled() -> bool:
+    """Whether GenAI calls use a response schema instead of a JSON skeleton in the prompt
+
+    Controlled by GENAI_STRUCTURED_OUTPUT (default false, which keeps the JSON skeleton prompts).
+    """
+    return os.environ.get('GENAI_STRUCTURED_OUTPUT', 'false').lower() in ('1', 'true', 'yes')
+
+
+def with_response_schema(generation_config: Dict[str, Any], schema: Dict[str, Any]) -> Dict[str, Any]:
+    """Copy of a generation config that requests JSON matching schema"""
+    return {
+        **generation_config,
+        'response_mime_type': 'application/json',
+        'response_schema': schema
+    }
+
+
+def prune_schema(schema: Dict[str, Any], paths, prefix: str = '') -> Optional[Dict[str, Any]]:
+    """Copy of a schema without the given dotted field paths
+
+    Paths run through arrays without an index (e.g. 'semesters.courses.code').
+    Objects left without properties are dropped as well. Returns None if
+    nothing of the schema remains.
+    """
+    if prefix in paths:
+        return None
+    if schema.get('type') == 'ARRAY':
+        items = prune_schema(schema['items'], paths, prefix)
+        return {**schema, 'items': items} if items is not None else None
+    if schema.get('type') != 'OBJECT':
+        return schema
+
+    properties = {}
+    for key, child in schema['properties'].items():
+        pruned = prune_schema(child, paths, f"{prefix}.{key}" if prefix else key)
+        if pruned is not None:
+            properties[key] = pruned
+    if not properties:
+        return None
+    return {**schema, 'properties': properties, 'property_ordering': list(properties)}
+
+
+def without_response_schema(generation_config: Dict[str, Any]) -> Dict[str, Any]:
+    """Copy of a generation config with any response schema removed"""
+    return {
+        key: value for key, value in generation_config.items()
+        if key not in ('response_mime_type', 'response_schema')
+    }
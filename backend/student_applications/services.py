@@ -3,24 +3,321 @@ Service layer for student application analysis using Google GenAI
 """
 
 import os
+import re
 import json
 import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, Callable, Tuple
+
+from .genai_client import GENAI_AVAILABLE, get_genai_client
+
+if not GENAI_AVAILABLE:
+    print("Warning: google-genai library not available. Please install with: pip install google-genai")
+
+from .utils import extract_document, extract_texts_in_parallel, get_extraction_workers
+from .ocr_lang import lang_for_file_key
+from .ocr_templates import read_template_fields, ocr_templates_enabled
+from .llm_cache import get_llm_cache, LLMResponseCache
+from .json_extract import extract_json, strip_leading_fence
+from .rate_limit import get_rate_limiter, estimate_tokens, get_max_wait
+from .model_router import ModelRouter, HedgeBudget, RequestCancelled, configured_models, new_hedge_budget
+from .field_rules import (
+    extract_rule_fields, required_fields, rule_extraction_enabled, empty_result, apply_rule_fields
+)
+from .transcript_chunks import plan_transcript_chunks, merge_chunk_results, split_semesters
+from .transcript_alignment import align_transcripts
+from .gpa import get_gpa_engine, gpa_recompute_enabled
+from .course_classifier import get_course_classifier, course_classifier_enabled
+from .transcript_tables import (
+    extract_course_tables, table_extraction_enabled, annotation_content, assemble_table_result
+)
+from .schemas import (
+    APPLICATION_RESPONSE_SCHEMA, TRANSCRIPT_RESPONSE_SCHEMA, TABLE_ANNOTATION_SCHEMA,
+    structured_output_enabled, with_response_schema, without_response_schema, prune_schema
+)
+
+# Signature of progress callbacks: callback(stage, **details)
+ProgressCallback = Callable[..., None]
+
+
+def _report_progress(progress_callback: Optional[ProgressCallback], stage: str, **details) -> None:
+    """Report a processing stage to the caller without letting callback errors break processing"""
+    if progress_callback is None:
+        return
+    try:
+        progress_callback(stage, **details)
+    except Exception as e:
+        print(f"Progress callback failed at stage {stage}: {e}")
+
+
+def _generate_text(client, model: str, contents: list, generation_config: Dict[str, Any],
+                   progress_callback: Optional[ProgressCallback] = None,
+                   stream_tokens: bool = False,
+                   cancel_event: Optional[threading.Event] = None) -> str:
+    """Call the model and return its text, streaming chunks to the progress callback if requested
+
+    The call first takes its share of the shared request/token quota (see
+    rate_limit.py), waiting up to GENAI_MAX_WAIT seconds for it. A call with
+    a cancel_event is streamed so it can stop reading as soon as the event is set.
+
+    Raises:
+        RateLimitExceeded: If the quota would not allow the call in time
+        RequestCancelled: If cancel_event was set before the answer was complete
+    """
+    limiter = get_rate_limiter()
+    estimated_tokens = estimate_tokens(contents)
+    if limiter is not None:
+        waited = limiter.acquire(estimated_tokens, max_wait=get_max_wait())
+        if waited > 0:
+            print(f"Waited {waited:.1f}s for GenAI rate limit")
+            _report_progress(progress_callback, 'rate_limited', model=model, waited=round(waited, 2))
+
+    if cancel_event is not None and cancel_event.is_set():
+        raise RequestCancelled(model)
+
+    usage = None
+    emit_tokens = stream_tokens and progress_callback is not None
+    if emit_tokens or cancel_event is not None:
+        parts = []
+        stream = client.models.generate_content_stream(
+            model=model,
+            contents=contents,
+            config=generation_config
+        )
+        for chunk in stream:
+            if cancel_event is not None and cancel_event.is_set():
+                # Closing the stream drops the connection, so the model stops generating
+                close = getattr(stream, 'close', None)
+                if callable(close):
+                    close()
+                print(f"Cancelled hedged request to {model}")
+                raise RequestCancelled(model)
+            text = getattr(chunk, 'text', None)
+            if text:
+                parts.append(text)
+                if emit_tokens:
+                    _report_progress(progress_callback, 'llm_token', text=text)
+            usage = getattr(chunk, 'usage_metadata', None) or usage
+        result_text = "".join(parts).strip()
+    else:
+        response = client.models.generate_content(
+            model=model,
+            contents=contents,
+            config=generation_config
+        )
+        usage = getattr(response, 'usage_metadata', None)
+        result_text = response.text.strip()
+
+    # Replace the estimate with the real prompt size once the API reports it
+    actual_tokens = getattr(usage, 'prompt_token_count', None)
+    if limiter is not None and isinstance(actual_tokens, int):
+        limiter.reconcile(estimated_tokens, actual_tokens)
+
+    _report_progress(progress_callback, 'llm_completed', model=model, chars=len(result_text))
+    return result_text
+
+
+CONTINUATION_PROMPT = """
+Your previous answer was cut off before the JSON was complete. It ended with:
+
+{tail}
+
+Continue the JSON exactly where it stopped. Do not repeat anything already written,
+do not restart the object and do not add explanations or markdown fences.
+"""
+
+
+def _parse_json_response(client, model: str, contents: list, generation_config: Dict[str, Any],
+                         result_text: str, progress_callback: Optional[ProgressCallback] = None,
+                         stream_tokens: bool = False) -> Tuple[Dict[str, Any], str, bool]:
+    """Parse the JSON in a model response, asking the model to continue a truncated answer
+
+    Returns:
+        (parsed_result, full_response_text, truncated). If the answer is still
+        cut off after JSON_CONTINUATION_ATTEMPTS continuations, the parsed
+        result holds everything up to the last complete value.
+
+    Raises:
+        json.JSONDecodeError: If the response contains no JSON object
+    """
+    parsed, truncated = extract_json(result_text)
+    max_attempts = int(os.environ.get('JSON_CONTINUATION_ATTEMPTS', 1))
+
+    attempt = 0
+    while truncated and client is not None and attempt < max_attempts:
+        attempt += 1
+        print(f"Response from {model} was truncated, requesting continuation {attempt}/{max_attempts}")
+        _report_progress(progress_callback, 'llm_continuation', model=model, attempt=attempt)
+        try:
+            # A schema would make the model start a fresh object instead of continuing
+            continuation = _generate_text(
+                client, model, contents + [CONTINUATION_PROMPT.format(tail=result_text[-2000:])],
+                without_response_schema(generation_config), progress_callback, stream_tokens
+            )
+        except Exception as e:
+            print(f"Continuation request failed: {e}")
+            break
+
+        combined = result_text + strip_leading_fence(continuation)
+        try:
+            parsed, truncated = extract_json(combined)
+        except json.JSONDecodeError as e:
+            print(f"Continuation did not produce valid JSON: {e}")
+            break
+        result_text = combined
+
+    if truncated:
+        print(f"Using repaired JSON from truncated {model} response")
+    return parsed, result_text, truncated
+
+
+# Appended to the analysis prompt for the fields the extraction rules already resolved
+RULE_FIELDS_PROMPT_NOTE = """
+
+以下字段已由系统从文件中准确识别，无需提取，返回时设为null即可：{fields}"""
+
+# Prompt for course rows already read from PDF tables: the model only
+# classifies courses and names semesters instead of writing every row
+TABLE_ANNOTATION_PROMPT = """你是一个专业的成绩单认证专家。以下成绩单的课程已从表格中读取，你只需要补充表格无法给出的信息：
+
+1. student_info：根据学生信息部分提取学生信息
+2. semesters：为每个学期编号（s1、s2……）给出中英文学期名、学期类型（fall/spring/summer/winter/custom）、学年和起止日期
+3. courses：为列出的每门课程编号给出课程类型，取值为 core、major、elective、general、required、optional、practical、thesis、internship、language 之一
+4. 标注"缺英文名"或"缺中文名"的课程：从"未能对应的另一语言课程"中选出对应课程的名称填入 name_en 或 name_zh，找不到时给出准确翻译
+5. academic_summary：学业状态和认证备注
+
+不要重复课程名称、学分或成绩。按以下JSON格式返回，无法确定的字段设为null：
+
+{"student_info": {"name_zh": null, "name_en": null, "student_id": null, "university": null, "major": null, "degree_level": null, "graduation_date": null, "overall_gpa": null, "gpa_scale": null},
+ "semesters": [{"id": "s1", "name_zh": null, "name_en": null, "type": null, "academic_year": null, "start_date": null, "end_date": null}],
+ "courses": [{"id": "s1c1", "course_type": null, "name_zh": null, "name_en": null}],
+ "academic_summary": {"academic_standing": null, "verification_notes": null}}"""
+
+# With local course classification the prompts stop asking for course types
+COURSE_TYPE_PROMPT_PARTS = [
+    (re.compile(r'\n\s*"course_type": \{.*?\},', re.S), ''),
+    (re.compile(r'"course_type": null, '), ''),
+    (re.compile(r'2\. 课程类型判断：.*?(?=\n3\. )', re.S), '2. 课程类型：由系统根据课程名称判断，无需提取'),
+    (re.compile(r'3\. courses：为列出的每门课程编号给出课程类型[^\n]*'), '3. courses：课程类型由系统判断，无需给出'),
+]
+
+
+def _without_course_types(prompt: str) -> str:
+    """Prompt variant that no longer requests course_type"""
+    for pattern, replacement in COURSE_TYPE_PROMPT_PARTS:
+        prompt = pattern.sub(replacement, prompt)
+    return prompt
+
+
+# Appended to the transcript prompt when a long transcript is extracted in semester chunks
+CHUNK_PROMPT_NOTE = """
+
+注意：以下内容只是成绩单的第{index}/{total}部分，开头附有成绩单的学生信息。
+只提取这一部分中出现的学期和课程，不要推测或补充其他学期；academic_summary中的总学分和总课程数可设为null。"""
 
-# Try to import Google GenAI with different possible import paths
-try:
-    import google.genai as genai
-    GENAI_AVAILABLE = True
-except ImportError:
+
+def _is_complete_json(result_text: str) -> bool:
+    """Whether a response holds a JSON object that was not cut off"""
+    try:
+        _, truncated = extract_json(result_text)
+    except json.JSONDecodeError:
+        return False
+    return not truncated
+
+
+def _request_model_json(client, router: ModelRouter, prompt: str, content: str,
+                        generation_config: Dict[str, Any],
+                        progress_callback: Optional[ProgressCallback] = None,
+                        use_cache: bool = True, stream_tokens: bool = False,
+                        hedge_budget: Optional[HedgeBudget] = None) -> Dict[str, Any]:
+    """Run one JSON request through the response cache and the router's model chain
+
+    With a hedge_budget the request is hedged (see ModelRouter.run_hedged):
+    the first complete JSON answer wins. Hedged calls do not stream tokens
+    to the progress callback, since two answers may be arriving at once.
+
+    Returns:
+        Dict with 'result' (parsed JSON, or None if it could not be parsed),
+        'error', 'result_text', 'model' (the model that answered), 'cache_hit'
+        and 'truncated'
+
+    Raises:
+        Exception: The last model's error if every model in the chain failed
+    """
+    # An answer cached from any model in the chain is reused before calling the models
+    cache = get_llm_cache()
+    cache_keys = {
+        model_name: LLMResponseCache.make_key(prompt, content, model_name, generation_config)
+        for model_name in router.models
+    }
+    result_text = None
+    served_model = None
+    # Bypassing skips the lookup only; the fresh answer still refreshes the cache
+    if cache is not None and use_cache:
+        for model_name in router.models:
+            result_text = cache.get(cache_keys[model_name])
+            if result_text is not None:
+                served_model = model_name
+                break
+    cache_hit = result_text is not None
+
+    if cache_hit:
+        print(f"Using cached GenAI response from {served_model}")
+    else:
+        def on_attempt(model_name):
+            print(f"Trying model: {model_name}")
+            _report_progress(progress_callback, 'llm_started', model=model_name)
+
+        if hedge_budget is not None:
+            def on_hedge(slow_model, hedge_model, waited):
+                _report_progress(progress_callback, 'llm_hedged', model=slow_model,
+                                 hedge_model=hedge_model, waited=round(waited, 2))
+
+            result_text, served_model = router.run_hedged(
+                lambda model_name, cancel_event: _generate_text(
+                    client, model_name, [prompt, content], generation_config,
+                    progress_callback, cancel_event=cancel_event
+                ),
+                hedge_budget, _is_complete_json, on_attempt, on_hedge
+            )
+        else:
+            # Models are tried in order of recent health; open circuits are skipped
+            result_text, served_model = router.run(
+                lambda model_name: _generate_text(
+                    client, model_name, [prompt, content], generation_config,
+                    progress_callback, stream_tokens
+                ),
+                on_attempt
+            )
+        print(f"Successfully used model: {served_model}")
+
+    outcome = {
+        'result': None,
+        'error': None,
+        'result_text': result_text,
+        'model': served_model,
+        'cache_hit': cache_hit,
+        'truncated': False
+    }
+
+    # Extract JSON from the response, continuing or repairing a truncated answer
     try:
-        import genai
-        GENAI_AVAILABLE = True
-    except ImportError:
-        GENAI_AVAILABLE = False
-        print("Warning: google-genai library not available. Please install with: pip install google-genai")
+        result, result_text, truncated = _parse_json_response(
+            client, served_model, [prompt, content], generation_config,
+            result_text, progress_callback, stream_tokens
+        )
+    except json.JSONDecodeError as e:
+        outcome['error'] = str(e)
+        return outcome
 
-from .utils import extract_text_from_file
+    # Only complete answers are worth replaying
+    if cache is not None and not cache_hit and not truncated:
+        cache.set(cache_keys[served_model], served_model, result_text)
+
+    outcome.update(result=result, result_text=result_text, truncated=truncated)
+    return outcome
 
 
 class StudentApplicationService:
@@ -37,8 +334,11 @@ class StudentApplicationService:
         if not api_key:
             raise ValueError("GOOGLE_GENAI_API_KEY environment variable is required")
 
-        # Configure the client
-        self.client = genai.Client(api_key=api_key)
+        # Share the process-wide client and its connection pool
+        self.client = get_genai_client()
+
+        # Model chain, ordered by recent health on every request (ANALYSIS_MODELS or GENAI_MODELS)
+        self.router = ModelRouter(configured_models('ANALYSIS_MODELS'))
 
         # Define the analysis prompt based on the template structure
         self.analysis_prompt = """你是一个专业的留学申请信息提取专家。请分析以下学生申请文件内容，提取关键信息并按照指定格式组织。
@@ -118,6 +418,18 @@ class StudentApplicationService:
 
 如果某些信息无法从文件中找到，请将对应字段设为null。请确保提取的信息尽可能准确完整。"""
 
+        # Instructions only, for structured output mode where the response schema
+        # (schemas.APPLICATION_RESPONSE_SCHEMA) replaces the JSON skeleton above
+        self.analysis_instructions = """你是一个专业的留学申请信息提取专家。请分析以下学生申请文件内容，提取关键信息，按照给定的响应结构返回JSON。
+
+你需要分析的文件类型包括：
+1. 成绩单 (Transcript) - 包含课程成绩、GPA等信息
+2. 学位证书 (Degree Certificate) - 包含学位、专业、毕业时间等信息
+3. 个人简历 (Resume) - 包含教育背景、工作经历、技能等信息
+4. 雅思成绩单 (IELTS Score) - 包含语言考试成绩信息
+
+日期使用YYYY-MM-DD格式。如果某些信息无法从文件中找到，请将对应字段设为null。请确保提取的信息尽可能准确完整。"""
+
         self.summary_prompt = """根据分析结果，生成一个结构化的申请信息总结，使用以下模板格式：
 
 # 申请信息梳理模板
@@ -164,21 +476,42 @@ class StudentApplicationService:
 
 请用实际提取的信息填充模板中的占位符。如果某个信息缺失，请使用"信息缺失"或"未提供"标注。"""
 
-    def _extract_document_texts(self, files: Dict[str, Any]) -> Dict[str, str]:
-        """Extract text content from uploaded files"""
+    def _extract_document_texts(self, files: Dict[str, Any],
+                                progress_callback: Optional[ProgressCallback] = None,
+                                file_types: Optional[Dict[str, Optional[str]]] = None) -> Dict[str, str]:
+        """Extract text content from uploaded files
+
+        file_types, when given, is filled with file_key -> detected file type.
+        """
+        if file_types is None:
+            file_types = {}
+        if get_extraction_workers() > 1 and len(files) > 1:
+            # Fan out across the extraction process pool
+            def on_result(file_key, text, file_type):
+                file_types[file_key] = file_type
+                print(f"Extracted {len(text)} characters from {file_key} ({file_type or 'unknown type'})")
+                _report_progress(progress_callback, 'file_extracted',
+                                 file_key=file_key, chars=len(text), file_type=file_type)
+
+            return extract_texts_in_parallel(files, on_result=on_result)
+
         document_texts = {}
 
         for file_key, file_info in files.items():
             filepath = file_info['filepath']
             content_type = file_info.get('content_type')
 
+            file_type = None
             try:
-                text = extract_text_from_file(filepath, content_type)
+                text, file_type = extract_document(filepath, content_type, lang_for_file_key(file_key))
                 document_texts[file_key] = text
-                print(f"Extracted {len(text)} characters from {file_key}")
+                print(f"Extracted {len(text)} characters from {file_key} ({file_type or 'unknown type'})")
             except Exception as e:
                 print(f"Failed to extract text from {file_key}: {e}")
                 document_texts[file_key] = ""
+            file_types[file_key] = file_type
+            _report_progress(progress_callback, 'file_extracted',
+                             file_key=file_key, chars=len(document_texts[file_key]), file_type=file_type)
 
         return document_texts
 
@@ -200,8 +533,18 @@ class StudentApplicationService:
 
         return "\n".join(content_parts)
 
-    def analyze_documents(self, files: Dict[str, Any]) -> Dict[str, Any]:
-        """Analyze uploaded documents using Google GenAI"""
+    def analyze_documents(self, files: Dict[str, Any],
+                          progress_callback: Optional[ProgressCallback] = None,
+                          use_cache: bool = True,
+                          stream_tokens: bool = False) -> Dict[str, Any]:
+        """Analyze uploaded documents using Google GenAI
+
+        Args:
+            files: Uploaded files keyed by document type
+            progress_callback: Optional callback(stage, **details) invoked as each stage finishes
+            use_cache: Whether a cached response for identical input may be returned
+            stream_tokens: Stream the model output and report each chunk as an 'llm_token' stage
+        """
         try:
             # Check if GenAI is available
             if not GENAI_AVAILABLE:
@@ -209,50 +552,113 @@ class StudentApplicationService:
                     "error": "Google GenAI library not available",
                     "message": "Please install google-genai library and set GOOGLE_GENAI_API_KEY environment variable"
                 }
-            # Step 1: Extract text from all documents
+            # Step 1: Read photos and scans of fixed-layout documents from their template regions
+            template_reads = {}
+            if ocr_templates_enabled():
+                for file_key, file_info in files.items():
+                    read = read_template_fields(file_info['filepath'], file_key)
+                    if read is not None:
+                        template_reads[file_key] = read
+                        print(f"Read {file_key} with the {read['template']} template")
+                        _report_progress(progress_callback, 'template_read', file_key=file_key,
+                                         template=read['template'], fields=sorted(read['fields']))
+            template_documents = {file_key: read['template'] for file_key, read in template_reads.items()}
+
+            # Step 2: Extract text from the other documents
+            remaining_files = {key: info for key, info in files.items() if key not in template_reads}
             print("Extracting text from documents...")
-            document_texts = self._extract_document_texts(files)
+            _report_progress(progress_callback, 'extraction_started', files=list(remaining_files.keys()))
+            file_types = {}
+            document_texts = self._extract_document_texts(remaining_files, progress_callback, file_types)
+            # Documents whose optional template fields were not read stay in the model input as their region text
+            for file_key, read in template_reads.items():
+                if not read['complete']:
+                    document_texts[file_key] = read['text']
+            _report_progress(progress_callback, 'extraction_completed',
+                             chars={k: len(v) for k, v in document_texts.items()})
+
+            # Step 3: Resolve fields with a fixed written form locally
+            rule_fields = {}
+            if rule_extraction_enabled():
+                rule_fields = extract_rule_fields(document_texts)
+            # Template fields come from the document that defines them, so they win over other matches
+            for read in template_reads.values():
+                rule_fields.update(read['fields'])
+            if rule_extraction_enabled() or template_reads:
+                print(f"Extraction rules resolved {len(rule_fields)} fields")
+                _report_progress(progress_callback, 'rules_applied', fields=sorted(rule_fields))
+
+                # With every document fully read from templates there is nothing left for the model
+                if (template_reads and not remaining_files and
+                        all(read['complete'] for read in template_reads.values())) or \
+                        all(path in rule_fields for path in required_fields(document_texts)):
+                    print("All required fields resolved by extraction rules, skipping GenAI call")
+                    analysis_result = apply_rule_fields(empty_result(), rule_fields)
+                    analysis_result['metadata'] = {
+                        'model_used': None,
+                        'cache_hit': False,
+                        'rule_fields': sorted(rule_fields),
+                        'file_types': file_types,
+                        'llm_skipped': True
+                    }
+                    if template_documents:
+                        analysis_result['metadata']['template_documents'] = template_documents
+                    return analysis_result
 
-            # Step 2: Prepare content for analysis
+            # Step 4: Prepare content for analysis (documents fully read from templates are left out)
             print("Preparing content for GenAI analysis...")
             content = self._prepare_analysis_content(document_texts)
 
-            # Step 3: Call Google GenAI for analysis
+            # Step 5: Call Google GenAI for the unresolved fields (or reuse the cached answer)
+            generation_config = {
+                "temperature": 0.1,
+                "top_p": 0.8,
+                "top_k": 40,
+                "max_output_tokens": 4096,
+            }
+            if structured_output_enabled():
+                prompt = self.analysis_instructions
+                # Resolved fields are left out of the schema, so the model never writes them
+                schema = APPLICATION_RESPONSE_SCHEMA
+                if rule_fields:
+                    schema = prune_schema(schema, rule_fields) or schema
+                generation_config = with_response_schema(generation_config, schema)
+            else:
+                prompt = self.analysis_prompt
+                if rule_fields:
+                    prompt += RULE_FIELDS_PROMPT_NOTE.format(fields=', '.join(sorted(rule_fields)))
+
             print("Calling Google GenAI for analysis...")
-            response = self.client.models.generate_content(
-                model="gemini-pro",
-                contents=[self.analysis_prompt, content],
-                generation_config={
-                    "temperature": 0.1,
-                    "top_p": 0.8,
-                    "top_k": 40,
-                    "max_output_tokens": 4096,
-                }
+            outcome = _request_model_json(
+                self.client, self.router, prompt, content, generation_config,
+                progress_callback, use_cache, stream_tokens, new_hedge_budget()
             )
 
-            # Step 4: Parse the response
-            result_text = response.text.strip()
-
-            # Try to extract JSON from the response
-            try:
-                # Find JSON in the response (might be wrapped in markdown code blocks)
-                if '```json' in result_text:
-                    json_str = result_text.split('```json')[1].split('```')[0].strip()
-                elif '```' in result_text:
-                    json_str = result_text.split('```')[1].split('```')[0].strip()
-                else:
-                    json_str = result_text
-
-                analysis_result = json.loads(json_str)
-            except json.JSONDecodeError as e:
-                print(f"Failed to parse JSON response: {e}")
-                print(f"Response text: {result_text}")
+            # Step 6: Use the parsed response, with the rule-extracted values on top
+            analysis_result = outcome['result']
+            if analysis_result is None:
+                print(f"Failed to parse JSON response: {outcome['error']}")
+                print(f"Response text: {outcome['result_text']}")
                 # Fallback: return raw text
-                analysis_result = {
-                    "raw_response": result_text,
+                return {
+                    "raw_response": outcome['result_text'],
                     "error": "Failed to parse JSON response"
                 }
 
+            _report_progress(progress_callback, 'json_parsed', truncated=outcome['truncated'])
+            apply_rule_fields(analysis_result, rule_fields)
+            analysis_result['metadata'] = {
+                'model_used': outcome['model'],
+                'cache_hit': outcome['cache_hit'],
+                'file_types': file_types
+            }
+            if outcome['truncated']:
+                analysis_result['metadata']['truncated'] = True
+            if rule_fields:
+                analysis_result['metadata']['rule_fields'] = sorted(rule_fields)
+            if template_documents:
+                analysis_result['metadata']['template_documents'] = template_documents
+
             return analysis_result
 
         except Exception as e:
@@ -378,8 +784,11 @@ class TranscriptVerificationService:
         if not api_key:
             raise ValueError("GOOGLE_GENAI_API_KEY environment variable is required")
 
-        # Configure the client
-        self.client = genai.Client(api_key=api_key)
+        # Share the process-wide client and its connection pool
+        self.client = get_genai_client()
+
+        # Model chain, ordered by recent health on every request (TRANSCRIPT_MODELS or GENAI_MODELS)
+        self.router = ModelRouter(configured_models('TRANSCRIPT_MODELS'))
 
         # Define the transcript analysis prompt
         self.transcript_prompt = """你是一个专业的成绩单认证专家。请分析以下成绩单内容，提取关键学术信息并按照指定格式组织。
@@ -461,21 +870,71 @@ class TranscriptVerificationService:
 
 如果某些信息无法找到，请将对应字段设为null。请确保提取的信息尽可能准确完整。"""
 
-    def _extract_transcript_texts(self, files: Dict[str, Any], upload_type: str) -> Dict[str, str]:
-        """Extract text content from uploaded transcript files"""
+        # Instructions only, for structured output mode where the response schema
+        # (schemas.TRANSCRIPT_RESPONSE_SCHEMA) replaces the JSON skeleton above
+        self.transcript_instructions = """你是一个专业的成绩单认证专家。请分析以下成绩单内容，提取关键学术信息，按照给定的响应结构返回JSON。
+
+成绩单可能包含以下形式：
+1. 双语成绩单：同一文件中同时包含中文和英文内容
+2. 中文成绩单：仅包含中文内容
+3. 英文成绩单：仅包含英文内容
+4. 分开的成绩单：分别上传中文和英文成绩单
+
+提取规则：
+1. 学期划分：根据成绩单上的学期信息，将课程按学期分组
+2. 课程类型判断：根据课程名称、描述或学分判断课程类型
+   - 核心课程（core）：专业核心必修课
+   - 专业课程（major）：专业相关课程
+   - 选修课程（elective）：选修课
+   - 通识课程（general）：通识教育课
+   - 必修课程（required）：必修课
+   - 可选课程（optional）：可选课
+   - 实践课程（practical）：实验、实践课
+   - 论文课程（thesis）：毕业论文、设计
+   - 实习课程（internship）：实习
+   - 语言课程（language）：语言类课程
+3. 双语匹配：如果成绩单是双语或分开上传，请确保中英文课程名称正确匹配
+4. 学分计算：确保学分数值准确提取
+5. 成绩提取：如果成绩单包含成绩，请提取成绩信息
+
+如果某些信息无法找到，请将对应字段设为null。请确保提取的信息尽可能准确完整。"""
+
+    def _extract_transcript_texts(self, files: Dict[str, Any], upload_type: str,
+                                  progress_callback: Optional[ProgressCallback] = None,
+                                  file_types: Optional[Dict[str, Optional[str]]] = None) -> Dict[str, str]:
+        """Extract text content from uploaded transcript files
+
+        file_types, when given, is filled with file_key -> detected file type.
+        """
+        if file_types is None:
+            file_types = {}
+        if get_extraction_workers() > 1 and len(files) > 1:
+            # Fan out across the extraction process pool
+            def on_result(file_key, text, file_type):
+                file_types[file_key] = file_type
+                print(f"Extracted {len(text)} characters from {file_key} ({file_type or 'unknown type'})")
+                _report_progress(progress_callback, 'file_extracted',
+                                 file_key=file_key, chars=len(text), file_type=file_type)
+
+            return extract_texts_in_parallel(files, on_result=on_result)
+
         transcript_texts = {}
 
         for file_key, file_info in files.items():
             filepath = file_info['filepath']
             content_type = file_info.get('content_type')
 
+            file_type = None
             try:
-                text = extract_text_from_file(filepath, content_type)
+                text, file_type = extract_document(filepath, content_type, lang_for_file_key(file_key))
                 transcript_texts[file_key] = text
-                print(f"Extracted {len(text)} characters from {file_key}")
+                print(f"Extracted {len(text)} characters from {file_key} ({file_type or 'unknown type'})")
             except Exception as e:
                 print(f"Failed to extract text from {file_key}: {e}")
                 transcript_texts[file_key] = ""
+            file_types[file_key] = file_type
+            _report_progress(progress_callback, 'file_extracted',
+                             file_key=file_key, chars=len(transcript_texts[file_key]), file_type=file_type)
 
         return transcript_texts
 
@@ -496,8 +955,19 @@ class TranscriptVerificationService:
 
         return "\n".join(content_parts)
 
-    def verify_transcript(self, files: Dict[str, Any], upload_type: str) -> Dict[str, Any]:
-        """Verify transcript using Google GenAI"""
+    def verify_transcript(self, files: Dict[str, Any], upload_type: str,
+                          progress_callback: Optional[ProgressCallback] = None,
+                          use_cache: bool = True,
+                          stream_tokens: bool = False) -> Dict[str, Any]:
+        """Verify transcript using Google GenAI
+
+        Args:
+            files: Uploaded transcript files keyed by file key
+            upload_type: 'single' or 'separate'
+            progress_callback: Optional callback(stage, **details) invoked as each stage finishes
+            use_cache: Whether a cached response for identical input may be returned
+            stream_tokens: Stream the model output and report each chunk as an 'llm_token' stage
+        """
         try:
             # Check if GenAI is available
             if not GENAI_AVAILABLE:
@@ -508,78 +978,102 @@ class TranscriptVerificationService:
 
             # Step 1: Extract text from transcript documents
             print("Extracting text from transcript documents...")
-            transcript_texts = self._extract_transcript_texts(files, upload_type)
+            _report_progress(progress_callback, 'extraction_started', files=list(files.keys()))
+            file_types = {}
+            transcript_texts = self._extract_transcript_texts(files, upload_type, progress_callback, file_types)
+            _report_progress(progress_callback, 'extraction_completed',
+                             chars={k: len(v) for k, v in transcript_texts.items()})
 
             # Step 2: Prepare content for analysis
             print("Preparing content for GenAI analysis...")
             content = self._prepare_transcript_content(transcript_texts, upload_type)
 
             # Step 3: Call Google GenAI for analysis
-            print("Calling Google GenAI for transcript verification...")
-
-            # Try primary model first, fallback to secondary
-            models_to_try = ["gemini-3-pro-preview", "gemini-2.5-pro"]
-            response = None
-
-            for model_name in models_to_try:
-                try:
-                    print(f"Trying model: {model_name}")
-                    response = self.client.models.generate_content(
-                        model=model_name,
-                        contents=[self.transcript_prompt, content],
-                        generation_config={
-                            "temperature": 0.1,
-                            "top_p": 0.8,
-                            "top_k": 40,
-                            "max_output_tokens": 8192,  # Increased for transcript data
-                        }
-                    )
-                    print(f"Successfully used model: {model_name}")
-                    break
-                except Exception as model_error:
-                    print(f"Model {model_name} failed: {model_error}")
-                    if model_name == models_to_try[-1]:  # Last model failed
-                        raise model_error
-                    continue
-
-            # Step 4: Parse the response
-            result_text = response.text.strip()
-
-            # Try to extract JSON from the response
-            try:
-                # Find JSON in the response (might be wrapped in markdown code blocks)
-                if '```json' in result_text:
-                    json_str = result_text.split('```json')[1].split('```')[0].strip()
-                elif '```' in result_text:
-                    json_str = result_text.split('```')[1].split('```')[0].strip()
-                else:
-                    json_str = result_text
-
-                verification_result = json.loads(json_str)
-
-                # Add metadata
-                verification_result['metadata'] = {
-                    'document_type': 'bilingual' if upload_type == 'single' else 'separate',
-                    'source_files': list(files.keys()),
-                    'verified_at': datetime.now().isoformat(),
-                    'model_used': 'gemini-3-pro-preview' if 'gemini-3-pro-preview' in models_to_try else 'gemini-2.5-pro',
-                    'processing_time': 0,  # Would be calculated in real implementation
-                    'status': 'completed'
-                }
-
-            except json.JSONDecodeError as e:
-                print(f"Failed to parse JSON response: {e}")
-                print(f"Response text: {result_text}")
+            generation_config = {
+                "temperature": 0.1,
+                "top_p": 0.8,
+                "top_k": 40,
+                "max_output_tokens": 8192,  # Increased for transcript data
+            }
+            classify_locally = course_classifier_enabled()
+            if structured_output_enabled():
+                prompt = self.transcript_instructions
+                schema = TRANSCRIPT_RESPONSE_SCHEMA
+                if classify_locally:
+                    schema = prune_schema(schema, {'semesters.courses.course_type'})
+                generation_config = with_response_schema(generation_config, schema)
+            else:
+                prompt = self.transcript_prompt
+            if classify_locally:
+                prompt = _without_course_types(prompt)
+
+            # One hedge budget covers every call this verification makes
+            hedge_budget = new_hedge_budget()
+
+            # Course rows read from PDF tables leave only types and semester names to the model
+            outcome = None
+            table = self._extract_table_courses(files, upload_type)
+            if table:
+                outcome = self._annotate_table_courses(
+                    table, transcript_texts, progress_callback, use_cache, hedge_budget
+                )
+
+            # Long transcripts are extracted semester group by semester group, concurrently
+            chunks = self._plan_chunks(transcript_texts) if outcome is None else None
+            if chunks:
+                outcome = self._request_transcript_chunks(
+                    prompt, chunks, upload_type, generation_config, progress_callback, use_cache,
+                    hedge_budget
+                )
+            if outcome is None:
+                outcome = _request_model_json(
+                    self.client, self.router, prompt, content, generation_config,
+                    progress_callback, use_cache, stream_tokens, hedge_budget
+                )
+
+            # Step 4: Use the parsed response
+            verification_result = outcome['result']
+            if verification_result is None:
+                print(f"Failed to parse JSON response: {outcome['error']}")
+                print(f"Response text: {outcome['result_text']}")
                 # Fallback: return raw text
-                verification_result = {
-                    "raw_response": result_text,
+                return {
+                    "raw_response": outcome['result_text'],
                     "error": "Failed to parse JSON response",
                     "metadata": {
                         'status': 'failed',
-                        'error': str(e)
+                        'error': outcome['error']
                     }
                 }
 
+            _report_progress(progress_callback, 'json_parsed', truncated=outcome['truncated'])
+
+            # Course types come from the local classifier, not the model
+            if classify_locally:
+                get_course_classifier().classify_result(verification_result)
+
+            # Credits and GPAs are recomputed from the courses; model numbers that disagree are flagged
+            gpa_recomputed = gpa_recompute_enabled() and isinstance(verification_result.get('semesters'), list)
+            if gpa_recomputed:
+                get_gpa_engine().recompute(verification_result)
+
+            # Add metadata
+            verification_result['metadata'] = {
+                'document_type': 'bilingual' if upload_type == 'single' else 'separate',
+                'source_files': list(files.keys()),
+                'file_types': file_types,
+                'verified_at': datetime.now().isoformat(),
+                'model_used': outcome['model'],
+                'processing_time': 0,  # Would be calculated in real implementation
+                'cache_hit': outcome['cache_hit'],
+                'truncated': outcome['truncated'],
+                'chunks': outcome.get('chunks', 1),
+                'course_source': outcome.get('course_source', 'model'),
+                'course_types': 'classifier' if classify_locally else 'model',
+                'gpa_recomputed': gpa_recomputed,
+                'status': 'completed'
+            }
+
             return verification_result
 
         except Exception as e:
@@ -592,6 +1086,159 @@ class TranscriptVerificationService:
                 }
             }
 
+    def _extract_table_courses(self, files: Dict[str, Any], upload_type: str) -> Optional[Dict[str, Any]]:
+        """Course rows read from text-layer transcript PDF tables, or None to let the model read them
+
+        Separate zh/en uploads have their rows paired locally (see
+        transcript_alignment.py); English rows left unpaired are returned as
+        leftovers for the model.
+
+        Returns:
+            {'semesters': [...], 'leftovers': list for separate uploads, else None}
+        """
+        if not table_extraction_enabled():
+            return None
+
+        if upload_type == 'single' and len(files) == 1:
+            filepath = next(iter(files.values())).get('filepath')
+            semesters = extract_course_tables(filepath) if filepath else None
+            if not semesters:
+                return None
+            print(f"Read {sum(len(s['courses']) for s in semesters)} courses "
+                  f"in {len(semesters)} semesters from PDF tables")
+            return {'semesters': semesters, 'leftovers': None}
+
+        if upload_type == 'separate' and {'transcript_zh', 'transcript_en'} <= set(files):
+            filepaths = [files[key].get('filepath') for key in ('transcript_zh', 'transcript_en')]
+            if not all(filepaths):
+                return None
+            zh_semesters, en_semesters = (extract_course_tables(filepath) for filepath in filepaths)
+            if not zh_semesters or not en_semesters:
+                return None
+            aligned = align_transcripts(zh_semesters, en_semesters)
+            if aligned is None:
+                return None
+            print(f"Paired {aligned['matched']} courses across the zh/en transcripts, "
+                  f"{len(aligned['leftovers'])} English rows left over")
+            return {'semesters': aligned['semesters'], 'leftovers': aligned['leftovers']}
+
+        return None
+
+    def _annotate_table_courses(self, table: Dict[str, Any], transcript_texts: Dict[str, str],
+                                progress_callback: Optional[ProgressCallback] = None,
+                                use_cache: bool = True,
+                                hedge_budget: Optional[HedgeBudget] = None) -> Optional[Dict[str, Any]]:
+        """Ask the model for semester names, student details and (unless classified locally) course types of table rows
+
+        Returns:
+            The outcome with the assembled verification result, or None if the
+            annotation failed so the caller can fall back to a full extraction
+        """
+        semesters = table['semesters']
+        _report_progress(progress_callback, 'tables_extracted', semesters=len(semesters),
+                         courses=sum(len(semester['courses']) for semester in semesters))
+        header = '\n'.join(split_semesters(text)[0][:3000] for text in transcript_texts.values() if text)
+
+        generation_config = {
+            "temperature": 0.1,
+            "top_p": 0.8,
+            "top_k": 40,
+            "max_output_tokens": 4096,
+        }
+        classify_locally = course_classifier_enabled()
+        prompt = _without_course_types(TABLE_ANNOTATION_PROMPT) if classify_locally else TABLE_ANNOTATION_PROMPT
+        if structured_output_enabled():
+            schema = TABLE_ANNOTATION_SCHEMA
+            if classify_locally:
+                schema = prune_schema(schema, {'courses.course_type'})
+            generation_config = with_response_schema(generation_config, schema)
+
+        try:
+            outcome = _request_model_json(
+                self.client, self.router, prompt,
+                annotation_content(header, semesters, table['leftovers'], need_types=not classify_locally),
+                generation_config,
+                progress_callback, use_cache, hedge_budget=hedge_budget
+            )
+        except Exception as e:
+            print(f"Annotating table courses failed: {e}")
+            return None
+        if outcome['result'] is None:
+            print(f"Table annotation returned no JSON: {outcome['error']}")
+            return None
+
+        outcome['result'] = assemble_table_result(semesters, outcome['result'])
+        outcome['course_source'] = 'tables'
+        return outcome
+
+    def _plan_chunks(self, transcript_texts: Dict[str, str]) -> Optional[list]:
+        """Semester chunks for a transcript long enough to be worth splitting, else None
+
+        Controlled by TRANSCRIPT_CHUNKING (default false: each chunk is its own model
+        call against the rate limit), TRANSCRIPT_CHUNK_MIN_CHARS (default 6000) and
+        TRANSCRIPT_CHUNK_MAX (default 6 concurrent calls).
+        """
+        if os.environ.get('TRANSCRIPT_CHUNKING', 'false').lower() not in ('1', 'true', 'yes'):
+            return None
+        if sum(len(text) for text in transcript_texts.values()) < int(os.environ.get('TRANSCRIPT_CHUNK_MIN_CHARS', 6000)):
+            return None
+        return plan_transcript_chunks(transcript_texts, max_chunks=int(os.environ.get('TRANSCRIPT_CHUNK_MAX', 6)))
+
+    def _request_transcript_chunks(self, prompt: str, chunks: list, upload_type: str,
+                                   generation_config: Dict[str, Any],
+                                   progress_callback: Optional[ProgressCallback] = None,
+                                   use_cache: bool = True,
+                                   hedge_budget: Optional[HedgeBudget] = None) -> Optional[Dict[str, Any]]:
+        """Extract each semester chunk with a concurrent request and merge the results
+
+        Returns:
+            The merged outcome, or None if any chunk failed so the caller can
+            fall back to a single request for the whole transcript
+        """
+        total = len(chunks)
+        print(f"Verifying transcript in {total} semester chunks...")
+        _report_progress(progress_callback, 'chunks_planned', chunks=total)
+
+        def run_chunk(index: int, chunk_texts: Dict[str, str]) -> Optional[Dict[str, Any]]:
+            def chunk_progress(stage, **details):
+                _report_progress(progress_callback, stage, chunk=index, **details)
+
+            try:
+                outcome = _request_model_json(
+                    self.client, self.router,
+                    prompt + CHUNK_PROMPT_NOTE.format(index=index + 1, total=total),
+                    self._prepare_transcript_content(chunk_texts, upload_type),
+                    generation_config, chunk_progress, use_cache, hedge_budget=hedge_budget
+                )
+            except Exception as e:
+                print(f"Transcript chunk {index + 1}/{total} failed: {e}")
+                return None
+
+            if outcome['result'] is None:
+                print(f"Transcript chunk {index + 1}/{total} returned no JSON: {outcome['error']}")
+                return None
+            _report_progress(progress_callback, 'chunk_completed', chunk=index,
+                             semesters=len(outcome['result'].get('semesters') or []))
+            return outcome
+
+        with ThreadPoolExecutor(max_workers=total, thread_name_prefix='comes-chunk') as executor:
+            outcomes = list(executor.map(run_chunk, range(total), chunks))
+
+        if any(outcome is None for outcome in outcomes):
+            print("Falling back to a single request for the whole transcript")
+            return None
+
+        return {
+            'result': merge_chunk_results([outcome['result'] for outcome in outcomes]),
+            'error': None,
+            'result_text': None,
+            # Chunks may be answered by different models of the chain
+            'model': ', '.join(dict.fromkeys(outcome['model'] for outcome in outcomes)),
+            'cache_hit': all(outcome['cache_hit'] for outcome in outcomes),
+            'truncated': any(outcome['truncated'] for outcome in outcomes),
+            'chunks': total
+        }
+
     def generate_structured_transcript(self, verification_result: Dict[str, Any]) -> str:
         """Generate structured transcript summary based on verification result"""
         try:
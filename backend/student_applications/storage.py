@@ -0,0 +1,163 @@
+"""
+Storage backends for application and verification records
+
+Records are plain JSON-serializable dicts grouped into named collections.
+The SQLite backend is shared by every worker process on the host, so a
+record saved by one gunicorn worker can be read by any other one.
+"""
+
+import os
+import json
+import sqlite3
+import threading
+from datetime import datetime
+from typing import Dict, Any, Optional, List
+
+DEFAULT_DATABASE_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'instance', 'comes.db'
+)
+
+
+class InMemoryStorage:
+    """Per-process dict storage, used for tests and single-process development"""
+
+    def __init__(self):
+        self._collections: Dict[str, Dict[str, str]] = {}
+        self._lock = threading.Lock()
+
+    def save(self, collection: str, record_id: str, record: Dict[str, Any]) -> None:
+        """Insert or replace a record"""
+        # Store serialized copies so callers never share state with the store,
+        # matching what the SQLite backend returns
+        data = json.dumps(record, ensure_ascii=False)
+        with self._lock:
+            self._collections.setdefault(collection, {})[record_id] = data
+
+    def get(self, collection: str, record_id: str) -> Optional[Dict[str, Any]]:
+        """Get a record by ID"""
+        with self._lock:
+            data = self._collections.get(collection, {}).get(record_id)
+        return json.loads(data) if data is not None else None
+
+    def get_all(self, collection: str) -> List[Dict[str, Any]]:
+        """Get all records of a collection in insertion order"""
+        with self._lock:
+            rows = list(self._collections.get(collection, {}).values())
+        return [json.loads(data) for data in rows]
+
+    def delete_all(self, collection: str) -> None:
+        """Remove every record of a collection"""
+        with self._lock:
+            self._collections.pop(collection, None)
+
+
+class SQLiteStorage:
+    """SQLite storage in WAL mode, safe to share across worker processes"""
+
+    def __init__(self, path: str = DEFAULT_DATABASE_PATH, timeout: float = 30.0):
+        self.path = path
+        self.timeout = timeout
+        self._local = threading.local()
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+
+        self._connect().execute(
+            """
+            CREATE TABLE IF NOT EXISTS records (
+                collection TEXT NOT NULL,
+                id TEXT NOT NULL,
+                data TEXT NOT NULL,
+                updated_at TEXT NOT NULL,
+                PRIMARY KEY (collection, id)
+            )
+            """
+        )
+
+    def _connect(self) -> sqlite3.Connection:
+        """Get the connection for the current thread, reopening after a fork"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None and getattr(self._local, 'pid', None) == os.getpid():
+            return conn
+
+        conn = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.execute(f'PRAGMA busy_timeout={int(self.timeout * 1000)}')
+        self._local.conn = conn
+        self._local.pid = os.getpid()
+        return conn
+
+    def save(self, collection: str, record_id: str, record: Dict[str, Any]) -> None:
+        """Insert or replace a record, keeping its original insertion order"""
+        self._connect().execute(
+            """
+            INSERT INTO records (collection, id, data, updated_at)
+            VALUES (?, ?, ?, ?)
+            ON CONFLICT (collection, id) DO UPDATE SET
+                data = excluded.data,
+                updated_at = excluded.updated_at
+            """,
+            (collection, record_id, json.dumps(record, ensure_ascii=False), datetime.now().isoformat())
+        )
+
+    def get(self, collection: str, record_id: str) -> Optional[Dict[str, Any]]:
+        """Get a record by ID"""
+        row = self._connect().execute(
+            'SELECT data FROM records WHERE collection = ? AND id = ?',
+            (collection, record_id)
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def get_all(self, collection: str) -> List[Dict[str, Any]]:
+        """Get all records of a collection in insertion order"""
+        rows = self._connect().execute(
+            'SELECT data FROM records WHERE collection = ? ORDER BY rowid',
+            (collection,)
+        ).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def delete_all(self, collection: str) -> None:
+        """Remove every record of a collection"""
+        self._connect().execute('DELETE FROM records WHERE collection = ?', (collection,))
+
+
+_storage = None
+_storage_lock = threading.Lock()
+
+
+def create_storage(backend: Optional[str] = None, path: Optional[str] = None):
+    """Create a storage backend from arguments or environment variables
+
+    Args:
+        backend: 'sqlite' (default) or 'memory'; falls back to STORAGE_BACKEND
+        path: SQLite database path; falls back to DATABASE_PATH
+
+    Returns:
+        A storage backend instance
+    """
+    backend = (backend or os.environ.get('STORAGE_BACKEND', 'sqlite')).lower()
+
+    if backend == 'memory':
+        return InMemoryStorage()
+    if backend == 'sqlite':
+        return SQLiteStorage(path or os.environ.get('DATABASE_PATH', DEFAULT_DATABASE_PATH))
+
+    raise ValueError(f"Unsupported storage backend: {backend}")
+
+
+def get_storage():
+    """Get the process-wide storage backend, creating it on first use"""
+    global _storage
+    if _storage is None:
+        with _storage_lock:
+            if _storage is None:
+                _storage = create_storage()
+    return _storage
+
+
+def set_storage(storage) -> None:
+    """Replace the process-wide storage backend (None resets to the configured default)"""
+    global _storage
+    with _storage_lock:
+        _storage = storage
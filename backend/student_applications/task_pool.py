@@ -0,0 +1,166 @@
+"""
+Process pools that time tasks from when they start running
+
+A ProcessPoolExecutor only tells the submitting process when a task has
+finished, so a timeout counted from submission also counts the time the
+task spent queued behind other requests' work, and a busy pool makes
+healthy tasks time out. Workers of a TaskPool put (task id, pid, start
+time) on a shared queue as they begin each task; the submitting process
+times every task from that report. A running task cannot be cancelled, so
+one that runs past its timeout has its worker process killed and the pool
+is replaced (see kill()).
+"""
+
+import os
+import time
+import signal
+import itertools
+import threading
+import multiprocessing
+import queue as queue_module
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple
+
+# Seconds between checks for newly started tasks while waiting for results
+START_POLL_INTERVAL = 0.2
+
+# Queue of the current worker process for start reports (set by its initializer)
+_worker_queue = None
+
+
+def _init_worker(started_queue, initializer: Optional[Callable], initargs: Tuple) -> None:
+    global _worker_queue
+    _worker_queue = started_queue
+    if initializer is not None:
+        initializer(*initargs)
+
+
+def _run_task(task_id: int, fn: Callable, *args) -> Any:
+    if _worker_queue is not None:
+        _worker_queue.put((task_id, os.getpid(), time.time()))
+    return fn(*args)
+
+
+class TaskPool:
+    """A process pool that knows when each of its tasks started and on which worker"""
+
+    def __init__(self, max_workers: int = 1, initializer: Optional[Callable] = None,
+                 initargs: Tuple = (), executor: Optional[Executor] = None):
+        """
+        Args:
+            max_workers: Number of worker processes
+            initializer: Called with initargs in every worker process when it starts
+            executor: Run tasks on this executor instead (threads in tests; tasks report their start directly)
+        """
+        self._lock = threading.Lock()
+        self._ids = itertools.count()
+        self._pending = set()
+        self._started: Dict[int, Tuple[Optional[int], float]] = {}
+        if executor is not None:
+            self._queue = None
+            self._executor = executor
+        else:
+            # Workers are started from a clean server process rather than forked
+            # from this (multi-threaded) worker
+            methods = multiprocessing.get_all_start_methods()
+            context = multiprocessing.get_context('forkserver' if 'forkserver' in methods else 'spawn')
+            self._queue = context.Queue()
+            self._executor = ProcessPoolExecutor(
+                max_workers=max_workers, mp_context=context,
+                initializer=_init_worker, initargs=(self._queue, initializer, initargs)
+            )
+
+    def submit(self, fn: Callable, *args) -> Future:
+        """Run fn(*args) on a worker; fn and args must be picklable"""
+        task_id = next(self._ids)
+        with self._lock:
+            self._pending.add(task_id)
+        if self._queue is None:
+            future = self._executor.submit(self._run_local, task_id, fn, *args)
+        else:
+            future = self._executor.submit(_run_task, task_id, fn, *args)
+        future.task_id = task_id
+        future.add_done_callback(self._forget)
+        return future
+
+    def _run_local(self, task_id: int, fn: Callable, *args) -> Any:
+        with self._lock:
+            if task_id in self._pending:
+                self._started[task_id] = (None, time.time())
+        return fn(*args)
+
+    def _forget(self, future: Future) -> None:
+        with self._lock:
+            self._pending.discard(future.task_id)
+            self._started.pop(future.task_id, None)
+
+    def _drain(self) -> None:
+        """Record the start reports workers have sent so far"""
+        if self._queue is None:
+            return
+        while True:
+            try:
+                task_id, pid, started = self._queue.get_nowait()
+            except (queue_module.Empty, OSError, ValueError):
+                return
+            with self._lock:
+                # Reports of tasks that already finished are dropped
+                if task_id in self._pending:
+                    self._started[task_id] = (pid, started)
+
+    def started_at(self, future: Future) -> Optional[float]:
+        """Wall-clock time a task started running, None while it is queued"""
+        self._drain()
+        with self._lock:
+            entry = self._started.get(future.task_id)
+        return entry[1] if entry else None
+
+    def expired(self, future: Future, timeout: float) -> bool:
+        """Whether a task has been running for longer than timeout seconds"""
+        started = self.started_at(future)
+        return not future.done() and started is not None and time.time() - started >= timeout
+
+    def wait_interval(self, futures: Iterable[Future], timeout: float) -> float:
+        """Seconds to wait for results before checking futures for starts and expiry again"""
+        interval = None
+        for future in futures:
+            started = self.started_at(future)
+            remaining = START_POLL_INTERVAL if started is None else started + timeout - time.time()
+            interval = remaining if interval is None else min(interval, remaining)
+        return max(0.0, interval if interval is not None else 0.0)
+
+    def result(self, future: Future, timeout: float) -> Any:
+        """Result of a task, waiting at most timeout seconds from when it started
+
+        Raises:
+            concurrent.futures.TimeoutError: If the task ran for longer than timeout
+        """
+        while True:
+            started = self.started_at(future)
+            remaining = START_POLL_INTERVAL if started is None else started + timeout - time.time()
+            try:
+                return future.result(timeout=max(0.0, remaining))
+            except FutureTimeoutError:
+                if started is not None:
+                    raise
+
+    def kill(self, future: Future) -> None:
+        """Stop a task that ran past its timeout by killing its worker process
+
+        The executor then reports its other unfinished tasks as broken
+        (BrokenProcessPool) and accepts no more work, so the owner replaces
+        the pool and resubmits them.
+        """
+        future.cancel()
+        self._drain()
+        with self._lock:
+            entry = self._started.get(future.task_id)
+        if entry and entry[0] is not None:
+            try:
+                os.kill(entry[0], getattr(signal, 'SIGKILL', signal.SIGTERM))
+            except OSError:
+                pass
+
+    def shutdown(self) -> None:
+        """Stop accepting tasks and cancel queued ones, without waiting for running ones"""
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,151 @@
+"""
+Alignment of separately uploaded Chinese and English transcripts
+
+Both transcripts list the same courses in (almost) the same order, so
+their table rows are paired with a sequence alignment: a dynamic program
+over the two course lists that rewards agreeing course codes, credits
+and grades and never pairs rows whose code or credits contradict each
+other. The Chinese transcript gives the semester structure; each paired
+row adds its English name. Only rows left unpaired need the model.
+"""
+
+import re
+from collections import Counter
+from typing import Dict, Any, List, Optional, Tuple
+
+# Score of a pair with no agreeing detail beyond its position
+BASE_SCORE = 1.0
+CODE_SCORE = 10.0
+CREDITS_SCORE = 3.0
+GRADE_SCORE = 2.0
+GRADE_POINTS_SCORE = 1.0
+
+# Below this share of paired rows the two documents are not treated as the same transcript
+MIN_MATCH_RATIO = 0.6
+
+
+def _normalize_code(code: Optional[str]) -> Optional[str]:
+    return re.sub(r'[\s\-_.]', '', code).upper() if code else None
+
+
+def _normalize_grade(grade: Optional[str]) -> Optional[str]:
+    return re.sub(r'\s', '', grade).upper() if grade else None
+
+
+def pair_score(zh: Dict[str, Any], en: Dict[str, Any]) -> Optional[float]:
+    """How well two course rows agree, or None if they cannot be the same course"""
+    score = BASE_SCORE
+
+    zh_code, en_code = _normalize_code(zh.get('code')), _normalize_code(en.get('code'))
+    if zh_code and en_code:
+        if zh_code != en_code:
+            return None
+        score += CODE_SCORE
+
+    if zh.get('credits') is not None and en.get('credits') is not None:
+        if abs(zh['credits'] - en['credits']) > 1e-6:
+            return None
+        score += CREDITS_SCORE
+
+    zh_grade, en_grade = _normalize_grade(zh.get('grade')), _normalize_grade(en.get('grade'))
+    if zh_grade and en_grade and zh_grade == en_grade:
+        score += GRADE_SCORE
+
+    if zh.get('grade_points') is not None and zh.get('grade_points') == en.get('grade_points'):
+        score += GRADE_POINTS_SCORE
+
+    return score
+
+
+def align_courses(zh_courses: List[Dict[str, Any]], en_courses: List[Dict[str, Any]]) -> List[Tuple[int, int]]:
+    """Best order-preserving pairing of two course lists
+
+    A weighted longest-common-subsequence: skipping a row costs nothing
+    and each pair earns its pair_score, so the alignment maximises the
+    total agreement while keeping both lists in order.
+
+    Returns:
+        (zh index, en index) pairs in order
+    """
+    rows, cols = len(zh_courses), len(en_courses)
+    scores = [[0.0] * (cols + 1) for _ in range(rows + 1)]
+
+    for i in range(rows - 1, -1, -1):
+        for j in range(cols - 1, -1, -1):
+            best = max(scores[i + 1][j], scores[i][j + 1])
+            pair = pair_score(zh_courses[i], en_courses[j])
+            if pair is not None:
+                best = max(best, pair + scores[i + 1][j + 1])
+            scores[i][j] = best
+
+    pairs = []
+    i = j = 0
+    while i < rows and j < cols:
+        pair = pair_score(zh_courses[i], en_courses[j])
+        if pair is not None and scores[i][j] == pair + scores[i + 1][j + 1]:
+            pairs.append((i, j))
+            i += 1
+            j += 1
+        elif scores[i][j] == scores[i + 1][j]:
+            i += 1
+        else:
+            j += 1
+    return pairs
+
+
+def _flatten(semesters: List[Dict[str, Any]]) -> List[Tuple[int, Dict[str, Any]]]:
+    return [(index, course) for index, semester in enumerate(semesters) for course in semester['courses']]
+
+
+def align_transcripts(zh_semesters: List[Dict[str, Any]],
+                      en_semesters: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """Merge the table rows of a Chinese and an English transcript
+
+    Returns:
+        {'semesters': merged semesters in the Chinese transcript's structure,
+        each course with name_zh and name_en and each semester with an
+        English 'heading_en' where one could be matched; 'leftovers': English
+        rows that matched no Chinese row; 'matched': number of pairs}, or None
+        if too few rows could be paired
+    """
+    zh_rows = _flatten(zh_semesters)
+    en_rows = _flatten(en_semesters)
+    if not zh_rows or not en_rows:
+        return None
+
+    pairs = align_courses([course for _, course in zh_rows], [course for _, course in en_rows])
+    if len(pairs) < MIN_MATCH_RATIO * min(len(zh_rows), len(en_rows)):
+        print(f"Only {len(pairs)} of {len(zh_rows)} courses could be paired across the transcripts")
+        return None
+
+    partner = dict(pairs)
+    semesters = [
+        {'heading': semester['heading'], 'heading_en': None, 'courses': []}
+        for semester in zh_semesters
+    ]
+    en_headings: Dict[int, Counter] = {}
+
+    for zh_index, (semester_index, zh) in enumerate(zh_rows):
+        course = dict(zh)
+        en_index = partner.get(zh_index)
+        if en_index is not None:
+            en_semester, en = en_rows[en_index]
+            course['name_en'] = en.get('name_en') or zh.get('name_en')
+            course['name_zh'] = zh.get('name_zh') or en.get('name_zh')
+            for key in ('code', 'type', 'grade', 'grade_points'):
+                if course.get(key) is None:
+                    course[key] = en.get(key)
+            en_headings.setdefault(semester_index, Counter())[en_semesters[en_semester]['heading']] += 1
+        semesters[semester_index]['courses'].append(course)
+
+    # Each semester takes the English heading most of its paired courses came from
+    for semester_index, counts in en_headings.items():
+        semesters[semester_index]['heading_en'] = counts.most_common(1)[0][0]
+
+    matched_en = set(partner.values())
+    leftovers = [course for index, (_, course) in enumerate(en_rows) if index not in matched_en]
+    return {
+        'semesters': [semester for semester in semesters if semester['courses']],
+        'leftovers': leftovers,
+        'matched': len(pairs)
+    }
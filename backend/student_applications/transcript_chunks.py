@@ -0,0 +1,187 @@
+"""
+Semester-level chunking of extracted transcript text
+
+Long transcripts are split at semester headings so that each group of
+semesters can be extracted by its own, concurrent model call. The
+results are merged back into one verification result and the academic
+summary is recomputed from the merged courses.
+"""
+
+import re
+from typing import Dict, Any, List, Optional, Tuple
+
+from .utils import to_number, tidy_number
+
+_CN_NUMBER = r'[一二三四五六七八九十\d]+'
+_SEASON_EN = r'(?:Fall|Autumn|Spring|Summer|Winter)'
+_YEAR_RANGE = r'\d{4}\s*[-–—~/至]\s*\d{2,4}'
+
+# Lines that open a semester section, in Chinese or English
+SEMESTER_HEADING = re.compile(
+    r'^[^\S\n]*[=#*|\-–—•·【\[(（]*[^\S\n]*(?:'
+    rf'(?:{_YEAR_RANGE}\s*学年\s*)?第\s*{_CN_NUMBER}\s*学期'
+    rf'|(?:{_YEAR_RANGE}\s*学年\s*)?[上下春秋夏冬]季?学期'
+    r'|\d{4}\s*年?\s*[春秋夏冬]季(?:学期)?'
+    r'|大[一二三四五]\s*[上下]'
+    rf'|{_SEASON_EN}\s+(?:Semester|Term|Quarter)?\s*,?\s*\d{{4}}'
+    rf'|(?:{_YEAR_RANGE}\s*,?\s*)?(?:Academic\s+Year\s+{_YEAR_RANGE}\s*,?\s*)?'
+    r'(?:(?:First|Second|Third|Fourth|1st|2nd|3rd|4th)\s+(?:Semester|Term)|(?:Semester|Term)\s+\d+)'
+    rf'|{_YEAR_RANGE}\s+{_SEASON_EN}'
+    r')',
+    re.IGNORECASE | re.MULTILINE
+)
+
+# Headings are short lines; longer matches are course names or prose
+MAX_HEADING_LENGTH = 80
+
+# Sections shorter than this (e.g. an English heading right under the
+# Chinese one) are joined with the following section
+MIN_SECTION_CHARS = 40
+
+
+def split_semesters(text: str) -> Tuple[str, List[str]]:
+    """Split transcript text at semester headings
+
+    Returns:
+        (header, sections): the text before the first heading (student
+        details) and one text block per semester, each starting with its heading
+    """
+    starts = []
+    for match in SEMESTER_HEADING.finditer(text):
+        line_end = text.find('\n', match.start())
+        line = text[match.start():line_end if line_end != -1 else len(text)]
+        if len(line.strip()) <= MAX_HEADING_LENGTH:
+            starts.append(match.start())
+
+    if not starts:
+        return text, []
+
+    header = text[:starts[0]]
+    sections = []
+    pending = ''
+    for index, start in enumerate(starts):
+        end = starts[index + 1] if index + 1 < len(starts) else len(text)
+        section = pending + text[start:end]
+        if len(section.strip()) < MIN_SECTION_CHARS and index + 1 < len(starts):
+            pending = section
+            continue
+        sections.append(section)
+        pending = ''
+
+    return header, sections
+
+
+def _group_ranges(count: int, max_groups: int) -> List[Tuple[int, int]]:
+    """Split range(count) into at most max_groups contiguous, near-equal ranges"""
+    groups = min(count, max(1, max_groups))
+    size, extra = divmod(count, groups)
+    ranges = []
+    start = 0
+    for index in range(groups):
+        end = start + size + (1 if index < extra else 0)
+        ranges.append((start, end))
+        start = end
+    return ranges
+
+
+def plan_transcript_chunks(transcript_texts: Dict[str, str], max_chunks: int = 8) -> Optional[List[Dict[str, str]]]:
+    """Split each transcript file into the same semester groups
+
+    Every chunk repeats the file headers so the model still sees the
+    student details. Separate zh/en uploads are only chunked when both
+    files have the same number of semesters, so the groups line up.
+
+    Returns:
+        One file_key -> text mapping per chunk, or None if the transcript
+        does not have at least two recognisable semesters
+    """
+    split = {
+        file_key: split_semesters(text)
+        for file_key, text in transcript_texts.items() if text and text.strip()
+    }
+    counts = {len(sections) for _, sections in split.values()}
+    if len(counts) != 1:
+        return None
+    count = counts.pop()
+    if count < 2 or max_chunks < 2:
+        return None
+
+    chunks = []
+    for start, end in _group_ranges(count, max_chunks):
+        chunks.append({
+            file_key: header + ''.join(sections[start:end])
+            for file_key, (header, sections) in split.items()
+        })
+    return chunks
+
+
+def summarize_semesters(semesters: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Recompute credit and course totals from the semesters' courses
+
+    Semesters without a total_credits value get one from their courses.
+    """
+    total_credits = 0.0
+    total_courses = 0
+    for semester in semesters:
+        courses = semester.get('courses') or []
+        semester_credits = sum(to_number(course.get('credits')) or 0.0 for course in courses)
+        if semester.get('total_credits') in (None, '') and courses:
+            semester['total_credits'] = tidy_number(semester_credits)
+        total_credits += semester_credits
+        total_courses += len(courses)
+
+    return {
+        'total_credits': tidy_number(total_credits),
+        'total_courses': total_courses
+    }
+
+
+def merge_chunk_results(results: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Merge per-chunk verification results in chunk order
+
+    student_info fields take the first non-empty value, semesters are
+    concatenated (a semester split across chunks is joined by name), and
+    academic_summary totals are recomputed locally.
+    """
+    student_info: Dict[str, Any] = {}
+    semesters: List[Dict[str, Any]] = []
+    by_name: Dict[Tuple[Any, Any], Dict[str, Any]] = {}
+    standing = None
+    notes = []
+
+    for result in results:
+        for key, value in (result.get('student_info') or {}).items():
+            if student_info.get(key) in (None, '') and value not in (None, ''):
+                student_info[key] = value
+            else:
+                student_info.setdefault(key, value)
+
+        for semester in result.get('semesters') or []:
+            name = (semester.get('academic_year'), semester.get('name_zh') or semester.get('name_en'))
+            if name[1] and name in by_name:
+                existing = by_name[name]
+                existing['courses'] = (existing.get('courses') or []) + (semester.get('courses') or [])
+                existing['total_credits'] = None
+                continue
+            if name[1]:
+                by_name[name] = semester
+            semesters.append(semester)
+
+        summary = result.get('academic_summary') or {}
+        standing = standing or summary.get('academic_standing')
+        if summary.get('verification_notes') and summary['verification_notes'] not in notes:
+            notes.append(summary['verification_notes'])
+
+    for index, semester in enumerate(semesters):
+        if not semester.get('semester_id'):
+            semester['semester_id'] = f"semester_{index + 1}"
+
+    academic_summary = summarize_semesters(semesters)
+    academic_summary['academic_standing'] = standing
+    academic_summary['verification_notes'] = '；'.join(notes) if notes else None
+
+    return {
+        'student_info': student_info,
+        'semesters': semesters,
+        'academic_summary': academic_summary
+    }
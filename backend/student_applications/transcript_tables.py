@@ -0,0 +1,358 @@
+"""
+Local course extraction from the tables of text-layer transcript PDFs
+
+Most university transcripts are tables with a text layer. pdfplumber
+reads their rows directly, so course code, name, credits, grade and
+grade points never have to be written out by the model; it is only asked
+for what the table cannot say, such as course types and semester names.
+Semesters come from a semester column, from heading rows inside the
+table or from the heading text above each table. The rows read from a
+file are kept in the extraction cache, so verifying the same upload again
+does not have pdfplumber lay out its pages again.
+"""
+
+import os
+import re
+import json
+from typing import Dict, Any, List, Optional, Tuple
+
+from .course_classifier import course_type_entry
+from .extraction_cache import get_extraction_cache
+from .transcript_chunks import SEMESTER_HEADING, summarize_semesters
+from .utils import detect_file_type
+
+try:
+    import pdfplumber
+    PDFPLUMBER_AVAILABLE = True
+except ImportError:
+    PDFPLUMBER_AVAILABLE = False
+
+# Bump to invalidate cached table rows when parse_course_tables changes
+TABLE_EXTRACTOR_VERSION = '1'
+
+# Header keywords per column, checked in this order (the first match wins)
+COLUMN_KEYWORDS = [
+    ('code', re.compile(r'课程代码|课程号|课程编号|代码|Course\s*(?:Code|No)|\bCode\b', re.I)),
+    ('grade_points', re.compile(r'绩点|Grade\s*Points?|\bGP\b|\bGPA\b', re.I)),
+    ('credits', re.compile(r'学分|Credits?|\bCr\b|Units?', re.I)),
+    ('grade', re.compile(r'成绩|分数|Grade|Score|Mark', re.I)),
+    ('semester', re.compile(r'学期|Semester|Term', re.I)),
+    ('type_label', re.compile(r'课程性质|课程类别|课程类型|性质|类别|Category|Type', re.I)),
+    ('name', re.compile(r'课程名称|课程|科目|名称|Course|Subject|Title', re.I)),
+]
+
+CJK = re.compile(r'[一-鿿]')
+BILINGUAL_NAME = re.compile(r'^(.*[一-鿿][）)】\]]*(?:\s*[\dⅠ-Ⅻ]+[）)】\]]*)?)\s*(.*)$')
+
+# Course type labels printed on transcripts -> schema course types
+TYPE_LABELS = [
+    ('thesis', re.compile(r'毕业论文|毕业设计|Thesis', re.I)),
+    ('internship', re.compile(r'实习|Internship', re.I)),
+    ('practical', re.compile(r'实践|实验|Practi', re.I)),
+    ('general', re.compile(r'通识|公共|General', re.I)),
+    ('core', re.compile(r'核心|Core', re.I)),
+    ('major', re.compile(r'专业|Major', re.I)),
+    ('elective', re.compile(r'选修|任选|限选|Elective', re.I)),
+    ('required', re.compile(r'必修|Required|Compulsory', re.I)),
+]
+
+
+def _clean(cell: Any) -> str:
+    return re.sub(r'\s+', ' ', str(cell)).strip() if cell is not None else ''
+
+
+def _parse_number(text: str) -> Optional[float]:
+    match = re.search(r'\d+(?:\.\d+)?', text or '')
+    return float(match.group()) if match else None
+
+
+def map_header(row: List[Any]) -> Optional[Dict[str, int]]:
+    """Column index of each course field in a header row, or None if it is not a course header"""
+    columns: Dict[str, int] = {}
+    for index, cell in enumerate(row):
+        text = _clean(cell)
+        if not text:
+            continue
+        for field, pattern in COLUMN_KEYWORDS:
+            if field not in columns and pattern.search(text):
+                columns[field] = index
+                break
+    if 'name' in columns and 'credits' in columns:
+        return columns
+    return None
+
+
+def split_bilingual(name: str) -> Tuple[Optional[str], Optional[str]]:
+    """Split '数据结构 Data Structures' into its Chinese and English parts"""
+    name = _clean(name)
+    if not name:
+        return None, None
+    if not CJK.search(name):
+        return None, name
+    # The Chinese part runs to its last CJK character, plus a closing bracket or level number
+    match = BILINGUAL_NAME.match(name)
+    return match.group(1).strip(), match.group(2).strip() or None
+
+
+def course_type(label: str) -> Optional[str]:
+    """Schema course type for a type label printed on the transcript"""
+    for type_name, pattern in TYPE_LABELS:
+        if pattern.search(label or ''):
+            return type_name
+    return None
+
+
+def _semester_heading(text: str) -> Optional[str]:
+    """The last semester heading in a block of text"""
+    heading = None
+    for match in SEMESTER_HEADING.finditer(text or ''):
+        line_end = text.find('\n', match.start())
+        line = text[match.start():line_end if line_end != -1 else len(text)].strip()
+        if line:
+            heading = line
+    return heading
+
+
+def parse_course_tables(tables: List[Tuple[str, List[List[Any]]]]) -> List[Dict[str, Any]]:
+    """Turn page tables into semesters of course rows
+
+    Args:
+        tables: (text above the table, table rows) in reading order
+
+    Returns:
+        Semesters as {'heading': str or None, 'courses': [...]}, in order of appearance
+    """
+    semesters: List[Dict[str, Any]] = []
+    by_heading: Dict[Optional[str], Dict[str, Any]] = {}
+    columns: Optional[Dict[str, int]] = None
+    heading: Optional[str] = None
+
+    def semester_for(name: Optional[str]) -> Dict[str, Any]:
+        if name not in by_heading:
+            by_heading[name] = {'heading': name, 'courses': []}
+            semesters.append(by_heading[name])
+        return by_heading[name]
+
+    for text_above, rows in tables:
+        heading = _semester_heading(text_above) or heading
+
+        for row in rows:
+            header = map_header(row)
+            if header is not None:
+                columns = header
+                continue
+            cells = [_clean(cell) for cell in row]
+            filled = [cell for cell in cells if cell]
+            if not filled:
+                continue
+
+            # A single merged cell naming a semester starts a new group
+            if len(filled) == 1 and _semester_heading(filled[0]):
+                heading = filled[0]
+                continue
+            # Tables continued on the next page repeat no header: reuse the last one
+            if columns is None or max(columns.values()) >= len(cells):
+                continue
+
+            def cell(field: str) -> str:
+                return cells[columns[field]] if field in columns else ''
+
+            credits = _parse_number(cell('credits'))
+            name = cell('name')
+            if not name or credits is None or not 0 < credits <= 30:
+                continue
+
+            name_zh, name_en = split_bilingual(name)
+            row_heading = cell('semester') or heading
+            semester_for(row_heading)['courses'].append({
+                'code': cell('code') or None,
+                'name_zh': name_zh,
+                'name_en': name_en,
+                'type': course_type(cell('type_label')),
+                'credits': credits,
+                'grade': cell('grade') or None,
+                'grade_points': _parse_number(cell('grade_points')) if cell('grade_points') else None,
+            })
+
+    return [semester for semester in semesters if semester['courses']]
+
+
+def read_pdf_tables(filepath: str) -> List[Tuple[str, List[List[Any]]]]:
+    """Tables of a text-layer PDF with the page text between each table and the previous one"""
+    tables = []
+    with pdfplumber.open(filepath) as pdf:
+        for page in pdf.pages:
+            top = 0
+            for table in sorted(page.find_tables(), key=lambda found: (found.bbox[1], found.bbox[0])):
+                above = ''
+                if table.bbox[1] > top:
+                    above = page.crop((0, top, page.width, table.bbox[1])).extract_text() or ''
+                tables.append((above, table.extract()))
+                top = max(top, table.bbox[3])
+            # Drop the page's parsed layout objects before moving on
+            page.close()
+    return tables
+
+
+def read_course_tables(filepath: str) -> List[Dict[str, Any]]:
+    """parse_course_tables of a PDF's tables, reusing the rows cached for an identical file"""
+    cache = get_extraction_cache()
+    key = None
+    if cache is not None:
+        try:
+            key = cache.make_key(filepath, TABLE_EXTRACTOR_VERSION, 'tables')
+        except OSError:
+            key = None
+        cached = cache.get(key) if key else None
+        if cached is not None:
+            return json.loads(cached)
+
+    semesters = parse_course_tables(read_pdf_tables(filepath))
+    if key:
+        cache.set(key, json.dumps(semesters, ensure_ascii=False))
+    return semesters
+
+
+def extract_course_tables(filepath: str, min_courses: Optional[int] = None) -> Optional[List[Dict[str, Any]]]:
+    """Course rows of a transcript PDF grouped by semester, if its tables are usable
+
+    Returns:
+        Semesters as parsed by parse_course_tables, or None if the file has
+        no text-layer course tables, fewer than TRANSCRIPT_TABLE_MIN_COURSES
+        courses (default 5) or courses that cannot be placed in a semester
+    """
+    if not PDFPLUMBER_AVAILABLE or detect_file_type(filepath) != 'pdf':
+        return None
+    if min_courses is None:
+        min_courses = int(os.environ.get('TRANSCRIPT_TABLE_MIN_COURSES', 5))
+
+    try:
+        semesters = read_course_tables(filepath)
+    except Exception as e:
+        print(f"Table extraction failed for {filepath}: {e}")
+        return None
+
+    if sum(len(semester['courses']) for semester in semesters) < min_courses:
+        return None
+    if any(semester['heading'] is None for semester in semesters):
+        return None
+    return semesters
+
+
+def table_extraction_enabled() -> bool:
+    """Whether course rows are read from PDF tables locally (TRANSCRIPT_TABLES, default true)"""
+    return os.environ.get('TRANSCRIPT_TABLES', 'true').lower() in ('1', 'true', 'yes')
+
+
+def _needs_name(course: Dict[str, Any], bilingual: bool) -> Optional[str]:
+    """Name the model has to supply for a course of a two-language upload"""
+    if not bilingual:
+        return None
+    if not course.get('name_en'):
+        return 'name_en'
+    if not course.get('name_zh'):
+        return 'name_zh'
+    return None
+
+
+def annotation_content(header_text: str, semesters: List[Dict[str, Any]],
+                       leftovers: Optional[List[Dict[str, Any]]] = None,
+                       need_types: bool = True) -> str:
+    """Compact listing of the table data for the model to annotate
+
+    Only courses that still need a type (unless need_types is False because
+    types are classified locally) or, for separate zh/en uploads given
+    leftovers, a name in the other language are listed.
+    """
+    bilingual = leftovers is not None
+    lines = ["=== 成绩单学生信息 ===", header_text.strip(), "", "=== 学期 ==="]
+    for index, semester in enumerate(semesters):
+        headings = ' / '.join(part for part in (semester['heading'], semester.get('heading_en')) if part)
+        lines.append(f"s{index + 1} | {headings}")
+    lines.extend(["", "=== 需要补充的课程 ==="])
+    for s_index, semester in enumerate(semesters):
+        for c_index, course in enumerate(semester['courses']):
+            missing = _needs_name(course, bilingual)
+            if (need_types and course['type'] is None) or missing:
+                names = ' / '.join(part for part in (course['name_zh'], course['name_en']) if part)
+                note = f" | 缺{'英文名' if missing == 'name_en' else '中文名'}" if missing else ''
+                lines.append(f"s{s_index + 1}c{c_index + 1} | {course['code'] or ''} | {names}{note}")
+    if leftovers:
+        lines.extend(["", "=== 未能对应的另一语言课程 ==="])
+        for course in leftovers:
+            names = ' / '.join(part for part in (course['name_zh'], course['name_en']) if part)
+            lines.append(f"{course['code'] or ''} | {names} | {course['credits']:g}学分")
+    return '\n'.join(lines)
+
+
+def _weighted_grade_points(courses: List[Dict[str, Any]]) -> Optional[float]:
+    """Credit-weighted grade point average, if every course has grade points"""
+    if not courses or any(course['grade_points'] is None for course in courses):
+        return None
+    credits = sum(course['credits'] for course in courses)
+    if not credits:
+        return None
+    return round(sum(course['credits'] * course['grade_points'] for course in courses) / credits, 2)
+
+
+def assemble_table_result(semesters: List[Dict[str, Any]], annotation: Dict[str, Any]) -> Dict[str, Any]:
+    """Build the verification result from table rows plus the model's annotation
+
+    Args:
+        semesters: Output of extract_course_tables
+        annotation: {'student_info', 'semesters': [{'id', 'name_zh', ...}],
+            'courses': [{'id', 'course_type'}], 'academic_summary'}
+    """
+    semester_notes = {item.get('id'): item for item in annotation.get('semesters') or [] if isinstance(item, dict)}
+    course_notes = {item.get('id'): item for item in annotation.get('courses') or [] if isinstance(item, dict)}
+
+    result_semesters = []
+    for s_index, semester in enumerate(semesters):
+        note = semester_notes.get(f"s{s_index + 1}") or {}
+        courses = []
+        for c_index, row in enumerate(semester['courses']):
+            course_id = f"s{s_index + 1}c{c_index + 1}"
+            course_note = course_notes.get(course_id) or {}
+            # A type printed on the transcript is certain; the model's is not
+            if row['type']:
+                type_entry = course_type_entry(row['type'], 1.0)
+            else:
+                type_entry = course_type_entry(course_note.get('course_type'))
+            courses.append({
+                'course_id': course_id,
+                'code': row['code'],
+                'name_zh': row['name_zh'] or course_note.get('name_zh'),
+                'name_en': row['name_en'] or course_note.get('name_en'),
+                'course_type': type_entry,
+                'credits': row['credits'],
+                'grade': row['grade'],
+                'grade_points': row['grade_points'],
+                'description': None
+            })
+
+        headings = [semester['heading'], semester.get('heading_en')]
+        heading_zh = next((text for text in headings if text and CJK.search(text)), None)
+        heading_en = next((text for text in headings if text and not CJK.search(text)), None)
+        result_semesters.append({
+            'semester_id': f"semester_{s_index + 1}",
+            'name_zh': note.get('name_zh') or heading_zh,
+            'name_en': note.get('name_en') or heading_en,
+            'type': note.get('type'),
+            'academic_year': note.get('academic_year'),
+            'start_date': note.get('start_date'),
+            'end_date': note.get('end_date'),
+            'courses': courses,
+            'total_credits': None,
+            'semester_gpa': _weighted_grade_points(semester['courses'])
+        })
+
+    academic_summary = summarize_semesters(result_semesters)
+    summary_notes = annotation.get('academic_summary') or {}
+    academic_summary['academic_standing'] = summary_notes.get('academic_standing')
+    academic_summary['verification_notes'] = summary_notes.get('verification_notes')
+
+    return {
+        'student_info': annotation.get('student_info') or {},
+        'semesters': result_semesters,
+        'academic_summary': academic_summary
+    }
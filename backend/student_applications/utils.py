@@ -3,9 +3,51 @@ Utility functions for document processing and text extraction
 """
 
 import os
+import re
 import tempfile
-from typing import Optional, Dict, Any
+import threading
+from concurrent.futures import FIRST_COMPLETED, wait as wait_futures
+from concurrent.futures.process import BrokenProcessPool
+from typing import Optional, Dict, Any, Tuple, Callable, Iterator, Set
 import io
+import zipfile
+
+from .extraction_cache import get_extraction_cache
+from .task_pool import TaskPool
+from .ocr_lang import lang_for_file_key
+from .ocr import (
+    PILLOW_AVAILABLE, PageOCR, ocr_enabled, ocr_available, pdf_ocr_available, ocr_signature, image_ocr_signature,
+    page_has_text_layer, recognize_images, use_in_process_ocr, ocr_stats_mark, ocr_stats_since,
+    merge_ocr_stats
+)
+
+# Bump whenever extractor behaviour changes so cached text is re-extracted
+EXTRACTOR_VERSION = '5'
+
+# Extensions handled by image OCR
+IMAGE_EXTENSIONS = ('png', 'jpg', 'jpeg', 'bmp', 'tiff', 'tif')
+
+# Detected file types handled by image OCR
+IMAGE_TYPES = ('png', 'jpeg', 'tiff', 'bmp', 'image')
+
+# Leading bytes of each file type; checked before the extension or content type
+FILE_SIGNATURES = [
+    (b'\x89PNG\r\n\x1a\n', 'png'),
+    (b'\xff\xd8\xff', 'jpeg'),
+    (b'II*\x00', 'tiff'),
+    (b'MM\x00*', 'tiff'),
+    (b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1', 'doc'),  # OLE2 compound file (Word 97-2003)
+    (b'PK\x03\x04', 'zip'),
+]
+
+# Bytes read from the start of a file to detect its type
+SNIFF_BYTES = 2048
+
+# File type by extension, for files without a recognised signature
+EXTENSION_TYPES = {
+    'pdf': 'pdf', 'docx': 'docx', 'doc': 'docx', 'txt': 'text',
+    'png': 'png', 'jpg': 'jpeg', 'jpeg': 'jpeg', 'bmp': 'bmp', 'tiff': 'tiff', 'tif': 'tiff',
+}
 
 # Optional imports for document processing
 try:
@@ -29,11 +71,7 @@ except ImportError:
     DOCX_AVAILABLE = False
     print("Warning: python-docx not available. DOCX extraction will not work.")
 
-try:
-    from PIL import Image
-    PILLOW_AVAILABLE = True
-except ImportError:
-    PILLOW_AVAILABLE = False
+if not PILLOW_AVAILABLE:
     print("Warning: Pillow not available. Image processing will not work.")
 
 try:
@@ -44,37 +82,125 @@ except ImportError:
     pytesseract = None
     print("Warning: pytesseract not available. OCR extraction will not work.")
 
-def extract_text_from_pdf(filepath: str) -> str:
-    """Extract text from PDF file using multiple methods for better coverage"""
-    text = ""
+def _env_limit(name: str) -> Optional[int]:
+    """Positive integer from the environment, None when unset or 0 (no limit)"""
+    value = int(os.environ.get(name, 0) or 0)
+    return value if value > 0 else None
 
-    # Method 1: PyPDF2 for basic text extraction
-    if PYPDF2_AVAILABLE:
-        try:
-            with open(filepath, 'rb') as file:
-                pdf_reader = PyPDF2.PdfReader(file)
-                for page_num in range(len(pdf_reader.pages)):
-                    page = pdf_reader.pages[page_num]
-                    text += page.extract_text() + "\n"
-        except Exception as e:
-            print(f"PyPDF2 extraction failed: {e}")
-    else:
-        print("PyPDF2 not available for PDF extraction")
+def pdf_budget() -> Tuple[Optional[int], Optional[int]]:
+    """Default (max pages, max chars) of PDF extraction (PDF_MAX_PAGES, PDF_MAX_CHARS; unset means no limit)"""
+    return _env_limit('PDF_MAX_PAGES'), _env_limit('PDF_MAX_CHARS')
 
-    # If PyPDF2 didn't extract much text, try pdfplumber
-    if PDFPLUMBER_AVAILABLE and len(text.strip()) < 100:
-        try:
-            with pdfplumber.open(filepath) as pdf:
-                for page in pdf.pages:
-                    page_text = page.extract_text()
-                    if page_text:
-                        text += page_text + "\n"
-        except Exception as e:
-            print(f"pdfplumber extraction failed: {e}")
-    elif not PDFPLUMBER_AVAILABLE and len(text.strip()) < 100:
-        print("pdfplumber not available for PDF extraction")
+def iter_pdf_pages(filepath: str, max_pages: Optional[int] = None,
+                   max_chars: Optional[int] = None,
+                   ocr_lang: Optional[str] = None) -> Iterator[Tuple[int, str, str]]:
+    """Yield (page index, text, extractor) for each page of a PDF as it is read
+
+    Pages that declare no fonts are scans: they skip text extraction and
+    are OCR'd concurrently on the OCR pool (extractor 'ocr'). Other pages
+    are read with PyPDF2 and only re-read with pdfplumber when PyPDF2 finds
+    fewer than PDF_PAGE_MIN_CHARS characters (default 100) on them, so a
+    document is never parsed twice in full. pdfplumber pages are closed
+    after use, so parsed layout objects do not pile up over long documents.
+    Stops after max_pages pages or once max_chars characters have been
+    yielded (the last page is cut to fit). ocr_lang fixes the OCR language
+    set of scanned pages; by default it is detected per page.
+    """
+    min_chars = int(os.environ.get('PDF_PAGE_MIN_CHARS', 100))
+    file = reader = plumber = ocr = None
+    plumber_tried = False
+
+    def plumber_pages():
+        nonlocal plumber, plumber_tried
+        if not plumber_tried:
+            plumber_tried = True
+            if PDFPLUMBER_AVAILABLE:
+                try:
+                    plumber = pdfplumber.open(filepath)
+                except Exception as e:
+                    print(f"pdfplumber extraction failed: {e}")
+            else:
+                print("pdfplumber not available for PDF extraction")
+        return plumber.pages if plumber is not None else None
+
+    try:
+        if PYPDF2_AVAILABLE:
+            try:
+                file = open(filepath, 'rb')
+                reader = PyPDF2.PdfReader(file)
+                page_count = len(reader.pages)
+            except Exception as e:
+                print(f"PyPDF2 extraction failed: {e}")
+                reader = None
+        else:
+            print("PyPDF2 not available for PDF extraction")
+        if reader is None:
+            pages = plumber_pages()
+            page_count = len(pages) if pages is not None else 0
+
+        if max_pages is not None:
+            page_count = min(page_count, max_pages)
+        remaining = max_chars
+
+        # Scanned pages are found from their resources and OCR'd while the text pages are read
+        if reader is not None and ocr_enabled():
+            scanned = [index for index in range(page_count) if not page_has_text_layer(reader.pages[index])]
+            if scanned and pdf_ocr_available():
+                ocr = PageOCR(filepath, scanned, lang=ocr_lang)
+            elif scanned:
+                print(f"{len(scanned)} scanned page(s) in {os.path.basename(filepath)} but OCR is not available")
+
+        for index in range(page_count):
+            text, extractor = '', None
+            if ocr is not None and index in ocr:
+                text, extractor = ocr.text(index), 'ocr'
+            elif reader is not None:
+                try:
+                    text, extractor = reader.pages[index].extract_text() or '', 'pypdf2'
+                except Exception as e:
+                    print(f"PyPDF2 extraction failed on page {index + 1}: {e}")
 
-    return text.strip()
+            if len(text.strip()) < min_chars and extractor != 'ocr':
+                pages = plumber_pages()
+                if pages is not None and index < len(pages):
+                    page = pages[index]
+                    try:
+                        plumber_text = page.extract_text() or ''
+                        if len(plumber_text.strip()) > len(text.strip()):
+                            text, extractor = plumber_text, 'pdfplumber'
+                    except Exception as e:
+                        print(f"pdfplumber extraction failed on page {index + 1}: {e}")
+                    finally:
+                        page.close()
+
+            if remaining is not None:
+                text = text[:remaining]
+                remaining -= len(text)
+            yield index, text, extractor
+            if remaining is not None and remaining <= 0:
+                break
+    finally:
+        if ocr is not None:
+            ocr.close()
+        if plumber is not None:
+            plumber.close()
+        if file is not None:
+            file.close()
+
+def extract_text_from_pdf(filepath: str, max_pages: Optional[int] = None,
+                          max_chars: Optional[int] = None, ocr_lang: Optional[str] = None) -> str:
+    """Extract text from PDF file page by page, choosing the better extractor for each page
+
+    Budgets default to PDF_MAX_PAGES and PDF_MAX_CHARS.
+    """
+    default_pages, default_chars = pdf_budget()
+    pages = iter_pdf_pages(
+        filepath,
+        max_pages if max_pages is not None else default_pages,
+        max_chars if max_chars is not None else default_chars,
+        ocr_lang
+    )
+    return "\n".join(text for _, text, _ in pages if text).strip()
 
 def extract_text_from_docx(filepath: str) -> str:
     """Extract text from Word document"""
@@ -92,8 +218,8 @@ def extract_text_from_docx(filepath: str) -> str:
         print(f"DOCX extraction failed: {e}")
         return ""
 
-def extract_text_from_image(filepath: str) -> str:
-    """Extract text from image using OCR"""
+def extract_text_from_image(filepath: str, ocr_lang: Optional[str] = None) -> str:
+    """Extract text from image using OCR (ocr_lang fixes the language set, detected by default)"""
     if not PILLOW_AVAILABLE:
         print("Pillow not available for image processing")
         return ""
@@ -102,17 +228,13 @@ def extract_text_from_image(filepath: str) -> str:
         print("pytesseract not available for OCR extraction")
         return ""
 
-    try:
-        # Check if pytesseract is available
-        pytesseract.get_tesseract_version()
-
-        image = Image.open(filepath)
-        text = pytesseract.image_to_string(image, lang='eng+chi_sim')
-        return text.strip()
-    except Exception as e:
-        print(f"OCR extraction failed: {e}")
+    # The tesseract check runs once per process; the engine stays loaded between images
+    if not ocr_available():
+        print("tesseract not available for OCR extraction")
         return ""
 
+    return recognize_images([filepath], lang=ocr_lang)[0]
+
 def extract_text_from_txt(filepath: str) -> str:
     """Extract text from plain text file"""
     try:
@@ -131,35 +253,350 @@ def extract_text_from_txt(filepath: str) -> str:
     except FileNotFoundError:
         return ""
 
-def extract_text_from_file(filepath: str, content_type: str = None) -> str:
-    """Extract text from any supported file type"""
-    filename = filepath.lower()
-
-    if filename.endswith('.pdf'):
-        return extract_text_from_pdf(filepath)
-    elif filename.endswith('.docx') or filename.endswith('.doc'):
-        return extract_text_from_docx(filepath)
-    elif filename.endswith('.txt'):
-        return extract_text_from_txt(filepath)
-    elif filename.endswith(('.png', '.jpg', '.jpeg', '.bmp', '.tiff', '.tif')):
-        return extract_text_from_image(filepath)
-    else:
-        # Try to determine from content type
-        if content_type:
-            if 'pdf' in content_type:
-                return extract_text_from_pdf(filepath)
-            elif 'word' in content_type or 'document' in content_type:
-                return extract_text_from_docx(filepath)
-            elif 'text' in content_type:
-                return extract_text_from_txt(filepath)
-            elif 'image' in content_type:
-                return extract_text_from_image(filepath)
-
-    # Fallback: try as text file
+def sniff_file_type(filepath: str) -> Optional[str]:
+    """File type from the first bytes of a file, None when no signature matches
+
+    Returns 'pdf', 'docx', 'doc', 'zip', 'png', 'jpeg', 'tiff' or 'bmp'.
+    """
+    try:
+        with open(filepath, 'rb') as f:
+            head = f.read(SNIFF_BYTES)
+    except OSError:
+        return None
+
+    # Readers accept junk before the header, so %PDF is looked for in the first kilobyte
+    if b'%PDF-' in head[:1024]:
+        return 'pdf'
+    for signature, file_type in FILE_SIGNATURES:
+        if head.startswith(signature):
+            if file_type == 'zip':
+                return 'docx' if _is_docx(filepath) else 'zip'
+            return file_type
+    # 'BM' alone is too common at the start of text; the BMP header has four reserved zero bytes
+    if head.startswith(b'BM') and head[6:10] == b'\x00\x00\x00\x00':
+        return 'bmp'
+    return None
+
+def _is_docx(filepath: str) -> bool:
+    try:
+        with zipfile.ZipFile(filepath) as archive:
+            return 'word/document.xml' in archive.namelist()
+    except (zipfile.BadZipFile, OSError):
+        return False
+
+def _looks_like_text(filepath: str) -> bool:
+    """Whether a file without a signature is plain text (no NUL bytes at its start)"""
+    try:
+        with open(filepath, 'rb') as f:
+            return b'\x00' not in f.read(SNIFF_BYTES)
+    except OSError:
+        return True
+
+def detect_file_type(filepath: str, content_type: str = None) -> Optional[str]:
+    """Type of an uploaded file: its signature, then its extension, then its content type
+
+    Files matching none of these are 'text' when they contain no NUL bytes
+    and None (not extractable) otherwise, so binary files are never decoded as text.
+    """
+    file_type = sniff_file_type(filepath) or EXTENSION_TYPES.get(get_file_extension(filepath))
+    if file_type is None and content_type:
+        if 'pdf' in content_type:
+            file_type = 'pdf'
+        elif 'word' in content_type or 'document' in content_type:
+            file_type = 'docx'
+        elif content_type.startswith('image/'):
+            file_type = EXTENSION_TYPES.get(content_type.split('/', 1)[1], 'image')
+        elif 'text' in content_type:
+            file_type = 'text'
+    if file_type is None and _looks_like_text(filepath):
+        file_type = 'text'
+    return file_type
+
+def extract_text_from_doc(filepath: str) -> str:
+    """Legacy Word 97-2003 documents cannot be read; they have to be saved as .docx or PDF"""
+    print(f"{os.path.basename(filepath)} is a Word 97-2003 document, which is not supported")
+    return ""
+
+# Detected file type -> extractor(filepath, ocr_lang); extractors are looked up when called
+_extractors: Dict[str, Callable[[str, Optional[str]], str]] = {
+    'pdf': lambda filepath, ocr_lang: extract_text_from_pdf(filepath, ocr_lang=ocr_lang),
+    'docx': lambda filepath, ocr_lang: extract_text_from_docx(filepath),
+    'doc': lambda filepath, ocr_lang: extract_text_from_doc(filepath),
+    'text': lambda filepath, ocr_lang: extract_text_from_txt(filepath),
+}
+for _image_type in IMAGE_TYPES:
+    _extractors[_image_type] = lambda filepath, ocr_lang: extract_text_from_image(filepath, ocr_lang)
+
+# Types whose extractor was set with register_extractor. Extraction pool workers
+# import this module afresh and only know the built-in extractors, so files of
+# these types are extracted in the process that registered them
+_registered_types: Set[str] = set()
+
+def register_extractor(file_type: str, extractor: Callable[[str, Optional[str]], str],
+                       signature: Optional[bytes] = None, extensions: Tuple[str, ...] = ()) -> None:
+    """Route files of a type to extractor(filepath, ocr_lang)
+
+    Args:
+        file_type: Detected type name (replaces the extractor of a built-in type)
+        extractor: Called with the file path and the OCR language hint
+        signature: Leading bytes that identify the type
+        extensions: Extensions (without the dot) of the type, for files without a signature
+    """
+    _extractors[file_type] = extractor
+    _registered_types.add(file_type)
+    if signature is not None:
+        FILE_SIGNATURES.insert(0, (signature, file_type))
+    for extension in extensions:
+        EXTENSION_TYPES[extension.lower()] = file_type
+
+def _cache_lookup(filepath: str, file_type: Optional[str],
+                  ocr_lang: Optional[str] = None) -> Tuple[Optional[str], Optional[str]]:
+    """Look up a file in the extraction cache
+
+    Returns:
+        (cache key, cached text); the key is None when caching is disabled or the file is unreadable
+    """
+    cache = get_extraction_cache()
+    if cache is None:
+        return None, None
+
     try:
-        return extract_text_from_txt(filepath)
-    except:
+        # The detected type decides which extractor runs, so it is part of the key
+        variant = file_type or 'unknown'
+        # PDF budgets and OCR settings change the text, so files extracted under others are not reused
+        if file_type == 'pdf':
+            variant += "|{}|{}|{}".format(*pdf_budget(), ocr_signature(ocr_lang))
+        elif file_type in IMAGE_TYPES:
+            variant += f"|{image_ocr_signature(ocr_lang)}"
+        key = cache.make_key(filepath, EXTRACTOR_VERSION, variant)
+    except OSError:
+        return None, None
+
+    return key, cache.get(key)
+
+def _cache_store(key: Optional[str], text: str) -> None:
+    """Store extracted text under a key from _cache_lookup"""
+    cache = get_extraction_cache()
+    # Empty results usually mean a missing extractor dependency, so they are not cached
+    if cache is not None and key and text:
+        cache.set(key, text)
+
+def extract_document(filepath: str, content_type: str = None,
+                     ocr_lang: Optional[str] = None) -> Tuple[str, Optional[str]]:
+    """Extract text from any supported file, reusing cached results for identical files
+
+    ocr_lang fixes the OCR language set of images and scanned pages (see lang_for_file_key).
+
+    Returns:
+        (text, detected file type); the type is None for unrecognised binary files
+    """
+    file_type = detect_file_type(filepath, content_type)
+    key, text = _cache_lookup(filepath, file_type, ocr_lang)
+    if text is None:
+        text = _extract_text_uncached(filepath, content_type, ocr_lang, file_type)
+        _cache_store(key, text)
+    return text, file_type
+
+def extract_text_from_file(filepath: str, content_type: str = None, ocr_lang: Optional[str] = None) -> str:
+    """Extract text from any supported file type, reusing cached results for identical files"""
+    return extract_document(filepath, content_type, ocr_lang)[0]
+
+def _extract_text_uncached(filepath: str, content_type: str = None, ocr_lang: Optional[str] = None,
+                           file_type: Optional[str] = None) -> str:
+    """Dispatch once to the extractor of the file's detected type"""
+    file_type = file_type or detect_file_type(filepath, content_type)
+    extractor = _extractors.get(file_type)
+    if extractor is None:
+        print(f"No extractor for {os.path.basename(filepath)} (detected type: {file_type or 'unknown binary'})")
         return ""
+    return extractor(filepath, ocr_lang)
+
+_extraction_pool = None
+_extraction_pool_pid = None
+_extraction_pool_lock = threading.Lock()
+
+def get_extraction_workers() -> int:
+    """Size of the extraction process pool (EXTRACTION_WORKERS, default min(4, CPU count))"""
+    default = min(4, os.cpu_count() or 1)
+    return max(1, int(os.environ.get('EXTRACTION_WORKERS', default)))
+
+def get_extraction_timeout() -> float:
+    """Per-file extraction timeout in seconds (EXTRACTION_TIMEOUT, default 120)"""
+    return float(os.environ.get('EXTRACTION_TIMEOUT', 120))
+
+def _extract_in_worker(filepath: str, content_type: Optional[str], ocr_lang: Optional[str],
+                       file_type: Optional[str]) -> Tuple[str, Dict[str, Any]]:
+    """Extract one file on the extraction pool, with the OCR work it took for the web worker's statistics"""
+    mark = ocr_stats_mark()
+    text = _extract_text_uncached(filepath, content_type, ocr_lang, file_type)
+    return text, ocr_stats_since(mark)
+
+def _init_extraction_worker() -> None:
+    """Set up an extraction worker process: scanned pages are OCR'd in the worker itself"""
+    use_in_process_ocr()
+
+def _get_extraction_pool(max_workers: int) -> TaskPool:
+    """Get the process pool of the current process, creating it on first use"""
+    global _extraction_pool, _extraction_pool_pid
+    with _extraction_pool_lock:
+        if _extraction_pool is None or _extraction_pool_pid != os.getpid():
+            _extraction_pool = TaskPool(max_workers, initializer=_init_extraction_worker)
+            _extraction_pool_pid = os.getpid()
+        return _extraction_pool
+
+def _reset_extraction_pool(pool: Optional[TaskPool] = None) -> None:
+    """Drop a broken or hung process pool so the next call starts a fresh one
+
+    With pool given, the current pool is only dropped if it is still that
+    one, so threads that saw the same failure replace it once.
+    """
+    global _extraction_pool
+    with _extraction_pool_lock:
+        if _extraction_pool is not None and (pool is None or pool is _extraction_pool):
+            _extraction_pool.shutdown()
+            _extraction_pool = None
+
+def extract_texts_in_parallel(files: Dict[str, Dict[str, Any]],
+                              max_workers: Optional[int] = None,
+                              timeout: Optional[float] = None,
+                              on_result: Optional[Callable[[str, str, Optional[str]], None]] = None) -> Dict[str, str]:
+    """Extract text from several uploaded files at once on a process pool
+
+    Cached files are answered in this process; the rest are extracted in
+    worker processes, so the total time is roughly that of the slowest file.
+    Image uploads are OCR'd together as one batch on this process's OCR
+    pool, and files of types added with register_extractor are extracted in
+    this process. The OCR language set of each file follows from its file key.
+
+    Args:
+        files: file_key -> {filepath, content_type, ...}
+        max_workers: Pool size (defaults to EXTRACTION_WORKERS)
+        timeout: Seconds each file may take once a worker starts it (defaults to EXTRACTION_TIMEOUT)
+        on_result: Optional callback(file_key, text, detected file type) invoked as each file finishes
+
+    Returns:
+        file_key -> extracted text in the order of files; files that fail or
+        time out map to "" (the worker of a timed-out file is killed and the
+        pool restarted; files of other requests it interrupts are retried once)
+    """
+    max_workers = max_workers or get_extraction_workers()
+    timeout = timeout if timeout is not None else get_extraction_timeout()
+
+    texts = {}
+    file_types = {}
+    pending = {}
+    for file_key, file_info in files.items():
+        filepath = file_info['filepath']
+        content_type = file_info.get('content_type')
+        ocr_lang = lang_for_file_key(file_key)
+        file_types[file_key] = detect_file_type(filepath, content_type)
+        key, text = _cache_lookup(filepath, file_types[file_key], ocr_lang)
+        if text is not None:
+            texts[file_key] = text
+            if on_result is not None:
+                on_result(file_key, text, file_types[file_key])
+        else:
+            pending[file_key] = (filepath, content_type, key, ocr_lang)
+
+    def finish(file_key: str, text: str) -> None:
+        texts[file_key] = text
+        if on_result is not None:
+            on_result(file_key, text, file_types[file_key])
+
+    def extract_here(file_key: str) -> None:
+        filepath, content_type, key, ocr_lang = pending[file_key]
+        try:
+            text = _extract_text_uncached(filepath, content_type, ocr_lang, file_types[file_key])
+            _cache_store(key, text)
+        except Exception as e:
+            print(f"Failed to extract text from {file_key}: {e}")
+            text = ""
+        finish(file_key, text)
+
+    # Registered extractors exist only in this process. The image uploads of a
+    # request are OCR'd as one batch on this worker's OCR pool; other files go
+    # to the extraction pool
+    local = [file_key for file_key in pending if file_types[file_key] in _registered_types]
+    images = [file_key for file_key in pending
+              if file_key not in local and file_types[file_key] in IMAGE_TYPES] if ocr_available() else []
+    documents = [file_key for file_key in pending if file_key not in local and file_key not in images]
+
+    def submit(file_key: str) -> None:
+        filepath, content_type, _, ocr_lang = pending[file_key]
+        pools[file_key] = _get_extraction_pool(max_workers)
+        waiting[file_key] = pools[file_key].submit(
+            _extract_in_worker, filepath, content_type, ocr_lang, file_types[file_key]
+        )
+
+    pools: Dict[str, TaskPool] = {}
+    waiting = {}
+    try:
+        for file_key in documents:
+            submit(file_key)
+    except (BrokenProcessPool, RuntimeError, OSError) as e:
+        print(f"Extraction pool unavailable, extracting sequentially: {e}")
+        _reset_extraction_pool()
+        for future in waiting.values():
+            future.cancel()
+        waiting = {}
+        for file_key in documents:
+            extract_here(file_key)
+
+    for file_key in local:
+        extract_here(file_key)
+
+    if images:
+        try:
+            image_texts = recognize_images([pending[file_key][0] for file_key in images],
+                                           langs=[pending[file_key][3] for file_key in images])
+        except Exception as e:
+            print(f"Failed to OCR image uploads: {e}")
+            image_texts = [""] * len(images)
+        for file_key, text in zip(images, image_texts):
+            _cache_store(pending[file_key][2], text)
+            finish(file_key, text)
+
+    # Results are collected as they complete. The pool is shared with other
+    # requests, so each file's timeout runs from when a worker starts it
+    retried = set()
+    while waiting:
+        interval = min(pools[file_key].wait_interval([future], timeout) for file_key, future in waiting.items())
+        done, _ = wait_futures(list(waiting.values()), timeout=interval, return_when=FIRST_COMPLETED)
+
+        for file_key, future in list(waiting.items()):
+            if future in done:
+                try:
+                    text, ocr_report = future.result()
+                    merge_ocr_stats(ocr_report)
+                    _cache_store(pending[file_key][2], text)
+                except BrokenProcessPool as e:
+                    # A worker crashed or a hung one was killed; the pool is replaced
+                    _reset_extraction_pool(pools[file_key])
+                    if file_key not in retried:
+                        retried.add(file_key)
+                        try:
+                            submit(file_key)
+                            continue
+                        except (BrokenProcessPool, RuntimeError, OSError) as submit_error:
+                            e = submit_error
+                    print(f"Failed to extract text from {file_key}: {e}")
+                    text = ""
+                except Exception as e:
+                    print(f"Failed to extract text from {file_key}: {e}")
+                    text = ""
+            elif pools[file_key].expired(future, timeout):
+                # A running task cannot be cancelled, so its worker is killed
+                print(f"Text extraction from {file_key} timed out after {timeout}s, restarting the extraction pool")
+                pools[file_key].kill(future)
+                _reset_extraction_pool(pools[file_key])
+                text = ""
+            else:
+                continue
+
+            del waiting[file_key]
+            finish(file_key, text)
+
+    return {file_key: texts[file_key] for file_key in files}
 
 def get_file_extension(filename: str) -> str:
     """Get file extension from filename"""
@@ -169,4 +606,21 @@ def is_supported_file_type(filename: str) -> bool:
     """Check if file type is supported for text extraction"""
     supported_extensions = {'.pdf', '.docx', '.doc', '.txt', '.png', '.jpg', '.jpeg', '.bmp', '.tiff'}
     ext = os.path.splitext(filename)[1].lower()
-    return ext in supported_extensions
\ No newline at end of file
+    return ext in supported_extensions
+
+def to_number(value: Any) -> Optional[float]:
+    """Read a numeric field that may come back as a number or as text like '3.0学分'"""
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, str):
+        match = re.search(r'-?\d+(?:\.\d+)?', value)
+        if match:
+            return float(match.group())
+    return None
+
+def tidy_number(number: float) -> Any:
+    """Round a sum and drop the fraction when it is whole"""
+    number = round(number, 2)
+    return int(number) if number == int(number) else number
@@ -10,6 +10,63 @@ from typing import Generator, Dict, Any
 import sys
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+# Keep records in process memory instead of the shared SQLite database
+os.environ.setdefault('STORAGE_BACKEND', 'memory')
+# Tests reuse identical fixture bytes across cases, so extraction results must not be cached
+os.environ.setdefault('EXTRACTION_CACHE_ENABLED', 'false')
+# Every test must reach the (mocked) model rather than a cached answer
+os.environ.setdefault('LLM_CACHE_ENABLED', 'false')
+# Extract in-process so tests can patch the extractors
+os.environ.setdefault('EXTRACTION_WORKERS', '1')
+# OCR pages in-process so tests can patch the recogniser
+os.environ.setdefault('OCR_WORKERS', '1')
+# OCR with the configured language set unless a test enables the script probe
+os.environ.setdefault('OCR_LANG_DETECT', 'false')
+# Never contact the GenAI API when the app starts
+os.environ.setdefault('GENAI_WARMUP', 'false')
+# Tests use their own limiter instances instead of the shared quota database
+os.environ.setdefault('GENAI_RATE_LIMIT_ENABLED', 'false')
+
+
+@pytest.fixture(autouse=True)
+def reset_genai_client():
+    """Drop the shared GenAI client so every test builds one from its own (mocked) library"""
+    from student_applications.genai_client import set_genai_client
+
+    set_genai_client(None)
+    yield
+    set_genai_client(None)
+
+
+@pytest.fixture(autouse=True)
+def reset_model_circuits():
+    """Start every test with closed circuit breakers and no model statistics"""
+    from student_applications.model_router import reset_model_health
+
+    reset_model_health()
+    yield
+    reset_model_health()
+
+
+@pytest.fixture(autouse=True)
+def reset_gpa_engine():
+    """Reload the GPA scale tables so tests can configure their own"""
+    from student_applications.gpa import set_gpa_engine
+
+    set_gpa_engine(None)
+    yield
+    set_gpa_engine(None)
+
+
+@pytest.fixture(autouse=True)
+def reset_course_classifier():
+    """Rebuild the course classifier so tests can configure their own keywords"""
+    from student_applications.course_classifier import set_course_classifier
+
+    set_course_classifier(None)
+    yield
+    set_course_classifier(None)
+
 
 @pytest.fixture(scope='session')
 def app():
@@ -0,0 +1,76 @@
+"""
+Tests for the local course type classifier
+"""
+import json
+
+from student_applications.course_classifier import CourseTypeClassifier, KeywordAutomaton, course_type_entry
+
+
+class TestKeywordAutomaton:
+    """Tests for the Aho-Corasick keyword automaton"""
+
+    def test_finds_overlapping_keywords(self):
+        automaton = KeywordAutomaton([('he', 'he'), ('she', 'she'), ('his', 'his'), ('hers', 'hers')])
+
+        assert sorted(automaton.search('ushers')) == [(1, 4, 'she'), (2, 4, 'he'), (2, 6, 'hers')]
+
+    def test_no_keywords(self):
+        assert list(KeywordAutomaton([]).search('text')) == []
+
+
+class TestCourseTypeClassifier:
+    """Tests for CourseTypeClassifier"""
+
+    def test_classifies_chinese_and_english_names(self):
+        classifier = CourseTypeClassifier()
+
+        assert classifier.classify('毕业设计', 'Graduation Design', 8)['type'] == 'thesis'
+        assert classifier.classify('生产实习', None, 4)['type'] == 'internship'
+        assert classifier.classify('大学物理实验', 'College Physics Lab', 1)['type'] == 'practical'
+        assert classifier.classify('大学英语（一）', 'College English I', 4)['type'] == 'language'
+        assert classifier.classify(None, 'Ideological and Moral Cultivation', 3)['type'] == 'general'
+        assert classifier.classify('专业选修：机器学习', None, 2)['type'] == 'elective'
+        assert classifier.classify('C语言程序设计', 'C Language Programming', 3)['type'] == 'major'
+        assert classifier.classify('程序设计语言', None, 3)['type'] == 'major'
+        assert classifier.classify('形式语言与自动机', 'Formal Languages and Automata', 3)['type'] == 'major'
+
+    def test_result_has_descriptions_and_confidence(self):
+        course_type = CourseTypeClassifier().classify('形势与政策', 'Situation and Policy', 0)
+
+        assert course_type['en'] == 'General Education'
+        assert course_type['zh'] == '通识课程'
+        assert 0.5 < course_type['confidence'] <= 1
+
+    def test_unmatched_course_falls_back_with_low_confidence(self):
+        course_type = CourseTypeClassifier().classify('数据结构', 'Data Structures', 3)
+
+        assert course_type['type'] == 'major'
+        assert course_type['confidence'] < 0.5
+
+    def test_english_keywords_must_start_a_word(self):
+        classifier = CourseTypeClassifier()
+
+        assert 'practical' not in classifier.scores('Syllabus Design')
+        assert 'practical' in classifier.scores('Physics Laboratory')
+
+    def test_zero_credit_courses_lean_general(self):
+        assert CourseTypeClassifier().classify('新生研讨', None, 0)['type'] == 'general'
+
+    def test_custom_keywords_file(self, tmp_path, monkeypatch):
+        keywords = tmp_path / 'keywords.json'
+        keywords.write_text(json.dumps({'core': ['数据结构']}), encoding='utf-8')
+        monkeypatch.setenv('COURSE_KEYWORDS_FILE', str(keywords))
+
+        assert CourseTypeClassifier().classify('数据结构', None, 3)['type'] == 'core'
+
+    def test_classify_result_keeps_printed_types(self):
+        result = {'semesters': [{'courses': [
+            {'name_zh': '体育', 'credits': 1, 'course_type': {'type': 'core'}},
+            {'name_zh': '毕业论文', 'credits': 10, 'course_type': course_type_entry('required', 1.0)},
+        ]}]}
+
+        assert CourseTypeClassifier().classify_result(result) == 1
+
+        first, second = result['semesters'][0]['courses']
+        assert first['course_type']['type'] == 'general'
+        assert second['course_type']['type'] == 'required'
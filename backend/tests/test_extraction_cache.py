@@ -0,0 +1,160 @@
+"""
+Tests for the content-addressed extraction cache
+"""
+import os
+import pytest
+from unittest.mock import patch
+
+from student_applications.extraction_cache import ExtractionCache, get_extraction_cache, set_extraction_cache
+
+
+class TestExtractionCache:
+    """Tests for ExtractionCache"""
+
+    @pytest.fixture
+    def cache(self, tmp_path):
+        """Create a cache with a temporary disk tier"""
+        return ExtractionCache(directory=str(tmp_path / 'cache'))
+
+    @pytest.fixture
+    def sample_file(self, tmp_path):
+        """Create a file to hash"""
+        path = tmp_path / 'transcript.pdf'
+        path.write_bytes(b'%PDF-1.4 transcript bytes')
+        return str(path)
+
+    def test_make_key_depends_on_content_and_version(self, tmp_path, sample_file):
+        """Test that keys change with bytes and extractor version but not with the path"""
+        copy = tmp_path / 'copy.pdf'
+        copy.write_bytes(b'%PDF-1.4 transcript bytes')
+        other = tmp_path / 'other.pdf'
+        other.write_bytes(b'%PDF-1.4 other bytes')
+
+        key = ExtractionCache.make_key(sample_file, '1')
+        assert key == ExtractionCache.make_key(str(copy), '1')
+        assert key != ExtractionCache.make_key(str(other), '1')
+        assert key != ExtractionCache.make_key(sample_file, '2')
+        assert key != ExtractionCache.make_key(sample_file, '1', 'pdf|application/pdf')
+
+    def test_memory_hit(self, cache):
+        """Test hits from the memory tier"""
+        assert cache.get('abc') is None
+        cache.set('abc', '成绩单 text')
+
+        assert cache.get('abc') == '成绩单 text'
+        stats = cache.stats()
+        assert stats['memory_hits'] == 1
+        assert stats['misses'] == 1
+
+    def test_disk_tier_shared_between_instances(self, tmp_path):
+        """Test that another process (instance) reads entries from disk"""
+        directory = str(tmp_path / 'shared')
+        ExtractionCache(directory=directory).set('abc', 'shared text')
+
+        other = ExtractionCache(directory=directory)
+        assert other.get('abc') == 'shared text'
+        assert other.stats()['disk_hits'] == 1
+
+        # Promoted into memory on the second lookup
+        assert other.get('abc') == 'shared text'
+        assert other.stats()['memory_hits'] == 1
+
+    def test_memory_lru_eviction(self):
+        """Test that the least recently used entry is evicted first"""
+        cache = ExtractionCache(directory=None, max_memory_items=2)
+        cache.set('a', 'A')
+        cache.set('b', 'B')
+        cache.get('a')
+        cache.set('c', 'C')
+
+        assert cache.get('b') is None
+        assert cache.get('a') == 'A'
+        assert cache.get('c') == 'C'
+        assert cache.stats()['evictions'] == 1
+
+    def test_disk_size_eviction(self, tmp_path):
+        """Test that the disk tier is trimmed when it exceeds its size limit"""
+        cache = ExtractionCache(directory=str(tmp_path / 'cache'), max_memory_items=1, max_disk_bytes=250)
+        for i in range(5):
+            key = f"{i:02d}" + 'f' * 62
+            cache.set(key, 'x' * 100)
+            os.utime(cache._path_for(key), (i, i))
+
+        assert cache.stats()['disk_bytes'] <= 250
+        assert not os.path.exists(cache._path_for('00' + 'f' * 62))
+        assert os.path.exists(cache._path_for('04' + 'f' * 62))
+
+    def test_rewriting_an_entry_does_not_grow_disk_usage(self, cache):
+        """Test that overwriting an entry only counts the size difference"""
+        cache.set('abc', 'x' * 100)
+        cache.set('abc', 'x' * 40)
+
+        assert cache.stats()['disk_bytes'] == 40
+
+    def test_failed_write_leaves_no_temp_file(self, cache):
+        """Test that a write error removes the partial temp file"""
+        with patch('student_applications.extraction_cache.os.replace', side_effect=OSError('disk full')):
+            cache.set('abc', 'text')
+
+        directory = os.path.dirname(cache._path_for('abc'))
+        assert os.listdir(directory) == []
+        assert cache.stats()['disk_bytes'] == 0
+        # The memory tier still has the text
+        assert cache.get('abc') == 'text'
+
+    def test_clear(self, cache):
+        """Test clearing both tiers"""
+        cache.set('abc', 'text')
+        cache.clear()
+
+        assert cache.get('abc') is None
+        assert cache.stats()['disk_bytes'] == 0
+
+
+class TestCachedExtraction:
+    """Tests for extract_text_from_file with the cache enabled"""
+
+    @pytest.fixture(autouse=True)
+    def enabled_cache(self, tmp_path, monkeypatch):
+        """Enable a temporary cache for each test"""
+        monkeypatch.setenv('EXTRACTION_CACHE_ENABLED', 'true')
+        cache = ExtractionCache(directory=str(tmp_path / 'cache'))
+        set_extraction_cache(cache)
+        yield cache
+        set_extraction_cache(None)
+
+    def test_repeat_extraction_uses_cache(self, tmp_path, enabled_cache):
+        """Test that the extractor runs once for identical file bytes"""
+        from student_applications.utils import extract_text_from_file
+
+        first = tmp_path / 'ielts.pdf'
+        first.write_bytes(b'%PDF-1.4 ielts')
+        second = tmp_path / 'ielts_again.pdf'
+        second.write_bytes(b'%PDF-1.4 ielts')
+
+        with patch('student_applications.utils.extract_text_from_pdf') as mock_pdf:
+            mock_pdf.return_value = 'Overall Band Score 7.5'
+            assert extract_text_from_file(str(first)) == 'Overall Band Score 7.5'
+            assert extract_text_from_file(str(second)) == 'Overall Band Score 7.5'
+
+        assert mock_pdf.call_count == 1
+        assert enabled_cache.stats()['memory_hits'] == 1
+
+    def test_empty_results_not_cached(self, tmp_path, enabled_cache):
+        """Test that failed (empty) extractions are retried"""
+        from student_applications.utils import extract_text_from_file
+
+        path = tmp_path / 'scan.png'
+        path.write_bytes(b'\x89PNG fake')
+
+        with patch('student_applications.utils.extract_text_from_image') as mock_image:
+            mock_image.return_value = ''
+            extract_text_from_file(str(path))
+            extract_text_from_file(str(path))
+
+        assert mock_image.call_count == 2
+
+    def test_disabled_cache(self, monkeypatch):
+        """Test that the cache can be disabled"""
+        monkeypatch.setenv('EXTRACTION_CACHE_ENABLED', 'false')
+        assert get_extraction_cache() is None
@@ -0,0 +1,122 @@
+"""
+Tests for the rule-based applicant field extractor
+"""
+import pytest
+from unittest.mock import patch
+
+from student_applications.field_rules import (
+    extract_rule_fields, required_fields, normalize_date, overall_band,
+    empty_result, apply_rule_fields, DEFAULT_REQUIRED_FIELDS
+)
+from student_applications.schemas import APPLICATION_RESPONSE_SCHEMA, prune_schema
+
+IELTS_REPORT = """IELTS Test Report Form
+Test Report Form Number: 19CN012345ZHAS001A
+Date of Test 12/MAR/2023
+Listening 8.0 Reading 7.5 Writing 6.5 Speaking 6.5
+Overall Band Score 7.0
+Passport No: E12345678"""
+
+TRANSCRIPT = """北京大学本科生成绩单
+姓名：张三性别：男
+学号：2018012345
+学校：北京大学信息科学技术学院
+专业：计算机科学与技术 学制：4年
+GPA: 3.62/4.0"""
+
+
+class TestExtractRuleFields:
+    """Tests for extract_rule_fields"""
+
+    def test_ielts_report(self):
+        fields = extract_rule_fields({'ielts_score': IELTS_REPORT})
+
+        assert fields['language_test.test_type'] == 'IELTS'
+        assert fields['language_test.reference_number'] == '19CN012345ZHAS001A'
+        assert fields['language_test.test_date'] == '2023-03-12'
+        assert fields['language_test.total_score'] == '7.0'
+        assert fields['language_test.sections.listening'] == '8.0'
+        assert fields['language_test.sections.speaking'] == '6.5'
+        assert fields['applicant_info.passport_number'] == 'E12345678'
+
+    def test_inconsistent_band_scores_are_ignored(self):
+        """Test that bands that do not average to the overall score are left to the model"""
+        report = IELTS_REPORT.replace('Overall Band Score 7.0', 'Overall Band Score 8.5')
+
+        fields = extract_rule_fields({'ielts_score': report})
+
+        assert 'language_test.total_score' not in fields
+        assert 'language_test.sections.listening' not in fields
+
+    def test_mention_of_ielts_is_not_a_report(self):
+        assert extract_rule_fields({'resume': '准备参加IELTS考试'}) == {}
+
+    def test_labelled_fields_from_table_text(self):
+        fields = extract_rule_fields({'transcript': TRANSCRIPT})
+
+        assert fields['applicant_info.name'] == '张三'
+        assert fields['applicant_info.gender'] == '男'
+        assert fields['education_background.university'] == '北京大学'
+        assert fields['education_background.major'] == '计算机科学与技术'
+        assert fields['education_background.gpa.score'] == '3.62'
+        assert fields['education_background.gpa.scale'] == '4.0'
+
+    def test_single_contact_details(self):
+        fields = extract_rule_fields({'resume': '邮箱：ZhangSan@Example.com 手机：+86 138-0013-8000'})
+
+        assert fields['applicant_info.email'] == 'zhangsan@example.com'
+        assert fields['applicant_info.phone'] == '13800138000'
+
+    def test_conflicting_values_are_left_unresolved(self):
+        """Test that several emails or names (e.g. recommenders) resolve nothing"""
+        fields = extract_rule_fields({
+            'resume': 'zhangsan@example.com 推荐人 lisi@example.com',
+            'transcript': '姓名：张三',
+            'degree_certificate': '姓名：张山'
+        })
+
+        assert 'applicant_info.email' not in fields
+        assert 'applicant_info.name' not in fields
+
+
+class TestHelpers:
+    """Tests for the rule extraction helpers"""
+
+    @pytest.mark.parametrize('text, expected', [
+        ('2023-03-12', '2023-03-12'),
+        ('2000年1月2日', '2000-01-02'),
+        ('12/MAR/2023', '2023-03-12'),
+        ('5 September 2022', '2022-09-05'),
+        ('32/13/2023', None),
+    ])
+    def test_normalize_date(self, text, expected):
+        assert normalize_date(text) == expected
+
+    def test_overall_band_rounding(self):
+        assert overall_band({'l': 6.5, 'r': 6.5, 'w': 5.0, 's': 7.0}) == 6.5  # 6.25 rounds up
+        assert overall_band({'l': 4.0, 'r': 3.5, 'w': 4.0, 's': 4.0}) == 4.0  # 3.875
+        assert overall_band({'l': 6.5, 'r': 6.5, 'w': 5.5, 's': 6.0}) == 6.0  # 6.125
+
+    def test_required_fields(self):
+        assert required_fields({'transcript': 'x'}) == DEFAULT_REQUIRED_FIELDS
+        assert 'work_experience' in required_fields({'resume': 'x'})
+        with patch.dict('os.environ', {'RULE_REQUIRED_FIELDS': 'applicant_info.email'}):
+            assert required_fields({'resume': 'x'}) == ['applicant_info.email']
+
+    def test_apply_rule_fields(self):
+        result = apply_rule_fields(empty_result(), {'language_test.sections.reading': '7.5'})
+
+        assert result['language_test']['sections']['reading'] == '7.5'
+        assert result['work_experience'] == []
+        assert result['applicant_info']['name'] is None
+
+    def test_prune_schema(self):
+        paths = {'applicant_info.email', 'language_test.test_type', 'language_test.test_date',
+                 'language_test.reference_number', 'language_test.total_score', 'language_test.sections'}
+
+        pruned = prune_schema(APPLICATION_RESPONSE_SCHEMA, paths)
+
+        assert 'email' not in pruned['properties']['applicant_info']['properties']
+        assert 'email' not in pruned['properties']['applicant_info']['property_ordering']
+        assert 'language_test' not in pruned['properties']
+        assert 'email' in APPLICATION_RESPONSE_SCHEMA['properties']['applicant_info']['properties']
@@ -0,0 +1,104 @@
+"""
+Tests for the shared GenAI client factory
+"""
+import os
+import pytest
+from unittest.mock import patch
+
+from student_applications import genai_client
+from student_applications.genai_client import get_genai_client, set_genai_client, warm_genai_client
+
+
+class TestGenAIClientFactory:
+    """Tests for get_genai_client and warm_genai_client"""
+
+    @pytest.fixture
+    def mock_genai(self, monkeypatch):
+        """Mock google-genai library with an API key configured"""
+        monkeypatch.setenv('GOOGLE_GENAI_API_KEY', 'test-api-key')
+        with patch('student_applications.genai_client.genai') as mock_genai:
+            yield mock_genai
+
+    def test_services_share_one_client(self, mock_genai):
+        """Test that both services reuse the process-wide client"""
+        from student_applications.services import StudentApplicationService, TranscriptVerificationService
+
+        first = StudentApplicationService()
+        second = TranscriptVerificationService()
+
+        assert first.client is second.client is get_genai_client()
+        assert mock_genai.Client.call_count == 1
+
+    def test_connection_pool_is_configured(self, mock_genai, monkeypatch):
+        """Test that the pool size and timeout are passed to the HTTP client"""
+        from google.genai import types
+
+        monkeypatch.setenv('GENAI_POOL_SIZE', '4')
+        monkeypatch.setenv('GENAI_TIMEOUT', '30')
+        mock_genai.types = types
+
+        get_genai_client()
+
+        http_options = mock_genai.Client.call_args[1]['http_options']
+        assert http_options.client_args['limits'].max_connections == 4
+        assert http_options.client_args['limits'].max_keepalive_connections == 4
+        assert http_options.timeout == 30000
+
+    def test_missing_api_key(self, monkeypatch):
+        """Test that a missing key is reported like the services used to"""
+        monkeypatch.delenv('GOOGLE_GENAI_API_KEY', raising=False)
+
+        with pytest.raises(ValueError, match='GOOGLE_GENAI_API_KEY environment variable is required'):
+            get_genai_client()
+
+    def test_new_client_after_fork(self, mock_genai):
+        """Test that a forked worker does not reuse its parent's client"""
+        get_genai_client()
+        get_genai_client()
+        assert mock_genai.Client.call_count == 1
+
+        with patch.object(genai_client.os, 'getpid', return_value=os.getpid() + 1):
+            get_genai_client()
+
+        assert mock_genai.Client.call_count == 2
+
+    def test_warm_up_opens_connection(self, mock_genai, monkeypatch):
+        """Test that warming up creates the client and makes a metadata request"""
+        monkeypatch.setenv('GENAI_WARMUP', 'true')
+
+        warm_genai_client(background=False)
+
+        mock_genai.Client.return_value.models.get.assert_called_once()
+
+    def test_warm_up_failure_is_ignored(self, mock_genai, monkeypatch):
+        """Test that a failed warm-up request does not raise"""
+        monkeypatch.setenv('GENAI_WARMUP', 'true')
+        mock_genai.Client.return_value.models.get.side_effect = RuntimeError('offline')
+
+        warm_genai_client(background=False)
+
+        assert get_genai_client() is mock_genai.Client.return_value
+
+    def test_warm_up_disabled(self, mock_genai, monkeypatch):
+        """Test that GENAI_WARMUP=false skips warming"""
+        monkeypatch.setenv('GENAI_WARMUP', 'false')
+
+        assert warm_genai_client() is None
+        assert not mock_genai.Client.called
+
+
+class TestServicePlaceholders:
+    """Tests for the mock services used while no client can be created"""
+
+    def test_mock_service_replaced_once_client_available(self, monkeypatch):
+        """Test that get_service retries the factory instead of keeping the mock forever"""
+        from student_applications import routes
+
+        monkeypatch.setattr(routes, 'service', None)
+        monkeypatch.delenv('GOOGLE_GENAI_API_KEY', raising=False)
+        assert isinstance(routes.get_service(), routes.MockService)
+
+        monkeypatch.setenv('GOOGLE_GENAI_API_KEY', 'test-api-key')
+        with patch('student_applications.genai_client.genai'):
+            set_genai_client(None)
+            assert not isinstance(routes.get_service(), routes.MockService)
@@ -0,0 +1,188 @@
+"""
+Tests for the credit, GPA and grade-scale engine
+"""
+import copy
+import json
+import random
+
+import pytest
+
+from student_applications import gpa
+from student_applications.gpa import GPAEngine
+
+
+def _transcript(courses_by_semester, **student_info):
+    return {
+        'student_info': dict(student_info),
+        'semesters': [{'courses': courses} for courses in courses_by_semester],
+        'academic_summary': {}
+    }
+
+
+class TestConvert:
+    """Tests for single-grade conversion between scales"""
+
+    def test_percent_letter_and_five_level_grades(self):
+        engine = GPAEngine()
+
+        assert engine.convert('92', '4.0') == 4.0
+        assert engine.convert(86, '4.0') == 3.7
+        assert engine.convert('59', '4.0') == 0.0
+        assert engine.convert('A+', '4.3') == 4.3
+        assert engine.convert('A+', '4.0') == 4.0
+        assert engine.convert('良好', '4.0') == 3.7
+        assert engine.convert('Excellent', '5.0') == 5.0
+        assert engine.convert('B', 100) == 83
+
+    def test_pass_fail_and_unreadable_grades_have_no_points(self):
+        engine = GPAEngine()
+
+        assert engine.convert('通过', '4.0') is None
+        assert engine.convert('缓考', '4.0') is None
+        assert engine.convert(None, '4.0') is None
+
+    def test_custom_tables_from_file(self, tmp_path, monkeypatch):
+        tables = tmp_path / 'scales.json'
+        tables.write_text(json.dumps({
+            'scales': {'4.0': {'percent': [[80, 4.0], [0, 1.0]]}},
+            'levels': {'良好': 80}
+        }), encoding='utf-8')
+        monkeypatch.setenv('GPA_SCALES_FILE', str(tables))
+        engine = GPAEngine()
+
+        assert engine.convert('良好', '4.0') == 4.0
+        assert engine.convert('75', '4.0') == 1.0
+        assert engine.convert('A-', '4.0') == 3.7
+
+
+class TestRecompute:
+    """Tests for recomputing verification results"""
+
+    def test_weighted_gpas_and_totals(self):
+        result = _transcript([
+            [{'credits': 3, 'grade': '92'}, {'credits': '2学分', 'grade': '良好'}, {'credits': 1, 'grade': '通过'}],
+            [{'credits': 4, 'grade': 'B+'}]
+        ], gpa_scale=4.0)
+
+        GPAEngine().recompute(result)
+
+        first, second = result['semesters']
+        assert first['total_credits'] == 6
+        assert first['semester_gpa'] == round((3 * 4.0 + 2 * 3.7) / 5, 2)
+        assert second['semester_gpa'] == 3.3
+        assert result['academic_summary']['total_credits'] == 10
+        assert result['academic_summary']['total_courses'] == 4
+        assert result['student_info']['overall_gpa'] == round((12 + 7.4 + 13.2) / 9, 2)
+
+    def test_printed_grade_points_win_on_the_transcripts_own_scale(self):
+        result = _transcript([[{'credits': 2, 'grade': '85', 'grade_points': 3.5}]], gpa_scale='4.0')
+
+        GPAEngine().recompute(result)
+
+        check = result['academic_summary']['gpa_check']
+        assert result['student_info']['overall_gpa'] == 3.5
+        assert check['equivalents']['4.0'] == 3.7
+        assert check['equivalents']['100'] == 85
+
+    def test_model_numbers_that_disagree_are_flagged(self):
+        result = _transcript([[{'credits': 3, 'grade': 'A'}]], overall_gpa='3.6/4.0')
+        result['semesters'][0].update({'semester_gpa': 4.0, 'total_credits': 4})
+        result['academic_summary']['total_courses'] = 1
+
+        GPAEngine().recompute(result)
+
+        mismatches = result['academic_summary']['gpa_check']['mismatches']
+        assert {item['field'] for item in mismatches} == {
+            'semesters[0].total_credits', 'student_info.overall_gpa'
+        }
+        assert result['semesters'][0]['total_credits'] == 3
+        assert result['academic_summary']['gpa_check']['overall_gpa'] == 4.0
+
+    def test_missing_gpa_is_filled_on_the_default_scale(self):
+        result = _transcript([[{'credits': 3, 'grade': 'A'}]])
+
+        GPAEngine().recompute(result)
+
+        assert result['student_info']['overall_gpa'] == 4.0
+        assert result['student_info']['gpa_scale'] == 4.0
+
+    def test_printed_gpas_are_kept(self):
+        result = _transcript([[{'credits': 3, 'grade': '86'}]], overall_gpa='3.6/4.0', gpa_scale=4.0)
+        result['semesters'][0]['semester_gpa'] = 3.5
+
+        GPAEngine().recompute(result)
+
+        check = result['academic_summary']['gpa_check']
+        assert result['student_info']['overall_gpa'] == '3.6/4.0'
+        assert result['semesters'][0]['semester_gpa'] == 3.5
+        assert check['overall_gpa'] == 3.7
+        assert check['semester_gpas'] == [3.7]
+
+    def test_small_differences_are_within_tolerance(self):
+        result = _transcript([[{'credits': 3, 'grade': '86'}]], overall_gpa=3.68)
+
+        GPAEngine(tolerance=0.05).recompute(result)
+
+        assert result['academic_summary']['gpa_check']['mismatches'] == []
+
+    def test_transcript_without_graded_courses(self):
+        result = _transcript([[{'credits': 1, 'grade': '合格'}]], overall_gpa=3.2)
+
+        GPAEngine().recompute(result)
+
+        assert result['student_info']['overall_gpa'] == 3.2
+        assert result['academic_summary']['gpa_check']['overall_gpa'] is None
+        assert result['academic_summary']['total_credits'] == 1
+
+    @pytest.mark.parametrize('use_numpy', [True, False])
+    def test_missing_credits_keep_model_totals(self, use_numpy, monkeypatch):
+        if use_numpy and not gpa.NUMPY_AVAILABLE:
+            pytest.skip('numpy not installed')
+        monkeypatch.setattr(gpa, 'NUMPY_AVAILABLE', use_numpy)
+        result = {
+            'semesters': [{'total_credits': 20, 'courses': [{'credits': None, 'grade': '85'},
+                                                            {'credits': '', 'grade': '90'}]}],
+            'academic_summary': {'total_credits': 20}
+        }
+
+        GPAEngine().recompute(result)
+
+        assert result['semesters'][0]['total_credits'] == 20
+        assert result['academic_summary']['total_credits'] == 20
+        assert result['academic_summary']['total_courses'] == 2
+        assert result['academic_summary']['gpa_check']['mismatches'] == []
+        assert 'student_info' not in result
+
+    def test_batch_keeps_each_transcripts_scale(self):
+        results = [
+            _transcript([[{'credits': 2, 'grade': '95'}]], gpa_scale=100),
+            _transcript([[{'credits': 2, 'grade': '95'}]], gpa_scale=4.3),
+        ]
+
+        GPAEngine().recompute_batch(results)
+
+        assert results[0]['student_info']['overall_gpa'] == 95
+        assert results[1]['student_info']['overall_gpa'] == 4.3
+
+
+@pytest.mark.skipif(not gpa.NUMPY_AVAILABLE, reason='numpy not installed')
+def test_numpy_and_python_paths_agree(monkeypatch):
+    rng = random.Random(7)
+    grades = ['95', '81', '62', '40', 'A', 'B-', 'F', '优秀', '中等', '及格', '通过', None, '3.3']
+    results = [
+        _transcript(
+            [[{'credits': rng.choice([1, 2, 3.5, '4学分', None]),
+               'grade': rng.choice(grades),
+               'grade_points': rng.choice([None, 3.0, 9])} for _ in range(6)] for _ in range(4)],
+            gpa_scale=rng.choice([None, 4, 4.3, 5, 100]), overall_gpa=3.0
+        )
+        for _ in range(200)
+    ]
+    vectorised = copy.deepcopy(results)
+    engine = GPAEngine()
+    engine.recompute_batch(vectorised)
+
+    monkeypatch.setattr(gpa, 'NUMPY_AVAILABLE', False)
+    engine.recompute_batch(results)
+
+    assert vectorised == results
@@ -0,0 +1,77 @@
+"""
+Tests for the background job queue
+"""
+import threading
+import pytest
+
+from student_applications.jobs import JobQueue, QueueFullError
+from student_applications.models import AnalysisJob
+
+
+class TestJobQueue:
+    """Tests for JobQueue"""
+
+    @pytest.fixture
+    def queue(self):
+        """Create a small job queue"""
+        queue = JobQueue(max_workers=1, max_pending=1)
+        yield queue
+        queue.shutdown()
+
+    def test_submit_and_wait(self, queue):
+        """Test that a job runs and its record is updated"""
+        calls = []
+
+        def work(job, value):
+            calls.append(value)
+            job.stage = 'done'
+
+        job = queue.submit('analyze', 'app-1', work, 42)
+        assert job.kind == 'analyze'
+
+        finished = queue.wait(job.id, timeout=5)
+        assert finished.status == 'completed'
+        assert calls == [42]
+
+        stored = AnalysisJob.get_by_id(job.id)
+        assert stored.status == 'completed'
+        assert stored.stage == 'done'
+        assert stored.target_id == 'app-1'
+
+    def test_failed_job(self, queue):
+        """Test that an exception marks the job as failed"""
+        def work(job):
+            raise RuntimeError('boom')
+
+        job = queue.submit('verify', 'verify-1', work)
+        finished = queue.wait(job.id, timeout=5)
+
+        assert finished.status == 'failed'
+        assert finished.error_message == 'boom'
+        assert AnalysisJob.get_by_id(job.id).status == 'failed'
+
+    def test_queue_full(self, queue):
+        """Test that jobs beyond workers plus backlog are rejected"""
+        release = threading.Event()
+
+        def work(job):
+            release.wait(5)
+
+        first = queue.submit('analyze', 'a', work)
+        second = queue.submit('analyze', 'b', work)
+        assert queue.active_count() == 2
+
+        with pytest.raises(QueueFullError):
+            queue.submit('analyze', 'c', work)
+
+        release.set()
+        assert queue.wait(first.id, timeout=5).status == 'completed'
+        assert queue.wait(second.id, timeout=5).status == 'completed'
+        assert queue.active_count() == 0
+
+    def test_wait_unknown_job(self, queue):
+        """Test waiting on a job this process never submitted"""
+        job = AnalysisJob(kind='analyze', target_id='x').save()
+
+        assert queue.wait(job.id, timeout=0).status == 'queued'
+        assert queue.wait('missing', timeout=0) is None
@@ -0,0 +1,77 @@
+"""
+Tests for JSON extraction from model responses
+"""
+import json
+import pytest
+
+from student_applications.json_extract import extract_json, scan_json_object, strip_leading_fence
+
+
+class TestExtractJson:
+    """Tests for extract_json and scan_json_object"""
+
+    @pytest.mark.parametrize('text', [
+        '{"name": "张三", "scores": [90, 85.5]}',
+        '```json\n{"name": "张三", "scores": [90, 85.5]}\n```',
+        '```\n{"name": "张三", "scores": [90, 85.5]}\n```\nLet me know if you need more.',
+        'Here is the result: {"name": "张三", "scores": [90, 85.5]} as requested',
+    ])
+    def test_complete_object_in_any_fencing(self, text):
+        """Test that complete objects are found whatever surrounds them"""
+        result, truncated = extract_json(text)
+
+        assert result == {'name': '张三', 'scores': [90, 85.5]}
+        assert truncated is False
+
+    def test_braces_and_fences_inside_strings(self):
+        """Test that brackets, quotes and fences inside strings are not structural"""
+        text = '```json\n{"note": "uses {braces} and ```fences``` and \\"quotes\\"", "ok": true}\n```'
+
+        result, truncated = extract_json(text)
+
+        assert result['note'] == 'uses {braces} and ```fences``` and "quotes"'
+        assert result['ok'] is True
+        assert truncated is False
+
+    def test_json_fence_preferred_over_prose_braces(self):
+        """Test that a ```json block wins over braces in the preceding prose"""
+        text = 'Fields like {name} are filled below.\n```json\n{"name": "李四"}\n```'
+
+        assert extract_json(text) == ({'name': '李四'}, False)
+
+    @pytest.mark.parametrize('text, expected', [
+        ('{"a": 1, "b": "unfinished str', {'a': 1, 'b': 'unfinished str'}),
+        ('{"a": 1, "b": ', {'a': 1}),
+        ('{"a": 1, "b"', {'a': 1}),
+        ('{"a": 1,', {'a': 1}),
+        ('{"a": [1, 2, 3', {'a': [1, 2]}),
+        ('{"a": [1, 2, 3,', {'a': [1, 2, 3]}),
+        ('{"a": {"b": [{"c": tru', {'a': {'b': [{}]}}),
+        ('```json\n{"courses": [{"name": "高等数学", "credits": 4}, {"name": "线性', {
+            'courses': [{'name': '高等数学', 'credits': 4}, {'name': '线性'}]
+        }),
+        ('{"a": "ends with escape \\', {'a': 'ends with escape '}),
+    ])
+    def test_truncated_tail_is_repaired(self, text, expected):
+        """Test that truncated responses are cut back to the last complete value and closed"""
+        result, truncated = extract_json(text)
+
+        assert result == expected
+        assert truncated is True
+
+    def test_repaired_text_is_valid_json(self):
+        """Test that the repaired text parses on its own"""
+        json_text, truncated = scan_json_object('{"a": [{"b": "x"}, {"c": 12')
+
+        assert truncated is True
+        assert json.loads(json_text) == {'a': [{'b': 'x'}, {}]}
+
+    def test_no_object(self):
+        """Test that text without an object raises JSONDecodeError"""
+        with pytest.raises(json.JSONDecodeError):
+            extract_json('Not a valid JSON')
+
+    def test_strip_leading_fence(self):
+        """Test removal of a fence line at the start of a continuation"""
+        assert strip_leading_fence('```json\n"rest": 1}') == '"rest": 1}'
+        assert strip_leading_fence('"rest": 1}') == '"rest": 1}'
@@ -0,0 +1,137 @@
+"""
+Tests for the GenAI response cache
+"""
+import json
+import time
+import pytest
+from unittest.mock import Mock, patch
+
+from student_applications.llm_cache import LLMResponseCache, get_llm_cache, set_llm_cache
+
+
+class TestLLMResponseCache:
+    """Tests for LLMResponseCache"""
+
+    @pytest.fixture
+    def cache(self, tmp_path):
+        """Create a cache in a temporary database"""
+        return LLMResponseCache(path=str(tmp_path / 'llm.db'))
+
+    def test_make_key(self):
+        """Test that every input changes the key"""
+        config = {'temperature': 0.1, 'max_output_tokens': 4096}
+        key = LLMResponseCache.make_key('prompt', 'content', 'gemini-pro', config)
+
+        assert key == LLMResponseCache.make_key('prompt', 'content', 'gemini-pro', dict(reversed(config.items())))
+        assert key != LLMResponseCache.make_key('prompt2', 'content', 'gemini-pro', config)
+        assert key != LLMResponseCache.make_key('prompt', 'content2', 'gemini-pro', config)
+        assert key != LLMResponseCache.make_key('prompt', 'content', 'gemini-2.5-pro', config)
+        assert key != LLMResponseCache.make_key('prompt', 'content', 'gemini-pro', {'temperature': 0.2})
+
+    def test_get_and_set(self, cache):
+        """Test storing and reading a response"""
+        assert cache.get('k') is None
+        cache.set('k', 'gemini-pro', '{"a": 1}')
+
+        assert cache.get('k') == '{"a": 1}'
+        stats = cache.stats()
+        assert stats['hits'] == 1
+        assert stats['misses'] == 1
+        assert stats['entries'] == 1
+
+    def test_ttl_expiry(self, tmp_path):
+        """Test that expired entries are not returned"""
+        cache = LLMResponseCache(path=str(tmp_path / 'llm.db'), ttl_seconds=60)
+        cache.set('k', 'gemini-pro', 'old')
+
+        with patch('student_applications.llm_cache.time.time', return_value=time.time() + 120):
+            assert cache.get('k') is None
+        assert cache.stats()['entries'] == 0
+
+    def test_size_bounded_eviction(self, tmp_path):
+        """Test that the least recently used entries are evicted"""
+        cache = LLMResponseCache(path=str(tmp_path / 'llm.db'), max_entries=2)
+        now = time.time()
+        with patch('student_applications.llm_cache.time.time', side_effect=[now, now + 1, now + 2, now + 3]):
+            cache.set('a', 'm', 'A')
+            cache.set('b', 'm', 'B')
+            cache.get('a')
+            cache.set('c', 'm', 'C')
+
+        assert cache.get('b') is None
+        assert cache.get('a') == 'A'
+        assert cache.get('c') == 'C'
+
+    def test_disabled(self, monkeypatch):
+        """Test that the cache can be disabled"""
+        monkeypatch.setenv('LLM_CACHE_ENABLED', 'false')
+        assert get_llm_cache() is None
+
+
+class TestServiceResponseCaching:
+    """Tests for cached responses in the GenAI services"""
+
+    @pytest.fixture(autouse=True)
+    def enabled_cache(self, tmp_path, monkeypatch):
+        """Enable a temporary response cache"""
+        monkeypatch.setenv('LLM_CACHE_ENABLED', 'true')
+        monkeypatch.setenv('GOOGLE_GENAI_API_KEY', 'test-api-key')
+        set_llm_cache(LLMResponseCache(path=str(tmp_path / 'llm.db')))
+        yield
+        set_llm_cache(None)
+
+    @pytest.fixture
+    def mock_genai_client(self):
+        """Mock Google GenAI client"""
+        with patch('student_applications.genai_client.genai') as mock_genai:
+            mock_client = Mock()
+            mock_genai.Client.return_value = mock_client
+            yield mock_client
+
+    def test_analyze_documents_reuses_response(self, mock_genai_client):
+        """Test that identical input is answered from the cache"""
+        from student_applications.services import StudentApplicationService
+
+        service = StudentApplicationService()
+        mock_genai_client.models.generate_content.return_value = Mock(text=json.dumps({'applicant_info': {}}))
+
+        with patch.object(service, '_extract_document_texts', return_value={'resume': 'Resume text'}):
+            first = service.analyze_documents({})
+            second = service.analyze_documents({})
+            bypassed = service.analyze_documents({}, use_cache=False)
+
+        assert first['metadata']['cache_hit'] is False
+        assert second['metadata']['cache_hit'] is True
+        assert bypassed['metadata']['cache_hit'] is False
+        assert mock_genai_client.models.generate_content.call_count == 2
+
+    def test_unparseable_response_not_cached(self, mock_genai_client):
+        """Test that failed parses are not replayed"""
+        from student_applications.services import StudentApplicationService
+
+        service = StudentApplicationService()
+        mock_genai_client.models.generate_content.return_value = Mock(text='Not JSON')
+
+        with patch.object(service, '_extract_document_texts', return_value={'resume': 'Resume text'}):
+            service.analyze_documents({})
+            service.analyze_documents({})
+
+        assert mock_genai_client.models.generate_content.call_count == 2
+
+    def test_verify_transcript_reuses_fallback_response(self, mock_genai_client):
+        """Test that an answer cached from the fallback model is reused"""
+        from student_applications.services import TranscriptVerificationService
+
+        service = TranscriptVerificationService()
+        mock_genai_client.models.generate_content.side_effect = [
+            Exception('preview model unavailable'),
+            Mock(text=json.dumps({'student_info': {}, 'semesters': []})),
+        ]
+
+        with patch.object(service, '_extract_transcript_texts', return_value={'transcript': 'text'}):
+            first = service.verify_transcript({'transcript': {}}, 'single')
+            second = service.verify_transcript({'transcript': {}}, 'single')
+
+        assert first['metadata']['cache_hit'] is False
+        assert second['metadata']['cache_hit'] is True
+        assert mock_genai_client.models.generate_content.call_count == 2
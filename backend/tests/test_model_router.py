@@ -0,0 +1,263 @@
+"""
+Tests for per-model circuit breakers and health-aware routing
+"""
+import time
+import pytest
+from unittest.mock import Mock, patch
+
+from student_applications.model_router import (
+    ModelHealth, ModelRouter, HedgeBudget, RequestCancelled, configured_models,
+    get_model_health, hedge_delay, model_health_stats, new_hedge_budget
+)
+from student_applications.rate_limit import RateLimitExceeded
+
+
+class TestModelHealth:
+    """Tests for ModelHealth"""
+
+    def test_opens_after_consecutive_failures(self):
+        """Test that the circuit opens at the failure threshold and rejects calls"""
+        health = ModelHealth('model-a', failure_threshold=2, cooldown_seconds=60)
+
+        health.record_failure(0.1)
+        assert health.state == 'closed'
+        health.record_failure(0.1)
+
+        assert health.state == 'open'
+        assert not health.allow()
+        assert health.retry_in() > 0
+
+    def test_success_resets_failure_count(self):
+        """Test that only consecutive failures count towards the threshold"""
+        health = ModelHealth('model-a', failure_threshold=2)
+
+        health.record_failure(0.1)
+        health.record_success(0.1)
+        health.record_failure(0.1)
+
+        assert health.state == 'closed'
+        assert health.error_rate() == pytest.approx(2 / 3)
+
+    def test_half_open_admits_one_trial(self):
+        """Test that a cooled-down circuit lets exactly one trial call through"""
+        health = ModelHealth('model-a', failure_threshold=1, cooldown_seconds=0)
+        health.record_failure(0.1)
+
+        assert health.state == 'half_open'
+        assert health.allow()
+        assert not health.allow()
+
+        health.record_success(0.2)
+        assert health.state == 'closed'
+        assert health.allow()
+
+    def test_failed_trial_reopens(self):
+        """Test that a failed trial call opens the circuit again"""
+        health = ModelHealth('model-a', failure_threshold=3, cooldown_seconds=60)
+        health._opened_at = time.monotonic() - 120  # long cooled down
+        assert health.allow()
+
+        health.record_failure(0.1)
+
+        assert health.state == 'open'
+
+    def test_median_latency_of_successes(self):
+        """Test that latency statistics ignore failed calls"""
+        health = ModelHealth('model-a', window=3)
+        assert health.median_latency() is None
+
+        for latency in (1.0, 5.0, 3.0):
+            health.record_success(latency)
+        health.record_failure(100.0)
+
+        # The window keeps the last three calls
+        assert health.median_latency() == 5.0
+        assert health.stats()['calls'] == 3
+
+
+class TestModelRouter:
+    """Tests for ModelRouter"""
+
+    def test_falls_back_and_reports_model(self):
+        """Test that a failing model is followed by the next one in the chain"""
+        router = ModelRouter(['model-a', 'model-b'])
+        call = Mock(side_effect=[Exception('unavailable'), 'answer'])
+        attempts = []
+
+        result, model = router.run(call, attempts.append)
+
+        assert (result, model) == ('answer', 'model-b')
+        assert attempts == ['model-a', 'model-b']
+        assert get_model_health('model-a').error_rate() == 1.0
+
+    def test_skips_open_circuit(self):
+        """Test that a model with an open circuit is not called"""
+        router = ModelRouter(['model-a', 'model-b'])
+        with patch.dict('os.environ', {'MODEL_FAILURE_THRESHOLD': '1'}):
+            get_model_health('model-a').record_failure(0.1)
+        call = Mock(return_value='answer')
+
+        assert router.run(call) == ('answer', 'model-b')
+        call.assert_called_once_with('model-b')
+
+    def test_all_circuits_open_tries_soonest(self):
+        """Test that a request is still attempted when every circuit is open"""
+        router = ModelRouter(['model-a', 'model-b'])
+        with patch.dict('os.environ', {'MODEL_FAILURE_THRESHOLD': '1'}):
+            get_model_health('model-b').record_failure(0.1)
+            get_model_health('model-a').record_failure(0.1)
+
+        assert router.run(Mock(return_value='answer')) == ('answer', 'model-b')
+
+    def test_raises_last_error(self):
+        """Test that the last error surfaces when every model fails"""
+        router = ModelRouter(['model-a', 'model-b'])
+        call = Mock(side_effect=[Exception('first'), Exception('second')])
+
+        with pytest.raises(Exception, match='second'):
+            router.run(call)
+
+    def test_rate_limit_is_not_a_model_failure(self):
+        """Test that our own quota errors propagate without touching model health"""
+        router = ModelRouter(['model-a', 'model-b'])
+        call = Mock(side_effect=RateLimitExceeded(5))
+
+        with pytest.raises(RateLimitExceeded):
+            router.run(call)
+
+        call.assert_called_once_with('model-a')
+        assert get_model_health('model-a').stats()['calls'] == 0
+
+    def test_ranks_by_error_rate_then_latency(self):
+        """Test that unhealthy and slow models move down the chain"""
+        router = ModelRouter(['model-a', 'model-b', 'model-c'], latency_tolerance=2.0)
+        get_model_health('model-a').record_failure(0.1)
+        get_model_health('model-a').record_success(1.0)
+        get_model_health('model-b').record_success(10.0)
+        get_model_health('model-c').record_success(1.0)
+
+        assert router.ranked() == ['model-c', 'model-b', 'model-a']
+
+    def test_rejects_empty_chain(self):
+        with pytest.raises(ValueError):
+            ModelRouter([])
+
+    def test_health_stats(self):
+        """Test that statistics are reported for every model used"""
+        ModelRouter(['model-a']).run(Mock(return_value='answer'))
+
+        stats = model_health_stats()
+        assert stats['model-a']['state'] == 'closed'
+        assert stats['model-a']['calls'] == 1
+
+
+def _slow_then_fast(slow_model, delay=2.0):
+    """Call that is slow (until cancelled) on one model and immediate on the others"""
+    cancelled = []
+
+    def call(model, cancel_event):
+        if model == slow_model:
+            if cancel_event.wait(delay):
+                cancelled.append(model)
+                raise RequestCancelled(model)
+            return f'{model} answer'
+        return f'{model} answer'
+
+    return call, cancelled
+
+
+@pytest.fixture
+def short_hedge_delay():
+    with patch.dict('os.environ', {'GENAI_HEDGE_DEFAULT_DELAY': '0.05'}):
+        yield
+
+
+class TestHedging:
+    """Tests for ModelRouter.run_hedged"""
+
+    def test_fast_primary_is_not_hedged(self, short_hedge_delay):
+        router = ModelRouter(['model-a', 'model-b'])
+        attempts = []
+
+        result = router.run_hedged(lambda model, cancel: 'answer', HedgeBudget(1), on_attempt=attempts.append)
+
+        assert result == ('answer', 'model-a')
+        assert attempts == ['model-a']
+
+    def test_slow_primary_is_hedged_and_cancelled(self, short_hedge_delay):
+        """Test that the backup answer wins and the slow request is cancelled"""
+        router = ModelRouter(['model-a', 'model-b'])
+        call, cancelled = _slow_then_fast('model-a')
+        hedges = []
+        budget = HedgeBudget(1)
+
+        result = router.run_hedged(call, budget, on_hedge=lambda slow, backup, waited: hedges.append((slow, backup)))
+
+        assert result == ('model-b answer', 'model-b')
+        assert hedges == [('model-a', 'model-b')]
+        assert budget.remaining == 0
+        time.sleep(0.1)
+        assert cancelled == ['model-a']
+        # A lost race is not a failure of the slow model
+        assert get_model_health('model-a').stats()['calls'] == 0
+
+    def test_exhausted_budget_waits_for_primary(self, short_hedge_delay):
+        router = ModelRouter(['model-a', 'model-b'])
+        call, _ = _slow_then_fast('model-a', delay=0.2)
+
+        assert router.run_hedged(call, HedgeBudget(0)) == ('model-a answer', 'model-a')
+
+    def test_invalid_answer_waits_for_other_request(self, short_hedge_delay):
+        """Test that an answer failing validation does not win while another call is in flight"""
+        router = ModelRouter(['model-a', 'model-b'])
+
+        def call(model, cancel_event):
+            if model == 'model-a':
+                time.sleep(0.2)
+                return 'valid'
+            return 'invalid'
+
+        result = router.run_hedged(call, HedgeBudget(1), is_valid=lambda text: text == 'valid')
+
+        assert result == ('valid', 'model-a')
+
+    def test_failure_continues_down_chain(self, short_hedge_delay):
+        router = ModelRouter(['model-a', 'model-b'])
+
+        def call(model, cancel_event):
+            if model == 'model-a':
+                raise Exception('unavailable')
+            return 'answer'
+
+        assert router.run_hedged(call, HedgeBudget(0)) == ('answer', 'model-b')
+
+    def test_hedge_delay_uses_latency_percentile(self):
+        health = get_model_health('model-a')
+        for latency in range(1, 21):
+            health.record_success(float(latency))
+
+        with patch.dict('os.environ', {'GENAI_HEDGE_PERCENTILE': '90', 'GENAI_HEDGE_MIN_DELAY': '1'}):
+            assert hedge_delay('model-a') == 19.0
+        with patch.dict('os.environ', {'GENAI_HEDGE_DEFAULT_DELAY': '42'}):
+            assert hedge_delay('model-b') == 42.0
+
+    def test_budget_only_when_enabled(self):
+        with patch.dict('os.environ', {'GENAI_HEDGING': 'false'}):
+            assert new_hedge_budget() is None
+        with patch.dict('os.environ', {'GENAI_HEDGING': 'true', 'GENAI_HEDGE_MAX_PER_REQUEST': '2'}):
+            budget = new_hedge_budget()
+        assert [budget.spend(), budget.spend(), budget.spend()] == [True, True, False]
+
+
+class TestConfiguredModels:
+    """Tests for configured_models"""
+
+    def test_specific_variable_wins(self):
+        with patch.dict('os.environ', {'ANALYSIS_MODELS': 'x, y', 'GENAI_MODELS': 'z'}):
+            assert configured_models('ANALYSIS_MODELS') == ['x', 'y']
+
+    def test_falls_back_to_shared_list_then_default(self):
+        with patch.dict('os.environ', {'GENAI_MODELS': 'z'}):
+            assert configured_models('TRANSCRIPT_MODELS') == ['z']
+        with patch.dict('os.environ', {}, clear=True):
+            assert configured_models('TRANSCRIPT_MODELS') == ['gemini-3-pro-preview', 'gemini-2.5-pro']
@@ -0,0 +1,241 @@
+"""
+Tests for OCR of scanned PDF pages
+"""
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import Mock, patch, mock_open
+
+from PyPDF2 import PageObject
+from PyPDF2.generic import DictionaryObject, NameObject
+
+from student_applications import ocr
+from student_applications.ocr import OCRBatch, OCRStats, PageOCR, TesseractEngine, page_has_text_layer, recognize_images
+from student_applications.task_pool import TaskPool
+
+
+def _page(resources):
+    page = PageObject.create_blank_page(width=200, height=200)
+    page[NameObject('/Resources')] = resources
+    return page
+
+
+def _fonts():
+    return DictionaryObject({NameObject('/F1'): DictionaryObject({NameObject('/Type'): NameObject('/Font')})})
+
+
+class TestTextLayerDetection:
+    """Tests for page_has_text_layer"""
+
+    def test_page_without_fonts_is_a_scan(self):
+        image = DictionaryObject({NameObject('/Subtype'): NameObject('/Image')})
+        resources = DictionaryObject({NameObject('/XObject'): DictionaryObject({NameObject('/Im0'): image})})
+
+        assert not page_has_text_layer(PageObject.create_blank_page(width=200, height=200))
+        assert not page_has_text_layer(_page(resources))
+
+    def test_page_fonts(self):
+        assert page_has_text_layer(_page(DictionaryObject({NameObject('/Font'): _fonts()})))
+
+    def test_fonts_inside_form_xobject(self):
+        form = DictionaryObject({
+            NameObject('/Subtype'): NameObject('/Form'),
+            NameObject('/Resources'): DictionaryObject({NameObject('/Font'): _fonts()})
+        })
+        resources = DictionaryObject({NameObject('/XObject'): DictionaryObject({NameObject('/Fm0'): form})})
+
+        assert page_has_text_layer(_page(resources))
+
+    def test_unreadable_resources_count_as_text(self):
+        assert page_has_text_layer(Mock(get=Mock(side_effect=ValueError('broken'))))
+
+
+class TestPageOCR:
+    """Tests for PageOCR"""
+
+    def test_pages_are_recognised_concurrently_in_page_order(self):
+        def slow_ocr(item, dpi, lang, detect=False):
+            time.sleep(0.2)
+            return f'page {item[2]} at {dpi}', 0.2
+
+        with ThreadPoolExecutor(max_workers=4) as executor, \
+             patch('student_applications.ocr._get_ocr_pool', return_value=TaskPool(executor=executor)), \
+             patch('student_applications.ocr.recognize_item', side_effect=slow_ocr):
+            start = time.monotonic()
+            page_ocr = PageOCR('scan.pdf', [0, 1, 2, 3], dpi=200, workers=4)
+            texts = [page_ocr.text(index) for index in range(4)]
+            elapsed = time.monotonic() - start
+
+        assert texts == ['page 0 at 200', 'page 1 at 200', 'page 2 at 200', 'page 3 at 200']
+        assert elapsed < 0.6
+
+    def test_timed_out_and_failed_pages_are_empty(self):
+        def ocr_page(item, dpi, lang, detect=False):
+            if item[2] == 0:
+                time.sleep(0.5)
+            raise RuntimeError('tesseract crashed')
+
+        with ThreadPoolExecutor(max_workers=2) as executor, \
+             patch('student_applications.ocr._get_ocr_pool', return_value=TaskPool(executor=executor)), \
+             patch('student_applications.ocr.recognize_item', side_effect=ocr_page):
+            page_ocr = PageOCR('scan.pdf', [0, 1], workers=2, timeout=0.1)
+
+            assert page_ocr.text(0) == ''
+            assert page_ocr.text(1) == ''
+
+    def test_pages_queued_behind_other_documents_are_not_timed_out(self):
+        def ocr_page(item, dpi, lang, detect=False):
+            time.sleep(0.1)
+            return f'page {item[2]}', 0.1
+
+        with ThreadPoolExecutor(max_workers=2) as executor, \
+             patch('student_applications.ocr.recognize_item', side_effect=ocr_page):
+            pool = TaskPool(executor=executor)
+            # Another document keeps both workers busy for longer than the timeout
+            busy = [pool.submit(time.sleep, 0.4) for _ in range(2)]
+            with patch('student_applications.ocr._get_ocr_pool', return_value=pool):
+                page_ocr = PageOCR('scan.pdf', [0, 1, 2], workers=2, timeout=0.3)
+                assert page_ocr.texts() == ['page 0', 'page 1', 'page 2']
+            assert all(future.done() for future in busy)
+
+    def test_extraction_workers_ocr_in_process(self):
+        with patch.object(ocr, '_in_process_only', True), \
+             patch('student_applications.ocr._get_ocr_pool') as get_pool, \
+             patch('student_applications.ocr.recognize_item', return_value=('text', 0.1)):
+            assert PageOCR('scan.pdf', [0, 1], workers=4).texts() == ['text', 'text']
+        assert not get_pool.called
+
+
+class TestEngine:
+    """Tests for the per-process tesseract engines"""
+
+    def test_engine_is_loaded_once_per_language_set(self):
+        with patch.object(ocr, 'TESSEROCR_AVAILABLE', True), \
+             patch.object(ocr, 'tesserocr', create=True) as tesserocr, \
+             patch.object(ocr, '_engines', {}):
+            api = tesserocr.PyTessBaseAPI.return_value
+            api.GetUTF8Text.side_effect = ['first \n', 'second']
+
+            assert ocr.get_engine('eng').recognize('image 1') == 'first'
+            assert ocr.get_engine('eng').recognize('image 2') == 'second'
+            assert ocr.get_engine('eng').name == 'tesserocr'
+
+        tesserocr.PyTessBaseAPI.assert_called_once_with(lang='eng')
+        assert api.Clear.call_count == 2
+
+    def test_falls_back_to_the_tesseract_binary(self):
+        with patch.object(ocr, 'TESSEROCR_AVAILABLE', False), \
+             patch.object(ocr, 'pytesseract') as tesseract:
+            tesseract.image_to_string.return_value = ' text '
+            engine = TesseractEngine('eng+chi_sim')
+
+            assert engine.name == 'pytesseract'
+            assert engine.recognize('image') == 'text'
+            tesseract.image_to_string.assert_called_once_with('image', lang='eng+chi_sim')
+
+    def test_binary_calls_are_not_serialised(self):
+        with patch.object(ocr, 'TESSEROCR_AVAILABLE', False), \
+             patch.object(ocr, 'pytesseract') as tesseract:
+            tesseract.image_to_string.return_value = 'text'
+            engine = TesseractEngine('eng')
+            # Another thread is inside the engine; a pytesseract call must not wait for it
+            with engine._lock:
+                assert engine.recognize('image') == 'text'
+
+
+class TestBatchesAndStats:
+    """Tests for image batches and OCR statistics"""
+
+    def test_recognize_images_keeps_order(self):
+        with ThreadPoolExecutor(max_workers=3) as executor, \
+             patch('student_applications.ocr._get_ocr_pool', return_value=TaskPool(executor=executor)), \
+             patch('student_applications.ocr.get_ocr_workers', return_value=3), \
+             patch('student_applications.ocr.recognize_item', side_effect=lambda item, dpi, lang, detect=False: (item[1].upper(), 0.05)):
+            assert recognize_images(['a.png', 'b.png', 'c.png']) == ['A.PNG', 'B.PNG', 'C.PNG']
+
+    def test_stats_track_queue_depth_and_latency(self):
+        stats = OCRStats(window=10)
+        stats.submitted(3)
+        stats.finished(0.2)
+        stats.finished(0.4)
+
+        snapshot = stats.snapshot()
+        assert snapshot['queue_depth'] == 1
+        assert snapshot['completed'] == 2
+        assert snapshot['latency']['p50'] == 0.4
+        stats.finished(None)
+        assert stats.snapshot()['failed'] == 1
+        assert stats.snapshot()['queue_depth'] == 0
+
+    def test_extraction_workers_report_their_ocr_work(self):
+        worker = OCRStats()
+        mark = worker.mark()
+        worker.submitted(2)
+        worker.finished(0.5)
+        worker.finished(None)
+        report = worker.since(mark)
+        assert report['latencies'] == [0.5] and report['failed'] == 1
+
+        web = OCRStats()
+        web.merge(dict(report, pid=-1))
+        assert web.snapshot()['completed'] == 1
+        assert web.snapshot()['failed'] == 1
+        assert web.snapshot()['latency']['mean'] == 0.5
+        # Work recorded by this process itself is not counted twice
+        web.merge(report)
+        assert web.snapshot()['completed'] == 1
+
+    def test_batch_items_have_their_own_languages(self, monkeypatch):
+        monkeypatch.setenv('OCR_LANG', 'eng+chi_sim')
+        monkeypatch.setenv('OCR_LANG_DETECT', 'true')
+        monkeypatch.setattr(ocr, 'TESSEROCR_AVAILABLE', True)
+        calls = []
+        with patch('student_applications.ocr.recognize_item',
+                   side_effect=lambda item, dpi, lang, detect=False: calls.append((item[1], lang, detect)) or ('', 0.1)):
+            recognize_images(['ielts.png', 'cv.png'], langs=['eng', None])
+        assert calls == [('ielts.png', 'eng', False), ('cv.png', 'eng+chi_sim', True)]
+
+    def test_in_process_batches_are_counted(self):
+        stats = OCRStats()
+        with patch.object(ocr, '_stats', stats), \
+             patch('student_applications.ocr.recognize_item', return_value=('text', 0.3)):
+            assert OCRBatch({'a': ('image', 'a.png')}, workers=1).texts() == ['text']
+
+        assert stats.snapshot()['completed'] == 1
+        assert stats.snapshot()['queue_depth'] == 0
+
+    def test_health_reports_ocr_stats(self, client):
+        response = client.get('/api/health')
+
+        assert 'queue_depth' in response.get_json()['ocr']
+
+
+@patch('student_applications.utils.PYPDF2_AVAILABLE', True)
+def test_scanned_pages_skip_text_extraction():
+    """Scanned pages are OCR'd instead of being run through the text extractors"""
+    from student_applications.utils import iter_pdf_pages
+
+    text_page = Mock(**{'extract_text.return_value': 'x' * 200})
+    scan = Mock()
+    reader = Mock(pages=[text_page, scan])
+
+    with patch('builtins.open', mock_open(read_data=b'PDF')), \
+         patch('student_applications.utils.PyPDF2.PdfReader', return_value=reader), \
+         patch('student_applications.utils.page_has_text_layer', side_effect=lambda page: page is text_page), \
+         patch('student_applications.utils.pdf_ocr_available', return_value=True), \
+         patch('student_applications.ocr.recognize_item', return_value=('scanned text', 0.1)) as ocr_page:
+        pages = list(iter_pdf_pages('doc.pdf'))
+
+    assert pages == [(0, 'x' * 200, 'pypdf2'), (1, 'scanned text', 'ocr')]
+    assert not scan.extract_text.called
+    assert ocr_page.call_args[0][0] == ('pdf', 'doc.pdf', 1)
+
+
+def test_ocr_unavailable_without_tesseract():
+    ocr.tesseract_version.cache_clear()
+    try:
+        with patch.object(ocr, 'pytesseract') as tesseract:
+            tesseract.get_tesseract_version.side_effect = OSError('not installed')
+            assert not ocr.ocr_available()
+            assert ocr.ocr_signature() == 'off'
+    finally:
+        ocr.tesseract_version.cache_clear()
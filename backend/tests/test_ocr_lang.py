@@ -0,0 +1,165 @@
+"""
+Tests for OCR language selection
+"""
+import os
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import Mock, patch
+
+import pytest
+from PIL import Image
+
+from student_applications import ocr
+from student_applications.ocr import OCRBatch, detect_lang, recognize_item
+from student_applications.ocr_lang import (
+    lang_for_file_key, lang_for_probe_text, narrow_lang, probe_image, script_counts, PROBE_LONG_SIDE
+)
+from student_applications.task_pool import TaskPool
+
+
+ENGLISH = 'Test Report Form Candidate Number Listening Reading Writing Speaking Overall Band Score'
+CHINESE = '北京大学本科毕业生成绩单课程名称学分成绩'
+
+
+@pytest.fixture
+def detection(monkeypatch):
+    monkeypatch.setenv('OCR_LANG_DETECT', 'true')
+    monkeypatch.setenv('OCR_LANG', 'eng+chi_sim')
+    monkeypatch.setattr(ocr, 'TESSEROCR_AVAILABLE', True)
+
+
+class TestLanguagePolicy:
+    """Tests for file key hints and script mapping"""
+
+    def test_narrow_lang_stays_within_configured_set(self):
+        assert narrow_lang('eng', 'eng+chi_sim') == 'eng'
+        assert narrow_lang('chi_tra', 'eng+chi_sim') == 'eng+chi_sim'
+        assert narrow_lang(None, 'eng+chi_sim') == 'eng+chi_sim'
+
+    def test_file_keys_fix_the_language(self, detection):
+        assert lang_for_file_key('ielts_score') == 'eng'
+        assert lang_for_file_key('transcript_en') == 'eng'
+        assert lang_for_file_key('transcript_zh') == 'chi_sim'
+        assert lang_for_file_key('transcript') is None
+        assert lang_for_file_key('degree_certificate') is None
+
+    def test_file_keys_ignored_when_detection_disabled(self, monkeypatch):
+        monkeypatch.setenv('OCR_LANG_DETECT', 'false')
+        assert lang_for_file_key('ielts_score') is None
+
+    def test_single_script_pages_narrow_the_set(self):
+        assert lang_for_probe_text(ENGLISH, 'eng+chi_sim') == 'eng'
+        assert lang_for_probe_text(CHINESE + ' 2023', 'eng+chi_sim') == 'chi_sim'
+        assert lang_for_probe_text(CHINESE, 'eng') == 'eng'
+
+    def test_mixed_pages_keep_the_set(self):
+        # Mostly Han, but with English course names: both models are needed
+        page = CHINESE * 3 + ' Data Structures Operating Systems Computer Networks'
+        assert script_counts(page) == {'Latin': 6, 'Han': 60}
+        assert lang_for_probe_text(page, 'eng+chi_sim') == 'eng+chi_sim'
+
+    def test_unreadable_probes_keep_the_set(self):
+        assert lang_for_probe_text('', 'eng+chi_sim') == 'eng+chi_sim'
+        assert lang_for_probe_text('| 1 2 ~ Ab', 'eng+chi_sim') == 'eng+chi_sim'
+
+    def test_probe_image_is_reduced(self):
+        image = probe_image(Image.new('L', (2480, 3508), 255))
+        assert max(image.size) == PROBE_LONG_SIDE
+        small = Image.new('L', (800, 600), 255)
+        assert probe_image(small) is small
+
+
+class TestScriptDetection:
+    """Tests for per-page language detection"""
+
+    def test_probe_reads_reduced_page_with_combined_set(self, detection):
+        engine = Mock(name='engine')
+        engine.name = 'tesserocr'
+        engine.recognize.return_value = ENGLISH
+        with patch('student_applications.ocr.get_engine', return_value=engine) as get_engine:
+            assert detect_lang(Image.new('L', (2480, 3508), 255), 'eng+chi_sim') == 'eng'
+        get_engine.assert_called_once_with('eng+chi_sim')
+        assert max(engine.recognize.call_args[0][0].size) == PROBE_LONG_SIDE
+
+    def test_failed_probe_falls_back_to_combined(self, detection):
+        engine = Mock()
+        engine.name = 'tesserocr'
+        engine.recognize.side_effect = RuntimeError('tesseract crashed')
+        with patch('student_applications.ocr.get_engine', return_value=engine):
+            assert detect_lang(Image.new('L', (100, 100), 255), 'eng+chi_sim') == 'eng+chi_sim'
+
+    def test_no_probe_through_the_tesseract_binary(self, detection):
+        engine = Mock()
+        engine.name = 'pytesseract'
+        with patch('student_applications.ocr.get_engine', return_value=engine):
+            assert detect_lang(Image.new('L', (100, 100), 255), 'eng+chi_sim') == 'eng+chi_sim'
+        assert not engine.recognize.called
+
+    def test_batches_skip_detection_without_tesserocr(self, detection, monkeypatch):
+        monkeypatch.setattr(ocr, 'TESSEROCR_AVAILABLE', False)
+        assert OCRBatch({0: ('image', 'a.png')}).detect is False
+
+    def test_recognize_item_reads_page_with_detected_language(self):
+        engines = {}
+
+        def get_engine(lang):
+            engine = engines.setdefault(lang, Mock())
+            engine.name = 'tesserocr'
+            engine.recognize.side_effect = lambda image: CHINESE if lang == 'eng+chi_sim' else f'text by {lang}'
+            return engine
+
+        with patch('student_applications.ocr.load_image', return_value=Image.new('L', (10, 10))), \
+             patch('student_applications.ocr.get_engine', side_effect=get_engine):
+            assert recognize_item(('image', 'a.png'), 300, 'eng+chi_sim', True)[0] == 'text by chi_sim'
+            assert recognize_item(('image', 'a.png'), 300, 'eng+chi_sim')[0] == CHINESE
+
+
+class TestBatchLanguages:
+    """Tests for language sets of OCR batches and extraction"""
+
+    def test_hinted_batch_skips_detection(self, detection):
+        batch = OCRBatch({0: ('image', 'a.png')}, lang='eng')
+        assert (batch.lang, batch.detect) == ('eng', False)
+
+    def test_unhinted_batch_detects_per_item(self, detection):
+        batch = OCRBatch({0: ('image', 'a.png')})
+        assert (batch.lang, batch.detect) == ('eng+chi_sim', True)
+        batch = OCRBatch({0: ('image', 'a.png')}, lang='kor')
+        assert (batch.lang, batch.detect) == ('eng+chi_sim', True)
+
+    def test_cache_signature_depends_on_language(self, detection):
+        with patch('student_applications.ocr.pdf_ocr_available', return_value=True):
+            assert ocr.ocr_signature('eng') != ocr.ocr_signature()
+            assert ocr.ocr_signature('eng') != ocr.ocr_signature('chi_sim')
+
+    def test_parallel_extraction_passes_file_key_language(self, detection, tmp_path):
+        from student_applications.utils import extract_texts_in_parallel
+
+        files = {}
+        for key in ('ielts_score', 'transcript'):
+            path = tmp_path / f'{key}.png'
+            path.write_bytes(b'image')
+            files[key] = {'filepath': str(path), 'content_type': 'image/png'}
+
+        executor = ThreadPoolExecutor(max_workers=2)
+        try:
+            with patch('student_applications.utils._get_extraction_pool', return_value=TaskPool(executor=executor)), \
+                 patch('student_applications.utils.ocr_available', return_value=False), \
+                 patch('student_applications.utils._extract_text_uncached',
+                       side_effect=lambda filepath, content_type, ocr_lang, file_type: str(ocr_lang)):
+                result = extract_texts_in_parallel(files, max_workers=2)
+        finally:
+            executor.shutdown(wait=True)
+
+        assert result == {'ielts_score': 'eng', 'transcript': 'None'}
+
+    def test_services_pass_file_key_language(self, detection, tmp_path):
+        from student_applications.services import StudentApplicationService
+
+        path = tmp_path / 'ielts.png'
+        path.write_bytes(b'image')
+        with patch.dict(os.environ, {'GOOGLE_GENAI_API_KEY': 'test-api-key'}), \
+             patch('student_applications.genai_client.genai'), \
+             patch('student_applications.services.extract_document', return_value=('text', 'png')) as extract:
+            service = StudentApplicationService()
+            service._extract_document_texts({'ielts_score': {'filepath': str(path), 'content_type': 'image/png'}})
+        extract.assert_called_once_with(str(path), 'image/png', 'eng')
@@ -0,0 +1,128 @@
+"""
+Tests for image preprocessing before OCR
+"""
+import os
+from unittest.mock import patch
+
+from PIL import Image, ImageDraw
+
+from student_applications import ocr
+from student_applications.ocr_preprocess import (
+    binarize, preprocess_image, preprocess_signature, target_size, MAX_UPSCALE
+)
+
+
+def _photo(path, size=(1200, 900), orientation=None, fmt='JPEG'):
+    image = Image.new('RGB', size, (235, 235, 230))
+    draw = ImageDraw.Draw(image)
+    # Text-like strokes; a solid block wider than the threshold window would only keep its outline
+    for y in range(100, 160, 12):
+        draw.line((100, y, 400, y), fill=(20, 20, 20), width=4)
+    exif = Image.Exif()
+    if orientation:
+        exif[0x0112] = orientation
+    image.save(path, fmt, exif=exif)
+    return path
+
+
+class TestPreprocessImage:
+    """Tests for preprocess_image"""
+
+    def test_exif_rotation_turns_image_upright(self, tmp_path):
+        path = _photo(str(tmp_path / 'photo.jpg'), orientation=6)
+        image = preprocess_image(path, dpi=100)
+        assert image.size[0] < image.size[1]
+        assert image.size == target_size((900, 1200), 100)
+
+    def test_output_is_binary_grayscale_with_dpi(self, tmp_path):
+        path = _photo(str(tmp_path / 'photo.jpg'))
+        image = preprocess_image(path, dpi=100)
+        assert image.mode == 'L'
+        # Only pure black and white pixels remain
+        assert not any(image.histogram()[1:255])
+        assert image.info['dpi'] == (100, 100)
+
+    def test_large_photo_is_downscaled(self, tmp_path):
+        path = _photo(str(tmp_path / 'photo.jpg'), size=(4000, 3000))
+        image = preprocess_image(path, dpi=200)
+        assert image.size == target_size((4000, 3000), 200)
+        assert max(image.size) == round(200 * 11.69)
+
+    def test_small_image_is_upscaled_at_most_twice(self, tmp_path):
+        path = _photo(str(tmp_path / 'small.png'), size=(300, 200), fmt='PNG')
+        image = preprocess_image(path, dpi=300)
+        assert image.size == (int(300 * MAX_UPSCALE), int(200 * MAX_UPSCALE))
+
+    def test_text_survives_binarization(self, tmp_path):
+        path = _photo(str(tmp_path / 'photo.png'), size=(1000, 750), fmt='PNG')
+        image = preprocess_image(path, dpi=85)
+        scale = image.size[0] / 1000
+        assert image.getpixel((int(250 * scale), int(100 * scale))) == 0
+        assert image.getpixel((int(700 * scale), int(600 * scale))) == 255
+
+
+class TestBinarize:
+    """Tests for the adaptive threshold"""
+
+    def test_gradient_background_becomes_white(self):
+        background = Image.linear_gradient('L').resize((400, 400)).point(lambda v: 255 - v // 2)
+        draw = ImageDraw.Draw(background)
+        draw.line((50, 360, 150, 360), fill=60, width=3)
+        draw.line((50, 40, 150, 40), fill=150, width=3)
+        result = binarize(background, 10)
+        assert result.getpixel((300, 20)) == 255
+        assert result.getpixel((300, 390)) == 255
+        assert result.getpixel((100, 360)) == 0
+        assert result.getpixel((100, 40)) == 0
+
+
+class TestPreprocessSettings:
+    """Tests for preprocessing configuration"""
+
+    def test_signature_reflects_settings(self):
+        with patch.dict(os.environ, {'OCR_PREPROCESS': 'false'}):
+            assert preprocess_signature() == 'raw'
+        with patch.dict(os.environ, {'OCR_PREPROCESS': 'true', 'OCR_TARGET_DPI': '150', 'OCR_BINARIZE_OFFSET': '8'}):
+            assert preprocess_signature() == '150|8'
+            assert ocr.image_ocr_signature().endswith('|150|8')
+
+    def test_image_signature_does_not_depend_on_pdf_ocr(self):
+        # Image OCR runs without pdfium and with OCR_ENABLED=false, so the image cache key must still change
+        with patch('student_applications.ocr.pdf_ocr_available', return_value=False), \
+             patch.dict(os.environ, {'OCR_ENABLED': 'false', 'OCR_PREPROCESS': 'true', 'OCR_TARGET_DPI': '150'}):
+            assert ocr.ocr_signature() == 'off'
+            preprocessed = ocr.image_ocr_signature()
+            with patch.dict(os.environ, {'OCR_TARGET_DPI': '250'}):
+                assert ocr.image_ocr_signature() != preprocessed
+            with patch.dict(os.environ, {'OCR_PREPROCESS': 'false'}):
+                assert ocr.image_ocr_signature() != preprocessed
+
+    def test_preprocessing_is_off_by_default(self, monkeypatch):
+        monkeypatch.delenv('OCR_PREPROCESS', raising=False)
+        assert preprocess_signature() == 'raw'
+
+    def test_load_image_preprocesses_photos(self, tmp_path):
+        path = _photo(str(tmp_path / 'photo.jpg'))
+        with patch.dict(os.environ, {'OCR_PREPROCESS': 'true'}):
+            assert ocr.load_image(('image', path), 300).mode == 'L'
+        with patch.dict(os.environ, {'OCR_PREPROCESS': 'false'}):
+            assert ocr.load_image(('image', path), 300).mode == 'RGB'
+
+    def test_load_image_closes_the_file(self, tmp_path):
+        """Images are read into memory so no file handle outlives load_image"""
+        path = _photo(str(tmp_path / 'photo.jpg'))
+        open_image = Image.open
+        opened = []
+
+        def spy(*args, **kwargs):
+            opened.append(open_image(*args, **kwargs))
+            return opened[-1]
+
+        for preprocess in ('true', 'false'):
+            with patch.dict(os.environ, {'OCR_PREPROCESS': preprocess}), \
+                 patch('PIL.Image.open', side_effect=spy):
+                image = ocr.load_image(('image', path), 300)
+            assert opened[-1].fp is None
+            assert image.getbbox() is not None
+
+        assert len(opened) == 2
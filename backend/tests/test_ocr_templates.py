@@ -0,0 +1,219 @@
+"""
+Tests for region-of-interest OCR templates
+"""
+import json
+import os
+from unittest.mock import patch
+
+import pytest
+from PIL import Image
+from PyPDF2 import PageObject, PdfWriter
+from PyPDF2.generic import DictionaryObject, NameObject
+
+from student_applications.ocr import crop_region
+from student_applications.ocr_templates import (
+    TemplateRegistry, chinese_date, default_templates, load_page, parse_cn_degree, parse_ielts_trf,
+    read_template_fields
+)
+
+TRF_REGIONS = {
+    'header': 'IELTS  Test Report Form  ACADEMIC',
+    'test_details': 'Centre Number CN123  Test Date 12 MAR 2024',
+    'results': 'Listening 7.5 Reading 8.0 Writing 6.5 Speaking 7.0 Overall Band Score 7.5 CEFR Level C1',
+    'trf_number': 'Test Report Form Number 24CN012345ZHAW001A',
+}
+
+# Region OCR texts of TRFs and degree certificates with the fields they should give
+FIXTURES = os.path.join(os.path.dirname(__file__), 'fixtures', 'template_regions.json')
+
+# Share of expected fields the templates must read from the fixtures
+MIN_FIELD_ACCURACY = 0.9
+
+DEGREE_BODY = ('张 三 ， 男 ， 二〇〇〇 年 一 月 十二 日 生 。 在 北 京 大 学 信息科学技术学院 计算机科学\n'
+               '与技术 专业 完成了 本科 学习 计划 ， 业已 毕业 ， 经 审核 符合 《中华人民共和国学位条例》'
+               '的规定 ， 授予 工学 学士 学位 。')
+
+
+@pytest.fixture
+def photo(tmp_path):
+    path = tmp_path / 'report.png'
+    Image.new('L', (1240, 1754), 255).save(path)
+    return str(path)
+
+
+def _pdf(path, with_font=False):
+    page = PageObject.create_blank_page(width=595, height=842)
+    if with_font:
+        font = DictionaryObject({NameObject('/Type'): NameObject('/Font')})
+        page[NameObject('/Resources')] = DictionaryObject({
+            NameObject('/Font'): DictionaryObject({NameObject('/F1'): font})
+        })
+    writer = PdfWriter()
+    writer.add_page(page)
+    with open(path, 'wb') as f:
+        writer.write(f)
+    return str(path)
+
+
+def _fake_regions(region_texts):
+    calls = []
+
+    def recognize(image, boxes, lang=None):
+        calls.append((sorted(boxes), lang))
+        return {name: region_texts.get(name, '') for name in boxes}
+
+    return recognize, calls
+
+
+class TestParsers:
+    """Tests for the template field parsers"""
+
+    def test_chinese_dates(self):
+        assert chinese_date('二〇〇〇年一月十二日') == '2000-01-12'
+        assert chinese_date('一九九九年十月二十三日') == '1999-10-23'
+        assert chinese_date('1998年12月31日') == '1998-12-31'
+        assert chinese_date('某年某月') is None
+
+    def test_degree_certificate_body(self):
+        fields = parse_cn_degree({'body': DEGREE_BODY})
+        assert fields == {
+            'applicant_info.name': '张三',
+            'applicant_info.gender': '男',
+            'applicant_info.birth_date': '2000-01-12',
+            'education_background.university': '北京大学',
+            'education_background.major': '计算机科学与技术',
+            'education_background.expected_degree': '工学学士',
+        }
+
+    def test_trf_regions(self):
+        fields = parse_ielts_trf(TRF_REGIONS)
+        assert fields['language_test.reference_number'] == '24CN012345ZHAW001A'
+        assert fields['language_test.test_date'] == '2024-03-12'
+        assert fields['language_test.total_score'] == '7.5'
+        assert fields['language_test.sections.writing'] == '6.5'
+        assert all(path.startswith('language_test.') for path in fields)
+
+    def test_inconsistent_trf_bands_are_not_read(self):
+        regions = dict(TRF_REGIONS, results='Listening 7.5 Reading 8.0 Writing 6.5 Speaking 7.0 Overall Band Score 9.0')
+        assert 'language_test.total_score' not in parse_ielts_trf(regions)
+
+
+class TestReadTemplateFields:
+    """Tests for template detection and region OCR"""
+
+    def test_trf_photo_is_read_from_regions(self, photo):
+        recognize, calls = _fake_regions(TRF_REGIONS)
+        with patch('student_applications.ocr_templates.ocr_available', return_value=True), \
+             patch('student_applications.ocr_templates.recognize_regions', side_effect=recognize):
+            read = read_template_fields(photo, 'ielts_score')
+
+        assert read['template'] == 'ielts_trf'
+        assert read['fields']['language_test.sections.listening'] == '7.5'
+        # The anchor is read first, then only the field regions, all in English
+        assert calls == [(['header'], 'eng'), (['results', 'test_details', 'trf_number'], 'eng')]
+
+    def test_anchor_mismatch_stops_after_one_region(self, photo):
+        recognize, calls = _fake_regions({'header': 'Bank statement'})
+        with patch('student_applications.ocr_templates.ocr_available', return_value=True), \
+             patch('student_applications.ocr_templates.recognize_regions', side_effect=recognize):
+            assert read_template_fields(photo, 'ielts_score') is None
+        assert len(calls) == 1
+
+    def test_missing_optional_field_keeps_region_text(self, photo):
+        recognize, _ = _fake_regions(dict(TRF_REGIONS, test_details='Centre Number CN123'))
+        with patch('student_applications.ocr_templates.ocr_available', return_value=True), \
+             patch('student_applications.ocr_templates.recognize_regions', side_effect=recognize):
+            read = read_template_fields(photo, 'ielts_score')
+
+        assert read['fields']['language_test.total_score'] == '7.5'
+        assert not read['complete']
+        assert 'Overall Band Score 7.5' in read['text']
+        assert 'Test Report Form Number 24CN012345ZHAW001A' in read['text']
+
+    def test_missing_required_field_falls_back(self, photo):
+        recognize, _ = _fake_regions(dict(TRF_REGIONS, results='Listening 7.5 Reading'))
+        with patch('student_applications.ocr_templates.ocr_available', return_value=True), \
+             patch('student_applications.ocr_templates.recognize_regions', side_effect=recognize):
+            assert read_template_fields(photo, 'ielts_score') is None
+
+    def test_degree_certificate(self, photo):
+        recognize, calls = _fake_regions({'title': '学 士 学 位 证 书', 'body': DEGREE_BODY})
+        with patch('student_applications.ocr_templates.ocr_available', return_value=True), \
+             patch('student_applications.ocr_templates.recognize_regions', side_effect=recognize):
+            read = read_template_fields(photo, 'degree_certificate')
+        assert read['template'] == 'cn_degree'
+        assert read['fields']['education_background.university'] == '北京大学'
+        assert calls[0] == (['title'], 'chi_sim')
+
+    def test_other_file_keys_are_not_templated(self, photo):
+        with patch('student_applications.ocr_templates.ocr_available', return_value=True), \
+             patch('student_applications.ocr_templates.recognize_regions') as recognize:
+            assert read_template_fields(photo, 'resume') is None
+        assert not recognize.called
+
+    def test_pdf_with_text_layer_is_not_templated(self, tmp_path):
+        path = _pdf(tmp_path / 'etrf.pdf', with_font=True)
+        with patch('student_applications.ocr_templates.pdf_ocr_available', return_value=True), \
+             patch('student_applications.ocr_templates.render_pdf_page') as render:
+            assert load_page(path) is None
+        assert not render.called
+
+    def test_scanned_single_page_pdf_is_rendered(self, tmp_path):
+        path = _pdf(tmp_path / 'scan.pdf')
+        with patch('student_applications.ocr_templates.pdf_ocr_available', return_value=True), \
+             patch('student_applications.ocr_templates.render_pdf_page', return_value='page') as render:
+            assert load_page(path) == 'page'
+        assert render.call_args[0][:2] == (path, 0)
+
+
+class TestFixtureAccuracy:
+    """Field accuracy of the templates on recorded region OCR output"""
+
+    def test_fields_read_from_fixtures(self, photo):
+        with open(FIXTURES, 'r', encoding='utf-8') as f:
+            fixtures = json.load(f)
+
+        expected_count, correct, wrong = 0, 0, []
+        for file_key, cases in fixtures.items():
+            for case in cases:
+                recognize, _ = _fake_regions(case['regions'])
+                with patch('student_applications.ocr_templates.ocr_available', return_value=True), \
+                     patch('student_applications.ocr_templates.recognize_regions', side_effect=recognize):
+                    read = read_template_fields(photo, file_key)
+                fields = read['fields'] if read else {}
+
+                for path, value in case['expected'].items():
+                    expected_count += 1
+                    if fields.get(path) == value:
+                        correct += 1
+                    elif path in fields:
+                        wrong.append((case['name'], path, fields[path]))
+                # A read that missed an expected field keeps the document in the model input
+                if read and any(path not in fields for path in case['expected']):
+                    assert not read['complete'], case['name']
+
+        # A misread value is worse than a missing one, which the model can still fill in
+        assert wrong == []
+        assert correct / expected_count >= MIN_FIELD_ACCURACY
+
+
+class TestRegistry:
+    """Tests for the template registry"""
+
+    def test_templates_by_file_key(self):
+        registry = TemplateRegistry()
+        assert [t.name for t in registry.for_file_key('ielts_score')] == ['ielts_trf']
+        assert [t.name for t in registry.for_file_key('degree_certificate')] == ['cn_degree']
+        assert registry.for_file_key('transcript') == []
+
+    def test_region_overrides_from_file(self, tmp_path, monkeypatch):
+        path = tmp_path / 'templates.json'
+        path.write_text(json.dumps({'ielts_trf': {'results': [0, 0.4, 1, 0.6]}}))
+        monkeypatch.setenv('OCR_TEMPLATES_FILE', str(path))
+        trf = {t.name: t for t in default_templates()}['ielts_trf']
+        assert trf.regions['results'] == (0.0, 0.4, 1.0, 0.6)
+        assert trf.regions['header'] == (0.0, 0.0, 1.0, 0.12)
+
+    def test_crop_region_uses_page_fractions(self):
+        image = Image.new('L', (1000, 2000))
+        assert crop_region(image, (0.5, 0.25, 1.0, 0.5)).size == (500, 500)
@@ -0,0 +1,66 @@
+"""
+Tests for the progress event broker
+"""
+import json
+import threading
+
+from student_applications.progress import ProgressBroker, format_sse
+
+
+class TestProgressBroker:
+    """Tests for ProgressBroker"""
+
+    def test_late_subscriber_gets_history(self):
+        """Test that a subscriber connecting mid-job receives earlier events"""
+        broker = ProgressBroker()
+        broker.publish('job-1', 'queued')
+        broker.publish('job-1', 'file_extracted', file_key='transcript', chars=120)
+        broker.publish('job-1', 'completed')
+
+        events = list(broker.subscribe('job-1', heartbeat=1))
+
+        assert [event['stage'] for event in events] == ['queued', 'file_extracted', 'completed']
+        assert events[1]['chars'] == 120
+
+    def test_live_events_until_terminal_stage(self):
+        """Test that live events are delivered and the stream ends on completion"""
+        broker = ProgressBroker()
+        broker.publish('job-1', 'running')
+        received = []
+        subscribed = threading.Event()
+
+        def consume():
+            for event in broker.subscribe('job-1', heartbeat=0.05):
+                subscribed.set()
+                received.append(event)
+
+        consumer = threading.Thread(target=consume)
+        consumer.start()
+        assert subscribed.wait(5)
+        broker.publish('job-1', 'llm_token', text='{')
+        broker.publish('job-1', 'failed', error='boom')
+        consumer.join(5)
+
+        stages = [event['stage'] for event in received if event is not None]
+        assert stages == ['running', 'llm_token', 'failed']
+        assert not consumer.is_alive()
+
+    def test_finished_history_is_purged(self):
+        """Test that histories of finished jobs are dropped after the retention period"""
+        broker = ProgressBroker(retain_seconds=0)
+        broker.publish('job-1', 'completed')
+        assert broker.has_job('job-1')
+
+        broker.publish('job-2', 'queued')
+
+        assert not broker.has_job('job-1')
+        assert broker.has_job('job-2')
+
+    def test_format_sse(self):
+        """Test Server-Sent Events formatting"""
+        message = format_sse({'job_id': 'job-1', 'stage': 'json_parsed'})
+
+        assert message.startswith('event: json_parsed\ndata: ')
+        assert message.endswith('\n\n')
+        assert json.loads(message.split('data: ', 1)[1])['job_id'] == 'job-1'
+        assert format_sse(None) == ': keep-alive\n\n'
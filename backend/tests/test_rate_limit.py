@@ -0,0 +1,106 @@
+"""
+Tests for the cross-process GenAI rate limiter
+"""
+import pytest
+from unittest.mock import Mock, patch
+
+from student_applications.rate_limit import TokenBucketLimiter, RateLimitExceeded, estimate_tokens
+
+
+class TestTokenBucketLimiter:
+    """Tests for TokenBucketLimiter"""
+
+    @pytest.fixture
+    def db_path(self, tmp_path):
+        return str(tmp_path / 'rate_limit.db')
+
+    def test_burst_then_wait(self, db_path):
+        """Test that a full bucket serves a burst and then books later slots"""
+        limiter = TokenBucketLimiter(db_path, requests_per_minute=3, tokens_per_minute=1000)
+
+        assert [limiter.reserve(10) for _ in range(3)] == [0.0, 0.0, 0.0]
+        assert limiter.reserve(10) == pytest.approx(20.0, abs=0.5)
+        # The next caller queues behind the previous reservation
+        assert limiter.reserve(10) == pytest.approx(40.0, abs=0.5)
+
+    def test_token_quota(self, db_path):
+        """Test that large requests wait for the token bucket"""
+        limiter = TokenBucketLimiter(db_path, requests_per_minute=100, tokens_per_minute=1000)
+
+        assert limiter.reserve(800) == 0.0
+        assert limiter.reserve(500) == pytest.approx(18.0, abs=0.5)
+
+    def test_reject_instead_of_waiting_too_long(self, db_path):
+        """Test that a reservation over max_wait raises and takes nothing"""
+        limiter = TokenBucketLimiter(db_path, requests_per_minute=1, tokens_per_minute=1000)
+        limiter.reserve(1)
+
+        with pytest.raises(RateLimitExceeded) as excinfo:
+            limiter.reserve(1, max_wait=5)
+
+        assert excinfo.value.retry_after == pytest.approx(60.0, abs=0.5)
+        assert limiter.projected_wait() == pytest.approx(60.0, abs=0.5)
+
+    def test_buckets_shared_between_instances(self, db_path):
+        """Test that limiters on the same database (one per worker) share the quota"""
+        first = TokenBucketLimiter(db_path, requests_per_minute=2, tokens_per_minute=1000)
+        second = TokenBucketLimiter(db_path, requests_per_minute=2, tokens_per_minute=1000)
+
+        first.reserve(1)
+        second.reserve(1)
+
+        assert first.projected_wait() > 0
+        assert second.projected_wait() == pytest.approx(first.projected_wait(), abs=0.5)
+
+    def test_reconcile_returns_overestimate(self, db_path):
+        """Test that the token bucket is corrected with the real token count"""
+        limiter = TokenBucketLimiter(db_path, requests_per_minute=100, tokens_per_minute=1000)
+        limiter.reserve(900)
+
+        limiter.reconcile(900, 100)
+
+        assert limiter.stats()['tokens']['level'] == pytest.approx(900, abs=5)
+
+    def test_estimate_tokens(self):
+        """Test the character-based token estimate"""
+        assert estimate_tokens(['a' * 100, '中' * 100]) == 101
+
+
+class TestRateLimitedCalls:
+    """Tests for the limiter in GenAI calls and routes"""
+
+    def test_generate_text_acquires_and_reconciles(self):
+        """Test that model calls take quota and report the real prompt size"""
+        from student_applications.services import _generate_text
+
+        limiter = Mock()
+        limiter.acquire.return_value = 0.0
+        client = Mock()
+        client.models.generate_content.return_value = Mock(
+            text='{}', usage_metadata=Mock(prompt_token_count=42)
+        )
+
+        with patch('student_applications.services.get_rate_limiter', return_value=limiter):
+            _generate_text(client, 'gemini-pro', ['prompt', 'content'], {})
+
+        estimated = limiter.acquire.call_args[0][0]
+        limiter.reconcile.assert_called_once_with(estimated, 42)
+
+    @patch('student_applications.routes.StudentApplication')
+    def test_analyze_rejected_with_retry_after(self, mock_student_app, client):
+        """Test that analysis is refused with 503 and Retry-After when quota is booked ahead"""
+        import json
+
+        mock_student_app.get_by_id.return_value = Mock(id='app-123')
+        limiter = Mock()
+        limiter.projected_wait.return_value = 95.2
+
+        with patch('student_applications.routes.get_rate_limiter', return_value=limiter), \
+             patch('student_applications.routes.get_job_queue') as mock_get_job_queue:
+            response = client.post('/api/student-applications/analyze/app-123')
+
+        data = json.loads(response.data)
+        assert response.status_code == 503
+        assert response.headers['Retry-After'] == '96'
+        assert data['error']['code'] == 'RATE_LIMITED'
+        assert not mock_get_job_queue.return_value.submit.called
@@ -236,7 +236,7 @@ class TestStudentApplicationRoutes:
         mock_service.generate_structured_summary.return_value = 'Structured summary'
         mock_get_service.return_value = mock_service
 
-        response = client.post('/api/student-applications/analyze/app-123')
+        response = client.post('/api/student-applications/analyze/app-123?wait=true')
         data = json.loads(response.data)
 
         assert response.status_code == 200
@@ -250,7 +250,155 @@ class TestStudentApplicationRoutes:
         assert mock_app.analysis_result == {'applicant_info': {'name': '张三'}}
         assert mock_app.structured_summary == 'Structured summary'
         assert mock_app.status == 'completed'
-        assert mock_app.save.call_count == 2  # Once for analyzed, once for completed
+        assert mock_app.save.call_count == 3  # Once each for queued, analyzed and completed
+
+    @patch('student_applications.routes.StudentApplication')
+    @patch('student_applications.routes.get_service')
+    def test_analyze_application_queued(self, mock_get_service, mock_student_app, client):
+        """Test that analysis is queued and finishes in the background"""
+        from student_applications.jobs import get_job_queue
+
+        mock_app = Mock()
+        mock_app.id = 'app-123'
+        mock_app.files = {'test': 'files'}
+        mock_app.status = 'uploaded'
+        mock_student_app.get_by_id.return_value = mock_app
+
+        def analyze(files, progress_callback=None, use_cache=True, stream_tokens=False):
+            progress_callback('extraction_started', files=['test'])
+            progress_callback('llm_started', model='gemini-pro')
+            return {'applicant_info': {'name': '张三'}}
+
+        mock_service = Mock()
+        mock_service.analyze_documents.side_effect = analyze
+        mock_service.generate_structured_summary.return_value = 'Structured summary'
+        mock_get_service.return_value = mock_service
+
+        response = client.post('/api/student-applications/analyze/app-123')
+        data = json.loads(response.data)
+
+        assert response.status_code == 202
+        assert data['success'] is True
+        assert data['data']['application_id'] == 'app-123'
+        assert data['message'] == 'Analysis queued'
+        job_id = data['data']['job_id']
+        assert data['data']['next_step']['job'] == f'/api/student-applications/jobs/{job_id}'
+
+        job = get_job_queue().wait(job_id, timeout=10)
+        assert job.status == 'completed'
+        assert job.stage == 'llm_started'
+        assert mock_app.status == 'completed'
+        assert mock_app.structured_summary == 'Structured summary'
+
+        response = client.get(f'/api/student-applications/jobs/{job_id}')
+        data = json.loads(response.data)
+
+        assert response.status_code == 200
+        assert data['data']['status'] == 'completed'
+        assert data['data']['kind'] == 'analyze'
+        assert data['data']['target_id'] == 'app-123'
+
+    @patch('student_applications.routes.StudentApplication')
+    @patch('student_applications.routes.get_job_queue')
+    def test_analyze_application_queue_full(self, mock_get_job_queue, mock_student_app, client):
+        """Test that a full job queue is reported as 503"""
+        from student_applications.jobs import QueueFullError
+
+        mock_app = Mock(id='app-123', status='uploaded')
+        mock_student_app.get_by_id.return_value = mock_app
+        mock_get_job_queue.return_value.submit.side_effect = QueueFullError('Job queue is full')
+
+        response = client.post('/api/student-applications/analyze/app-123')
+        data = json.loads(response.data)
+
+        assert response.status_code == 503
+        assert data['error']['code'] == 'QUEUE_FULL'
+        assert response.headers['Retry-After'] == '10'
+        # The rejected job leaves the application as it was
+        assert mock_app.status == 'uploaded'
+
+    @patch('student_applications.routes.StudentApplication')
+    @patch('student_applications.routes.get_job_queue')
+    def test_analyze_application_marks_record_queued(self, mock_get_job_queue, mock_student_app, client):
+        """Test that the application is saved as queued before its job is submitted"""
+        mock_app = Mock(id='app-123', status='uploaded')
+        mock_student_app.get_by_id.return_value = mock_app
+        statuses = []
+        mock_app.save.side_effect = lambda: statuses.append(mock_app.status)
+        mock_get_job_queue.return_value.submit.side_effect = lambda *args: statuses.append('submitted') or Mock(id='job-1')
+
+        response = client.post('/api/student-applications/analyze/app-123')
+        data = json.loads(response.data)
+
+        assert response.status_code == 202
+        assert data['data']['status'] == 'queued'
+        assert statuses == ['queued', 'submitted']
+
+    @patch('student_applications.routes.StudentApplication')
+    @patch('student_applications.routes.get_service')
+    def test_stream_application_analysis(self, mock_get_service, mock_student_app, client):
+        """Test that analysis progress is streamed as Server-Sent Events"""
+        mock_app = Mock()
+        mock_app.id = 'app-123'
+        mock_app.files = {'test': 'files'}
+        mock_app.status = 'uploaded'
+        mock_student_app.get_by_id.return_value = mock_app
+
+        def analyze(files, progress_callback=None, use_cache=True, stream_tokens=False):
+            assert stream_tokens is True
+            progress_callback('file_extracted', file_key='test', chars=42)
+            progress_callback('llm_started', model='gemini-pro')
+            progress_callback('llm_token', text='{}')
+            progress_callback('json_parsed')
+            return {'applicant_info': {'name': '张三'}}
+
+        mock_service = Mock()
+        mock_service.analyze_documents.side_effect = analyze
+        mock_service.generate_structured_summary.return_value = 'Structured summary'
+        mock_get_service.return_value = mock_service
+
+        response = client.post('/api/student-applications/analyze/app-123/stream')
+        body = response.get_data(as_text=True)
+
+        assert response.status_code == 200
+        assert response.mimetype == 'text/event-stream'
+        assert response.headers['Cache-Control'] == 'no-cache'
+        stages = [line[len('event: '):] for line in body.splitlines() if line.startswith('event: ')]
+        assert stages == [
+            'queued', 'running', 'file_extracted', 'llm_started', 'llm_token',
+            'json_parsed', 'summary_rendered', 'completed'
+        ]
+        assert '"chars": 42' in body
+
+    def test_get_job_events_from_storage(self, client):
+        """Test that events of a job run by another worker are read from storage"""
+        from student_applications.models import AnalysisJob
+
+        job = AnalysisJob(kind='analyze', target_id='app-123', status='failed')
+        job.stage = 'llm_started'
+        job.error_message = 'boom'
+        job.save()
+
+        response = client.get(f'/api/student-applications/jobs/{job.id}/events')
+        body = response.get_data(as_text=True)
+
+        assert response.status_code == 200
+        assert 'event: failed' in body
+        assert '"error": "boom"' in body
+
+    def test_get_job_events_not_found(self, client):
+        """Test streaming events of a non-existent job"""
+        response = client.get('/api/student-applications/jobs/nonexistent/events')
+
+        assert response.status_code == 404
+
+    def test_get_job_not_found(self, client):
+        """Test getting a non-existent job"""
+        response = client.get('/api/student-applications/jobs/nonexistent')
+        data = json.loads(response.data)
+
+        assert response.status_code == 404
+        assert data['error']['code'] == 'NOT_FOUND'
 
     @patch('student_applications.routes.StudentApplication')
     def test_analyze_application_not_found(self, mock_student_app, client):
@@ -279,7 +427,7 @@ class TestStudentApplicationRoutes:
         mock_service.analyze_documents.side_effect = Exception('Analysis failed')
         mock_get_service.return_value = mock_service
 
-        response = client.post('/api/student-applications/analyze/app-123')
+        response = client.post('/api/student-applications/analyze/app-123?wait=true')
         data = json.loads(response.data)
 
         assert response.status_code == 500
@@ -414,7 +562,7 @@ class TestStudentApplicationRoutes:
         mock_service.generate_structured_transcript.return_value = 'Structured transcript'
         mock_get_service.return_value = mock_service
 
-        response = client.post('/api/student-applications/transcript/verify/verify-123')
+        response = client.post('/api/student-applications/transcript/verify/verify-123?wait=true')
         data = json.loads(response.data)
 
         assert response.status_code == 200
@@ -432,7 +580,36 @@ class TestStudentApplicationRoutes:
         }
         assert mock_verification.structured_result == 'Structured transcript'
         assert mock_verification.status == 'completed'
-        assert mock_verification.save.call_count == 2
+        assert mock_verification.save.call_count == 3  # Queued, processing, completed
+
+    @patch('student_applications.routes.TranscriptVerification')
+    @patch('student_applications.routes.get_transcript_service')
+    def test_verify_transcript_queued(self, mock_get_service, mock_transcript_verification, client):
+        """Test that transcript verification is queued and finishes in the background"""
+        from student_applications.jobs import get_job_queue
+
+        mock_verification = Mock()
+        mock_verification.id = 'verify-123'
+        mock_verification.files = {'test': 'files'}
+        mock_verification.upload_type = 'single'
+        mock_verification.status = 'uploaded'
+        mock_transcript_verification.get_by_id.return_value = mock_verification
+
+        mock_service = Mock()
+        mock_service.verify_transcript.side_effect = Exception('Verification failed')
+        mock_get_service.return_value = mock_service
+
+        response = client.post('/api/student-applications/transcript/verify/verify-123')
+        data = json.loads(response.data)
+
+        assert response.status_code == 202
+        assert data['message'] == 'Transcript verification queued'
+
+        job = get_job_queue().wait(data['data']['job_id'], timeout=10)
+        assert job.status == 'failed'
+        assert job.error_message == 'Verification failed'
+        assert mock_verification.status == 'failed'
+        assert mock_verification.error_message == 'Verification failed'
 
     @patch('student_applications.routes.TranscriptVerification')
     def test_verify_transcript_not_found(self, mock_transcript_verification, client):
@@ -3,6 +3,7 @@ Tests for student application services
 """
 import os
 import json
+import time
 import pytest
 from unittest.mock import Mock, patch, mock_open, MagicMock
 from datetime import datetime
@@ -16,7 +17,7 @@ class TestStudentApplicationService:
     @pytest.fixture
     def mock_genai_client(self):
         """Mock Google GenAI client"""
-        with patch('student_applications.services.genai') as mock_genai:
+        with patch('student_applications.genai_client.genai') as mock_genai:
             mock_client = Mock()
             mock_genai.Client.return_value = mock_client
             mock_genai_client = mock_client
@@ -61,21 +62,33 @@ class TestStudentApplicationService:
 
     def test_extract_document_texts(self, service, mock_files):
         """Test text extraction from files"""
-        # Mock extract_text_from_file to return sample text
-        with patch('student_applications.services.extract_text_from_file') as mock_extract:
-            mock_extract.return_value = "Sample text content"
+        # Mock extract_document to return sample text
+        with patch('student_applications.services.extract_document') as mock_extract:
+            mock_extract.return_value = ("Sample text content", 'pdf')
 
             result = service._extract_document_texts(mock_files)
 
-            # Check that extract_text_from_file was called for each file
+            # Check that extract_document was called for each file
             assert mock_extract.call_count == 4
             assert set(result.keys()) == set(mock_files.keys())
             for key in mock_files.keys():
                 assert result[key] == "Sample text content"
 
+    def test_analyze_documents_reports_file_types(self, service, mock_files, mock_genai_client):
+        """Test that the detected type of each document is listed in the metadata"""
+        detected = {'transcript': 'pdf', 'degree_certificate': 'jpeg', 'resume': 'docx', 'ielts_score': None}
+        mock_genai_client.models.generate_content.return_value = Mock(text='{}')
+
+        with patch('student_applications.services.extract_document',
+                   side_effect=lambda filepath, content_type, ocr_lang: (
+                       'text', next(t for k, t in detected.items() if k in filepath))):
+            result = service.analyze_documents(mock_files)
+
+        assert result['metadata']['file_types'] == detected
+
     def test_extract_document_texts_with_error(self, service, mock_files):
         """Test text extraction when extraction fails"""
-        with patch('student_applications.services.extract_text_from_file') as mock_extract:
+        with patch('student_applications.services.extract_document') as mock_extract:
             mock_extract.side_effect = Exception("Extraction failed")
 
             result = service._extract_document_texts(mock_files)
@@ -136,9 +149,33 @@ class TestStudentApplicationService:
 
             # Check that GenAI was called
             assert mock_genai_client.models.generate_content.called
-            # Check that result matches expected
+            # Check that result matches expected, plus metadata about how it was produced
+            assert result.pop('metadata') == {'model_used': 'gemini-3-pro-preview', 'cache_hit': False,
+                                              'file_types': {}}
             assert result == expected_result
 
+    def test_analyze_documents_streams_progress(self, service, mock_files, mock_genai_client):
+        """Test that per-file, token and parse stages reach the progress callback"""
+        events = []
+
+        def on_stage(stage, **details):
+            events.append((stage, details))
+
+        chunks = [Mock(text='{"applicant_info": '), Mock(text='{"name": "张三"}}')]
+        mock_genai_client.models.generate_content_stream.return_value = iter(chunks)
+
+        with patch('student_applications.services.extract_document', return_value=('Some text', 'pdf')):
+            result = service.analyze_documents(mock_files, progress_callback=on_stage, stream_tokens=True)
+
+        assert result['applicant_info'] == {'name': '张三'}
+        assert not mock_genai_client.models.generate_content.called
+
+        stages = [stage for stage, _ in events]
+        assert stages.count('file_extracted') == len(mock_files)
+        assert stages.count('llm_token') == 2
+        assert stages.index('llm_started') < stages.index('llm_token') < stages.index('json_parsed')
+        assert ('file_extracted', {'file_key': 'transcript', 'chars': 9, 'file_type': 'pdf'}) in events
+
     def test_analyze_documents_with_json_in_markdown(self, service, mock_files, mock_genai_client):
         """Test analysis with JSON wrapped in markdown code blocks"""
         with patch.object(service, '_extract_document_texts') as mock_extract:
@@ -156,9 +193,165 @@ class TestStudentApplicationService:
             mock_genai_client.models.generate_content.return_value = mock_response
 
             result = service.analyze_documents(mock_files)
+            result.pop('metadata')
 
             assert result == expected_result
 
+    def test_analyze_documents_continues_truncated_response(self, service, mock_files, mock_genai_client):
+        """Test that a truncated answer triggers a continuation request"""
+        with patch.object(service, '_extract_document_texts') as mock_extract:
+            mock_extract.return_value = {'transcript': 'Transcript text'}
+
+            first = Mock(text='```json\n{"applicant_info": {"name": "张三", "gen')
+            rest = Mock(text='```json\nder": "男"}}\n```')
+            mock_genai_client.models.generate_content.side_effect = [first, rest]
+
+            result = service.analyze_documents(mock_files)
+
+            assert mock_genai_client.models.generate_content.call_count == 2
+            continuation_contents = mock_genai_client.models.generate_content.call_args[1]['contents']
+            assert 'cut off' in continuation_contents[-1]
+            assert 'response_schema' not in mock_genai_client.models.generate_content.call_args[1]['config']
+            assert result['applicant_info'] == {'name': '张三', 'gender': '男'}
+            assert 'truncated' not in result['metadata']
+
+    def test_analyze_documents_repairs_truncated_response(self, service, mock_files, mock_genai_client):
+        """Test that a response still truncated after continuing is repaired, not discarded"""
+        with patch.object(service, '_extract_document_texts') as mock_extract, \
+             patch.dict(os.environ, {'JSON_CONTINUATION_ATTEMPTS': '0'}):
+            mock_extract.return_value = {'transcript': 'Transcript text'}
+
+            mock_response = Mock(text='{"applicant_info": {"name": "张三"}, "education_background": {"univ')
+            mock_genai_client.models.generate_content.return_value = mock_response
+
+            result = service.analyze_documents(mock_files)
+
+            assert mock_genai_client.models.generate_content.call_count == 1
+            assert result['applicant_info'] == {'name': '张三'}
+            assert result['education_background'] == {}
+            assert result['metadata']['truncated'] is True
+
+    def test_analyze_documents_structured_output(self, service, mock_files, mock_genai_client):
+        """Test that the response schema replaces the JSON skeleton in the prompt"""
+        from student_applications.schemas import APPLICATION_RESPONSE_SCHEMA
+
+        with patch.object(service, '_extract_document_texts') as mock_extract, \
+             patch.dict(os.environ, {'GENAI_STRUCTURED_OUTPUT': 'true'}):
+            mock_extract.return_value = {'transcript': 'Transcript text'}
+            mock_genai_client.models.generate_content.return_value = Mock(text='{"applicant_info": null}')
+
+            service.analyze_documents(mock_files)
+
+            kwargs = mock_genai_client.models.generate_content.call_args[1]
+            assert kwargs['config']['response_mime_type'] == 'application/json'
+            assert kwargs['config']['response_schema'] is APPLICATION_RESPONSE_SCHEMA
+            assert kwargs['contents'][0] == service.analysis_instructions
+            assert len(service.analysis_instructions) < len(service.analysis_prompt) / 2
+
+    def test_analyze_documents_structured_output_disabled(self, service, mock_files, mock_genai_client):
+        """Test that disabling structured output sends the prompt with the JSON skeleton"""
+        with patch.object(service, '_extract_document_texts') as mock_extract, \
+             patch.dict(os.environ, {'GENAI_STRUCTURED_OUTPUT': 'false'}):
+            mock_extract.return_value = {'transcript': 'Transcript text'}
+            mock_genai_client.models.generate_content.return_value = Mock(text='{"applicant_info": null}')
+
+            service.analyze_documents(mock_files)
+
+            kwargs = mock_genai_client.models.generate_content.call_args[1]
+            assert 'response_schema' not in kwargs['config']
+            assert kwargs['contents'][0] == service.analysis_prompt
+
+    def test_analyze_documents_rules_shrink_request(self, service, mock_files, mock_genai_client):
+        """Test that rule-resolved fields are dropped from the schema and win over the model"""
+        report = ("IELTS Test Report Form\nTest Report Form Number: 19CN012345ZHAS001A\n"
+                  "Listening 8.0 Reading 7.5 Writing 6.5 Speaking 6.5\nOverall Band Score 7.0")
+        mock_genai_client.models.generate_content.return_value = Mock(
+            text='{"applicant_info": {"name": "张三"}, "language_test": {"total_score": "9"}}'
+        )
+
+        with patch.object(service, '_extract_document_texts', return_value={'ielts_score': report}), \
+             patch.dict(os.environ, {'GENAI_STRUCTURED_OUTPUT': 'true'}):
+            result = service.analyze_documents(mock_files)
+
+        schema = mock_genai_client.models.generate_content.call_args[1]['config']['response_schema']
+        assert 'total_score' not in schema['properties']['language_test']['properties']
+        assert result['applicant_info']['name'] == '张三'
+        assert result['language_test']['total_score'] == '7.0'
+        assert 'language_test.total_score' in result['metadata']['rule_fields']
+
+    def test_analyze_documents_rules_skip_genai(self, service, mock_files, mock_genai_client):
+        """Test that the GenAI call is skipped when the rules resolve every required field"""
+        with patch.object(service, '_extract_document_texts', return_value={'transcript': '邮箱：zhangsan@example.com'}), \
+             patch.dict(os.environ, {'RULE_REQUIRED_FIELDS': 'applicant_info.email'}):
+            result = service.analyze_documents(mock_files)
+
+        assert not mock_genai_client.models.generate_content.called
+        assert result['applicant_info']['email'] == 'zhangsan@example.com'
+        assert result['recommenders'] == []
+        assert result['metadata']['llm_skipped'] is True
+
+    def test_analyze_documents_template_documents_skip_model(self, service, mock_files, mock_genai_client):
+        """Test that a document read from template regions is neither extracted nor sent to the model"""
+        trf = {'template': 'ielts_trf', 'fields': {'language_test.test_type': 'IELTS', 'language_test.total_score': '7.5'},
+               'text': 'IELTS Test Report Form', 'complete': True}
+        mock_genai_client.models.generate_content.return_value = Mock(text='{"language_test": {"total_score": "9"}}')
+
+        with patch('student_applications.services.read_template_fields',
+                   side_effect=lambda filepath, file_key: trf if file_key == 'ielts_score' else None), \
+             patch.object(service, '_extract_document_texts', return_value={'resume': 'Resume text'}) as mock_extract, \
+             patch.dict(os.environ, {'OCR_TEMPLATES': 'true'}):
+            result = service.analyze_documents(mock_files)
+
+        assert 'ielts_score' not in mock_extract.call_args[0][0]
+        assert 'IELTS' not in mock_genai_client.models.generate_content.call_args[1]['contents'][1]
+        assert result['language_test']['total_score'] == '7.5'
+        assert result['metadata']['template_documents'] == {'ielts_score': 'ielts_trf'}
+
+    def test_analyze_documents_partial_template_read_keeps_region_text(self, service, mock_files, mock_genai_client):
+        """Test that a template read missing optional fields still gives the model its region text"""
+        files = {'ielts_score': mock_files['ielts_score']}
+        trf = {'template': 'ielts_trf', 'fields': {'language_test.total_score': '7.5'},
+               'text': 'IELTS Test Report Form\nTest Date 12 MAR 2O24', 'complete': False}
+        mock_genai_client.models.generate_content.return_value = Mock(text='{"language_test": {"test_date": "2024-03-12"}}')
+
+        with patch('student_applications.services.read_template_fields', return_value=trf), \
+             patch('student_applications.services.extract_document') as mock_extract, \
+             patch.dict(os.environ, {'OCR_TEMPLATES': 'true'}):
+            result = service.analyze_documents(files)
+
+        assert not mock_extract.called
+        assert 'Test Date 12 MAR 2O24' in mock_genai_client.models.generate_content.call_args[1]['contents'][1]
+        assert result['language_test']['test_date'] == '2024-03-12'
+        assert result['language_test']['total_score'] == '7.5'
+        assert 'llm_skipped' not in result['metadata']
+
+    def test_analyze_documents_templates_off_by_default(self, service, mock_files, mock_genai_client):
+        """Test that template OCR is only used when OCR_TEMPLATES is set"""
+        mock_genai_client.models.generate_content.return_value = Mock(text='{}')
+
+        with patch('student_applications.services.read_template_fields') as mock_read, \
+             patch.object(service, '_extract_document_texts', return_value={'resume': 'Resume text'}), \
+             patch.dict(os.environ):
+            os.environ.pop('OCR_TEMPLATES', None)
+            service.analyze_documents(mock_files)
+
+        assert not mock_read.called
+
+    def test_analyze_documents_all_templates_skip_genai(self, service, mock_files, mock_genai_client):
+        """Test that no model call is made when every document was read from templates"""
+        files = {'ielts_score': mock_files['ielts_score']}
+        trf = {'template': 'ielts_trf', 'fields': {'language_test.total_score': '7.5'},
+               'text': 'IELTS Test Report Form', 'complete': True}
+
+        with patch('student_applications.services.read_template_fields', return_value=trf), \
+             patch.dict(os.environ, {'OCR_TEMPLATES': 'true'}):
+            result = service.analyze_documents(files)
+
+        assert not mock_genai_client.models.generate_content.called
+        assert result['language_test']['total_score'] == '7.5'
+        assert result['metadata']['llm_skipped'] is True
+        assert result['metadata']['template_documents'] == {'ielts_score': 'ielts_trf'}
+
     def test_analyze_documents_json_parse_error(self, service, mock_files, mock_genai_client):
         """Test analysis when JSON parsing fails"""
         with patch.object(service, '_extract_document_texts') as mock_extract:
@@ -369,7 +562,7 @@ class TestTranscriptVerificationService:
     @pytest.fixture
     def mock_genai_client(self):
         """Mock Google GenAI client"""
-        with patch('student_applications.services.genai') as mock_genai:
+        with patch('student_applications.genai_client.genai') as mock_genai:
             mock_client = Mock()
             mock_genai.Client.return_value = mock_client
             mock_genai_client = mock_client
@@ -423,8 +616,8 @@ class TestTranscriptVerificationService:
 
     def test_extract_transcript_texts(self, transcript_service, mock_transcript_files):
         """Test text extraction from transcript files"""
-        with patch('student_applications.services.extract_text_from_file') as mock_extract:
-            mock_extract.return_value = "Extracted text"
+        with patch('student_applications.services.extract_document') as mock_extract:
+            mock_extract.return_value = ("Extracted text", 'pdf')
 
             result = transcript_service._extract_transcript_texts(mock_transcript_files, 'single')
 
@@ -484,6 +677,15 @@ class TestTranscriptVerificationService:
             assert result['metadata']['document_type'] == 'bilingual'
             assert result['metadata']['status'] == 'completed'
 
+    def test_verify_transcript_reports_file_types(self, transcript_service, mock_transcript_files, mock_genai_client):
+        """Test that the detected type of each transcript file is listed in the metadata"""
+        mock_genai_client.models.generate_content.return_value = Mock(text='{"semesters": []}')
+
+        with patch('student_applications.services.extract_document', return_value=('Transcript text', 'rtf')):
+            result = transcript_service.verify_transcript(mock_transcript_files, 'single')
+
+        assert result['metadata']['file_types'] == {'transcript': 'rtf'}
+
     def test_verify_transcript_separate_files(self, transcript_service, mock_separate_transcript_files, mock_genai_client):
         """Test verification with separate transcript files"""
         with patch.object(transcript_service, '_extract_transcript_texts') as mock_extract:
@@ -506,6 +708,212 @@ class TestTranscriptVerificationService:
             assert 'metadata' in result
             assert result['metadata']['document_type'] == 'separate'
 
+    def test_verify_transcript_in_semester_chunks(self, transcript_service, mock_transcript_files, mock_genai_client):
+        """Test that a long transcript is verified per semester chunk and merged"""
+        transcript = "姓名: 张三\n" + "".join(
+            f"第{n}学期\n" + "".join(f"课程{n}-{i} 2 90\n" for i in range(10)) for n in range(1, 5)
+        )
+
+        def generate(model, contents, config):
+            semester = '第1学期' if '第1学期' in contents[1] else '第3学期'
+            result = {
+                'student_info': {'name_zh': '张三'},
+                'semesters': [{'name_zh': semester, 'courses': [{'credits': 2}, {'credits': 2}]}],
+                'academic_summary': {'total_credits': None}
+            }
+            return Mock(text=json.dumps(result, ensure_ascii=False))
+
+        mock_genai_client.models.generate_content.side_effect = generate
+
+        with patch.object(transcript_service, '_extract_transcript_texts', return_value={'transcript': transcript}), \
+             patch.dict(os.environ, {'TRANSCRIPT_CHUNKING': 'true', 'TRANSCRIPT_CHUNK_MIN_CHARS': '100',
+                                     'TRANSCRIPT_CHUNK_MAX': '2'}):
+            result = transcript_service.verify_transcript(mock_transcript_files, 'single')
+
+        assert mock_genai_client.models.generate_content.call_count == 2
+        prompts = [c[1]['contents'][0] for c in mock_genai_client.models.generate_content.call_args_list]
+        assert all('2部分' in prompt for prompt in prompts)
+        assert [s['name_zh'] for s in result['semesters']] == ['第1学期', '第3学期']
+        assert result['academic_summary']['total_credits'] == 8
+        assert result['academic_summary']['total_courses'] == 4
+        assert result['metadata']['chunks'] == 2
+
+    def test_verify_transcript_chunk_failure_falls_back(self, transcript_service, mock_transcript_files, mock_genai_client):
+        """Test that a failed chunk falls back to one request for the whole transcript"""
+        transcript = "姓名: 张三\n" + "".join(
+            f"第{n}学期\n" + "".join(f"课程{n}-{i} 2 90\n" for i in range(10)) for n in range(1, 3)
+        )
+
+        def generate(model, contents, config):
+            if '部分' in contents[0]:
+                return Mock(text='Not JSON')
+            return Mock(text='{"semesters": [], "student_info": {"name_zh": "张三"}}')
+
+        mock_genai_client.models.generate_content.side_effect = generate
+
+        with patch.object(transcript_service, '_extract_transcript_texts', return_value={'transcript': transcript}), \
+             patch.dict(os.environ, {'TRANSCRIPT_CHUNKING': 'true', 'TRANSCRIPT_CHUNK_MIN_CHARS': '100'}):
+            result = transcript_service.verify_transcript(mock_transcript_files, 'single')
+
+        assert result['student_info'] == {'name_zh': '张三'}
+        assert result['metadata']['chunks'] == 1
+
+    def test_verify_transcript_chunking_off_by_default(self, transcript_service, mock_transcript_files, mock_genai_client):
+        """Test that long transcripts go out as one request unless TRANSCRIPT_CHUNKING is set"""
+        transcript = "".join(f"第{n}学期\n" + "课程 2 90\n" * 10 for n in range(1, 5))
+
+        with patch.dict(os.environ, {'TRANSCRIPT_CHUNK_MIN_CHARS': '100'}):
+            os.environ.pop('TRANSCRIPT_CHUNKING', None)
+            assert transcript_service._plan_chunks({'transcript': transcript}) is None
+            os.environ['TRANSCRIPT_CHUNKING'] = 'true'
+            assert len(transcript_service._plan_chunks({'transcript': transcript})) > 1
+
+    def test_verify_transcript_reports_fallback_model(self, transcript_service, mock_transcript_files, mock_genai_client):
+        """Test that the model that actually answered is reported and a failing one is skipped later"""
+        def generate(model, contents, config):
+            if model == 'gemini-3-pro-preview':
+                raise Exception('503 UNAVAILABLE')
+            return Mock(text='{"semesters": [], "student_info": {"name_zh": "张三"}}')
+
+        mock_genai_client.models.generate_content.side_effect = generate
+
+        with patch.object(transcript_service, '_extract_transcript_texts', return_value={'transcript': 'Transcript text'}), \
+             patch.dict(os.environ, {'MODEL_FAILURE_THRESHOLD': '1'}):
+            first = transcript_service.verify_transcript(mock_transcript_files, 'single')
+            second = transcript_service.verify_transcript(mock_transcript_files, 'single')
+
+        assert first['metadata']['model_used'] == 'gemini-2.5-pro'
+        assert second['metadata']['model_used'] == 'gemini-2.5-pro'
+        models = [c[1]['model'] for c in mock_genai_client.models.generate_content.call_args_list]
+        # The open circuit keeps the second request off the failing model
+        assert models == ['gemini-3-pro-preview', 'gemini-2.5-pro', 'gemini-2.5-pro']
+
+    def test_verify_transcript_hedges_slow_model(self, transcript_service, mock_transcript_files, mock_genai_client):
+        """Test that a slow primary model is hedged and the fallback's answer is used"""
+        def stream(model, contents, config):
+            if model == 'gemini-3-pro-preview':
+                time.sleep(0.3)
+                yield Mock(text='{"semesters": []', usage_metadata=None)
+                yield Mock(text='}', usage_metadata=None)
+                return
+            yield Mock(text='{"semesters": [], "student_info": {"name_zh": "张三"}}', usage_metadata=None)
+
+        mock_genai_client.models.generate_content_stream.side_effect = stream
+        events = []
+
+        with patch.object(transcript_service, '_extract_transcript_texts', return_value={'transcript': 'Transcript text'}), \
+             patch.dict(os.environ, {'GENAI_HEDGING': 'true', 'GENAI_HEDGE_DEFAULT_DELAY': '0.05'}):
+            result = transcript_service.verify_transcript(
+                mock_transcript_files, 'single', progress_callback=lambda stage, **details: events.append(stage)
+            )
+
+        assert result['student_info'] == {'name_zh': '张三'}
+        assert result['metadata']['model_used'] == 'gemini-2.5-pro'
+        assert 'llm_hedged' in events
+        assert not mock_genai_client.models.generate_content.called
+
+    def test_verify_transcript_from_pdf_tables(self, transcript_service, mock_transcript_files, mock_genai_client):
+        """Test that table rows are used and the model only annotates them"""
+        semesters = [{'heading': '第一学期', 'courses': [
+            {'code': 'CS101', 'name_zh': '数据结构', 'name_en': 'Data Structures', 'type': None,
+             'credits': 3.0, 'grade': '90', 'grade_points': 4.0}
+        ]}]
+        mock_genai_client.models.generate_content.return_value = Mock(text=json.dumps({
+            'student_info': {'name_zh': '张三'},
+            'semesters': [{'id': 's1', 'name_en': 'Semester 1'}],
+            'courses': [{'id': 's1c1', 'course_type': 'core'}]
+        }))
+
+        with patch.object(transcript_service, '_extract_transcript_texts', return_value={'transcript': '姓名：张三'}), \
+             patch('student_applications.services.extract_course_tables', return_value=semesters), \
+             patch.dict(os.environ, {'COURSE_CLASSIFIER': 'false'}):
+            result = transcript_service.verify_transcript(mock_transcript_files, 'single')
+
+        contents = mock_genai_client.models.generate_content.call_args[1]['contents']
+        assert '不要重复课程名称' in contents[0]
+        assert 's1c1 | CS101 | 数据结构 / Data Structures' in contents[1]
+        course = result['semesters'][0]['courses'][0]
+        assert course['name_en'] == 'Data Structures'
+        assert course['course_type']['type'] == 'core'
+        assert result['metadata']['course_source'] == 'tables'
+
+    def test_verify_transcript_classifies_course_types_locally(self, transcript_service, mock_transcript_files, mock_genai_client):
+        """Test that the prompt stops requesting course types and the classifier fills them"""
+        mock_genai_client.models.generate_content.return_value = Mock(text=json.dumps({
+            'student_info': {},
+            'semesters': [{'courses': [
+                {'name_zh': '毕业设计', 'name_en': 'Graduation Project', 'credits': 8},
+                {'name_zh': '大学英语', 'name_en': 'College English', 'credits': 2,
+                 'course_type': {'type': 'core', 'en': 'Core Course', 'zh': '核心课程'}}
+            ]}],
+            'academic_summary': {}
+        }))
+
+        with patch.object(transcript_service, '_extract_transcript_texts', return_value={'transcript': 'text'}), \
+             patch.dict(os.environ, {'GENAI_STRUCTURED_OUTPUT': 'true'}):
+            result = transcript_service.verify_transcript(mock_transcript_files, 'single')
+
+        call = mock_genai_client.models.generate_content.call_args[1]
+        assert 'course_type' not in call['contents'][0]
+        assert 'course_type' not in json.dumps(call['config']['response_schema'])
+        thesis, english = result['semesters'][0]['courses']
+        assert thesis['course_type']['type'] == 'thesis'
+        assert english['course_type']['type'] == 'language'
+        assert english['course_type']['confidence'] > 0.5
+        assert result['metadata']['course_types'] == 'classifier'
+
+    def test_verify_transcript_aligns_separate_tables(self, transcript_service, mock_separate_transcript_files, mock_genai_client):
+        """Test that zh/en table rows are paired locally before the model annotates them"""
+        def tables(filepath):
+            if filepath.endswith('transcript_zh.pdf'):
+                return [{'heading': '第一学期', 'courses': [
+                    {'code': 'CS101', 'name_zh': '数据结构', 'name_en': None, 'type': 'required',
+                     'credits': 3.0, 'grade': '90', 'grade_points': 4.0}
+                ]}]
+            return [{'heading': 'Fall 2019', 'courses': [
+                {'code': 'CS101', 'name_zh': None, 'name_en': 'Data Structures', 'type': None,
+                 'credits': 3.0, 'grade': '90', 'grade_points': 4.0}
+            ]}]
+
+        mock_genai_client.models.generate_content.return_value = Mock(text='{"student_info": {}}')
+
+        with patch.object(transcript_service, '_extract_transcript_texts',
+                          return_value={'transcript_zh': '姓名：张三', 'transcript_en': 'Name: Zhang San'}), \
+             patch('student_applications.services.extract_course_tables', side_effect=tables):
+            result = transcript_service.verify_transcript(mock_separate_transcript_files, 'separate')
+
+        content = mock_genai_client.models.generate_content.call_args[1]['contents'][1]
+        # A typed, paired course needs nothing from the model
+        assert 'CS101' not in content
+        semester = result['semesters'][0]
+        assert (semester['name_zh'], semester['name_en']) == ('第一学期', 'Fall 2019')
+        assert semester['courses'][0]['name_en'] == 'Data Structures'
+        assert result['metadata']['course_source'] == 'tables'
+
+    def test_verify_transcript_recomputes_gpa(self, transcript_service, mock_transcript_files, mock_genai_client):
+        """Credits and GPAs are recomputed from the courses and wrong model numbers flagged"""
+        with patch.object(transcript_service, '_extract_transcript_texts') as mock_extract:
+            mock_extract.return_value = {'transcript': 'Transcript text'}
+            mock_response = Mock()
+            mock_response.text = json.dumps({
+                'student_info': {'overall_gpa': 3.9, 'gpa_scale': 4.0},
+                'semesters': [{
+                    'semester_gpa': 3.9,
+                    'total_credits': 5,
+                    'courses': [{'credits': 3, 'grade': '90'}, {'credits': 2, 'grade': '中等'}]
+                }],
+                'academic_summary': {'total_credits': 5, 'total_courses': 2}
+            })
+            mock_genai_client.models.generate_content.return_value = mock_response
+
+            result = transcript_service.verify_transcript(mock_transcript_files, 'single')
+
+        assert result['metadata']['gpa_recomputed'] is True
+        assert result['student_info']['overall_gpa'] == 3.9
+        assert result['academic_summary']['gpa_check']['overall_gpa'] == round((3 * 4.0 + 2 * 2.7) / 5, 2)
+        mismatches = result['academic_summary']['gpa_check']['mismatches']
+        assert [item['field'] for item in mismatches] == ['semesters[0].semester_gpa', 'student_info.overall_gpa']
+
     def test_verify_transcript_json_parse_error(self, transcript_service, mock_transcript_files, mock_genai_client):
         """Test verification when JSON parsing fails"""
         with patch.object(transcript_service, '_extract_transcript_texts') as mock_extract:
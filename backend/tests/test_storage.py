@@ -0,0 +1,159 @@
+"""
+Tests for storage backends and model persistence
+"""
+import multiprocessing
+import pytest
+
+from student_applications.storage import (
+    InMemoryStorage, SQLiteStorage, create_storage, get_storage, set_storage
+)
+from student_applications.models import StudentApplication, TranscriptVerification
+
+
+def _save_from_child(path, record_id):
+    """Save a record from a separate process"""
+    SQLiteStorage(path).save('applications', record_id, {'id': record_id, 'status': 'uploaded'})
+
+
+class TestStorageBackends:
+    """Tests shared by both storage backends"""
+
+    @pytest.fixture(params=['memory', 'sqlite'])
+    def storage(self, request, tmp_path):
+        """Create each backend in turn"""
+        if request.param == 'memory':
+            return InMemoryStorage()
+        return SQLiteStorage(str(tmp_path / 'test.db'))
+
+    def test_save_and_get(self, storage):
+        """Test saving and reading back a record"""
+        storage.save('applications', 'app-1', {'id': 'app-1', 'name': '张三'})
+
+        assert storage.get('applications', 'app-1') == {'id': 'app-1', 'name': '张三'}
+        assert storage.get('applications', 'missing') is None
+        assert storage.get('verifications', 'app-1') is None
+
+    def test_update_keeps_insertion_order(self, storage):
+        """Test that updating a record does not move it to the end"""
+        storage.save('applications', 'a', {'id': 'a', 'status': 'uploaded'})
+        storage.save('applications', 'b', {'id': 'b', 'status': 'uploaded'})
+        storage.save('applications', 'a', {'id': 'a', 'status': 'completed'})
+
+        records = storage.get_all('applications')
+        assert [r['id'] for r in records] == ['a', 'b']
+        assert records[0]['status'] == 'completed'
+
+    def test_returned_records_are_copies(self, storage):
+        """Test that mutating a returned record does not change the store"""
+        storage.save('applications', 'a', {'id': 'a', 'files': {}})
+        record = storage.get('applications', 'a')
+        record['files']['x'] = 1
+
+        assert storage.get('applications', 'a')['files'] == {}
+
+    def test_delete_all(self, storage):
+        """Test clearing one collection leaves the others intact"""
+        storage.save('applications', 'a', {'id': 'a'})
+        storage.save('verifications', 'v', {'id': 'v'})
+        storage.delete_all('applications')
+
+        assert storage.get_all('applications') == []
+        assert len(storage.get_all('verifications')) == 1
+
+
+class TestSQLiteStorage:
+    """Tests specific to the SQLite backend"""
+
+    def test_wal_mode_enabled(self, tmp_path):
+        """Test that the database runs in WAL journal mode"""
+        storage = SQLiteStorage(str(tmp_path / 'test.db'))
+        mode = storage._connect().execute('PRAGMA journal_mode').fetchone()[0]
+        assert mode.lower() == 'wal'
+
+    def test_records_visible_across_processes(self, tmp_path):
+        """Test that a record saved by another process can be read"""
+        path = str(tmp_path / 'shared.db')
+        storage = SQLiteStorage(path)
+
+        process = multiprocessing.get_context('spawn').Process(
+            target=_save_from_child, args=(path, 'from-child')
+        )
+        process.start()
+        process.join(timeout=30)
+
+        assert process.exitcode == 0
+        assert storage.get('applications', 'from-child')['status'] == 'uploaded'
+
+    def test_records_survive_reopen(self, tmp_path):
+        """Test that records persist when the database is reopened"""
+        path = str(tmp_path / 'test.db')
+        SQLiteStorage(path).save('applications', 'a', {'id': 'a'})
+
+        assert SQLiteStorage(path).get('applications', 'a') == {'id': 'a'}
+
+
+class TestCreateStorage:
+    """Tests for backend selection"""
+
+    def test_create_memory(self):
+        """Test selecting the in-memory backend"""
+        assert isinstance(create_storage('memory'), InMemoryStorage)
+
+    def test_create_sqlite_from_env(self, tmp_path, monkeypatch):
+        """Test selecting SQLite via environment variables"""
+        monkeypatch.setenv('STORAGE_BACKEND', 'sqlite')
+        monkeypatch.setenv('DATABASE_PATH', str(tmp_path / 'env.db'))
+
+        storage = create_storage()
+        assert isinstance(storage, SQLiteStorage)
+        assert storage.path == str(tmp_path / 'env.db')
+
+    def test_create_unknown_backend(self):
+        """Test that an unknown backend name is rejected"""
+        with pytest.raises(ValueError, match='Unsupported storage backend'):
+            create_storage('redis')
+
+
+class TestModelPersistence:
+    """Tests for models saved through the storage backend"""
+
+    @pytest.fixture(autouse=True)
+    def sqlite_storage(self, tmp_path):
+        """Use a temporary SQLite database for each test"""
+        previous = get_storage()
+        set_storage(SQLiteStorage(str(tmp_path / 'models.db')))
+        yield
+        set_storage(previous)
+
+    def test_application_round_trip(self):
+        """Test saving and loading a student application"""
+        files = {'transcript': {'filename': 't.pdf', 'filepath': '/tmp/t.pdf', 'content_type': 'application/pdf'}}
+        application = StudentApplication(files=files, status='uploaded').save()
+        application.analysis_result = {'applicant_info': {'name': '张三'}}
+        application.status = 'completed'
+        application.save()
+
+        loaded = StudentApplication.get_by_id(application.id)
+        assert loaded is not application
+        assert loaded.to_dict() == application.to_dict()
+        assert StudentApplication.get_by_id('missing') is None
+
+    def test_verification_round_trip(self):
+        """Test saving and loading a transcript verification"""
+        verification = TranscriptVerification(files={}, upload_type='separate', status='uploaded').save()
+
+        loaded = TranscriptVerification.get_by_id(verification.id)
+        assert loaded.upload_type == 'separate'
+        assert loaded.created_at == verification.created_at
+
+    def test_get_all_and_delete_all(self):
+        """Test listing and clearing models"""
+        first = StudentApplication(files={}).save()
+        second = StudentApplication(files={}).save()
+        TranscriptVerification(files={}).save()
+
+        assert [a.id for a in StudentApplication.get_all()] == [first.id, second.id]
+
+        StudentApplication.delete_all()
+        assert StudentApplication.get_all() == []
+        assert len(TranscriptVerification.get_all()) == 1
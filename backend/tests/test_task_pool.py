@@ -0,0 +1,57 @@
+"""
+Tests for process pools that time tasks from their start
+"""
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+
+from student_applications.task_pool import TaskPool
+
+
+class TestTaskPool:
+    """Tests for start reports, timeouts and killing hung workers"""
+
+    def test_queued_task_has_not_started(self):
+        executor = ThreadPoolExecutor(max_workers=1)
+        pool = TaskPool(executor=executor)
+        try:
+            first = pool.submit(time.sleep, 0.3)
+            second = pool.submit(os.getpid)
+            time.sleep(0.05)
+            assert pool.started_at(first) is not None
+            assert pool.started_at(second) is None
+            # The second task's timeout only starts once the first one is done
+            assert pool.result(second, timeout=0.2) == os.getpid()
+        finally:
+            executor.shutdown(wait=True)
+
+    def test_result_times_out_from_the_start(self):
+        executor = ThreadPoolExecutor(max_workers=1)
+        pool = TaskPool(executor=executor)
+        try:
+            future = pool.submit(time.sleep, 0.5)
+            with pytest.raises(FutureTimeoutError):
+                pool.result(future, timeout=0.1)
+            assert pool.expired(future, 0.1)
+        finally:
+            executor.shutdown(wait=True)
+
+    def test_workers_report_starts_and_hung_workers_are_killed(self):
+        pool = TaskPool(max_workers=1)
+        try:
+            assert pool.result(pool.submit(os.getpid), timeout=30) != os.getpid()
+
+            hung = pool.submit(time.sleep, 60)
+            deadline = time.time() + 30
+            while pool.started_at(hung) is None and time.time() < deadline:
+                time.sleep(0.05)
+            assert pool.started_at(hung) is not None
+
+            pool.kill(hung)
+            with pytest.raises(BrokenProcessPool):
+                hung.result(timeout=30)
+        finally:
+            pool.shutdown()
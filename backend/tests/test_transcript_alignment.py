@@ -0,0 +1,81 @@
+"""
+Tests for pairing separately uploaded Chinese and English transcripts
+"""
+from student_applications.transcript_alignment import align_courses, align_transcripts, pair_score
+from student_applications.transcript_tables import annotation_content
+
+
+def _course(name_zh=None, name_en=None, credits=3.0, code=None, grade=None, grade_points=None):
+    return {'code': code, 'name_zh': name_zh, 'name_en': name_en, 'type': None,
+            'credits': credits, 'grade': grade, 'grade_points': grade_points}
+
+
+class TestPairScore:
+    """Tests for pair_score"""
+
+    def test_conflicting_code_or_credits_never_pair(self):
+        assert pair_score(_course(code='CS101'), _course(code='CS102')) is None
+        assert pair_score(_course(credits=3), _course(credits=2)) is None
+
+    def test_agreeing_details_score_higher(self):
+        plain = pair_score(_course(), _course())
+        detailed = pair_score(_course(code='cs-101', grade='90'), _course(code='CS101', grade='90'))
+        assert detailed > plain
+
+
+class TestAlignCourses:
+    """Tests for the sequence alignment"""
+
+    def test_pairs_in_order_around_missing_rows(self):
+        zh = [_course('数据结构', code='CS1'), _course('体育', credits=1), _course('操作系统', code='CS2')]
+        en = [_course(name_en='Data Structures', code='CS1'), _course(name_en='Operating Systems', code='CS2')]
+
+        assert align_courses(zh, en) == [(0, 0), (2, 1)]
+
+    def test_uses_grades_when_codes_are_missing(self):
+        zh = [_course('数学', grade='90'), _course('物理', grade='85')]
+        en = [_course(name_en='Physics', grade='85')]
+
+        assert align_courses(zh, en) == [(1, 0)]
+
+
+class TestAlignTranscripts:
+    """Tests for merging aligned transcripts"""
+
+    def test_merge(self):
+        zh = [
+            {'heading': '第一学期', 'courses': [
+                _course('数据结构', code='CS1', grade='90'),
+                _course('形势与政策', credits=0.5, grade='通过'),
+            ]},
+            {'heading': '第二学期', 'courses': [_course('操作系统', code='CS2', grade='88')]},
+        ]
+        en = [
+            {'heading': 'Fall 2019', 'courses': [_course(name_en='Data Structures', code='CS1', grade='90')]},
+            {'heading': 'Spring 2020', 'courses': [
+                _course(name_en='Operating Systems', code='CS2', grade='88'),
+                _course(name_en='Swimming', credits=1.0),
+            ]},
+        ]
+
+        aligned = align_transcripts(zh, en)
+
+        assert aligned['matched'] == 2
+        first, second = aligned['semesters']
+        assert first['heading_en'] == 'Fall 2019'
+        assert second['heading_en'] == 'Spring 2020'
+        assert first['courses'][0]['name_zh'] == '数据结构'
+        assert first['courses'][0]['name_en'] == 'Data Structures'
+        assert first['courses'][1]['name_en'] is None
+        assert [course['name_en'] for course in aligned['leftovers']] == ['Swimming']
+
+        # Only the unpaired rows are sent to the model for names
+        content = annotation_content('', aligned['semesters'], aligned['leftovers'])
+        assert 's1c2 |  | 形势与政策 | 缺英文名' in content
+        assert 'Swimming' in content
+
+    def test_unrelated_documents_are_rejected(self):
+        zh = [{'heading': '第一学期', 'courses': [_course(code=f'A{i}') for i in range(5)]}]
+        en = [{'heading': 'Fall', 'courses': [_course(code=f'B{i}') for i in range(5)]}]
+
+        assert align_transcripts(zh, en) is None
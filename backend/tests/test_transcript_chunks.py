@@ -0,0 +1,128 @@
+"""
+Tests for semester-level transcript chunking
+"""
+from student_applications.transcript_chunks import (
+    split_semesters, plan_transcript_chunks, merge_chunk_results, summarize_semesters
+)
+
+TRANSCRIPT = """清华大学 本科成绩单
+姓名: 张三  学号: 2019001
+
+2019-2020学年 第一学期
+高等数学 4 95
+大学英语 3 88
+线性代数 3 90
+
+2019-2020学年 第二学期
+概率论 3 85
+数据结构 4 92
+操作系统 4 91
+
+=== Fall 2021 ===
+Computer Networks 3 A
+Compilers 3 A-
+Database Systems 3 B+
+
+Spring 2022
+Machine Learning 3 A
+Thesis 6 A
+"""
+
+
+class TestSplitSemesters:
+    """Tests for split_semesters and plan_transcript_chunks"""
+
+    def test_split_at_chinese_and_english_headings(self):
+        """Test that headings in either language start a new section"""
+        header, sections = split_semesters(TRANSCRIPT)
+
+        assert '学号: 2019001' in header
+        assert [section.split('\n')[0] for section in sections] == [
+            '2019-2020学年 第一学期', '2019-2020学年 第二学期', '=== Fall 2021 ===', 'Spring 2022'
+        ]
+
+    def test_heading_words_inside_lines_do_not_split(self):
+        """Test that semester words inside course lines are ignored"""
+        header, sections = split_semesters("Student: Li\nIntro to the Fall 2021 elections 3 A\n")
+
+        assert sections == []
+
+    def test_bilingual_heading_pair_stays_together(self):
+        """Test that an English heading directly under a Chinese one does not form its own chunk"""
+        text = "第一学期\nFirst Semester\n高等数学 Advanced Mathematics 4 95\n大学英语 College English 3 88\n" \
+               "第二学期\nSecond Semester\n数据结构 Data Structures 4 92\n操作系统 Operating Systems 4 91\n"
+
+        _, sections = split_semesters(text)
+
+        assert len(sections) == 2
+        assert sections[0].startswith('第一学期\nFirst Semester')
+
+    def test_plan_groups_semesters_and_repeats_header(self):
+        """Test that chunks are contiguous groups that all carry the student header"""
+        chunks = plan_transcript_chunks({'transcript': TRANSCRIPT}, max_chunks=3)
+
+        assert len(chunks) == 3
+        assert all('学号: 2019001' in chunk['transcript'] for chunk in chunks)
+        assert '第一学期' in chunks[0]['transcript'] and '第二学期' in chunks[0]['transcript']
+        assert 'Spring 2022' in chunks[2]['transcript']
+
+    def test_plan_requires_matching_semester_counts(self):
+        """Test that separate uploads with different semester counts are not chunked"""
+        chunks = plan_transcript_chunks({
+            'transcript_zh': TRANSCRIPT,
+            'transcript_en': 'Name: Zhang San\nFall 2021\nComputer Networks 3 A and more courses listed\n'
+        })
+
+        assert chunks is None
+
+    def test_plan_without_semesters(self):
+        """Test that text without semester headings is not chunked"""
+        assert plan_transcript_chunks({'transcript': 'Transcript text'}) is None
+
+
+class TestMergeChunkResults:
+    """Tests for merging per-chunk results"""
+
+    def test_merge_semesters_and_recompute_summary(self):
+        """Test that semesters are concatenated and totals recomputed"""
+        first = {
+            'student_info': {'name_zh': '张三', 'name_en': None, 'overall_gpa': None},
+            'semesters': [{'name_zh': '第一学期', 'academic_year': '2019-2020',
+                           'courses': [{'credits': 4}, {'credits': '3.5学分'}]}],
+            'academic_summary': {'total_credits': None, 'academic_standing': '良好',
+                                 'verification_notes': '部分课程无英文名'}
+        }
+        second = {
+            'student_info': {'name_zh': '张三', 'name_en': 'Zhang San', 'overall_gpa': 3.8},
+            'semesters': [{'name_zh': '第二学期', 'academic_year': '2019-2020', 'total_credits': 6,
+                           'courses': [{'credits': 3}, {'credits': 3}]}],
+            'academic_summary': {'total_credits': 999, 'academic_standing': None, 'verification_notes': None}
+        }
+
+        merged = merge_chunk_results([first, second])
+
+        assert merged['student_info'] == {'name_zh': '张三', 'name_en': 'Zhang San', 'overall_gpa': 3.8}
+        assert [s['name_zh'] for s in merged['semesters']] == ['第一学期', '第二学期']
+        assert [s['semester_id'] for s in merged['semesters']] == ['semester_1', 'semester_2']
+        assert merged['semesters'][0]['total_credits'] == 7.5
+        assert merged['academic_summary'] == {
+            'total_credits': 13.5,
+            'total_courses': 4,
+            'academic_standing': '良好',
+            'verification_notes': '部分课程无英文名'
+        }
+
+    def test_semester_split_across_chunks_is_joined(self):
+        """Test that the same semester reported by two chunks becomes one"""
+        part = {'semesters': [{'name_zh': '第一学期', 'academic_year': '2019-2020', 'courses': [{'credits': 2}]}]}
+
+        merged = merge_chunk_results([part, {'semesters': [dict(part['semesters'][0], courses=[{'credits': 3}])]}])
+
+        assert len(merged['semesters']) == 1
+        assert merged['semesters'][0]['total_credits'] == 5
+
+    def test_summarize_ignores_unreadable_credits(self):
+        """Test that missing or non-numeric credits count as zero"""
+        summary = summarize_semesters([{'courses': [{'credits': None}, {'credits': 'N/A'}, {'credits': 2.5}]}])
+
+        assert summary == {'total_credits': 2.5, 'total_courses': 3}
@@ -0,0 +1,195 @@
+"""
+Tests for course extraction from transcript PDF tables
+"""
+import os
+import pytest
+from unittest.mock import Mock, MagicMock, patch
+
+from student_applications.extraction_cache import ExtractionCache, set_extraction_cache
+from student_applications.transcript_tables import (
+    map_header, split_bilingual, course_type, parse_course_tables,
+    extract_course_tables, annotation_content, assemble_table_result
+)
+
+HEADER = ['课程代码 Code', '课程名称 Course Title', '课程性质 Type', '学分 Credits', '成绩 Grade', '绩点 GP']
+
+
+def _rows(*courses):
+    return [HEADER] + [list(course) for course in courses]
+
+
+class TestTableParsing:
+    """Tests for the table row parser"""
+
+    def test_map_header(self):
+        assert map_header(HEADER) == {
+            'code': 0, 'name': 1, 'type_label': 2, 'credits': 3, 'grade': 4, 'grade_points': 5
+        }
+        assert map_header(['CS101', '数据结构', '3', '90']) is None
+
+    @pytest.mark.parametrize('name, expected', [
+        ('数据结构 Data Structures', ('数据结构', 'Data Structures')),
+        ('大学英语3 College English 3', ('大学英语3', 'College English 3')),
+        ('高等数学（上） Advanced Mathematics I', ('高等数学（上）', 'Advanced Mathematics I')),
+        ('Data Mining', (None, 'Data Mining')),
+        ('思想道德修养', ('思想道德修养', None)),
+    ])
+    def test_split_bilingual(self, name, expected):
+        assert split_bilingual(name) == expected
+
+    def test_course_type_labels(self):
+        assert course_type('必修') == 'required'
+        assert course_type('专业选修') == 'major'
+        assert course_type('公共选修') == 'general'
+        assert course_type('') is None
+
+    def test_semesters_from_text_above_tables(self):
+        tables = [
+            ('姓名：张三\n2019-2020学年 第一学期', _rows(
+                ['CS101', '数据结构 Data Structures', '', '3', '90', '4.0'],
+                ['MA101', '高等数学 Calculus', '必修', '5.0', '85', '3.7'],
+            )),
+            ('2019-2020学年 第二学期', [
+                # Continued tables may have no header row
+                ['CS102', '操作系统 Operating Systems', '', '3', 'A', ''],
+            ]),
+        ]
+
+        semesters = parse_course_tables(tables)
+
+        assert [s['heading'] for s in semesters] == ['2019-2020学年 第一学期', '2019-2020学年 第二学期']
+        first = semesters[0]['courses']
+        assert first[0] == {
+            'code': 'CS101', 'name_zh': '数据结构', 'name_en': 'Data Structures', 'type': None,
+            'credits': 3.0, 'grade': '90', 'grade_points': 4.0
+        }
+        assert first[1]['type'] == 'required'
+        assert semesters[1]['courses'][0]['grade_points'] is None
+
+    def test_heading_rows_inside_table(self):
+        rows = _rows(
+            ['Fall 2020', None, None, None, None, None],
+            ['CS101', 'Data Structures', '', '3', 'A', '4.0'],
+            ['Spring 2021', None, None, None, None, None],
+            ['CS102', 'Operating Systems', '', '4', 'B', '3.0'],
+            ['', '合计 Total', '', '', '', ''],
+        )
+
+        semesters = parse_course_tables([('', rows)])
+
+        assert [(s['heading'], len(s['courses'])) for s in semesters] == [('Fall 2020', 1), ('Spring 2021', 1)]
+
+    def test_semester_column(self):
+        rows = [
+            ['学期', '课程名称', '学分', '成绩'],
+            ['2020秋季', '数据结构', '3', '90'],
+            ['2021春季', '操作系统', '3', '88'],
+            ['2020秋季', '离散数学', '2', '95'],
+        ]
+
+        semesters = parse_course_tables([('', rows)])
+
+        assert [(s['heading'], len(s['courses'])) for s in semesters] == [('2020秋季', 2), ('2021春季', 1)]
+
+
+class TestExtractCourseTables:
+    """Tests for reading tables from a PDF"""
+
+    def _pdf(self, tables):
+        page = MagicMock(width=600)
+        found = []
+        for top, (above, rows) in enumerate(tables):
+            table = Mock(bbox=(0, top * 100 + 50, 600, top * 100 + 90))
+            table.extract.return_value = rows
+            found.append(table)
+        page.find_tables.return_value = found
+        page.crop.side_effect = [Mock(**{'extract_text.return_value': above}) for above, _ in tables]
+        pdf = MagicMock()
+        pdf.__enter__.return_value = Mock(pages=[page])
+        return pdf
+
+    def test_reads_semesters_from_pdf(self):
+        rows = _rows(*[['C%d' % i, '课程%d' % i, '', '2', '90', '4.0'] for i in range(6)])
+        pdf = self._pdf([('第一学期', rows)])
+
+        with patch('student_applications.transcript_tables.pdfplumber.open', return_value=pdf):
+            semesters = extract_course_tables('transcript.pdf')
+
+        assert len(semesters) == 1
+        assert semesters[0]['heading'] == '第一学期'
+        assert len(semesters[0]['courses']) == 6
+
+    def test_too_few_courses_or_no_semesters(self):
+        few = self._pdf([('第一学期', _rows(['C1', '课程', '', '2', '90', '4.0']))])
+        with patch('student_applications.transcript_tables.pdfplumber.open', return_value=few):
+            assert extract_course_tables('transcript.pdf') is None
+
+        rows = _rows(*[['C%d' % i, '课程%d' % i, '', '2', '90', '4.0'] for i in range(6)])
+        no_heading = self._pdf([('成绩单', rows)])
+        with patch('student_applications.transcript_tables.pdfplumber.open', return_value=no_heading):
+            assert extract_course_tables('transcript.pdf') is None
+
+    def test_non_pdf_is_skipped(self):
+        assert extract_course_tables('transcript.png') is None
+
+    def test_pdf_without_suffix_is_read(self, tmp_path):
+        """PDFs are recognised by their signature, not their file name"""
+        upload = tmp_path / 'transcript'
+        upload.write_bytes(b'%PDF-1.4\n')
+        rows = _rows(*[['C%d' % i, '课程%d' % i, '', '2', '90', '4.0'] for i in range(6)])
+
+        with patch('student_applications.transcript_tables.pdfplumber.open',
+                   return_value=self._pdf([('第一学期', rows)])):
+            semesters = extract_course_tables(str(upload))
+
+        assert len(semesters[0]['courses']) == 6
+
+    def test_rows_of_identical_file_are_cached(self, tmp_path):
+        """A second verification of the same file does not parse the PDF again"""
+        upload = tmp_path / 'transcript.pdf'
+        upload.write_bytes(b'%PDF-1.4\n')
+        rows = _rows(*[['C%d' % i, '课程%d' % i, '', '2', '90', '4.0'] for i in range(6)])
+        pdf = self._pdf([('第一学期', rows)])
+
+        set_extraction_cache(ExtractionCache(directory=None))
+        try:
+            with patch.dict(os.environ, {'EXTRACTION_CACHE_ENABLED': 'true'}), \
+                 patch('student_applications.transcript_tables.pdfplumber.open', return_value=pdf) as opened:
+                first = extract_course_tables(str(upload))
+                second = extract_course_tables(str(upload))
+        finally:
+            set_extraction_cache(None)
+
+        assert opened.call_count == 1
+        assert second == first
+
+
+class TestAssembleTableResult:
+    """Tests for merging table rows with the model's annotation"""
+
+    def test_assemble(self):
+        semesters = parse_course_tables([('第一学期', _rows(
+            ['CS101', '数据结构 Data Structures', '', '3', '90', '4.0'],
+            ['PE101', '体育 Physical Education', '必修', '1', '85', '3.0'],
+        ))])
+        content = annotation_content('姓名：张三', semesters)
+        # Only the course without a printed type is sent for classification
+        assert 's1c1' in content and 's1c2' not in content
+
+        result = assemble_table_result(semesters, {
+            'student_info': {'name_zh': '张三'},
+            'semesters': [{'id': 's1', 'name_en': 'First Semester', 'type': 'fall'}],
+            'courses': [{'id': 's1c1', 'course_type': 'core'}],
+            'academic_summary': {'academic_standing': '良好'}
+        })
+
+        semester = result['semesters'][0]
+        assert semester['name_zh'] == '第一学期'
+        assert semester['name_en'] == 'First Semester'
+        assert semester['total_credits'] == 4
+        assert semester['semester_gpa'] == 3.75
+        assert semester['courses'][0]['course_type'] == {'type': 'core', 'en': 'Core Course', 'zh': '核心课程'}
+        assert semester['courses'][1]['course_type']['type'] == 'required'
+        assert result['academic_summary']['total_courses'] == 2
+        assert result['academic_summary']['academic_standing'] == '良好'
+        assert result['student_info'] == {'name_zh': '张三'}
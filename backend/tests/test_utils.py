@@ -7,6 +7,8 @@ from pathlib import Path
 import pytest
 from unittest.mock import Mock, patch, mock_open
 
+from student_applications.task_pool import TaskPool
+
 
 class TestFileExtensionUtils:
     """Tests for file extension utility functions"""
@@ -133,6 +135,56 @@ class TestTextExtraction:
         finally:
             os.unlink(temp_path)
 
+    @patch('student_applications.utils.PYPDF2_AVAILABLE', True)
+    @patch('student_applications.utils.PDFPLUMBER_AVAILABLE', True)
+    def test_iter_pdf_pages_falls_back_per_page(self):
+        """Only pages PyPDF2 cannot read are re-read with pdfplumber, and those pages are closed"""
+        from student_applications.utils import iter_pdf_pages
+
+        reader = Mock(pages=[Mock(**{'extract_text.return_value': 'x' * 200}),
+                             Mock(**{'extract_text.return_value': ''})])
+        plumber_pages = [Mock(), Mock(**{'extract_text.return_value': 'scanned page text'})]
+        plumber = Mock(pages=plumber_pages)
+
+        with patch('builtins.open', mock_open(read_data=b'PDF')), \
+             patch('student_applications.utils.PyPDF2.PdfReader', return_value=reader), \
+             patch('student_applications.utils.pdfplumber.open', return_value=plumber):
+            pages = list(iter_pdf_pages('doc.pdf'))
+
+        assert pages == [(0, 'x' * 200, 'pypdf2'), (1, 'scanned page text', 'pdfplumber')]
+        assert not plumber_pages[0].extract_text.called
+        assert plumber_pages[1].close.called
+        assert plumber.close.called
+
+    @patch('student_applications.utils.PYPDF2_AVAILABLE', True)
+    def test_iter_pdf_pages_stops_at_budget(self):
+        """Page and character budgets stop extraction before later pages are read"""
+        from student_applications.utils import iter_pdf_pages, extract_text_from_pdf
+
+        pages = [Mock(**{'extract_text.return_value': f'page {n} ' + 'x' * 120}) for n in range(5)]
+        reader = Mock(pages=pages)
+
+        with patch('builtins.open', mock_open(read_data=b'PDF')), \
+             patch('student_applications.utils.PyPDF2.PdfReader', return_value=reader):
+            assert len(list(iter_pdf_pages('doc.pdf', max_pages=2))) == 2
+            text = extract_text_from_pdf('doc.pdf', max_chars=200)
+
+        # The budget counts page text, not the newlines joining pages
+        assert len(text.replace('\n', '')) == 200
+        assert text.startswith('page 0')
+        assert not pages[4].extract_text.called
+
+    @patch('student_applications.utils.PYPDF2_AVAILABLE', False)
+    @patch('student_applications.utils.PDFPLUMBER_AVAILABLE', True)
+    def test_extract_text_from_pdf_pdfplumber_only(self):
+        """Without PyPDF2 every page is read with pdfplumber"""
+        from student_applications.utils import extract_text_from_pdf
+
+        plumber = Mock(pages=[Mock(**{'extract_text.return_value': 'Page 1'}),
+                              Mock(**{'extract_text.return_value': 'Page 2'})])
+        with patch('student_applications.utils.pdfplumber.open', return_value=plumber):
+            assert extract_text_from_pdf('doc.pdf') == 'Page 1\nPage 2'
+
     @patch('student_applications.utils.DOCX_AVAILABLE', True)
     @patch('student_applications.utils.docx.Document')
     def test_extract_text_from_docx(self, mock_document):
@@ -176,16 +228,18 @@ class TestTextExtraction:
 
     @patch('student_applications.utils.PILLOW_AVAILABLE', True)
     @patch('student_applications.utils.TESSERACT_AVAILABLE', True)
-    @patch('student_applications.utils.pytesseract')
-    @patch('student_applications.utils.Image')
-    def test_extract_text_from_image(self, mock_image, mock_pytesseract):
+    @patch('student_applications.utils.ocr_available', return_value=True)
+    @patch('student_applications.ocr.TESSEROCR_AVAILABLE', False)
+    @patch.dict(os.environ, {'OCR_PREPROCESS': 'false'})
+    @patch('student_applications.ocr.pytesseract')
+    @patch('student_applications.ocr.Image')
+    def test_extract_text_from_image(self, mock_image, mock_pytesseract, mock_available):
         """Test image text extraction with OCR"""
         from student_applications.utils import extract_text_from_image
 
         # Mock PIL Image and pytesseract
         mock_img = Mock()
-        mock_image.open.return_value = mock_img
-        mock_pytesseract.get_tesseract_version.return_value = None  # Mock version check
+        mock_image.open.return_value.__enter__.return_value.copy.return_value = mock_img
         mock_pytesseract.image_to_string.return_value = 'Extracted text from image'
 
         with tempfile.NamedTemporaryFile(suffix='.png', delete=False) as f:
@@ -266,4 +320,265 @@ class TestTextExtraction:
                 assert text == 'Fallback text'
                 assert mock_func.called
         finally:
-            os.unlink(temp_path)
\ No newline at end of file
+            os.unlink(temp_path)
+
+class TestFileTypeDetection:
+    """Tests for content sniffing and the extractor registry"""
+
+    @pytest.mark.parametrize('head, expected', [
+        (b'%PDF-1.7\n', 'pdf'),
+        (b'\xef\xbb\xbf\r\n%PDF-1.4\n', 'pdf'),
+        (b'\x89PNG\r\n\x1a\n\x00\x00', 'png'),
+        (b'\xff\xd8\xff\xe0\x00\x10JFIF', 'jpeg'),
+        (b'II*\x00\x08\x00', 'tiff'),
+        (b'MM\x00*\x00\x00', 'tiff'),
+        (b'BM\x36\x00\x0c\x00\x00\x00\x00\x00', 'bmp'),
+        (b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1\x00', 'doc'),
+        (b'BMW 3 series brochure', None),
+        (b'plain text', None),
+    ])
+    def test_sniff_file_type(self, tmp_path, head, expected):
+        from student_applications.utils import sniff_file_type
+
+        path = tmp_path / 'upload.bin'
+        path.write_bytes(head + b'\x00' * 64)
+        assert sniff_file_type(str(path)) == expected
+
+    def test_zip_is_docx_only_with_a_word_document(self, tmp_path):
+        import zipfile
+        from student_applications.utils import sniff_file_type
+
+        docx = tmp_path / 'cv.bin'
+        with zipfile.ZipFile(docx, 'w') as archive:
+            archive.writestr('word/document.xml', '<w:document/>')
+        other = tmp_path / 'photos.docx'
+        with zipfile.ZipFile(other, 'w') as archive:
+            archive.writestr('scan.png', b'')
+
+        assert sniff_file_type(str(docx)) == 'docx'
+        assert sniff_file_type(str(other)) == 'zip'
+
+    def test_signature_wins_over_extension_and_content_type(self, tmp_path):
+        from student_applications.utils import extract_document
+
+        path = tmp_path / 'transcript.doc'
+        path.write_bytes(b'%PDF-1.4\n')
+        with patch('student_applications.utils.extract_text_from_pdf', return_value='PDF text') as pdf, \
+             patch('student_applications.utils.extract_text_from_docx') as docx:
+            assert extract_document(str(path), 'application/msword') == ('PDF text', 'pdf')
+        pdf.assert_called_once_with(str(path), ocr_lang=None)
+        assert not docx.called
+
+    def test_legacy_word_documents_are_not_read(self, tmp_path):
+        from student_applications.utils import extract_document
+
+        path = tmp_path / 'resume.doc'
+        path.write_bytes(b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1' + b'\x00' * 64)
+        with patch('student_applications.utils.extract_text_from_docx') as docx:
+            assert extract_document(str(path)) == ('', 'doc')
+        assert not docx.called
+
+    def test_unrecognised_binary_is_not_decoded_as_text(self, tmp_path):
+        from student_applications.utils import extract_document
+
+        path = tmp_path / 'upload.unknown'
+        path.write_bytes(b'\x7fELF\x02\x01\x01\x00' + b'\x00' * 64)
+        with patch('student_applications.utils.extract_text_from_txt') as txt:
+            assert extract_document(str(path), 'application/octet-stream') == ('', None)
+        assert not txt.called
+
+    def test_register_extractor(self, tmp_path, monkeypatch):
+        from student_applications import utils
+
+        monkeypatch.setattr(utils, 'FILE_SIGNATURES', list(utils.FILE_SIGNATURES))
+        monkeypatch.setattr(utils, 'EXTENSION_TYPES', dict(utils.EXTENSION_TYPES))
+        monkeypatch.setattr(utils, '_extractors', dict(utils._extractors))
+        monkeypatch.setattr(utils, '_registered_types', set())
+        extractor = Mock(return_value='RTF text')
+        utils.register_extractor('rtf', extractor, signature=b'{\\rtf', extensions=('RTF',))
+
+        sniffed = tmp_path / 'letter.txt'
+        sniffed.write_bytes(b'{\\rtf1\\ansi hello}')
+        by_extension = tmp_path / 'empty.rtf'
+        by_extension.write_bytes(b'')
+
+        assert utils.extract_document(str(sniffed), ocr_lang='eng') == ('RTF text', 'rtf')
+        assert utils.detect_file_type(str(by_extension)) == 'rtf'
+        extractor.assert_called_once_with(str(sniffed), 'eng')
+
+class TestParallelExtraction:
+    """Tests for extract_texts_in_parallel"""
+
+    @pytest.fixture
+    def text_files(self, tmp_path):
+        """Create several text documents"""
+        files = {}
+        for key in ['transcript', 'degree_certificate', 'resume']:
+            path = tmp_path / f'{key}.txt'
+            path.write_text(f'{key} content', encoding='utf-8')
+            files[key] = {'filename': path.name, 'filepath': str(path), 'content_type': 'text/plain'}
+        return files
+
+    def test_extract_in_process_pool(self, text_files):
+        """Test extraction across real worker processes keeps the key order"""
+        from student_applications.utils import extract_texts_in_parallel
+
+        result = extract_texts_in_parallel(text_files, max_workers=2, timeout=60)
+
+        assert list(result.keys()) == ['transcript', 'degree_certificate', 'resume']
+        assert result['resume'] == 'resume content'
+
+    def test_registered_types_are_extracted_outside_the_pool(self, text_files, tmp_path, monkeypatch):
+        """Test that extractors registered in this process also apply to files sent to the pool"""
+        from student_applications import utils
+
+        monkeypatch.setattr(utils, 'FILE_SIGNATURES', list(utils.FILE_SIGNATURES))
+        monkeypatch.setattr(utils, '_extractors', dict(utils._extractors))
+        monkeypatch.setattr(utils, '_registered_types', set())
+        utils.register_extractor('rtfx', lambda filepath, ocr_lang: 'registered ' + os.path.basename(filepath),
+                                 signature=b'RTF1')
+        path = tmp_path / 'letter.bin'
+        path.write_bytes(b'RTF1\x00\x01 body')
+        files = dict(text_files, letter={'filename': path.name, 'filepath': str(path), 'content_type': None})
+        types = {}
+
+        result = utils.extract_texts_in_parallel(
+            files, max_workers=2, timeout=60, on_result=lambda key, text, file_type: types.update({key: file_type})
+        )
+
+        assert result['letter'] == 'registered letter.bin'
+        assert result['resume'] == 'resume content'
+        assert types == {'transcript': 'text', 'degree_certificate': 'text', 'resume': 'text', 'letter': 'rtfx'}
+
+    def test_errors_and_timeouts_map_to_empty_text(self, text_files):
+        """Test that failed and timed-out files return empty text like the sequential path"""
+        import time
+        from concurrent.futures import ThreadPoolExecutor
+        from student_applications.utils import extract_texts_in_parallel
+
+        def fake_extract(filepath, content_type=None, ocr_lang=None, file_type=None):
+            if 'degree' in filepath:
+                raise ValueError('corrupt file')
+            if 'resume' in filepath:
+                time.sleep(1)
+            return 'ok'
+
+        executor = ThreadPoolExecutor(max_workers=3)
+        try:
+            with patch('student_applications.utils._get_extraction_pool', return_value=TaskPool(executor=executor)), \
+                 patch('student_applications.utils._extract_text_uncached', side_effect=fake_extract):
+                result = extract_texts_in_parallel(text_files, max_workers=3, timeout=0.2)
+        finally:
+            executor.shutdown(wait=True)
+
+        assert result == {'transcript': 'ok', 'degree_certificate': '', 'resume': ''}
+
+    def test_timeouts_start_when_a_worker_starts_the_file(self, text_files):
+        """Test that files queued behind other requests' work are not timed out"""
+        import time
+        from concurrent.futures import ThreadPoolExecutor
+        from student_applications.utils import extract_texts_in_parallel
+
+        def fake_extract(filepath, content_type=None, ocr_lang=None, file_type=None):
+            time.sleep(0.1)
+            return 'ok'
+
+        executor = ThreadPoolExecutor(max_workers=1)
+        pool = TaskPool(executor=executor)
+        try:
+            # Another request occupies the only worker for longer than the timeout
+            busy = pool.submit(time.sleep, 0.5)
+            with patch('student_applications.utils._get_extraction_pool', return_value=pool), \
+                 patch('student_applications.utils._extract_text_uncached', side_effect=fake_extract):
+                result = extract_texts_in_parallel(text_files, max_workers=1, timeout=0.3)
+            assert busy.done()
+        finally:
+            executor.shutdown(wait=True)
+
+        assert result == {'transcript': 'ok', 'degree_certificate': 'ok', 'resume': 'ok'}
+
+    def test_hung_file_restarts_the_pool(self, text_files):
+        """Test that the worker of a timed-out file is killed and the pool replaced"""
+        import time
+        from concurrent.futures import ThreadPoolExecutor
+        from student_applications.utils import extract_texts_in_parallel
+
+        def fake_extract(filepath, content_type=None, ocr_lang=None, file_type=None):
+            if 'resume' in filepath:
+                time.sleep(0.5)
+            return 'ok'
+
+        executor = ThreadPoolExecutor(max_workers=3)
+        pool = TaskPool(executor=executor)
+        try:
+            with patch('student_applications.utils._get_extraction_pool', return_value=pool), \
+                 patch('student_applications.utils._extract_text_uncached', side_effect=fake_extract), \
+                 patch.object(pool, 'kill') as kill, \
+                 patch('student_applications.utils._reset_extraction_pool') as reset:
+                result = extract_texts_in_parallel(text_files, max_workers=3, timeout=0.2)
+        finally:
+            executor.shutdown(wait=True)
+
+        assert result['resume'] == ''
+        kill.assert_called_once()
+        reset.assert_called_once_with(pool)
+
+    def test_image_uploads_are_ocrd_as_one_batch(self, text_files, tmp_path):
+        """Test that the images of a request share one OCR batch while documents use the pool"""
+        from concurrent.futures import ThreadPoolExecutor
+        from student_applications.utils import extract_texts_in_parallel
+
+        files = dict(text_files)
+        for key in ('ielts_score', 'degree_scan'):
+            path = tmp_path / f'{key}.png'
+            path.write_bytes(b'\x89PNG\r\n\x1a\n' + b'\x00' * 16)
+            files[key] = {'filepath': str(path), 'content_type': 'image/png'}
+
+        executor = ThreadPoolExecutor(max_workers=2)
+        try:
+            with patch('student_applications.utils._get_extraction_pool', return_value=TaskPool(executor=executor)), \
+                 patch('student_applications.utils.ocr_available', return_value=True), \
+                 patch('student_applications.utils.lang_for_file_key', side_effect=lambda key: 'eng' if key == 'ielts_score' else None), \
+                 patch('student_applications.utils.recognize_images', return_value=['IELTS', 'DEGREE']) as recognize:
+                result = extract_texts_in_parallel(files, max_workers=2, timeout=30)
+        finally:
+            executor.shutdown(wait=True)
+
+        recognize.assert_called_once_with([files['ielts_score']['filepath'], files['degree_scan']['filepath']],
+                                          langs=['eng', None])
+        assert result['ielts_score'] == 'IELTS'
+        assert result['resume'] == 'resume content'
+
+    def test_worker_results_carry_ocr_statistics(self):
+        """Test that extraction workers send their OCR work back for the health statistics"""
+        from student_applications import ocr
+        from student_applications.utils import _extract_in_worker
+
+        def scanned_pdf(filepath, content_type, ocr_lang, file_type):
+            ocr._stats.submitted()
+            ocr._stats.finished(0.25)
+            return 'scanned text'
+
+        with patch('student_applications.utils._extract_text_uncached', side_effect=scanned_pdf):
+            text, report = _extract_in_worker('scan.pdf', 'application/pdf', None, 'pdf')
+
+        assert text == 'scanned text'
+        assert report['latencies'] == [0.25]
+        assert report['failed'] == 0
+
+    def test_services_fan_out_when_pool_enabled(self, text_files, monkeypatch):
+        """Test that the services use the pool when more than one worker is configured"""
+        monkeypatch.setenv('EXTRACTION_WORKERS', '4')
+        monkeypatch.setenv('GOOGLE_GENAI_API_KEY', 'test-api-key')
+
+        with patch('student_applications.genai_client.genai'), \
+             patch('student_applications.services.extract_texts_in_parallel') as mock_parallel:
+            from student_applications.services import StudentApplicationService
+
+            mock_parallel.return_value = {'transcript': 'a', 'degree_certificate': 'b', 'resume': 'c'}
+            result = StudentApplicationService()._extract_document_texts(text_files)
+
+        mock_parallel.assert_called_once()
+        assert mock_parallel.call_args[0][0] == text_files
+        assert callable(mock_parallel.call_args[1]['on_result'])
+        assert result['resume'] == 'c'
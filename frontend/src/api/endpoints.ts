@@ -29,7 +29,11 @@ export const USER_ENDPOINTS = {
 export const STUDENT_APPLICATION_ENDPOINTS = {
   LIST: '/api/student-applications',
   UPLOAD: '/api/student-applications/upload',
+  // Queues a background job; poll GET_JOB (or subscribe to GET_JOB_EVENTS) for its outcome
   ANALYZE: (id: string) => `/api/student-applications/analyze/${id}`,
+  ANALYZE_STREAM: (id: string) => `/api/student-applications/analyze/${id}/stream`,
+  GET_JOB: (id: string) => `/api/student-applications/jobs/${id}`,
+  GET_JOB_EVENTS: (id: string) => `/api/student-applications/jobs/${id}/events`,
   GET_APPLICATION: (id: string) => `/api/student-applications/${id}`,
   GET_TEMPLATE: '/api/student-applications/template',
 }
@@ -38,7 +42,9 @@ export const STUDENT_APPLICATION_ENDPOINTS = {
 export const TRANSCRIPT_VERIFICATION_ENDPOINTS = {
   LIST: '/api/student-applications/transcript',
   UPLOAD: '/api/student-applications/transcript/upload',
+  // Queues a background job; poll STUDENT_APPLICATION.GET_JOB for its outcome
   VERIFY: (id: string) => `/api/student-applications/transcript/verify/${id}`,
+  VERIFY_STREAM: (id: string) => `/api/student-applications/transcript/verify/${id}/stream`,
   GET_VERIFICATION: (id: string) => `/api/student-applications/transcript/${id}`,
 }
 
@@ -16,8 +16,10 @@ export type {
   Module2Data,
   Module3Data,
   TodoResponse,
+  AnalysisJob,
 } from './types'
 export { ENDPOINTS } from './endpoints'
+export { waitForJob } from './jobs'
 
 // Re-export apiClient as default for backward compatibility
 export { apiClient as default } from './client'
@@ -0,0 +1,48 @@
+/**
+ * Background job polling
+ * Analysis and verification requests return 202 with a job ID right away;
+ * the result is read from the record once the job has finished
+ */
+
+import { apiClient } from './client'
+import { ENDPOINTS } from './endpoints'
+import type { AnalysisJob } from './types'
+
+// Delay between job status requests
+export const JOB_POLL_INTERVAL_MS = 1500
+
+// Give up on a job that has not finished after this long
+export const JOB_POLL_TIMEOUT_MS = 15 * 60 * 1000
+
+const sleep = (ms: number) => new Promise(resolve => setTimeout(resolve, ms))
+
+// Responses use the standard { success, data } envelope; older handlers return the payload directly
+export const responseData = (body: any) => (body && body.data !== undefined ? body.data : body)
+
+/**
+ * Poll a job until it completes
+ * Resolves with the finished job and rejects with the job's error message when it fails
+ */
+export const waitForJob = async (
+  jobId: string,
+  intervalMs: number = JOB_POLL_INTERVAL_MS,
+  timeoutMs: number = JOB_POLL_TIMEOUT_MS
+): Promise<AnalysisJob> => {
+  const deadline = Date.now() + timeoutMs
+
+  for (;;) {
+    const response = await apiClient.get(ENDPOINTS.STUDENT_APPLICATION.GET_JOB(jobId))
+    const job: AnalysisJob = responseData(response.data)
+
+    if (job.status === 'completed') {
+      return job
+    }
+    if (job.status === 'failed') {
+      throw new Error(job.error_message || 'Job failed')
+    }
+    if (Date.now() >= deadline) {
+      throw new Error('Timed out waiting for the job to finish')
+    }
+    await sleep(intervalMs)
+  }
+}
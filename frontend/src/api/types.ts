@@ -129,7 +129,15 @@ export interface StudentApplicationFile {
 export interface StudentApplication {
   id: string
   files: Record<string, StudentApplicationFile>
-  status: 'pending' | 'uploaded' | 'analyzing' | 'analyzed' | 'completed' | 'failed'
+  status:
+    | 'pending'
+    | 'uploaded'
+    | 'queued'
+    | 'extracting'
+    | 'analyzing'
+    | 'analyzed'
+    | 'completed'
+    | 'failed'
   analysis_result?: any
   structured_summary?: string
   error_message?: string
@@ -157,8 +165,27 @@ export interface UploadFilesResponse {
 export interface AnalyzeResponse {
   message: string
   application_id: string
+  job_id: string
   status: string
-  analysis_summary: string
+  next_step: {
+    job: string
+    events: string
+    status: string
+  }
+}
+
+/**
+ * Background analysis/verification job
+ */
+export interface AnalysisJob {
+  id: string
+  kind: 'analyze' | 'verify'
+  target_id: string
+  status: 'queued' | 'running' | 'completed' | 'failed'
+  stage: string | null
+  error_message: string | null
+  created_at: string
+  updated_at: string
 }
 
 export interface TemplateResponse {
@@ -7,6 +7,7 @@ import { create } from 'zustand'
 import { persist, createJSONStorage } from 'zustand/middleware'
 import { apiClient } from '../api/client'
 import { ENDPOINTS } from '../api/endpoints'
+import { waitForJob, responseData } from '../api/jobs'
 
 /**
  * Student Application Information Types
@@ -322,17 +323,22 @@ export const useModule1Store = create<Module1State & Module1Actions>()(
         set({ isProcessing: true, processingError: null })
 
         try {
+          // The analysis runs as a background job; the result is read once it has finished
           const response = await apiClient.post(
             ENDPOINTS.STUDENT_APPLICATION.ANALYZE(applicationId)
           )
+          await waitForJob(responseData(response.data).job_id)
 
-          const applicationData = response.data
+          const applicationResponse = await apiClient.get(
+            ENDPOINTS.STUDENT_APPLICATION.GET_APPLICATION(applicationId)
+          )
+          const applicationData = responseData(applicationResponse.data)
           const result: StudentApplicationResult = {
             id: applicationId,
             files: applicationData.files || {},
             status: applicationData.status || 'completed',
             analysis_result: applicationData.analysis_result,
-            structured_summary: applicationData.analysis_summary || applicationData.structured_summary,
+            structured_summary: applicationData.structured_summary || applicationData.analysis_summary,
             created_at: applicationData.created_at || new Date().toISOString(),
             updated_at: applicationData.updated_at || new Date().toISOString(),
           }
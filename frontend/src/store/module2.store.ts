@@ -13,6 +13,7 @@ import type {
 } from '../types/transcript.types'
 import { apiClient } from '../api/client'
 import { ENDPOINTS } from '../api/endpoints'
+import { waitForJob, responseData } from '../api/jobs'
 
 /**
  * Module 2 state interface for transcript verification
@@ -225,12 +226,18 @@ export const useModule2Store = create<Module2State & Module2Actions>()(
         set({ isVerifying: true, verificationError: null })
 
         try {
+          // The verification runs as a background job; the result is read once it has finished
           const response = await apiClient.post(
             ENDPOINTS.TRANSCRIPT_VERIFICATION.VERIFY(verificationId)
           )
+          await waitForJob(responseData(response.data).job_id)
 
-          const verificationResult = response.data.verification_result
-          const structuredResult = response.data.structured_result
+          const verificationResponse = await apiClient.get(
+            ENDPOINTS.TRANSCRIPT_VERIFICATION.GET_VERIFICATION(verificationId)
+          )
+          const verificationData = responseData(verificationResponse.data)
+          const verificationResult = verificationData.verification_result
+          const structuredResult = verificationData.structured_result
 
           // Create verification result object
           const result: TranscriptVerificationResult = {
@@ -23,6 +23,7 @@ vi.mock('../../api/endpoints', () => ({
     STUDENT_APPLICATION: {
       UPLOAD: '/api/student-applications/upload',
       ANALYZE: (id: string) => `/api/student-applications/analyze/${id}`,
+      GET_JOB: (id: string) => `/api/student-applications/jobs/${id}`,
       GET_APPLICATION: (id: string) => `/api/student-applications/${id}`,
       GET_TEMPLATE: '/api/student-applications/template',
       LIST: '/api/student-applications/'
@@ -238,7 +239,10 @@ describe('Module 1 Store - Student Application Processing', () => {
 
       vi.mocked(apiClient.post)
         .mockResolvedValueOnce(mockUploadResponse) // Upload call
-        .mockResolvedValueOnce(mockAnalysisResponse) // Analyze call
+        .mockResolvedValueOnce({ data: { job_id: 'job-1', status: 'queued' } }) // Analyze call
+      vi.mocked(apiClient.get)
+        .mockResolvedValueOnce({ data: { id: 'job-1', status: 'completed' } }) // Job status
+        .mockResolvedValueOnce(mockAnalysisResponse) // Application record
 
       // Execute upload and analyze
       await act(async () => {
@@ -271,17 +275,40 @@ describe('Module 1 Store - Student Application Processing', () => {
         }
       }
 
-      vi.mocked(apiClient.post).mockResolvedValue(mockAnalysisResponse)
+      vi.mocked(apiClient.post).mockResolvedValue({ data: { job_id: 'job-1', status: 'queued' } })
+      vi.mocked(apiClient.get)
+        .mockResolvedValueOnce({ data: { id: 'job-1', status: 'completed' } })
+        .mockResolvedValueOnce(mockAnalysisResponse)
 
       await act(async () => {
         await result.current.analyzeApplication('app-123')
       })
 
+      expect(apiClient.post).toHaveBeenCalledWith('/api/student-applications/analyze/app-123')
+      expect(apiClient.get).toHaveBeenCalledWith('/api/student-applications/jobs/job-1')
+      expect(apiClient.get).toHaveBeenCalledWith('/api/student-applications/app-123')
       expect(result.current.isProcessing).toBe(false)
-      expect(result.current.currentApplication).not.toBeNull()
+      expect(result.current.currentApplication?.structured_summary).toBe('Test summary')
       expect(result.current.applicationHistory).toHaveLength(1)
     })
 
+    it('should report a failed analysis job', async () => {
+      const { result } = renderHook(() => useModule1Store())
+
+      vi.mocked(apiClient.post).mockResolvedValue({ data: { job_id: 'job-1', status: 'queued' } })
+      vi.mocked(apiClient.get).mockResolvedValueOnce({
+        data: { id: 'job-1', status: 'failed', error_message: 'Model unavailable' }
+      })
+
+      await act(async () => {
+        await expect(result.current.analyzeApplication('app-123')).rejects.toThrow('Model unavailable')
+      })
+
+      expect(result.current.isProcessing).toBe(false)
+      expect(result.current.processingError).toBe('Model unavailable')
+      expect(result.current.applicationHistory).toHaveLength(0)
+    })
+
     it('should handle analysis error', async () => {
       const { result } = renderHook(() => useModule1Store())
 